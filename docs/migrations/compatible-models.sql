@@ -0,0 +1,150 @@
+-- ============================================
+-- COMPATIBLE MODELS - Индекс совместимых моделей
+-- Дата: 2026-10-19
+-- Описание: products.compatible_models TEXT[] с GIN индексом.
+-- Заполняется токенизатором scripts/model_tokens.py
+-- (build-compatible-models.py и импорт): "244", "df-244", "km385",
+-- "zn490bt", ... Страницы моделей и счётчики DongFeng по моделям
+-- ищут по массиву (&&, @>) вместо LIKE '%244%' по названию.
+-- Порядок: эта миграция → python3 build-compatible-models.py
+-- (триггеры счётчиков сами перенесут товары из 'general' по моделям).
+-- ============================================
+
+-- 1. Колонка и индекс
+ALTER TABLE products
+  ADD COLUMN IF NOT EXISTS compatible_models TEXT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_products_compatible_models
+ON products USING GIN (compatible_models);
+
+-- 2. Модель DongFeng по токенам (приоритет как раньше: 240-244, 354-404, ...)
+CREATE OR REPLACE FUNCTION product_dongfeng_model(p_models TEXT[])
+RETURNS TEXT AS $$
+  SELECT CASE
+    WHEN p_models && ARRAY['240', '244'] THEN '240-244'
+    WHEN p_models && ARRAY['354', '404'] THEN '354-404'
+    WHEN p_models && ARRAY['504'] THEN '504'
+    WHEN p_models && ARRAY['904'] THEN '904'
+    WHEN p_models && ARRAY['1304'] THEN '1304'
+    ELSE 'general'
+  END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 3. Ключи счётчиков: модель из compatible_models вместо LIKE по названию
+CREATE OR REPLACE FUNCTION product_count_keys(
+  p_category_id BIGINT,
+  p_manufacturer TEXT,
+  p_models TEXT[]
+)
+RETURNS TABLE (dimension TEXT, bucket TEXT) AS $$
+  SELECT 'total', ''
+  UNION ALL
+  SELECT 'category', COALESCE(p_category_id::TEXT, 'null')
+  UNION ALL
+  SELECT 'manufacturer', COALESCE(p_manufacturer, 'null')
+  UNION ALL
+  SELECT 'dongfeng_model', product_dongfeng_model(p_models)
+  WHERE p_manufacturer = 'DongFeng';
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 4. Триггерные функции из product-counts.sql - те же, но с compatible_models
+CREATE OR REPLACE FUNCTION product_counts_on_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO product_count_buckets (dimension, bucket, total, in_stock)
+  SELECT k.dimension, k.bucket, COUNT(*), COUNT(*) FILTER (WHERE r.in_stock)
+  FROM new_rows r
+  CROSS JOIN LATERAL product_count_keys(r.category_id, r.manufacturer, r.compatible_models) k
+  GROUP BY k.dimension, k.bucket
+  ON CONFLICT (dimension, bucket) DO UPDATE SET
+    total = product_count_buckets.total + EXCLUDED.total,
+    in_stock = product_count_buckets.in_stock + EXCLUDED.in_stock,
+    updated_at = NOW();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION product_counts_on_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE product_count_buckets b SET
+    total = b.total - d.total,
+    in_stock = b.in_stock - d.in_stock,
+    updated_at = NOW()
+  FROM (
+    SELECT k.dimension, k.bucket, COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE r.in_stock) AS in_stock
+    FROM old_rows r
+    CROSS JOIN LATERAL product_count_keys(r.category_id, r.manufacturer, r.compatible_models) k
+    GROUP BY k.dimension, k.bucket
+  ) d
+  WHERE b.dimension = d.dimension AND b.bucket = d.bucket;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION product_counts_on_update()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO product_count_buckets (dimension, bucket, total, in_stock)
+  SELECT dimension, bucket, SUM(d_total), SUM(d_in_stock)
+  FROM (
+    SELECT k.dimension, k.bucket, 1 AS d_total,
+           CASE WHEN n.in_stock THEN 1 ELSE 0 END AS d_in_stock
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    CROSS JOIN LATERAL product_count_keys(n.category_id, n.manufacturer, n.compatible_models) k
+    WHERE (n.category_id, n.manufacturer, n.compatible_models, n.in_stock)
+          IS DISTINCT FROM (o.category_id, o.manufacturer, o.compatible_models, o.in_stock)
+    UNION ALL
+    SELECT k.dimension, k.bucket, -1,
+           CASE WHEN o.in_stock THEN -1 ELSE 0 END
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    CROSS JOIN LATERAL product_count_keys(o.category_id, o.manufacturer, o.compatible_models) k
+    WHERE (n.category_id, n.manufacturer, n.compatible_models, n.in_stock)
+          IS DISTINCT FROM (o.category_id, o.manufacturer, o.compatible_models, o.in_stock)
+  ) delta
+  GROUP BY dimension, bucket
+  HAVING SUM(d_total) <> 0 OR SUM(d_in_stock) <> 0
+  ON CONFLICT (dimension, bucket) DO UPDATE SET
+    total = product_count_buckets.total + EXCLUDED.total,
+    in_stock = product_count_buckets.in_stock + EXCLUDED.in_stock,
+    updated_at = NOW();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION rebuild_product_counts()
+RETURNS VOID AS $$
+BEGIN
+  LOCK TABLE product_count_buckets IN EXCLUSIVE MODE;
+  DELETE FROM product_count_buckets;
+  INSERT INTO product_count_buckets (dimension, bucket, total, in_stock)
+  SELECT k.dimension, k.bucket, COUNT(*), COUNT(*) FILTER (WHERE p.in_stock)
+  FROM products p
+  CROSS JOIN LATERAL product_count_keys(p.category_id, p.manufacturer, p.compatible_models) k
+  GROUP BY k.dimension, k.bucket;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Старые версии (по названию) больше не используются
+DROP FUNCTION IF EXISTS product_count_keys(BIGINT, TEXT, TEXT);
+DROP FUNCTION IF EXISTS product_dongfeng_model(TEXT);
+
+-- Полный пересчёт (блокировка таблицы + DELETE) - только service role
+REVOKE EXECUTE ON FUNCTION rebuild_product_counts() FROM PUBLIC, anon, authenticated;
+
+-- 5. Пересчёт под новые ключи
+SELECT rebuild_product_counts();
+
+ANALYZE products;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- SELECT id, name, compatible_models FROM products
+-- WHERE compatible_models && ARRAY['240', '244'] LIMIT 20;
+--
+-- EXPLAIN SELECT id FROM products WHERE compatible_models @> ARRAY['km385'];
+-- -- Bitmap Index Scan on idx_products_compatible_models
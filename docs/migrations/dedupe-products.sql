@@ -0,0 +1,67 @@
+-- ============================================
+-- DEDUPE PRODUCTS - Удаление дубликатов с переносом ссылок
+-- Дата: 2026-10-19
+-- Описание: order_items.product_id - ON DELETE SET NULL, поэтому простое
+-- удаление дубликата обнуляет позиции заказов. dedupe_products() за один
+-- RPC на пачку переносит ссылки (order_items, product_offers) с лишних
+-- копий на оставляемый товар и удаляет копии - одной транзакцией, без
+-- запроса на каждый id. Вызывает scripts/dedupe.py (apply_dedupe).
+-- Требуется docs/migrations/product-offers.sql.
+-- ============================================
+
+-- p_map: [{"loser": 12, "survivor": 7}, ...]
+-- loser удаляется, только если survivor существует и сам не удаляется
+-- в этой же пачке; возвращает число перенесённых и удалённых строк.
+CREATE OR REPLACE FUNCTION dedupe_products(p_map JSONB)
+RETURNS JSONB AS $$
+DECLARE
+  v_order_items INTEGER;
+  v_offers INTEGER;
+  v_deleted INTEGER;
+BEGIN
+  CREATE TEMP TABLE dedupe_map AS
+  SELECT DISTINCT ON (m.loser) m.loser, m.survivor
+  FROM jsonb_to_recordset(p_map) AS m(loser BIGINT, survivor BIGINT)
+  JOIN products s ON s.id = m.survivor
+  WHERE m.loser <> m.survivor
+  ORDER BY m.loser;
+
+  DELETE FROM dedupe_map WHERE survivor IN (SELECT loser FROM dedupe_map);
+
+  -- 1. Ссылки - на оставляемый товар
+  UPDATE order_items oi SET product_id = m.survivor
+  FROM dedupe_map m
+  WHERE oi.product_id = m.loser;
+  GET DIAGNOSTICS v_order_items = ROW_COUNT;
+
+  UPDATE product_offers o SET product_id = m.survivor
+  FROM dedupe_map m
+  WHERE o.product_id = m.loser;
+  GET DIAGNOSTICS v_offers = ROW_COUNT;
+
+  -- 2. Лишние копии
+  DELETE FROM products p
+  USING dedupe_map m
+  WHERE p.id = m.loser;
+  GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+  DROP TABLE dedupe_map;
+
+  RETURN jsonb_build_object(
+    'deleted', v_deleted,
+    'order_items', v_order_items,
+    'offers', v_offers
+  );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Только service role (скрипты), не витрина
+REVOKE EXECUTE ON FUNCTION dedupe_products(JSONB) FROM PUBLIC, anon, authenticated;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- Позиции заказов, потерявшие товар (после dedupe_products не растёт):
+-- SELECT COUNT(*) FROM order_items WHERE product_id IS NULL;
+--
+-- SELECT dedupe_products('[{"loser": 12, "survivor": 7}]');
@@ -0,0 +1,45 @@
+-- ============================================
+-- IMAGE HASHES - Перцептивные хеши картинок товаров
+-- Дата: 2026-10-19
+-- Описание: pHash / dHash каждой картинки (64 бита в BIGINT) для поиска
+-- заглушек "нет фото" источников, одной картинки на разных товарах и
+-- почти одинаковых загрузок. Заполняет scripts/build-image-hashes.py;
+-- индекс (BK-дерево по расстоянию Хэмминга) строится в памяти
+-- (scripts/image_hashes.py), зеркалирование картинок по нему не качает
+-- и не заливает повторы.
+-- ============================================
+
+-- 1. Хеши по URL картинки (внешнему или нашему Storage)
+CREATE TABLE IF NOT EXISTS image_hashes (
+  image_url TEXT PRIMARY KEY,
+  sha256 TEXT NOT NULL,
+  -- Биты хеша как знаковое 64-битное число (Python переводит туда и обратно)
+  phash BIGINT NOT NULL,
+  dhash BIGINT NOT NULL,
+  width INTEGER,
+  height INTEGER,
+  -- Заглушка источника ("нет фото"): одна картинка у множества разных товаров
+  is_placeholder BOOLEAN NOT NULL DEFAULT false,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 2. Одинаковое содержимое под разными URL
+CREATE INDEX IF NOT EXISTS idx_image_hashes_sha256
+ON image_hashes(sha256);
+
+CREATE INDEX IF NOT EXISTS idx_image_hashes_placeholder
+ON image_hashes(image_url) WHERE is_placeholder;
+
+-- 3. Права: только service role (скрипты), витрине таблица не нужна
+ALTER TABLE image_hashes ENABLE ROW LEVEL SECURITY;
+
+ANALYZE image_hashes;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- Заглушки и сколько товаров их показывают:
+-- SELECT h.image_url, COUNT(p.id) AS products
+-- FROM image_hashes h JOIN products p ON p.image_url = h.image_url
+-- WHERE h.is_placeholder
+-- GROUP BY h.image_url ORDER BY products DESC;
@@ -0,0 +1,72 @@
+-- ============================================
+-- MERGE SPECIFICATIONS - Слияние JSONB на стороне БД
+-- Дата: 2026-10-19
+-- Описание: specifications || patch (и удаление ключей) сразу для многих
+-- товаров одним RPC. Скриптам больше не нужно читать specifications,
+-- мержить в Python и записывать JSONB целиком - нет лишнего round trip
+-- и не теряются параллельные правки других ключей.
+-- ============================================
+
+-- 1. Один патч для списка id
+-- SELECT merge_specifications(ARRAY[1,2,3], '{"part_type": "filter"}', ARRAY['old_key']);
+CREATE OR REPLACE FUNCTION merge_specifications(
+  p_ids BIGINT[],
+  p_patch JSONB DEFAULT '{}'::JSONB,
+  p_remove TEXT[] DEFAULT '{}'::TEXT[]
+)
+RETURNS INTEGER AS $$
+DECLARE
+  affected INTEGER;
+BEGIN
+  UPDATE products SET
+    specifications = (COALESCE(specifications, '{}'::JSONB) || COALESCE(p_patch, '{}'::JSONB))
+                     - COALESCE(p_remove, '{}'::TEXT[]),
+    updated_at = NOW()
+  WHERE id = ANY(p_ids);
+
+  GET DIAGNOSTICS affected = ROW_COUNT;
+  RETURN affected;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- 2. Свой патч для каждого товара + простые колонки
+-- p_rows: [{"id": 1, "fields": {"manufacturer": "DongFeng", "model": "DF-244"},
+--           "patch": {"part_type": "filter"}, "remove": ["old_key"]}, ...]
+-- fields: только manufacturer / model / category_id / image_url (остальное
+-- игнорируется; image_url пишет scripts/image_mirror.py).
+-- Каждый id должен встречаться в p_rows один раз.
+CREATE OR REPLACE FUNCTION merge_specifications_bulk(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+  affected INTEGER;
+BEGIN
+  UPDATE products p SET
+    manufacturer = CASE WHEN r.fields ? 'manufacturer'
+                        THEN r.fields->>'manufacturer' ELSE p.manufacturer END,
+    model = CASE WHEN r.fields ? 'model'
+                 THEN r.fields->>'model' ELSE p.model END,
+    category_id = CASE WHEN r.fields ? 'category_id'
+                       THEN (r.fields->>'category_id')::BIGINT ELSE p.category_id END,
+    image_url = CASE WHEN r.fields ? 'image_url'
+                     THEN r.fields->>'image_url' ELSE p.image_url END,
+    specifications = (COALESCE(p.specifications, '{}'::JSONB) || COALESCE(r.patch, '{}'::JSONB))
+                     - COALESCE(r.remove, '{}'::TEXT[]),
+    updated_at = NOW()
+  FROM jsonb_to_recordset(p_rows) AS r(id BIGINT, fields JSONB, patch JSONB, remove TEXT[])
+  WHERE p.id = r.id;
+
+  GET DIAGNOSTICS affected = ROW_COUNT;
+  RETURN affected;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Только service role (скрипты), не витрина
+REVOKE EXECUTE ON FUNCTION merge_specifications(BIGINT[], JSONB, TEXT[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION merge_specifications_bulk(JSONB) FROM PUBLIC, anon, authenticated;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- SELECT merge_specifications_bulk('[{"id": 1, "patch": {"test": true}}]');
+-- SELECT specifications FROM products WHERE id = 1;
+-- SELECT merge_specifications(ARRAY[1], '{}', ARRAY['test']);
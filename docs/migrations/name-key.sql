@@ -0,0 +1,74 @@
+-- ============================================
+-- NAME KEY - Уникальное нормализованное название товара
+-- Дата: 2026-10-19
+-- Описание: генерируемая колонка name_key (нижний регистр, без лишних
+-- пробелов - как rules_engine.normalize_name()) с уникальным индексом.
+-- Импортёры вставляют товары через ON CONFLICT (name_key) DO NOTHING
+-- (db_batch.insert_new): дубликат отбрасывает БД за тот же запрос,
+-- без выгрузки всех названий и без чисток после импорта.
+-- ============================================
+
+-- 1. Нормализация названия (IMMUTABLE - нужна для генерируемой колонки).
+-- Пробельные символы - ровно те, что str.split() в Python
+-- (db_batch.name_key): табуляция, переводы строк, NBSP, узкие и широкие
+-- пробелы Unicode. \s зависит от локали (под glibc NBSP не пробел),
+-- поэтому класс перечислен явно
+CREATE OR REPLACE FUNCTION product_name_key(p_name TEXT)
+RETURNS TEXT AS $$
+  SELECT NULLIF(lower(btrim(regexp_replace(
+    p_name,
+    '[\u0009-\u000d\u001c-\u0020\u0085\u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+',
+    ' ',
+    'g'
+  ), ' ')), '');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 2. Генерируемая колонка
+ALTER TABLE products
+  ADD COLUMN IF NOT EXISTS name_key TEXT
+  GENERATED ALWAYS AS (product_name_key(name)) STORED;
+
+-- Колонка из прошлой версии функции (\s вместо явного класса) не
+-- пересчитывается сама - UPDATE строки пересчитывает генерируемую колонку
+UPDATE products SET name = name
+WHERE name_key IS DISTINCT FROM product_name_key(name);
+
+-- 3. Уже существующие дубликаты. Если запрос что-то вернул - сначала
+-- почистить их (scripts/cleanup-all-duplicates.py), иначе шаг 4 упадёт
+-- SELECT name_key, COUNT(*), array_agg(id ORDER BY id) AS ids
+-- FROM products
+-- WHERE name_key IS NOT NULL
+-- GROUP BY name_key HAVING COUNT(*) > 1
+-- ORDER BY COUNT(*) DESC;
+
+DO $$
+DECLARE
+  v_duplicates BIGINT;
+BEGIN
+  SELECT COUNT(*) INTO v_duplicates FROM (
+    SELECT 1 FROM products
+    WHERE name_key IS NOT NULL
+    GROUP BY name_key HAVING COUNT(*) > 1
+  ) d;
+
+  IF v_duplicates > 0 THEN
+    RAISE EXCEPTION
+      'В products % групп дубликатов по name_key - запустите scripts/cleanup-all-duplicates.py и примените миграцию снова',
+      v_duplicates;
+  END IF;
+END $$;
+
+-- 4. Уникальный индекс (не частичный: PostgREST использует его в on_conflict;
+-- NULL не конфликтуют)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_products_name_key
+ON products(name_key);
+
+ANALYZE products;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- Повторная вставка того же названия в другом регистре не создаёт строку:
+-- INSERT INTO products (name, slug, price) VALUES ('ТЕСТ  товар', 'test-name-key', 0)
+-- ON CONFLICT (name_key) DO NOTHING;
+-- SELECT id, name, name_key FROM products WHERE name_key = 'тест товар';
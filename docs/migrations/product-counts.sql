@@ -0,0 +1,207 @@
+-- ============================================
+-- PRODUCT COUNTS - Инкрементальные счётчики товаров
+-- Дата: 2026-10-19
+-- Описание: Счётчики по категориям, производителям и моделям DongFeng
+-- обновляются триггерами на products. Полный скан таблицы больше не нужен:
+-- generate-product-counts.py берёт готовый JSON через get_product_counts().
+-- ============================================
+
+-- 1. Таблица счётчиков
+-- dimension: 'total' | 'category' | 'manufacturer' | 'dongfeng_model'
+CREATE TABLE IF NOT EXISTS product_count_buckets (
+  dimension TEXT NOT NULL,
+  bucket TEXT NOT NULL,
+  total BIGINT NOT NULL DEFAULT 0,
+  in_stock BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  PRIMARY KEY (dimension, bucket)
+);
+
+-- 2. Модель DongFeng по названию (та же логика, что была в generate-product-counts.py)
+CREATE OR REPLACE FUNCTION product_dongfeng_model(p_name TEXT)
+RETURNS TEXT AS $$
+  SELECT CASE
+    WHEN lower(p_name) LIKE '%240%' OR lower(p_name) LIKE '%244%' THEN '240-244'
+    WHEN lower(p_name) LIKE '%354%' OR lower(p_name) LIKE '%404%' THEN '354-404'
+    WHEN lower(p_name) LIKE '%504%' THEN '504'
+    WHEN lower(p_name) LIKE '%904%' THEN '904'
+    WHEN lower(p_name) LIKE '%1304%' THEN '1304'
+    ELSE 'general'
+  END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 3. Все счётчики, в которые попадает один товар
+CREATE OR REPLACE FUNCTION product_count_keys(
+  p_category_id BIGINT,
+  p_manufacturer TEXT,
+  p_name TEXT
+)
+RETURNS TABLE (dimension TEXT, bucket TEXT) AS $$
+  SELECT 'total', ''
+  UNION ALL
+  SELECT 'category', COALESCE(p_category_id::TEXT, 'null')
+  UNION ALL
+  SELECT 'manufacturer', COALESCE(p_manufacturer, 'null')
+  UNION ALL
+  SELECT 'dongfeng_model', product_dongfeng_model(p_name)
+  WHERE p_manufacturer = 'DongFeng';
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 4. Триггерные функции (statement-level, через transition tables):
+-- один UPDATE на 10 000 строк = один агрегирующий INSERT ... ON CONFLICT
+CREATE OR REPLACE FUNCTION product_counts_on_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO product_count_buckets (dimension, bucket, total, in_stock)
+  SELECT k.dimension, k.bucket, COUNT(*), COUNT(*) FILTER (WHERE r.in_stock)
+  FROM new_rows r
+  CROSS JOIN LATERAL product_count_keys(r.category_id, r.manufacturer, r.name) k
+  GROUP BY k.dimension, k.bucket
+  ON CONFLICT (dimension, bucket) DO UPDATE SET
+    total = product_count_buckets.total + EXCLUDED.total,
+    in_stock = product_count_buckets.in_stock + EXCLUDED.in_stock,
+    updated_at = NOW();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION product_counts_on_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE product_count_buckets b SET
+    total = b.total - d.total,
+    in_stock = b.in_stock - d.in_stock,
+    updated_at = NOW()
+  FROM (
+    SELECT k.dimension, k.bucket, COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE r.in_stock) AS in_stock
+    FROM old_rows r
+    CROSS JOIN LATERAL product_count_keys(r.category_id, r.manufacturer, r.name) k
+    GROUP BY k.dimension, k.bucket
+  ) d
+  WHERE b.dimension = d.dimension AND b.bucket = d.bucket;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION product_counts_on_update()
+RETURNS TRIGGER AS $$
+BEGIN
+  -- Считаем только строки, у которых изменились поля, влияющие на счётчики
+  INSERT INTO product_count_buckets (dimension, bucket, total, in_stock)
+  SELECT dimension, bucket, SUM(d_total), SUM(d_in_stock)
+  FROM (
+    SELECT k.dimension, k.bucket, 1 AS d_total,
+           CASE WHEN n.in_stock THEN 1 ELSE 0 END AS d_in_stock
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    CROSS JOIN LATERAL product_count_keys(n.category_id, n.manufacturer, n.name) k
+    WHERE (n.category_id, n.manufacturer, n.name, n.in_stock)
+          IS DISTINCT FROM (o.category_id, o.manufacturer, o.name, o.in_stock)
+    UNION ALL
+    SELECT k.dimension, k.bucket, -1,
+           CASE WHEN o.in_stock THEN -1 ELSE 0 END
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    CROSS JOIN LATERAL product_count_keys(o.category_id, o.manufacturer, o.name) k
+    WHERE (n.category_id, n.manufacturer, n.name, n.in_stock)
+          IS DISTINCT FROM (o.category_id, o.manufacturer, o.name, o.in_stock)
+  ) delta
+  GROUP BY dimension, bucket
+  HAVING SUM(d_total) <> 0 OR SUM(d_in_stock) <> 0
+  ON CONFLICT (dimension, bucket) DO UPDATE SET
+    total = product_count_buckets.total + EXCLUDED.total,
+    in_stock = product_count_buckets.in_stock + EXCLUDED.in_stock,
+    updated_at = NOW();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- 5. Триггеры
+DROP TRIGGER IF EXISTS product_counts_insert ON products;
+CREATE TRIGGER product_counts_insert
+  AFTER INSERT ON products
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION product_counts_on_insert();
+
+DROP TRIGGER IF EXISTS product_counts_delete ON products;
+CREATE TRIGGER product_counts_delete
+  AFTER DELETE ON products
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION product_counts_on_delete();
+
+DROP TRIGGER IF EXISTS product_counts_update ON products;
+CREATE TRIGGER product_counts_update
+  AFTER UPDATE ON products
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION product_counts_on_update();
+
+-- 6. Полный пересчёт (первичное заполнение и починка после ручных правок)
+CREATE OR REPLACE FUNCTION rebuild_product_counts()
+RETURNS VOID AS $$
+BEGIN
+  LOCK TABLE product_count_buckets IN EXCLUSIVE MODE;
+  DELETE FROM product_count_buckets;
+  INSERT INTO product_count_buckets (dimension, bucket, total, in_stock)
+  SELECT k.dimension, k.bucket, COUNT(*), COUNT(*) FILTER (WHERE p.in_stock)
+  FROM products p
+  CROSS JOIN LATERAL product_count_keys(p.category_id, p.manufacturer, p.name) k
+  GROUP BY k.dimension, k.bucket;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- 7. JSON в формате product-counts.json
+CREATE OR REPLACE FUNCTION get_product_counts()
+RETURNS JSONB AS $$
+  SELECT jsonb_build_object(
+    'total', COALESCE((SELECT total FROM product_count_buckets
+                       WHERE dimension = 'total'), 0),
+    'in_stock', COALESCE((SELECT in_stock FROM product_count_buckets
+                          WHERE dimension = 'total'), 0),
+    'by_category', COALESCE((
+      SELECT jsonb_object_agg(b.bucket, jsonb_build_object(
+        'name', COALESCE(c.name, 'Category ' || b.bucket),
+        'slug', COALESCE(c.slug, 'category-' || b.bucket),
+        'total', b.total,
+        'in_stock', b.in_stock
+      ))
+      FROM product_count_buckets b
+      LEFT JOIN categories c ON c.id::TEXT = b.bucket
+      WHERE b.dimension = 'category' AND b.total > 0
+    ), '{}'::JSONB),
+    'by_manufacturer', COALESCE((
+      SELECT jsonb_object_agg(bucket, jsonb_build_object(
+        'total', total,
+        'in_stock', in_stock
+      ))
+      FROM product_count_buckets
+      WHERE dimension = 'manufacturer' AND total > 0
+    ), '{}'::JSONB),
+    -- DongFeng по моделям считается только по товарам в наличии
+    'dongfeng_by_model', (
+      SELECT jsonb_object_agg(m.model, COALESCE(b.in_stock, 0))
+      FROM unnest(ARRAY['240-244', '354-404', '504', '904', '1304', 'general']) AS m(model)
+      LEFT JOIN product_count_buckets b
+        ON b.dimension = 'dongfeng_model' AND b.bucket = m.model
+    )
+  );
+$$ LANGUAGE sql STABLE;
+
+-- 8. Первичное заполнение
+SELECT rebuild_product_counts();
+
+-- 9. Права: читать счётчики может витрина (anon)
+ALTER TABLE product_count_buckets ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Product counts are public" ON product_count_buckets;
+CREATE POLICY "Product counts are public"
+  ON product_count_buckets FOR SELECT
+  USING (true);
+GRANT EXECUTE ON FUNCTION get_product_counts() TO anon, authenticated;
+-- Полный пересчёт (блокировка таблицы + DELETE) - только service role
+REVOKE EXECUTE ON FUNCTION rebuild_product_counts() FROM PUBLIC, anon, authenticated;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- SELECT get_product_counts();
+-- SELECT * FROM product_count_buckets ORDER BY dimension, total DESC;
@@ -0,0 +1,46 @@
+-- ============================================
+-- PRODUCT OFFERS - Предложения источников для одного товара
+-- Дата: 2026-10-19
+-- Описание: одна деталь из tata-agro, zip-agro и agrodom - один товар
+-- в products и по строке в product_offers на каждый источник (цена,
+-- наличие, ссылка). Заполняет resolve-entities.py; импортёры не создают
+-- товар заново, если его ключ источника уже есть среди предложений.
+-- ============================================
+
+-- 1. Таблица предложений
+CREATE TABLE IF NOT EXISTS product_offers (
+  id BIGSERIAL PRIMARY KEY,
+  product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+  source TEXT NOT NULL,
+  source_url TEXT NOT NULL,
+  source_article TEXT,
+  name TEXT,
+  price NUMERIC(10, 2),
+  in_stock BOOLEAN DEFAULT false,
+  image_url TEXT,
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  -- Ключ тот же, что products_source_key (source_identity.py)
+  CONSTRAINT product_offers_source_key UNIQUE (source, source_url)
+);
+
+-- 2. Предложения товара
+CREATE INDEX IF NOT EXISTS idx_product_offers_product
+ON product_offers(product_id);
+
+-- 3. Права: предложения видит витрина (anon)
+ALTER TABLE product_offers ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Product offers are public" ON product_offers;
+CREATE POLICY "Product offers are public"
+  ON product_offers FOR SELECT
+  USING (true);
+
+ANALYZE product_offers;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- Товары с предложениями из нескольких источников:
+-- SELECT p.id, p.name, COUNT(*) AS offers, MIN(o.price) AS min_price
+-- FROM products p JOIN product_offers o ON o.product_id = p.id
+-- GROUP BY p.id, p.name HAVING COUNT(*) > 1
+-- ORDER BY offers DESC LIMIT 20;
@@ -0,0 +1,39 @@
+-- ============================================
+-- SLUG REDIRECTS - Старые slug → новые
+-- Дата: 2026-10-19
+-- Описание: скрипты fix-*-slugs.py меняют slug на месте, а старые URL
+-- уже проиндексированы. Каждая замена записывается сюда (old → new),
+-- из таблицы собирается карта frontend/app/data/slug-redirects.json
+-- (scripts/export-slug-redirects.py), по которой middleware отдаёт 308
+-- без запроса к БД.
+-- ============================================
+
+-- 1. Таблица замен (entity: product / category)
+CREATE TABLE IF NOT EXISTS slug_redirects (
+  id BIGSERIAL PRIMARY KEY,
+  entity TEXT NOT NULL DEFAULT 'product',
+  old_slug TEXT NOT NULL,
+  new_slug TEXT NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  -- Для upsert(..., on_conflict="entity,old_slug"): повторная замена
+  -- того же slug перезаписывает цель
+  CONSTRAINT slug_redirects_old_key UNIQUE (entity, old_slug),
+  CONSTRAINT slug_redirects_not_self CHECK (old_slug <> new_slug)
+);
+
+-- 2. Права: таблицу может читать витрина (anon)
+ALTER TABLE slug_redirects ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Slug redirects are public" ON slug_redirects;
+CREATE POLICY "Slug redirects are public"
+  ON slug_redirects FOR SELECT
+  USING (true);
+
+ANALYZE slug_redirects;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- Цепочки (A → B, B → C) схлопываются при экспорте карты:
+-- SELECT r1.old_slug, r1.new_slug, r2.new_slug AS final_slug
+-- FROM slug_redirects r1
+-- JOIN slug_redirects r2 ON r2.entity = r1.entity AND r2.old_slug = r1.new_slug;
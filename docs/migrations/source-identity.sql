@@ -0,0 +1,92 @@
+-- ============================================
+-- SOURCE IDENTITY - Ключ источника для товаров
+-- Дата: 2026-10-19
+-- Описание: source / source_url / source_article как отдельные колонки
+-- с UNIQUE (source, source_url). Импорт и resync-by-source.py находят
+-- товар по точному ключу вместо поиска по префиксу названия.
+-- ============================================
+
+-- 1. Колонки
+ALTER TABLE products ADD COLUMN IF NOT EXISTS source TEXT;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS source_url TEXT;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS source_article TEXT;
+
+-- 2. Заполнение из specifications (так раньше писали импортёры).
+-- Нормализация совпадает с source_identity.normalize_source_url():
+-- схема и хост в нижнем регистре, без #fragment, "/" в конце снимается
+-- только с пути (query не трогается). Части URL - регулярным выражением
+-- из RFC 3986 (то же разбиение, что urlsplit)
+WITH split AS (
+  SELECT
+    id,
+    regexp_match(
+      regexp_replace(specifications->>'source_url', '^\s+|\s+$', '', 'g'),
+      '^(([^:/?#]+):)?(//([^/?#]*))?([^?#]*)(\?([^#]*))?'
+    ) AS m,
+    NULLIF(btrim(specifications->>'article'), '') AS article
+  FROM products
+  WHERE source_url IS NULL
+    AND btrim(COALESCE(specifications->>'source_url', '')) <> ''
+),
+parsed AS (
+  SELECT
+    id,
+    COALESCE(lower(m[2]) || ':', '')
+      || COALESCE('//' || lower(m[4]), '')
+      || rtrim(m[5], '/')
+      || COALESCE('?' || NULLIF(m[7], ''), '') AS url,
+    regexp_replace(lower(COALESCE(m[4], '')), '^www\.', '') AS host,
+    article
+  FROM split
+),
+keyed AS (
+  SELECT
+    id,
+    url,
+    article,
+    -- Как source_identity.detect_source(): хост без www. через SOURCE_HOSTS
+    CASE host
+      WHEN 'tata-agro-moto.com' THEN 'tata-agro'
+      WHEN 'zip-agro.ru' THEN 'zip-agro'
+      WHEN 'xn----7sbabpgpk4bsbesjp1f.xn--p1ai' THEN 'agrodom'
+      WHEN 'запчасти-агродом.рф' THEN 'agrodom'
+      ELSE NULLIF(host, '')
+    END AS source
+  FROM parsed
+),
+-- Для дублей ключ получает только самая старая строка,
+-- остальные остаются без ключа до очистки дубликатов
+ranked AS (
+  SELECT *, ROW_NUMBER() OVER (PARTITION BY source, url ORDER BY id) AS rn
+  FROM keyed
+)
+UPDATE products p SET
+  source = r.source,
+  source_url = r.url,
+  source_article = r.article
+FROM ranked r
+WHERE p.id = r.id
+  AND r.rn = 1
+  AND NOT EXISTS (
+    SELECT 1 FROM products e
+    WHERE e.source = r.source AND e.source_url = r.url
+  );
+
+-- 3. Уникальный ключ (NULL не конфликтуют - товары без источника не мешают).
+-- Не частичный индекс, чтобы PostgREST мог использовать его в on_conflict
+ALTER TABLE products DROP CONSTRAINT IF EXISTS products_source_key;
+ALTER TABLE products
+  ADD CONSTRAINT products_source_key UNIQUE (source, source_url);
+
+-- 4. Поиск по артикулу внутри источника
+CREATE INDEX IF NOT EXISTS idx_products_source_article
+ON products(source, source_article)
+WHERE source_article IS NOT NULL;
+
+ANALYZE products;
+
+-- ============================================
+-- ПРОВЕРКА
+-- ============================================
+-- SELECT source, COUNT(*), COUNT(source_article) AS with_article
+-- FROM products GROUP BY source ORDER BY 2 DESC;
@@ -23,41 +23,19 @@ export default function DongFengModelPage() {
     async function loadProducts() {
       setLoading(true);
 
-      // Загружаем все товары DongFeng
+      // Модели по индексу compatible_models (scripts/model_tokens.py)
+      const models =
+        model === "240-244" ? ["240", "244"] : model === "354-404" ? ["354", "404"] : [];
+
       const { data } = await supabase
         .from("products")
         .select("*")
         .eq("manufacturer", "DongFeng")
         .eq("in_stock", true)
+        .overlaps("compatible_models", models)
         .order("created_at", { ascending: false });
 
-      if (data) {
-        // Фильтруем по модели
-        const filtered = data.filter((product: Product) => {
-          const name = product.name.toLowerCase();
-          const productModel = product.model?.toLowerCase() || "";
-
-          if (model === "240-244") {
-            return (
-              name.includes("240") ||
-              name.includes("244") ||
-              productModel.includes("240") ||
-              productModel.includes("244")
-            );
-          } else if (model === "354-404") {
-            return (
-              name.includes("354") ||
-              name.includes("404") ||
-              productModel.includes("354") ||
-              productModel.includes("404")
-            );
-          }
-          return false;
-        });
-
-        setProducts(filtered);
-      }
-
+      setProducts(data || []);
       setLoading(false);
     }
 
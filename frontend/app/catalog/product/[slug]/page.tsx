@@ -13,6 +13,7 @@ import 'react-toastify/dist/ReactToastify.css';
 import "./product.css";
 
 import { Product, Category } from "../../../../types";
+import { productImages, productImageSrcSet, productImageUrl } from "../../../lib/productImages";
 
 export default function ProductPage() {
   const { slug } = useParams();
@@ -82,6 +83,9 @@ export default function ProductPage() {
     return <div>Загрузка...</div>;
   }
 
+  // Нарезанные копии (scripts/build-image-derivatives.py) вместо оригинала
+  const images = productImages(product);
+
   return (
     <>
       <div className="product-page">
@@ -113,10 +117,30 @@ export default function ProductPage() {
                     -{Math.round((1 - product.price / product.old_price) * 100)}%
                   </div>
                 )}
-                <img
-                  src={product.image_url || "/images/placeholder.jpg"}
-                  alt={product.name}
-                />
+                {images ? (
+                  <picture>
+                    {images.formats.includes("avif") && (
+                      <source
+                        type="image/avif"
+                        srcSet={productImageSrcSet(images, "avif")}
+                        sizes="(max-width: 768px) 100vw, 50vw"
+                      />
+                    )}
+                    <img
+                      src={productImageUrl(images, 640)}
+                      srcSet={productImageSrcSet(images)}
+                      sizes="(max-width: 768px) 100vw, 50vw"
+                      width={images.width}
+                      height={images.height}
+                      alt={product.name}
+                    />
+                  </picture>
+                ) : (
+                  <img
+                    src={product.image_url || "/images/placeholder.jpg"}
+                    alt={product.name}
+                  />
+                )}
               </div>
             </div>
 
@@ -25,6 +25,7 @@ import { useState, useEffect } from "react";
 import { useCart } from "../context/CartContext";
 import { useFavorites } from "../context/FavoritesContext";
 import { useCompare } from "../context/CompareContext";
+import { productImageProps } from "../lib/productImages";
 import { ShoppingCartIcon, IndustryIcon, ArrowRightIcon } from "./Icons";
 
 // Интерфейсы
@@ -126,6 +127,7 @@ export default function ProductCard({ product }: ProductCardProps) {
           className="product-image"
           priority={product.is_featured}
           quality={75}
+          {...productImageProps(product)}
         />
         {product.old_price && product.old_price > product.price && (
           <span className="discount-badge">-{discount}%</span>
@@ -0,0 +1,50 @@
+/**
+ * Производные картинки товаров
+ * scripts/build-image-derivatives.py режет картинку из Storage в WebP
+ * (и AVIF) фиксированной ширины рядом с оригиналом и пишет описание в
+ * specifications.images - здесь по нему строятся src / srcset без
+ * оптимизатора Next и без скачивания оригинала.
+ *
+ * AVIF (images.formats) отдаёт страница товара через <picture>; next/image
+ * в карточках принимает один URL на ширину - там WebP.
+ */
+
+import type { ImageLoader } from "next/image";
+import type { Product, ProductImages } from "../../types";
+
+/**
+ * Описание производных или null (картинку ещё не нарезали)
+ */
+export function productImages(product: Pick<Product, "specifications">): ProductImages | null {
+  const images = product.specifications?.images;
+  return images && images.widths?.length ? images : null;
+}
+
+/**
+ * URL копии не уже запрошенной ширины (или самой большой)
+ */
+export function productImageUrl(images: ProductImages, width: number, format = "webp"): string {
+  const fit = images.widths.find((w) => w >= width) ?? images.widths[images.widths.length - 1];
+  return `${images.base}-${fit}w.${format}`;
+}
+
+/**
+ * srcset для <img>: "…-160w.webp 160w, …-320w.webp 320w, …"
+ */
+export function productImageSrcSet(images: ProductImages, format = "webp"): string {
+  return images.widths.map((w) => `${images.base}-${w}w.${format} ${w}w`).join(", ");
+}
+
+/**
+ * Props для next/image: loader берёт готовую копию нужной ширины,
+ * размытая заглушка - из specifications.images.placeholder
+ */
+export function productImageProps(product: Pick<Product, "specifications">) {
+  const images = productImages(product);
+  if (!images) return {};
+
+  const loader: ImageLoader = ({ width }) => productImageUrl(images, width);
+  return images.placeholder
+    ? { loader, placeholder: "blur" as const, blurDataURL: images.placeholder }
+    : { loader };
+}
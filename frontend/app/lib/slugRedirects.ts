@@ -0,0 +1,29 @@
+/**
+ * Редиректы со старых slug товаров и категорий
+ * Карты собираются скриптом scripts/export-slug-redirects.py из таблицы
+ * slug_redirects: цепочки уже схлопнуты, поиск - один доступ к объекту
+ */
+
+import categoryRedirects from "../data/category-slug-redirects.json";
+import redirects from "../data/slug-redirects.json";
+
+const PRODUCT_REDIRECTS: Record<string, string> = redirects;
+const CATEGORY_REDIRECTS: Record<string, string> = categoryRedirects;
+
+/**
+ * Новый slug товара или null, если slug не менялся
+ */
+export function productSlugRedirect(slug: string): string | null {
+  return Object.prototype.hasOwnProperty.call(PRODUCT_REDIRECTS, slug)
+    ? PRODUCT_REDIRECTS[slug]
+    : null;
+}
+
+/**
+ * Новый slug категории или null, если slug не менялся
+ */
+export function categorySlugRedirect(slug: string): string | null {
+  return Object.prototype.hasOwnProperty.call(CATEGORY_REDIRECTS, slug)
+    ? CATEGORY_REDIRECTS[slug]
+    : null;
+}
@@ -0,0 +1,45 @@
+import { NextResponse } from "next/server";
+import type { NextRequest } from "next/server";
+
+import { categorySlugRedirect, productSlugRedirect } from "./app/lib/slugRedirects";
+
+/**
+ * Редиректы со старых slug товаров и категорий (после fix-*-slugs.py)
+ * Старый URL из поисковиков сразу получает 308 на новый - без запроса
+ * к БД и без 404 на странице товара / категории.
+ *
+ * Rate limiting - в middleware.ts.disabled
+ */
+const PRODUCT_PREFIX = "/catalog/product/";
+const CATEGORY_PREFIX = "/catalog/parts/";
+
+export function middleware(request: NextRequest) {
+  const { pathname } = request.nextUrl;
+
+  const [prefix, lookup] = pathname.startsWith(PRODUCT_PREFIX)
+    ? [PRODUCT_PREFIX, productSlugRedirect]
+    : [CATEGORY_PREFIX, categorySlugRedirect];
+
+  let slug: string;
+  try {
+    slug = decodeURIComponent(pathname.slice(prefix.length));
+  } catch {
+    return NextResponse.next();
+  }
+
+  const target = lookup(slug);
+  if (!target) {
+    return NextResponse.next();
+  }
+
+  const url = request.nextUrl.clone();
+  url.pathname = prefix + encodeURIComponent(target);
+  return NextResponse.redirect(url, 308);
+}
+
+/**
+ * Только страницы товаров и категорий запчастей
+ */
+export const config = {
+  matcher: ["/catalog/product/:slug", "/catalog/parts/:slug"],
+};
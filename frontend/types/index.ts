@@ -10,17 +10,33 @@ export interface Product {
   category_id: number;
   manufacturer?: string;
   model?: string;
+  compatible_models?: string[];
   in_stock: boolean;
   is_featured?: boolean;
   power?: string;
   description?: string;
-  specifications?: string;
+  specifications?: ProductSpecifications;
   brand?: string;
   stock_quantity?: number;
   created_at?: string;
   category?: string; // Добавляем пропущенное свойство
 }
 
+// specifications.images - производные картинки (scripts/build-image-derivatives.py)
+export interface ProductImages {
+  base: string;
+  widths: number[];
+  formats: string[];
+  width: number;
+  height: number;
+  placeholder?: string;
+}
+
+export interface ProductSpecifications {
+  images?: ProductImages;
+  [key: string]: unknown;
+}
+
 export interface Category {
   id: number;
   name: string;
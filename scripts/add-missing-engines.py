@@ -9,6 +9,8 @@ import json
 import re
 from supabase import create_client
 
+from model_tokens import extract_models
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -122,6 +124,7 @@ for i, engine in enumerate(missing_engines, 1):
             "manufacturer": manufacturer,
             "image_url": image_url,
             "in_stock": True,
+            "compatible_models": extract_models(title, description),
             "specifications": {"description": description}
         }
 
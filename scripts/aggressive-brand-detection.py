@@ -7,6 +7,8 @@ import os
 import re
 from supabase import Client, create_client
 
+from db_batch import WriteBehindQueue
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
@@ -83,18 +85,27 @@ print("=" * 80)
 print("🎯 АГРЕССИВНОЕ ОПРЕДЕЛЕНИЕ БРЕНДОВ")
 print("=" * 80 + "\n")
 
-# Загружаем UNIVERSAL товары батчами
+# Загружаем UNIVERSAL товары батчами.
+# Пагинация по id, а не по offset: обновлённые товары выпадают из выборки
+# manufacturer = UNIVERSAL, и offset начинал бы пропускать строки
 total_updated = 0
-offset = 0
+last_id = 0
+batch_num = 0
 batch_size = 500
 
+# Запись в фоне: чтение следующего batch не ждёт обновлений
+queue = WriteBehindQueue(supabase)
+
 while True:
-    print(f"📦 Обработка batch {offset//batch_size + 1}...")
+    batch_num += 1
+    print(f"📦 Обработка batch {batch_num}...")
 
     result = supabase.table("products") \
         .select("id, name") \
         .eq("manufacturer", "UNIVERSAL") \
-        .range(offset, offset + batch_size - 1) \
+        .gt("id", last_id) \
+        .order("id") \
+        .limit(batch_size) \
         .execute()
 
     if not result.data:
@@ -107,25 +118,22 @@ while True:
         detected_brand = detect_brand(name)
 
         if detected_brand:
-            try:
-                supabase.table("products") \
-                    .update({"manufacturer": detected_brand}) \
-                    .eq("id", product["id"]) \
-                    .execute()
-
-                batch_updated += 1
-                total_updated += 1
+            queue.put(product["id"], {"manufacturer": detected_brand})
+            batch_updated += 1
+            total_updated += 1
 
-            except Exception as e:
-                pass
+    print(f"   ✅ В очереди: {batch_updated} из {len(result.data)}")
 
-    print(f"   ✅ Обновлено: {batch_updated} из {len(result.data)}")
-
-    offset += batch_size
+    last_id = result.data[-1]["id"]
 
     if len(result.data) < batch_size:
         break
 
+# Дописываем всё, что осталось в очереди
+queue.close()
+total_updated = queue.stats["updated"]
+print(f"\n💾 Записано за {queue.stats['requests']} запросов, ошибок: {queue.stats['failed']}")
+
 print("\n" + "=" * 80)
 print(f"📊 ИТОГО ОБНОВЛЕНО: {total_updated}")
 print("=" * 80)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+АДАПТИВНАЯ НАГРУЗКА НА БД (AIMD)
+
+Вместо подобранных руками BATCH_SIZE = 50, time.sleep(0.5) и Pool(12):
+контроллер меряет задержку и ошибки запросов и сам находит самую
+быструю безопасную скорость.
+
+- Всё хорошо: раз в "окно" (limit успешных запросов) +1 запрос в полёте
+  и +batch_step к размеру пачки (additive increase)
+- 429 / 5xx / таймаут: limit и batch_size × 0.5 (multiplicative decrease),
+  не чаще раза за окно - пачка одновременных ошибок = одно снижение
+- Retry-After: все новые запросы ждут указанное время
+- Задержка выше latency_target: рост останавливается
+
+Использование (синхронно):
+    from aimd import AIMDController
+
+    controller = AIMDController()
+    while ids:
+        chunk, ids = ids[:controller.batch_size], ids[controller.batch_size:]
+        with controller.slot() as slot:
+            try:
+                supabase.table("products").update(patch).in_("id", chunk).execute()
+            except Exception as e:
+                slot.fail(e)
+
+Асинхронно - AsyncSupabase(controller=AIMDController(...)) в async_db.py.
+"""
+
+import asyncio
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+OVERLOAD_STATUSES = {429, 500, 502, 503, 504}
+# SQLSTATE перегрузки: statement timeout, слишком много соединений
+OVERLOAD_CODES = {"57014", "53300"}
+
+# Транспортные ошибки без статуса и кода. Голых чисел здесь нет: "500"
+# встречается в тексте ошибок данных (slug filtr-500 в 23505)
+_OVERLOAD_RE = re.compile(
+    r"timed? ?out|too many requests|connection (reset|refused|aborted)",
+    re.IGNORECASE,
+)
+
+
+def is_overload(error) -> bool:
+    """Ошибка - признак перегрузки (а не ошибка в данных)"""
+    status = getattr(error, "status", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    if status is not None:
+        return status in OVERLOAD_STATUSES
+
+    # postgrest.APIError: code - SQLSTATE, а при не-JSON ответе шлюза - HTTP статус
+    code = getattr(error, "code", None)
+    if code is not None:
+        code = str(code)
+        return code in OVERLOAD_CODES or (code.isdigit() and int(code) in OVERLOAD_STATUSES)
+
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return bool(_OVERLOAD_RE.search(f"{type(error).__name__} {error}"))
+
+
+class Slot:
+    """Один запрос в полёте: по выходу сообщает контроллеру результат"""
+
+    def __init__(self):
+        self.overload = False
+        self.retry_after = None
+
+    def fail(self, error=None, retry_after: float | None = None):
+        """Отметить запрос как перегрузку (error - исключение для is_overload)"""
+        if error is None or is_overload(error):
+            self.overload = True
+            self.retry_after = retry_after
+
+
+class AIMDController:
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        initial_batch: int = 50,
+        min_batch: int = 10,
+        max_batch: int = 1000,
+        batch_step: int = 25,
+        decrease: float = 0.5,
+        latency_target: float = 2.0,
+    ):
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.batch_size = initial_batch
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch_step = batch_step
+        self.decrease = decrease
+        self.latency_target = latency_target
+
+        self.inflight = 0
+        self.latency = None  # EWMA, секунды
+        self.stats = {"requests": 0, "overloads": 0, "increases": 0, "decreases": 0}
+
+        self._lock = threading.Condition()
+        # asyncio.Condition создаётся в event loop при первом async_slot
+        self._async_cond = None
+        self._window_successes = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+
+    # ------------------------------------------------------------------
+    # Решения
+    # ------------------------------------------------------------------
+    def record(self, latency: float, overload: bool = False, retry_after: float | None = None):
+        """Результат одного запроса"""
+        with self._lock:
+            self.stats["requests"] += 1
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+            if overload:
+                self.stats["overloads"] += 1
+                self._on_overload(retry_after)
+            elif self.latency <= self.latency_target:
+                self._window_successes += 1
+                if self._window_successes >= self.limit:
+                    self._window_successes = 0
+                    self.limit = min(self.max_limit, self.limit + 1)
+                    self.batch_size = min(self.max_batch, self.batch_size + self.batch_step)
+                    self.stats["increases"] += 1
+
+            self._lock.notify_all()
+
+    def _on_overload(self, retry_after: float | None):
+        now = time.monotonic()
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+        # Одновременные ошибки одного окна - одно снижение
+        if now - self._last_decrease < (self.latency or 1.0):
+            return
+        self._last_decrease = now
+        self._window_successes = 0
+        self.limit = max(self.min_limit, int(self.limit * self.decrease))
+        self.batch_size = max(self.min_batch, int(self.batch_size * self.decrease))
+        self.stats["decreases"] += 1
+
+    def pause(self) -> float:
+        """Сколько ещё ждать по Retry-After (секунды)"""
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def summary(self) -> str:
+        latency = f"{self.latency * 1000:.0f}мс" if self.latency is not None else "-"
+        return (
+            f"в полёте ≤ {self.limit}, пачка {self.batch_size}, задержка {latency}, "
+            f"перегрузок {self.stats['overloads']}"
+        )
+
+    # ------------------------------------------------------------------
+    # Потоки
+    # ------------------------------------------------------------------
+    def acquire(self):
+        with self._lock:
+            while True:
+                pause = self.pause()
+                if pause > 0:
+                    self._lock.wait(pause)
+                elif self.inflight >= self.limit:
+                    self._lock.wait()
+                else:
+                    self.inflight += 1
+                    return
+
+    def release(self, latency: float, overload: bool = False, retry_after: float | None = None):
+        with self._lock:
+            self.inflight -= 1
+        self.record(latency, overload, retry_after)
+
+    @contextmanager
+    def slot(self):
+        """with controller.slot() as slot: запрос; slot.fail(e) при ошибке"""
+        self.acquire()
+        slot = Slot()
+        started = time.monotonic()
+        try:
+            yield slot
+        except BaseException as e:
+            slot.fail(e)
+            raise
+        finally:
+            self.release(time.monotonic() - started, slot.overload, slot.retry_after)
+
+    # ------------------------------------------------------------------
+    # asyncio (один event loop)
+    # ------------------------------------------------------------------
+    @asynccontextmanager
+    async def async_slot(self):
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        cond = self._async_cond
+
+        async with cond:
+            while True:
+                pause = self.pause()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(cond.wait(), pause)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.inflight >= self.limit:
+                    # Будит release() (слот освободился, limit мог вырасти)
+                    await cond.wait()
+                else:
+                    self.inflight += 1
+                    break
+
+        slot = Slot()
+        started = time.monotonic()
+        try:
+            yield slot
+        except BaseException as e:
+            slot.fail(e)
+            raise
+        finally:
+            self.release(time.monotonic() - started, slot.overload, slot.retry_after)
+            async with cond:
+                cond.notify_all()
+
+
+def fixed(concurrency: int, batch_size: int) -> AIMDController:
+    """Контроллер без адаптации: постоянные concurrency и batch_size"""
+    return AIMDController(
+        initial_limit=concurrency,
+        min_limit=concurrency,
+        max_limit=concurrency,
+        initial_batch=batch_size,
+        min_batch=batch_size,
+        max_batch=batch_size,
+    )
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+АСИНХРОННЫЙ ДОСТУП К SUPABASE (PostgREST /rest/v1)
+
+Вместо синхронного supabase-py / requests по одному запросу и Pool(12)
+для I/O: один процесс, один httpx.AsyncClient (HTTP/2, keep-alive пул),
+сотни запросов в полёте под контроллером нагрузки (aimd.py).
+
+- select / select_all (keyset по id) / count
+- insert / upsert / update / delete / rpc
+- update_ids / delete_ids / insert / upsert режут вход на чанки
+  и отправляют их параллельно; если часть чанков упала - PartialWriteError
+  со списком незаписанных элементов (.failed)
+- повтор на 429 / 5xx / таймаут с учётом Retry-After
+- controller=AIMDController() (aimd.py): число запросов в полёте и
+  размер чанков подбираются по задержке и ошибкам; по умолчанию -
+  постоянные concurrency / chunk_size
+
+Фильтры - в синтаксисе PostgREST: {"slug": "eq.perkins-filters",
+"category_id": "in.(1,2,3)", "name": "ilike.*perkins*"}.
+
+Использование:
+    import asyncio
+    from async_db import AsyncSupabase
+
+    async def main():
+        async with AsyncSupabase.from_env(concurrency=64) as db:
+            rows = await db.select_all("products", "id, name", {"manufacturer": "eq.UNIVERSAL"})
+            await db.update_ids("products", {"manufacturer": "DongFeng"}, [r["id"] for r in rows])
+
+    asyncio.run(main())
+"""
+
+import asyncio
+import os
+from typing import Any, Iterable
+
+import httpx
+
+from aimd import AIMDController, fixed
+
+Row = dict[str, Any]
+Filters = dict[str, str] | None
+
+CHUNK_SIZE = 200
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AsyncSupabaseError(Exception):
+    """Ответ PostgREST с ошибкой (после всех повторов)"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message[:200]}")
+        self.status = status
+
+
+class PartialWriteError(AsyncSupabaseError):
+    """
+    Часть чанков map_chunks не записалась (остальные записаны):
+    failed - элементы неудачных чанков, errors - их ошибки,
+    results - результат удачных чанков
+    """
+
+    def __init__(self, failed: list, errors: list, results: list):
+        first = errors[0]
+        super().__init__(
+            getattr(first, "status", 0),
+            f"не записано {len(failed)} элементов ({len(errors)} чанков): {first}",
+        )
+        self.failed = failed
+        self.errors = errors
+        self.results = results
+
+
+class AsyncSupabase:
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        concurrency: int = 32,
+        chunk_size: int = CHUNK_SIZE,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        controller: AIMDController | None = None,
+    ):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.controller = controller or fixed(concurrency, chunk_size)
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+        self._client: httpx.AsyncClient | None = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "AsyncSupabase":
+        url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+        key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        if not url or not key:
+            raise RuntimeError("Установите SUPABASE_URL и SUPABASE_SERVICE_ROLE_KEY")
+        return cls(url, key, **kwargs)
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.url}/rest/v1",
+            http2=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.controller.max_limit,
+                max_keepalive_connections=self.controller.max_limit,
+            ),
+            headers={
+                "apikey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Content-Type": "application/json",
+            },
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+        self._client = None
+
+    # ------------------------------------------------------------------
+    # Запрос через слот контроллера, с повторами
+    # ------------------------------------------------------------------
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: dict | None = None,
+        json: Any = None,
+        prefer: str | None = None,
+        headers: dict | None = None,
+    ) -> httpx.Response:
+        headers = dict(headers or {})
+        if prefer:
+            headers["Prefer"] = prefer
+
+        for attempt in range(self.max_retries):
+            async with self.controller.async_slot() as slot:
+                try:
+                    response = await self._client.request(
+                        method, path, params=params, json=json, headers=headers
+                    )
+                except httpx.TransportError as e:
+                    response, error = None, e
+                    slot.fail()
+                else:
+                    if response.status_code in RETRY_STATUSES:
+                        slot.fail(retry_after=_retry_after(response))
+                self.stats["requests"] += 1
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                if response.is_error:
+                    self.stats["errors"] += 1
+                    raise AsyncSupabaseError(response.status_code, response.text)
+                return response
+
+            if attempt == self.max_retries - 1:
+                self.stats["errors"] += 1
+                if response is None:
+                    raise error
+                raise AsyncSupabaseError(response.status_code, response.text)
+
+            self.stats["retries"] += 1
+            # Retry-After выдерживает контроллер (пауза для всех запросов)
+            if _retry_after(response) is None:
+                await asyncio.sleep(2.0 ** attempt)
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Filters = None,
+        order: str | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+    ) -> list[Row]:
+        params = {"select": _columns(columns), **(filters or {})}
+        if order:
+            params["order"] = order
+        if limit is not None:
+            params["limit"] = str(limit)
+        if offset is not None:
+            params["offset"] = str(offset)
+        response = await self.request("GET", f"/{table}", params=params)
+        return response.json()
+
+    async def select_all(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Filters = None,
+        page_size: int = 1000,
+    ) -> list[Row]:
+        """Все строки keyset-пагинацией по id (columns должны включать id)"""
+        rows = []
+        last_id = None
+        while True:
+            page_filters = dict(filters or {})
+            if last_id is not None:
+                page_filters["id"] = f"gt.{last_id}"
+            page = await self.select(table, columns, page_filters, order="id", limit=page_size)
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            last_id = page[-1]["id"]
+
+    async def count(self, table: str, filters: Filters = None) -> int:
+        response = await self.request(
+            "HEAD",
+            f"/{table}",
+            params={"select": "id", **(filters or {})},
+            prefer="count=exact",
+            headers={"Range": "0-0"},
+        )
+        # Content-Range: 0-0/12345 или */0
+        return int(response.headers.get("content-range", "*/0").split("/")[-1])
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+    async def insert(self, table: str, rows: list[Row], returning: bool = False) -> list[Row]:
+        return await self._write_chunks(table, rows, returning, "")
+
+    async def upsert(
+        self,
+        table: str,
+        rows: list[Row],
+        on_conflict: str | None = None,
+        ignore_duplicates: bool = False,
+        returning: bool = False,
+    ) -> list[Row]:
+        resolution = "ignore-duplicates" if ignore_duplicates else "merge-duplicates"
+        params = {"on_conflict": on_conflict} if on_conflict else None
+        return await self._write_chunks(table, rows, returning, f"resolution={resolution}", params)
+
+    async def update(
+        self, table: str, patch: Row, filters: dict[str, str], returning: bool = False
+    ) -> list[Row]:
+        if not filters:
+            raise ValueError("update() без фильтра обновил бы всю таблицу")
+        response = await self.request(
+            "PATCH", f"/{table}", params=filters, json=patch, prefer=_returning(returning)
+        )
+        return response.json() if returning else []
+
+    async def delete(self, table: str, filters: dict[str, str], returning: bool = False) -> list[Row]:
+        if not filters:
+            raise ValueError("delete() без фильтра удалил бы всю таблицу")
+        response = await self.request(
+            "DELETE", f"/{table}", params=filters, prefer=_returning(returning)
+        )
+        return response.json() if returning else []
+
+    async def update_ids(self, table: str, patch: Row, ids: Iterable[int]) -> int:
+        """Один patch для всех ids: чанки id=in.(...) параллельно; возвращает число ids"""
+        async def write(chunk):
+            await self.update(table, patch, {"id": _in(chunk)})
+            return [len(chunk)]
+
+        return sum(await self.map_chunks(list(ids), write))
+
+    async def delete_ids(self, table: str, ids: Iterable[int]) -> int:
+        async def write(chunk):
+            await self.delete(table, {"id": _in(chunk)})
+            return [len(chunk)]
+
+        return sum(await self.map_chunks(list(ids), write))
+
+    async def map_chunks(self, items: list, fn) -> list:
+        """
+        fn(chunk) → list для чанков items параллельно. Размер очередного
+        чанка берётся из controller.batch_size в момент отправки.
+
+        Ошибка чанка не останавливает остальные (они уже в полёте): после
+        всех чанков - PartialWriteError с элементами неудачных чанков,
+        чтобы вызывающий знал, что записано, а что нет.
+        """
+        position = 0
+        failed, errors = [], []
+
+        async def worker():
+            nonlocal position
+            out = []
+            while position < len(items):
+                size = self.controller.batch_size
+                chunk = items[position : position + size]
+                position += size
+                try:
+                    out.extend(await fn(chunk))
+                except Exception as e:
+                    failed.extend(chunk)
+                    errors.append(e)
+            return out
+
+        parts = await asyncio.gather(*(worker() for _ in range(self.controller.max_limit)))
+        results = [row for part in parts for row in part]
+        if errors:
+            raise PartialWriteError(failed, errors, results)
+        return results
+
+    async def rpc(self, fn: str, params: dict | None = None) -> Any:
+        response = await self.request("POST", f"/rpc/{fn}", json=params or {})
+        return response.json() if response.content else None
+
+    async def _write_chunks(
+        self,
+        table: str,
+        rows: list[Row],
+        returning: bool,
+        resolution: str,
+        params: dict | None = None,
+    ) -> list[Row]:
+        prefer = ",".join(p for p in (resolution, _returning(returning)) if p)
+
+        async def write(chunk):
+            response = await self.request("POST", f"/{table}", params=params, json=chunk, prefer=prefer)
+            return response.json() if returning else []
+
+        return await self.map_chunks(rows, write)
+
+
+def _columns(columns: str) -> str:
+    return ",".join(part.strip() for part in columns.split(","))
+
+
+def _returning(returning: bool) -> str:
+    return "return=representation" if returning else "return=minimal"
+
+
+def _in(ids: list) -> str:
+    return f"in.({','.join(str(i) for i in ids)})"
+
+
+def _retry_after(response: httpx.Response | None) -> float | None:
+    """Retry-After в секундах (None - заголовка нет)"""
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return None
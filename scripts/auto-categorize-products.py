@@ -1,170 +1,55 @@
 #!/usr/bin/env python3
 """
 Автоматическая категоризация товаров по типу на основе названия
+
+Штампы решений (engine.stamp) - в локальном кэше auto-categorize.stamps.json
+({id: штамп}), а не в products: в БД пишутся только товары, у которых
+поменялась категория, смена версии правил не переписывает весь каталог.
 """
 
+import json
 import os
-import re
+from collections import Counter
 from supabase import Client, create_client
 from multiprocessing import Pool, cpu_count
 
+from aimd import AIMDController
+from categorization_plan import load_catalog
+from db_batch import WriteBehindQueue
+from rules_engine import get_engine
+from shared_catalog import SharedCatalog, attach_worker, index_ranges, worker_catalog
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
-# Категории и их ключевые слова
-CATEGORY_PATTERNS = {
-    # Двигатели и компоненты
-    "parts-engines": [
-        r"двигател", r"дизел", r"блок цилиндр", r"головка.*цилиндр", r"гбц",
-        r"коленвал", r"коленчатый вал", r"поршн", r"шатун", r"вкладыш",
-        r"клапан.*(впуск|выпуск)", r"распредвал", r"распределительн.*вал",
-        r"гильза цилиндра", r"палец поршнев", r"втулка шатуна", r"седло.*клапан"
-    ],
-
-    # Гидравлика
-    "parts-hydraulics": [
-        r"гидро", r"брс", r"быстроразъем", r"гидроцилиндр", r"гидрораспределител",
-        r"рвд", r"рукав.*гидравл", r"штуцер", r"джойстик", r"гидробак",
-        r"гидросистема", r"гидравлик"
-    ],
-
-    # Фильтры
-    "parts-filters": [
-        r"фильтр", r"масля.*фильтр", r"топлив.*фильтр", r"воздуш.*фильтр",
-        r"гидравл.*фильтр"
-    ],
-
-    # Топливная система
-    "parts-fuel-system": [
-        r"тнвд", r"насос.*топлив", r"форсунк", r"распылител", r"топливн",
-        r"инжектор", r"бак.*топлив"
-    ],
-
-    # Система охлаждения
-    "parts-cooling": [
-        r"радиатор", r"вентилятор.*охлажд", r"крыльчатка.*охлажд",
-        r"термостат", r"помпа", r"насос.*водяной", r"охлажд"
-    ],
-
-    # Электрика
-    "parts-electrical": [
-        r"генератор", r"стартер", r"аккумулятор", r"проводк", r"реле",
-        r"предохранител", r"лампа", r"фара", r"электро", r"кнопка.*выключател",
-        r"концев.*выключател"
-    ],
-
-    # Трансмиссия
-    "parts-transmission": [
-        r"кпп", r"коробка передач", r"сцеплен", r"диск.*сцеплен",
-        r"корзина.*сцеплен", r"выжимн.*подшипник", r"трансмисс"
-    ],
-
-    # Карданные валы
-    "parts-driveshaft": [
-        r"вал.*кардан", r"карданн.*вал", r"крестовин.*кардан",
-        r"шлиц.*вал", r"приводн.*вал"
-    ],
-
-    # Тормоза
-    "parts-brakes": [
-        r"тормоз", r"колодк.*тормоз", r"диск.*тормоз", r"барабан.*тормоз",
-        r"цилиндр.*тормоз", r"тормозн"
-    ],
-
-    # Рулевое управление
-    "parts-steering": [
-        r"рулев", r"руль", r"гидроусилител.*рул", r"тяга.*рулев",
-        r"наконечник.*рулев", r"рейка.*рулев"
-    ],
-
-    # Ходовая часть
-    "parts-chassis": [
-        r"подшипник", r"ступица", r"полуось", r"мост", r"редуктор.*мост",
-        r"дифференциал", r"шкворн", r"рессор", r"амортизатор"
-    ],
-
-    # Колеса и шины
-    "parts-wheels-tires": [
-        r"колес[оа]", r"шина", r"покрышк", r"камера.*колес", r"диск.*колес",
-        r"обод"
-    ],
-
-    # Ремни
-    "parts-belts": [
-        r"ремень", r"ремен.*приводн", r"ремен.*генератор"
-    ],
-
-    # Навесное оборудование - Косилки
-    "parts-attachments-mowers": [
-        r"косилк", r"нож.*косилк", r"молоток.*косилк", r"барабан.*косилк",
-        r"ротор.*косилк", r"сегмент.*косилк", r"полотн.*косилк",
-        r"шатун.*косилк", r"газонокосилк", r"роторн.*косилк"
-    ],
-
-    # Навесное оборудование - Почвофрезы
-    "parts-attachments-tillers": [
-        r"почвофрез", r"фрез[аы]", r"1gqn", r"1gqe", r"нож.*почвофрез",
-        r"зуб.*почвофрез", r"редуктор.*почвофрез", r"шестерн.*почвофрез",
-        r"вал.*под ножи", r"крепление.*ножа", r"щиток.*почвофрез"
-    ],
-
-    # Навесное оборудование - Пресс-подборщики
-    "parts-attachments-balers": [
-        r"пресс.подборщик", r"yk0850", r"yk0870", r"yk0890", r"yk1070",
-        r"rxyk", r"rxfk", r"звездочк.*пресс", r"цепь.*пресс",
-        r"вязальн.*аппарат", r"шпагат", r"пружин.*пресс", r"барабан.*пресс",
-        r"граблин.*пресс", r"вал.*пресс.подборщик"
-    ],
-
-    # Навесное оборудование - Плуги
-    "parts-attachments-plows": [
-        r"плуг", r"1l-220", r"1l-320", r"2l-220", r"лемех", r"корпус.*плуг",
-        r"стойка.*плуг", r"отвал.*плуг"
-    ],
-
-    # Навесное оборудование - Бороны
-    "parts-attachments-harrows": [
-        r"борон", r"1bqx", r"1bjx", r"диск.*борон", r"вал.*борон",
-        r"тарелк.*борон", r"скребок.*борон"
-    ],
-
-    # Навесное оборудование - Культиваторы
-    "parts-attachments-cultivators": [
-        r"культиватор", r"окучник", r"лапа.*культиватор", r"стрела.*культиватор",
-        r"рыхлител"
-    ],
-
-    # Навесное оборудование - Картофелекопалки
-    "parts-attachments-potato": [
-        r"картофелекопал", r"картофелесажал", r"кк-540", r"кк-1-540",
-        r"н26.*картофел", r"транспорт.*картофел"
-    ],
-
-    # Навесное оборудование - Грабли-ворошилки
-    "parts-attachments-rakes": [
-        r"грабл", r"ворошил", r"спица.*грабл", r"зуб.*грабл",
-        r"тарелк.*грабл", r"диск.*грабл"
-    ],
-
-    # Прочее навесное
-    "parts-attachments": [
-        r"навесн", r"кун", r"погрузчик", r"ковш", r"экскаватор",
-        r"отвал", r"щетка.*коммунальн", r"сеялк", r"разбрасывател"
-    ]
-}
-
-def categorize_product(name: str, current_category: str = "") -> str:
+# Из specifications - только нужные ключи, а не весь JSONB
+CATALOG_COLUMNS = "id, name, category:specifications->>category"
+RANGE_SIZE = 2000
+STAMPS_PATH = "auto-categorize.stamps.json"
+
+
+def load_stamps() -> dict:
+    if not os.path.exists(STAMPS_PATH):
+        return {}
+    with open(STAMPS_PATH, "r", encoding="utf-8") as f:
+        return {int(product_id): stamp for product_id, stamp in json.load(f).items()}
+
+
+def save_stamps(stamps: dict):
+    tmp_path = STAMPS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stamps, f)
+    os.replace(tmp_path, STAMPS_PATH)
+
+def categorize_product(engine, name: str, current_category: str = "") -> str:
     """Определяет категорию товара по его названию"""
     if not name:
         return current_category or "parts-minitractors"
 
-    name_lower = name.lower()
-
-    # Проходим по категориям в порядке приоритета
-    for category, patterns in CATEGORY_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, name_lower):
-                return category
+    # Категории проверяются в порядке приоритета из файла правил
+    category = engine.label("product_category", name)
+    if category:
+        return category
 
     # Если ничего не подошло, оставляем текущую или общую категорию
     if current_category and current_category.startswith("parts-"):
@@ -172,105 +57,124 @@ def categorize_product(name: str, current_category: str = "") -> str:
 
     return "parts-minitractors"
 
-def process_batch(batch_num: int):
-    """Обрабатывает один батч товаров"""
-    supabase = create_client(url, key)
-
-    offset = batch_num * 500
-    result = supabase.table("products") \
-        .select("id, name, specifications, category_id") \
-        .range(offset, offset + 499) \
-        .execute()
-
-    if not result.data:
-        return {"batch": batch_num, "updated": 0, "skipped": 0}
-
+def process_range(bounds: tuple):
+    """
+    Классифицирует диапазон индексов общего каталога (только строки с
+    устаревшим штампом). Каталог и правила уже в воркере (initializer),
+    в ответ - только патчи для записи и новые штампы.
+    """
+    catalog, engine = worker_catalog()
+
+    merges = []
+    stamps = []
+    categories = Counter()
     updated = 0
     skipped = 0
+    cached = 0
+
+    for product_id, product in catalog.rows(*bounds):
+        name = product["name"]
+        current_cat = product["category"]
 
-    for product in result.data:
-        name = product.get("name", "")
-        specs = product.get("specifications") or {}
-        current_cat = specs.get("category", "")
+        # Кэш: штамп совпал - ни название, ни правила не менялись
+        if engine.is_fresh(name, product["stamp"]):
+            cached += 1
+            categories[current_cat or "NO_CATEGORY"] += 1
+            continue
+
+        stamp = engine.stamp(name)
 
         # Определяем новую категорию
-        new_category = categorize_product(name, current_cat)
+        new_category = categorize_product(engine, name, current_cat)
+        categories[new_category] += 1
 
-        # Обновляем только если категория изменилась
+        stamps.append((product_id, stamp))
         if new_category != current_cat:
-            specs["category"] = new_category
-
-            try:
-                supabase.table("products") \
-                    .update({"specifications": specs}) \
-                    .eq("id", product["id"]) \
-                    .execute()
-                updated += 1
-            except Exception as e:
-                skipped += 1
+            merges.append((product_id, {"category": new_category}))
+            updated += 1
         else:
+            # Категория та же - в БД ничего не пишется, штамп только в кэш
             skipped += 1
 
-    return {"batch": batch_num, "updated": updated, "skipped": skipped}
+    return {
+        "merges": merges,
+        "stamps": stamps,
+        "categories": categories,
+        "updated": updated,
+        "skipped": skipped,
+        "cached": cached,
+    }
 
 if __name__ == "__main__":
+    # Правила компилируются один раз в драйвере и уходят в воркеры через initializer
+    engine = get_engine()
+
     print("=" * 80)
     print("🤖 АВТОМАТИЧЕСКАЯ КАТЕГОРИЗАЦИЯ ТОВАРОВ")
+    print(f"📐 Правила: {engine.version}")
     print("=" * 80 + "\n")
 
-    # Получаем общее количество товаров
+    # Каталог читается один раз, воркеры получают только диапазоны индексов
     supabase = create_client(url, key)
-    count_result = supabase.table("products").select("id", count="exact").execute()
-    total_products = count_result.count
+    products = load_catalog(supabase, CATALOG_COLUMNS)
+    stamps = load_stamps()
+    for product in products:
+        product["stamp"] = stamps.get(product["id"])
 
-    print(f"📦 Всего товаров: {total_products}")
+    print(f"📦 Всего товаров: {len(products)}")
 
-    # Определяем количество батчей
-    batch_size = 500
-    num_batches = (total_products // batch_size) + 1
+    ranges = index_ranges(len(products), RANGE_SIZE)
+    processes = min(12, cpu_count())
 
-    print(f"📊 Количество батчей: {num_batches}")
-    print(f"💻 Используем {min(12, cpu_count())} процессоров\n")
+    print(f"📊 Диапазонов: {len(ranges)} по {RANGE_SIZE}")
+    print(f"💻 Используем {processes} процессоров\n")
 
     # Параллельная обработка
-    with Pool(processes=min(12, cpu_count())) as pool:
-        results = pool.map(process_batch, range(num_batches))
+    with SharedCatalog.create(products, ["name", "category", "stamp"]) as catalog:
+        del products
+        with Pool(processes, initializer=attach_worker, initargs=(catalog.spec, engine)) as pool:
+            results = pool.map(process_range, ranges)
+
+    # Запись - один клиент, в фоне; пачки и параллельность подбирает AIMD
+    controller = AIMDController(max_limit=8)
+    with WriteBehindQueue(supabase, max_workers=8, controller=controller) as queue:
+        for r in results:
+            for product_id, patch in r["merges"]:
+                queue.merge(product_id, patch)
+
+    # Штамп изменённого товара - только если запись прошла (какой именно id
+    # не записался, очередь не сообщает - тогда такие товары проверятся снова)
+    changed = {product_id for r in results for product_id, _ in r["merges"]}
+    for r in results:
+        for product_id, stamp in r["stamps"]:
+            if not queue.stats["failed"] or product_id not in changed:
+                stamps[product_id] = stamp
+    save_stamps(stamps)
 
     # Подсчет результатов
-    total_updated = sum(r["updated"] for r in results)
+    total_updated = sum(r["updated"] for r in results) - queue.stats["failed"]
     total_skipped = sum(r["skipped"] for r in results)
+    total_cached = sum(r["cached"] for r in results)
 
     print("\n" + "=" * 80)
     print("📊 РЕЗУЛЬТАТЫ:")
     print("=" * 80)
     print(f"✅ Обновлено:  {total_updated:>6} товаров")
     print(f"⏭️  Пропущено:  {total_skipped:>6} товаров")
+    print(f"💾 Из кэша:    {total_cached:>6} товаров (штамп актуален)")
+    print(f"❌ Ошибок:     {queue.stats['failed']:>6} товаров")
+    print(f"📈 Запись: {controller.summary()}")
     print("=" * 80)
 
-    # Статистика по категориям
+    # Статистика по категориям - по результатам, без повторного чтения каталога
     print("\n🔍 Распределение по категориям:\n")
 
-    category_stats = {}
-    offset = 0
-
-    while offset < total_products:
-        result = supabase.table("products") \
-            .select("specifications") \
-            .range(offset, offset + 999) \
-            .execute()
-
-        if not result.data:
-            break
-
-        for p in result.data:
-            specs = p.get("specifications") or {}
-            cat = specs.get("category", "NO_CATEGORY")
-            category_stats[cat] = category_stats.get(cat, 0) + 1
-
-        offset += 1000
+    category_stats = Counter()
+    for r in results:
+        category_stats.update(r["categories"])
 
     # Сортируем по количеству
-    for cat, count in sorted(category_stats.items(), key=lambda x: -x[1]):
+    for cat, count in category_stats.most_common():
         print(f"{cat:45} {count:>6}")
 
     print("\n" + "=" * 80)
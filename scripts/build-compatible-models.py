@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+ЗАПОЛНЕНИЕ products.compatible_models
+
+Токенизирует название, колонку model и описание каждого товара
+(model_tokens.extract_models) и пишет только изменившиеся массивы.
+Одинаковые массивы склеиваются в один update().in_("id", [...]).
+Импортёры заполняют колонку при вставке тем же extract_models; скрипт
+нужен для старых товаров и после правки токенизатора.
+
+Требуется миграция docs/migrations/compatible-models.sql.
+
+Использование:
+    python3 build-compatible-models.py             # заполнить / обновить
+    python3 build-compatible-models.py --dry-run   # только статистика
+"""
+
+import os
+import sys
+from collections import Counter
+
+from supabase import Client, create_client
+
+from db_batch import update_grouped
+from model_tokens import extract_models
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase: Client = create_client(url, key)
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+
+    print("=" * 80)
+    print("🔢 ЗАПОЛНЕНИЕ COMPATIBLE_MODELS" + (" (DRY RUN)" if dry_run else ""))
+    print("=" * 80 + "\n")
+
+    updates = {}
+    token_stats = Counter()
+    with_models = 0
+    total = 0
+    last_id = 0
+
+    while True:
+        result = supabase.table("products") \
+            .select("id, name, model, description, compatible_models") \
+            .gt("id", last_id) \
+            .order("id") \
+            .limit(1000) \
+            .execute()
+
+        if not result.data:
+            break
+
+        for product in result.data:
+            models = extract_models(
+                product.get("name"), product.get("model"), product.get("description")
+            )
+            token_stats.update(models)
+            with_models += bool(models)
+
+            if models != sorted(product.get("compatible_models") or []):
+                updates[product["id"]] = {"compatible_models": models}
+
+        total += len(result.data)
+        last_id = result.data[-1]["id"]
+        print(f"   Обработано: {total}...")
+
+        if len(result.data) < 1000:
+            break
+
+    print(f"\n📦 Товаров: {total}, с моделями: {with_models}")
+    print(f"✏️  Изменилось: {len(updates)}\n")
+
+    print("📊 Топ моделей:")
+    for model, count in token_stats.most_common(20):
+        print(f"   {model:15} {count:>6}")
+
+    if dry_run:
+        print("\nℹ️  DRY RUN - изменения не записаны")
+        return
+
+    if updates:
+        stats = update_grouped(supabase, updates)
+        print(
+            f"\n✅ Обновлено: {stats['updated']} за {stats['requests']} запросов, "
+            f"ошибок: {stats['failed']}"
+        )
+
+    print("\n" + "=" * 80)
+    print("✅ ГОТОВО!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+ПРОИЗВОДНЫЕ КАРТИНКИ ДЛЯ КАТАЛОГА
+
+Для товаров с картинкой в нашем Storage (после download-and-upload-images.py)
+режет WebP 160 / 320 / 640 / 960 (без увеличения) и размытую заглушку,
+кладёт их рядом с оригиналом и пишет specifications.images - по нему
+карточки каталога берут картинку нужной ширины вместо оригинала
+(frontend/app/lib/productImages.ts), страница товара с --avif отдаёт
+AVIF через <picture> (WebP - запасной вариант).
+
+Манифест image-derivatives.manifest.jsonl - повторный запуск режет только
+новые картинки; запись в БД - через журнал image-derivatives.journal.jsonl.
+
+Использование:
+    python3 build-image-derivatives.py              # WebP
+    python3 build-image-derivatives.py --avif       # + AVIF (если Pillow умеет)
+    python3 build-image-derivatives.py --rollback   # убрать specifications.images
+"""
+
+import asyncio
+import os
+import sys
+
+from supabase import create_client
+
+from async_db import AsyncSupabase
+from image_derivatives import FORMATS, avif_supported, build_derivatives, images_batches
+from image_mirror import ImageMirror, MirrorManifest
+from op_journal import OperationJournal, journal_cli, make_executor
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase = create_client(url, key)
+
+MANIFEST_PATH = "image-derivatives.manifest.jsonl"
+JOURNAL_PATH = "image-derivatives.journal.jsonl"
+
+
+async def derive(formats: tuple) -> tuple:
+    async with AsyncSupabase(url, key) as db:
+        products = await db.select_all(
+            "products",
+            "id, image_url, specifications",
+            {"image_url": f"like.{url.rstrip('/')}/storage/v1/object/public/*"},
+        )
+
+    print(f"✓ Товаров с картинкой в Storage: {len(products)}")
+    async with ImageMirror(url, key) as mirror:
+        images = await build_derivatives(
+            mirror, [p["image_url"] for p in products], MirrorManifest(MANIFEST_PATH), formats=formats
+        )
+    return products, images
+
+
+def main():
+    print("🖼️  Производные картинки (WebP / AVIF) для каталога")
+    print("=" * 60)
+
+    journal = OperationJournal(JOURNAL_PATH)
+    if journal_cli(journal, make_executor(supabase), sys.argv[1:]):
+        return
+
+    formats = FORMATS
+    if "--avif" in sys.argv:
+        if avif_supported():
+            formats = FORMATS + ("avif",)
+        else:
+            print("⚠️  Pillow без AVIF (нужен Pillow >= 11.3) - только WebP")
+
+    products, images = asyncio.run(derive(formats))
+    plan = images_batches(products, images)
+    if not plan:
+        print("\n✨ specifications.images у всех товаров актуальны")
+        return
+
+    print(f"\n💾 specifications.images для {sum(len(b['forward']) for b in plan)} товаров (журнал: {JOURNAL_PATH})...")
+    journal.start("image-derivatives", plan, {"formats": list(formats)})
+    summary = journal.run(make_executor(supabase))
+    print(f"✅ Обновлено товаров: {summary['rows_applied']}, ошибок: {summary['rows_failed']}")
+
+
+if __name__ == "__main__":
+    main()
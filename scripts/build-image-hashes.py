@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+ПЕРЦЕПТИВНЫЕ ХЕШИ КАРТИНОК ТОВАРОВ
+
+Заполняет таблицу image_hashes (docs/migrations/image-hashes.sql): pHash /
+dHash каждой картинки товаров, которой там ещё нет, и флаг заглушки.
+По хешам (image_hashes.py, BK-дерево по расстоянию Хэмминга) находит:
+
+1. Заглушки источников ("нет фото") - одна картинка у множества товаров
+   с разными названиями → is_placeholder; download-and-upload-images.py
+   их не заливает, find-duplicates.py не считает их признаком дубля
+2. Одну картинку (или её пережатую копию) на разных товарах - кандидаты
+   в дубли / перепутанные фото
+3. Почти одинаковые загрузки - одна картинка под разными sha256
+
+Отчёт: image-hashes-report.json
+
+Использование:
+    python3 build-image-hashes.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from supabase import create_client
+
+from async_db import AsyncSupabase
+from image_hashes import ImageIndex, find_placeholders, group_hashes, image_hashes
+from image_mirror import fetch_image, web_client
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase = create_client(url, key)
+
+REPORT_PATH = "image-hashes-report.json"
+CONCURRENCY = 32
+
+
+async def hash_urls(urls: list, failed: dict, processes: int | None = None) -> list:
+    """URL → строки image_hashes: скачивание параллельно, хеши - в пуле процессов"""
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(CONCURRENCY)
+    rows = []
+
+    async def one(client, pool, image_url):
+        async with slots:
+            try:
+                body, _, _, sha256 = await fetch_image(client, image_url)
+                hashes = await loop.run_in_executor(pool, image_hashes, body)
+            except Exception as e:
+                failed[image_url] = f"{type(e).__name__}: {str(e)[:200]}"
+                return
+        rows.append({"image_url": image_url, "sha256": sha256, **hashes, "is_placeholder": False})
+        if len(rows) % 500 == 0:
+            print(f"  ✓ Посчитано: {len(rows)}/{len(urls)}")
+
+    with ProcessPoolExecutor(processes or os.cpu_count() or 2) as pool:
+        async with web_client(CONCURRENCY) as client:
+            await asyncio.gather(*(one(client, pool, u) for u in urls))
+    return rows
+
+
+async def build(index: ImageIndex, failed: dict) -> list:
+    """Товары с картинкой; хеши новых картинок - в индекс и в image_hashes"""
+    async with AsyncSupabase(url, key) as db:
+        products = await db.select_all("products", "id, name, image_url", {"image_url": "not.is.null"})
+
+        missing = sorted({p["image_url"] for p in products} - set(index.rows))
+        print(f"✓ Товаров с картинкой: {len(products)}, уже в индексе: {len(index)}, новых URL: {len(missing)}")
+
+        rows = await hash_urls(missing, failed) if missing else []
+        if rows:
+            await db.upsert("image_hashes", rows, on_conflict="image_url")
+        for row in rows:
+            index.add(row)
+    return products
+
+
+async def save_placeholders(rows: list):
+    if rows:
+        async with AsyncSupabase(url, key) as db:
+            await db.upsert("image_hashes", rows, on_conflict="image_url")
+
+
+def describe(group: list, products_by_url: dict) -> dict:
+    products = {p["id"]: p for row in group for p in products_by_url.get(row["image_url"], [])}
+    return {
+        "image_urls": [row["image_url"] for row in group],
+        "sha256": sorted({row["sha256"] for row in group}),
+        "products": [{"id": p["id"], "name": p["name"]} for p in sorted(products.values(), key=lambda p: p["id"])],
+    }
+
+
+def main():
+    print("🔎 Перцептивные хеши картинок товаров")
+    print("=" * 60)
+
+    index = ImageIndex.load(supabase)
+    failed = {}
+    products = asyncio.run(build(index, failed))
+
+    products_by_url = defaultdict(list)
+    for product in products:
+        products_by_url[product["image_url"]].append(product)
+
+    groups = group_hashes(list(index.rows.values()))
+    placeholders = find_placeholders(groups, products_by_url)
+    placeholder_urls = {row["image_url"] for group in placeholders for row in group}
+
+    # Флаг заглушки только там, где он поменялся
+    changed = [
+        {**row, "is_placeholder": row["image_url"] in placeholder_urls}
+        for row in index.rows.values()
+        if bool(row.get("is_placeholder")) != (row["image_url"] in placeholder_urls)
+    ]
+    asyncio.run(save_placeholders(changed))
+
+    placeholder_ids = {id(group) for group in placeholders}
+    reused = [
+        describe(group, products_by_url) for group in groups
+        if id(group) not in placeholder_ids
+        and len({p["id"] for row in group for p in products_by_url.get(row["image_url"], [])}) > 1
+    ]
+    near_identical = [
+        describe(group, products_by_url) for group in groups
+        if len({row["sha256"] for row in group}) > 1
+    ]
+    report = {
+        "placeholders": [describe(group, products_by_url) for group in placeholders],
+        "reused": reused,
+        "near_identical": near_identical,
+        "failed": failed,
+    }
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n{'=' * 60}")
+    print(f"🖼️  Картинок в индексе: {len(index)} (ошибок скачивания: {len(failed)})")
+    print(f"🚫 Заглушек: {len(placeholders)} ({len(placeholder_urls)} URL, флаг обновлён у {len(changed)})")
+    print(f"🔁 Одна картинка на разных товарах: {len(reused)} групп")
+    print(f"≈  Почти одинаковые загрузки (разный sha256): {len(near_identical)} групп")
+    print(f"📄 Отчёт: {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+ПЛАН ИЗМЕНЕНИЙ КАТАЛОГА (diff-first)
+
+Вместо update() по ходу сканирования:
+1. Загружаем текущее состояние каталога один раз
+2. Локально считаем желаемое состояние (category_id / manufacturer /
+   specifications.part_type)
+3. diff → компактный changeset: группы {"set": {...}, "ids": [...]}
+4. apply: rollback-файл со старыми значениями, затем RPC
+   merge_specifications_bulk по 500 строк (UPDATE ... FROM jsonb_to_recordset);
+   с journal= - через журнал операций (op_journal.py): прерванный apply
+   продолжается с последней применённой пачки
+
+Dry run = шаги 1-3 без записи. Применяются только строки, которые
+реально отличаются. Rollback - тот же changeset со старыми значениями.
+
+Использование:
+    from categorization_plan import load_catalog, build_changeset, apply_changeset
+
+    products = load_catalog(supabase)
+    desired = {p["id"]: {"category_id": 42} for p in products if ...}
+    changeset = build_changeset(products, desired)
+    save_changeset(changeset, "plan.json")
+    apply_changeset(supabase, changeset, rollback_path="rollback.json")
+"""
+
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from aimd import AIMDController
+from db_batch import MERGE_CHUNK_SIZE, merge_specifications_bulk
+from op_journal import APPLIED, FAILED, OperationJournal, batches, make_executor
+
+# Поля плана: колонки products и ключи specifications
+COLUMN_FIELDS = ("category_id", "manufacturer", "model")
+SPEC_FIELDS = ("part_type",)
+
+CATALOG_COLUMNS = (
+    "id, name, category_id, manufacturer, "
+    "part_type:specifications->>part_type"
+)
+
+
+def load_catalog(supabase, columns: str = CATALOG_COLUMNS, page_size: int = 1000) -> list:
+    """Текущее состояние каталога (keyset-пагинация по id)"""
+    products = []
+    last_id = 0
+
+    while True:
+        result = (
+            supabase.table("products")
+            .select(columns)
+            .gt("id", last_id)
+            .order("id")
+            .limit(page_size)
+            .execute()
+        )
+
+        if not result.data:
+            break
+
+        products.extend(result.data)
+        last_id = result.data[-1]["id"]
+
+        if len(result.data) < page_size:
+            break
+
+    return products
+
+
+def load_categories(supabase) -> list:
+    """Все категории (id, name, slug)"""
+    return supabase.table("categories").select("id, name, slug").execute().data
+
+
+def diff_product(current: dict, desired: dict) -> tuple:
+    """(новые значения, старые значения) только для отличающихся полей"""
+    new, old = {}, {}
+    for field, value in desired.items():
+        if current.get(field) != value:
+            new[field] = value
+            old[field] = current.get(field)
+    return new, old
+
+
+def _group(values_by_id: dict) -> list:
+    groups = defaultdict(list)
+    for product_id, values in values_by_id.items():
+        groups[json.dumps(values, ensure_ascii=False, sort_keys=True)].append(product_id)
+    return [
+        {"set": json.loads(values_json), "ids": sorted(ids)}
+        for values_json, ids in sorted(groups.items(), key=lambda g: -len(g[1]))
+    ]
+
+
+def build_changeset(products: list, desired: dict, meta: dict | None = None) -> dict:
+    """
+    products - текущее состояние, desired - {id: {поле: значение}}.
+
+    Возвращает {"created_at", "total", "groups", "rollback", ...meta}:
+    groups - новые значения, rollback - старые, обе части сгруппированы
+    по одинаковым значениям.
+    """
+    current_by_id = {p["id"]: p for p in products}
+    new_by_id, old_by_id = {}, {}
+
+    for product_id, fields in desired.items():
+        current = current_by_id.get(product_id)
+        if current is None or not fields:
+            continue
+        new, old = diff_product(current, fields)
+        if new:
+            new_by_id[product_id] = new
+            old_by_id[product_id] = old
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        **(meta or {}),
+        "total": len(new_by_id),
+        "groups": _group(new_by_id),
+        "rollback": _group(old_by_id),
+    }
+
+
+def summarize(changeset: dict) -> dict:
+    """{поле: {значение: кол-во}} - что поменяет changeset"""
+    summary = defaultdict(lambda: defaultdict(int))
+    for group in changeset["groups"]:
+        for field, value in group["set"].items():
+            summary[field][value] += len(group["ids"])
+    return summary
+
+
+def _to_rows(groups: list) -> dict:
+    """Группы changeset → строки для merge_specifications_bulk"""
+    rows = {}
+    for group in groups:
+        fields = {f: v for f, v in group["set"].items() if f in COLUMN_FIELDS}
+        patch = {f: v for f, v in group["set"].items() if f in SPEC_FIELDS and v is not None}
+        remove = [f for f, v in group["set"].items() if f in SPEC_FIELDS and v is None]
+
+        row = {}
+        if fields:
+            row["fields"] = fields
+        if patch:
+            row["patch"] = patch
+        if remove:
+            row["remove"] = remove
+
+        for product_id in group["ids"]:
+            rows[product_id] = row
+    return rows
+
+
+def changeset_batches(changeset: dict, batch_size: int = MERGE_CHUNK_SIZE) -> list:
+    """Пачки журнала операций: прямой и обратный merge для каждого товара"""
+    forward = _to_rows(changeset["groups"])
+    inverse = _to_rows(changeset["rollback"])
+    ids = sorted(forward)
+    return batches(
+        "merge",
+        [{"id": product_id, **forward[product_id]} for product_id in ids],
+        [{"id": product_id, **inverse.get(product_id, {})} for product_id in ids],
+        batch_size,
+    )
+
+
+def apply_changeset(
+    supabase,
+    changeset: dict,
+    rollback_path: str | None = None,
+    controller: AIMDController | None = None,
+    journal: OperationJournal | None = None,
+) -> dict:
+    """
+    Применяет changeset. Сначала пишет rollback-файл (если указан),
+    затем все изменения RPC merge_specifications_bulk; размер пачек
+    подбирает AIMD-контроллер. С journal - пачками через журнал операций.
+    """
+    if rollback_path:
+        rollback = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "rollback_of": changeset.get("created_at"),
+            "total": changeset["total"],
+            "groups": changeset["rollback"],
+            "rollback": changeset["groups"],
+        }
+        save_changeset(rollback, rollback_path)
+
+    controller = controller or AIMDController(
+        initial_batch=MERGE_CHUNK_SIZE, max_batch=5000, batch_step=250
+    )
+
+    if journal is not None:
+        journal.start(
+            changeset.get("job", "changeset"),
+            changeset_batches(changeset),
+            {k: v for k, v in changeset.items() if k not in ("groups", "rollback")},
+        )
+        summary = journal.run(make_executor(supabase, controller=controller))
+        return {
+            "updated": summary["rows_applied"],
+            "failed": summary["rows_failed"],
+            "requests": summary[APPLIED] + summary[FAILED],
+        }
+
+    return merge_specifications_bulk(supabase, _to_rows(changeset["groups"]), controller=controller)
+
+
+def save_changeset(changeset: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(changeset, f, ensure_ascii=False, indent=1)
+
+
+def load_changeset(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
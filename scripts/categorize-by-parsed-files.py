@@ -8,6 +8,9 @@ import os
 import json
 from supabase import Client, create_client
 
+from db_batch import WriteBehindQueue
+from model_tokens import engine_models
+
 # Supabase setup
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
@@ -78,27 +81,27 @@ FILE_CATEGORY_MAPPING = {
     "parsed_data/zip-agro/zip-agro-kpp-parts.json": "parts-minitractors",  # Универсальные запчасти КПП
 }
 
-# Дополнительный маппинг для определения модели двигателя по названию
-ENGINE_MODEL_PATTERNS = {
-    "r180": ["r180", "р180"],
-    "r190": ["r190", "р190"],
-    "r195": ["r195", "р195"],
-    "zs1115": ["zs1115", "зс1115", "zs-1115"],
-    "zs1100": ["zs1100", "зс1100", "zs-1100"],
-    "km385bt": ["km385", "км385", "km-385"],
-    "ll380": ["ll380", "лл380", "ll-380"],
-    "zn490": ["zn490", "зн490", "zn-490"],
-    "zn390": ["zn390", "зн390", "zn-390"],
+# Семейство двигателя (токен model_tokens.engine_models) → engine_model.
+# Порядок = приоритет, если в названии несколько двигателей
+ENGINE_MODELS = {
+    "r180": "r180",
+    "r190": "r190",
+    "r195": "r195",
+    "zs1115": "zs1115",
+    "zs1100": "zs1100",
+    "km385": "km385bt",
+    "ll380": "ll380",
+    "zn490": "zn490",
+    "zn390": "zn390",
 }
 
 
 def detect_engine_model(product_name: str) -> str | None:
-    """Определяет модель двигателя из названия товара"""
-    name_lower = product_name.lower()
-    for model, patterns in ENGINE_MODEL_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in name_lower:
-                return model
+    """Определяет модель двигателя из названия товара (R195, Р195, ZS-1115, КМ385ВТ, ...)"""
+    tokens = set(engine_models(product_name))
+    for family, model in ENGINE_MODELS.items():
+        if family in tokens:
+            return model
     return None
 
 
@@ -111,7 +114,7 @@ def load_categories():
     return categories_map
 
 
-def process_file(file_path: str, category_slug: str, categories_map: dict):
+def process_file(file_path: str, category_slug: str, categories_map: dict, queue: WriteBehindQueue):
     """Обрабатывает один JSON файл и категоризирует товары"""
 
     if not os.path.exists(file_path):
@@ -151,9 +154,9 @@ def process_file(file_path: str, category_slug: str, categories_map: dict):
         # Ищем товар в БД по названию и артикулу
         query = supabase.table("products").select("id, name, category_id")
 
-        # Пробуем найти по артикулу (точнее)
+        # Пробуем найти по артикулу источника (точнее)
         if article:
-            result = query.eq("article", article).execute()
+            result = query.eq("source_article", str(article)).execute()
         else:
             # Если нет артикула, ищем по названию
             result = query.ilike("name", f"%{title[:50]}%").limit(1).execute()
@@ -164,16 +167,13 @@ def process_file(file_path: str, category_slug: str, categories_map: dict):
 
         product = result.data[0]
 
-        # Обновляем категорию товара
-        update_data = {"category_id": category_id}
-
+        # Обновляем категорию товара (запись в фоне, чтение не ждёт её)
         # Для запчастей двигателей добавляем модель в specifications
-        if category_slug == "parts-engines":
-            engine_model = detect_engine_model(title)
-            if engine_model:
-                update_data["specifications"] = {"engine_model": engine_model}
-
-        supabase.table("products").update(update_data).eq("id", product["id"]).execute()
+        engine_model = detect_engine_model(title) if category_slug == "parts-engines" else None
+        if engine_model:
+            queue.merge(product["id"], {"engine_model": engine_model}, fields={"category_id": category_id})
+        else:
+            queue.put(product["id"], {"category_id": category_id})
         updated += 1
 
     print(f"   ✅ Обновлено: {updated} | Пропущено: {skipped}")
@@ -193,11 +193,17 @@ def main():
     total_updated = 0
     total_skipped = 0
 
+    queue = WriteBehindQueue(supabase)
+
     for file_path, category_slug in FILE_CATEGORY_MAPPING.items():
-        updated, skipped = process_file(file_path, category_slug, categories_map)
+        updated, skipped = process_file(file_path, category_slug, categories_map, queue)
         total_updated += updated
         total_skipped += skipped
 
+    # Дописываем всё, что осталось в очереди
+    queue.close()
+    print(f"\n💾 Записано: {queue.stats['updated']} за {queue.stats['requests']} запросов, ошибок: {queue.stats['failed']}")
+
     print("\n" + "=" * 80)
     print("📊 ИТОГОВАЯ СТАТИСТИКА")
     print("=" * 80)
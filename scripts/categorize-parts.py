@@ -3,6 +3,8 @@ import re
 
 from supabase import Client, create_client
 
+from rules_engine import get_engine
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
@@ -11,135 +13,19 @@ supabase: Client = create_client(url, key)
 all_categories = supabase.table("categories").select("id, name, slug").execute()
 categories_map = {cat["slug"]: cat["id"] for cat in all_categories.data}
 
-# Маппинг брендов (как они встречаются в названиях товаров)
-BRAND_PATTERNS = {
-    "uralets": ["уралец", "uralets"],
-    "jinma": ["джинма", "jinma"],
-    "xingtai": ["синтай", "xingtai", "синтай-504"],
-    "dongfeng": [
-        "dongfeng",
-        "донгфенг",
-        "дунфенг",
-        "dongfeng 244",
-        "dongfeng 404",
-        "df-244",
-        "df-404",
-    ],
-    "scout": ["скаут", "scout", "т-18", "t-18", "т-25", "t-25"],
-    "foton": ["фотон", "foton", "lovol"],
-    "rusich": ["русич", "rusich"],
-    "mtz": ["мтз", "mtz", "беларус", "belarus"],
-    "t-series": ["т-серия", "t-series", "т-40", "т-25", "т-16"],
-    "shifeng": ["шифенг", "shifeng"],
-    "catmann": ["кэтманн", "catmann", "кетманн"],
-    "chuvashpiller": ["чувашпиллер", "chuvashpiller"],
-    "kentavr": ["кентавр", "kentavr", "т-15", "t-15", "т-18", "t-18", "т-224", "t-224"],
-    "bulat": ["булат", "bulat"],
-    "yto": ["yto"],
-    "neva": ["нева", "neva", "мб"],
-    "dlh": ["dlh"],
-    "perkins": ["perkins", "перкинс"],
-    "wirax": ["wirax", "виракс"],
-    "fayter": ["файтер", "fayter", "т-15", "t-15"],
-    "km-engines": ["км", "km"],
-    "rustrak": ["рустрак", "rustrak"],
-}
-
-# Маппинг типов запчастей
-TYPE_PATTERNS = {
-    "other-parts": [
-        "прочие",
-        "прочее",
-        "навесное",
-        "оборудование",
-        "крепление",
-        "кронштейн",
-        "адаптер",
-        "кабина",
-        "крыло",
-        "зеркало",
-        "колпак",
-        "ковш",
-        "борт",
-        "фаркоп",
-    ],
-    "filters": ["фильтр"],
-    "diesel-engines": [
-        "двигатель",
-        "двигателя",
-        "поршень",
-        "поршневые",
-        "цилиндр",
-        "гбц",
-        "головка блока",
-        "глушитель",
-        "коллектор",
-    ],
-    "starters-generators": ["стартер", "генератор"],
-    "universal-parts": ["универсальн", "комплект"],
-    "seats": ["сиденье", "сидение", "кресло"],
-    "spare-parts-kit": ["зип", "ремкомплект", "ремонтный комплект"],
-    "equipment-parts": [
-        "картофелекопалка",
-        "косилка",
-        "окучник",
-        "плуг",
-        "борона",
-        "фреза",
-        "снегоуборщик",
-        "прицеп",
-        "погрузчик",
-        "пресс-подборщик",
-    ],
-    "tractor-parts": [
-        "трактор",
-        "масляный",
-        "топливный",
-        "насос",
-        "редуктор",
-        "вал",
-        "вом",
-    ],
-    "wheels-tires": ["колесо", "колёс", "диск", "шина", "груз", "грунтозацеп"],
-    "standard-parts": [
-        "болт",
-        "гайка",
-        "шпилька",
-        "прокладка",
-        "кольцо",
-        "шайба",
-        "палец",
-        "пружина",
-        "стопорн",
-    ],
-    "hydraulics": ["гидравлик", "гидроцилиндр", "гидронасос", "нш", "рулевой цилиндр"],
-    "driveshafts": ["кардан", "карданный вал"],
-}
+# Правила - общий файл categorization_rules.json
+# (те же наборы brand_category / part_category, что и в migrate-parts-improved.py)
+ENGINE = get_engine()
 
 
 def detect_brand(product_name):
     """Определяет бренд из названия товара"""
-    name_lower = product_name.lower()
-
-    for brand_key, patterns in BRAND_PATTERNS.items():
-        for pattern in patterns:
-            if pattern.lower() in name_lower:
-                return brand_key
-
-    return "universal"
+    return ENGINE.label("brand_category", product_name)
 
 
 def detect_type(product_name):
     """Определяет тип запчасти из названия товара"""
-    name_lower = product_name.lower()
-
-    # Проверяем в порядке приоритета (более специфичные типы первыми)
-    for type_key, patterns in TYPE_PATTERNS.items():
-        for pattern in patterns:
-            if pattern.lower() in name_lower:
-                return type_key
-
-    return "other-parts"
+    return ENGINE.label("part_category", product_name)
 
 
 # Получаем все товары из категории "Запчасти"
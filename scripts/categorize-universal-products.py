@@ -197,4 +197,5 @@ print(f"Переназначено производителей: {total_updated}
 print(f"Осталось UNIVERSAL товаров: {final_universal.count}")
 print()
 print(f"💡 Оставшиеся {final_universal.count} товаров - это действительно универсальные запчасти!")
+print("💡 Остаток по похожим названиям: python3 classify-universal-nn.py")
 print()
@@ -3,67 +3,56 @@
 Проверяет товары Perkins в базе данных
 """
 
-import os
-import sys
+import asyncio
 
-import requests
+from async_db import AsyncSupabase
 
-SUPABASE_URL = "https://dpsykseeqloturowdyzf.supabase.co"
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-if not SUPABASE_KEY:
-    print("❌ ОШИБКА: Не найден SUPABASE_SERVICE_ROLE_KEY")
-    sys.exit(1)
+async def main():
+    print("=" * 70)
+    print("🔍 ПРОВЕРКА ТОВАРОВ PERKINS")
+    print("=" * 70)
 
-headers = {
-    "apikey": SUPABASE_KEY,
-    "Authorization": f"Bearer {SUPABASE_KEY}",
-}
+    async with AsyncSupabase.from_env() as db:
+        # Товары и категории Perkins - два запроса параллельно
+        perkins_products, perkins_cats = await asyncio.gather(
+            db.select_all("products", "id, name, category_id", {"name": "ilike.*perkins*"}),
+            db.select("categories", "id, name, slug", {"slug": "ilike.*perkins*"}),
+        )
 
-print("=" * 70)
-print("🔍 ПРОВЕРКА ТОВАРОВ PERKINS")
-print("=" * 70)
+        print(f"\n📦 Найдено товаров Perkins: {len(perkins_products)}")
 
-# Получаем все товары с Perkins в названии
-url = f"{SUPABASE_URL}/rest/v1/products?select=*"
-response = requests.get(url, headers=headers, params={"limit": "10000"})
-all_products = response.json()
+        if perkins_products:
+            # Категории товаров - одним запросом, а не по запросу на товар
+            category_ids = sorted({p["category_id"] for p in perkins_products if p["category_id"]})
+            categories = await db.select(
+                "categories", "id, name, slug", {"id": f"in.({','.join(map(str, category_ids))})"}
+            ) if category_ids else []
+            categories = {c["id"]: c for c in categories}
 
-perkins_products = [p for p in all_products if "perkins" in p["name"].lower()]
+            print("\n📋 Список товаров:")
+            for p in perkins_products:
+                print(f"  - ID: {p['id']}")
+                print(f"    Название: {p['name']}")
+                print(f"    Category ID: {p['category_id']}")
 
-print(f"\n📦 Найдено товаров Perkins: {len(perkins_products)}")
+                category = categories.get(p["category_id"])
+                if category:
+                    print(f"    Категория: {category['name']} ({category['slug']})")
+                print()
 
-if len(perkins_products) > 0:
-    print("\n📋 Список товаров:")
-    for p in perkins_products:
-        print(f"  - ID: {p['id']}")
-        print(f"    Название: {p['name']}")
-        print(f"    Category ID: {p['category_id']}")
+        # Количество товаров в категориях Perkins - count параллельно
+        counts = await asyncio.gather(*(
+            db.count("products", {"category_id": f"eq.{c['id']}"}) for c in perkins_cats
+        ))
 
-        # Получаем категорию
-        url = f"{SUPABASE_URL}/rest/v1/categories?id=eq.{p['category_id']}"
-        response = requests.get(url, headers=headers)
-        category = response.json()
+    print(f"\n📦 Категорий Perkins: {len(perkins_cats)}")
+    print("\n📋 Список категорий:")
+    for c, count in zip(perkins_cats, counts):
+        print(f"  - {c['name']} ({c['slug']}) - {count} товаров")
 
-        if category:
-            print(f"    Категория: {category[0]['name']} ({category[0]['slug']})")
-        print()
+    print("=" * 70)
 
-# Получаем все категории perkins
-url = f"{SUPABASE_URL}/rest/v1/categories?select=*"
-response = requests.get(url, headers=headers)
-all_categories = response.json()
 
-perkins_cats = [c for c in all_categories if "perkins" in c["slug"]]
-
-print(f"\n📦 Категорий Perkins: {len(perkins_cats)}")
-print("\n📋 Список категорий:")
-for c in perkins_cats:
-    # Считаем товары в категории
-    url = f"{SUPABASE_URL}/rest/v1/products?select=id&category_id=eq.{c['id']}"
-    response = requests.get(url, headers=headers)
-    products_in_cat = response.json()
-
-    print(f"  - {c['name']} ({c['slug']}) - {len(products_in_cat)} товаров")
-
-print("=" * 70)
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,16 +1,45 @@
 #!/usr/bin/env python3
 """
 Поиск изображений с водяными знаками в базе данных
-Проверяет URL и определяет наличие watermark по домену и пути
+
+Раньше знак искался по словам в URL, а все картинки zip-agro и tata-agro
+уходили на ручную проверку. Теперь - по пикселям (watermarks.py):
+шаблоны знаков источников строятся по выборке их картинок, каждая картинка
+сравнивается с шаблонами, на ручную проверку идут только найденные.
+
+Шаблоны: watermark-templates.npz (опция 1, один раз или после смены
+знака у источника). Оценки: watermark-scores.json. Порог - по ручной
+разметке выборки (опция 5: watermark-labels.json → watermark-calibration.json);
+без калибровки под текущие шаблоны флаги в БД не пишутся. Флаги пишутся
+пачками через журнал watermarks.journal.jsonl (откат - --rollback).
 """
 
+import asyncio
+import json
 import os
+import random
 import sys
 from collections import defaultdict
 
 from dotenv import load_dotenv
 from supabase import Client, create_client
 
+from dedupe import fetch_rows
+from op_journal import OperationJournal, journal_cli, make_executor
+from watermarks import (
+    CALIBRATION_PATH,
+    TEMPLATES_PATH,
+    THRESHOLD,
+    build_templates,
+    calibrate,
+    classify,
+    load_templates,
+    product_source,
+    sample_frames,
+    save_templates,
+    watermark_batches,
+)
+
 load_dotenv("frontend/.env.local")
 
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
@@ -22,263 +51,270 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-
-def check_for_watermarks():
-    """Находит товары с потенциальными водяными знаками"""
-    print("\n" + "=" * 70)
-    print("ПОИСК ИЗОБРАЖЕНИЙ С ВОДЯНЫМИ ЗНАКАМИ")
-    print("=" * 70 + "\n")
-
-    # Паттерны для определения водяных знаков
-    watermark_patterns = [
-        "watermark",
-        "wm",
-        "logo",
-        "branded",
-        "/w/",
-        "/wm/",
-        "_wm",
-        "-wm",
-        "водяной",
-        "знак",
-    ]
-
-    # Домены, которые ОБЫЧНО добавляют водяные знаки
-    # (для дальнейшей ручной проверки)
-    domains_to_check = [
-        "zip-agro.ru",
-        "tata-agro-moto.com",
-    ]
-
-    # Получаем все товары с изображениями
-    all_products = []
+# Источники, которые добавляют водяные знаки (по ним строятся шаблоны)
+WATERMARK_SOURCES = ["zip-agro", "tata-agro"]
+SCORES_PATH = "watermark-scores.json"
+JOURNAL_PATH = "watermarks.journal.jsonl"
+# Ручная разметка: [{"id", "image_url", "watermark_score", "has_watermark": true/false}]
+LABELS_PATH = "watermark-labels.json"
+LABEL_SAMPLE_SIZE = 200
+
+
+def load_calibration() -> dict | None:
+    """Калибровка под текущие шаблоны (после пересборки шаблонов - недействительна)"""
+    if not os.path.exists(CALIBRATION_PATH) or not os.path.exists(TEMPLATES_PATH):
+        return None
+    with open(CALIBRATION_PATH, "r", encoding="utf-8") as f:
+        calibration = json.load(f)
+    if calibration.get("templates_mtime") != os.path.getmtime(TEMPLATES_PATH):
+        return None
+    return calibration if calibration.get("threshold") is not None else None
+
+
+def load_products():
+    """Все товары с картинкой (keyset-пагинация по id)"""
+    products = []
+    last_id = 0
     page_size = 1000
-    offset = 0
 
     print("📥 Загружаем товары из БД...")
     while True:
         response = (
             supabase.table("products")
-            .select("id, name, image_url, manufacturer, specifications")
-            .range(offset, offset + page_size - 1)
+            .select("id, name, image_url, manufacturer, source")
+            .not_.is_("image_url", "null")
+            .gt("id", last_id)
+            .order("id")
+            .limit(page_size)
             .execute()
         )
-
         if not response.data:
             break
 
-        all_products.extend(response.data)
-        offset += page_size
+        products.extend(response.data)
+        last_id = response.data[-1]["id"]
 
         if len(response.data) < page_size:
             break
 
-    print(f"✅ Загружено товаров: {len(all_products):,}\n")
-
-    # Анализируем изображения
-    products_with_watermarks = []
-    products_without_images = []
-    products_to_check_manually = []  # Требуют визуальной проверки
-    by_domain = defaultdict(int)
-    watermark_by_brand = defaultdict(int)
-    check_by_brand = defaultdict(int)
-
-    for product in all_products:
-        image_url = product.get("image_url", "")
-
-        if not image_url:
-            products_without_images.append(product)
-            continue
-
-        # Подсчет по доменам
-        if "zip-agro.ru" in image_url:
-            by_domain["zip-agro.ru"] += 1
-        elif "tata-agro-moto.com" in image_url:
-            by_domain["tata-agro-moto.com"] += 1
-        else:
-            by_domain["other"] += 1
-
-        # Проверка на водяные знаки в URL
-        has_watermark = False
-        for pattern in watermark_patterns:
-            if pattern.lower() in image_url.lower():
-                has_watermark = True
-                break
-
-        if has_watermark:
-            products_with_watermarks.append(product)
-            brand = product.get("manufacturer", "UNKNOWN")
-            watermark_by_brand[brand] += 1
-
-        # Помечаем товары из подозрительных доменов для ручной проверки
-        needs_check = False
-        for domain in domains_to_check:
-            if domain in image_url:
-                needs_check = True
-                break
-
-        if needs_check:
-            products_to_check_manually.append(product)
-            brand = product.get("manufacturer", "UNKNOWN")
-            check_by_brand[brand] += 1
+    print(f"✅ Загружено товаров: {len(products):,}\n")
+    return products
+
+
+def build_watermark_templates():
+    """Шаблоны знаков источников по выборке их картинок"""
+    print("\n" + "=" * 70)
+    print("ПОСТРОЕНИЕ ШАБЛОНОВ ВОДЯНЫХ ЗНАКОВ")
+    print("=" * 70 + "\n")
+
+    products = [p for p in load_products() if product_source(p) in WATERMARK_SOURCES]
+    frames_by_source = asyncio.run(sample_frames(products))
+    templates = build_templates(frames_by_source)
+    save_templates(templates)
+
+    for source, template in templates.items():
+        print(f"  ✓ {source}: {len(frames_by_source[source])} картинок, регионы: {', '.join(template['regions'])}")
+    print(f"\n✅ Шаблоны сохранены в {TEMPLATES_PATH}")
+
+
+def check_for_watermarks():
+    """Оценивает все картинки по шаблонам, на ручную проверку - только найденные"""
+    print("\n" + "=" * 70)
+    print("ПОИСК ИЗОБРАЖЕНИЙ С ВОДЯНЫМИ ЗНАКАМИ")
+    print("=" * 70 + "\n")
+
+    if not os.path.exists(TEMPLATES_PATH):
+        print(f"❌ Нет шаблонов {TEMPLATES_PATH} - сначала опция 1")
+        return None
+
+    calibration = load_calibration()
+    threshold = calibration["threshold"] if calibration else THRESHOLD
+    if not calibration:
+        print(f"⚠️  Порог не откалиброван (опция 5) - отчёт по порогу {THRESHOLD}, в БД не пишется\n")
+
+    products = load_products()
+    failed = {}
+    results = asyncio.run(classify(products, load_templates(), failed))
+
+    flagged = [
+        {**p, "watermark_score": results[p["id"]]["score"], "watermark_source": results[p["id"]]["template"]}
+        for p in products
+        if p["id"] in results and results[p["id"]]["score"] >= threshold
+    ]
+    flagged.sort(key=lambda p: p["watermark_score"])
+    by_source = defaultdict(int)
+    for product in flagged:
+        by_source[product["watermark_source"]] += 1
 
     # Вывод статистики
-    print("📊 СТАТИСТИКА ПО ИЗОБРАЖЕНИЯМ")
+    print("\n📊 СТАТИСТИКА ПО ИЗОБРАЖЕНИЯМ")
     print("-" * 70)
-    print(f"{'Всего товаров:':<40} {len(all_products):>10,}")
-    print(f"{'С изображениями:':<40} {len(all_products) - len(products_without_images):>10,}")
-    print(f"{'Без изображений:':<40} {len(products_without_images):>10,}")
-    print(f"{'С водяными знаками в URL:':<40} {len(products_with_watermarks):>10,}")
-    print(f"{'⚠️  ТРЕБУЮТ РУЧНОЙ ПРОВЕРКИ:':<40} {len(products_to_check_manually):>10,}")
+    print(f"{'Товаров с картинкой:':<40} {len(products):>10,}")
+    print(f"{'Проверено:':<40} {len(results):>10,}")
+    print(f"{'Не скачались / битые картинки:':<40} {len(failed):>10,}")
+    print(f"{'⚠️  С ВОДЯНЫМ ЗНАКОМ (score >= ' + str(threshold) + '):':<40} {len(flagged):>10,}")
+    for source, count in sorted(by_source.items(), key=lambda x: x[1], reverse=True):
+        print(f"   {source:<37} {count:>10,}")
     print("-" * 70 + "\n")
 
-    print("📊 РАСПРЕДЕЛЕНИЕ ПО ДОМЕНАМ")
-    print("-" * 70)
-    for domain, count in sorted(by_domain.items(), key=lambda x: x[1], reverse=True):
-        print(f"{domain:<40} {count:>10,}")
-    print("-" * 70 + "\n")
+    with open(SCORES_PATH, "w", encoding="utf-8") as f:
+        json.dump({"threshold": threshold, "results": results}, f, ensure_ascii=False)
+    print(f"💾 Оценки всех картинок: {SCORES_PATH}")
 
-    if watermark_by_brand:
-        print("📊 ВОДЯНЫЕ ЗНАКИ ПО БРЕНДАМ (найдено в URL)")
-        print("-" * 70)
-        for brand, count in sorted(watermark_by_brand.items(), key=lambda x: x[1], reverse=True):
-            print(f"{brand:<40} {count:>10,}")
-        print("-" * 70 + "\n")
-
-    if check_by_brand:
-        print("⚠️  ТОВАРЫ ДЛЯ РУЧНОЙ ПРОВЕРКИ ПО БРЕНДАМ")
-        print("-" * 70)
-        print("(изображения с zip-agro.ru и tata-agro-moto.com)")
-        print("-" * 70)
-        for brand, count in sorted(check_by_brand.items(), key=lambda x: x[1], reverse=True):
-            print(f"{brand:<40} {count:>10,}")
-        print("-" * 70 + "\n")
-
-    # Примеры товаров с водяными знаками
-    if products_with_watermarks:
-        print("📋 ПРИМЕРЫ ТОВАРОВ С ВОДЯНЫМИ ЗНАКАМИ В URL (Топ-20)")
-        print("-" * 70)
-        for i, p in enumerate(products_with_watermarks[:20], 1):
-            print(f"\n{i}. {p['name'][:50]}")
-            print(f"   ID: {p['id']}")
-            print(f"   Brand: {p.get('manufacturer', 'N/A')}")
-            print(f"   URL: {p['image_url'][:100]}...")
-
-    # Товары без изображений
-    if products_without_images:
-        print(f"\n\n⚠️  ТОВАРЫ БЕЗ ИЗОБРАЖЕНИЙ ({len(products_without_images)})")
-        print("-" * 70)
-        for i, p in enumerate(products_without_images[:10], 1):
-            print(f"{i}. [{p.get('manufacturer', 'N/A'):10}] {p['name'][:50]}")
-
-    # Сохраняем списки товаров
-    import json
-
-    if products_with_watermarks:
-        print("\n\n💾 СОХРАНЕНИЕ СПИСКА ТОВАРОВ С ВОДЯНЫМИ ЗНАКАМИ")
-        print("-" * 70)
-
-        output_file = "watermarked_products.json"
-
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(products_with_watermarks, f, ensure_ascii=False, indent=2)
-
-        print(f"✅ Сохранено в {output_file}")
-        print(f"   Товаров: {len(products_with_watermarks):,}")
-
-    if products_to_check_manually:
-        print("\n💾 СОХРАНЕНИЕ СПИСКА ДЛЯ РУЧНОЙ ПРОВЕРКИ")
-        print("-" * 70)
-
-        output_file = "products_to_check_manually.json"
-
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(products_to_check_manually, f, ensure_ascii=False, indent=2)
-
-        print(f"✅ Сохранено в {output_file}")
-        print(f"   Товаров: {len(products_to_check_manually):,}")
-        print("\n💡 Эти товары используют изображения с zip-agro.ru и tata-agro-moto.com")
-        print("   Рекомендуется визуально проверить на наличие водяных знаков")
+    # На ручную проверку - только найденные, сначала пограничные
+    with open("products_to_check_manually.json", "w", encoding="utf-8") as f:
+        json.dump(flagged, f, ensure_ascii=False, indent=2)
+    print(f"💾 На ручную проверку: products_to_check_manually.json ({len(flagged):,} шт.)")
 
     return {
-        "total": len(all_products),
-        "with_watermarks": len(products_with_watermarks),
-        "to_check_manually": len(products_to_check_manually),
-        "without_images": len(products_without_images),
-        "by_domain": dict(by_domain),
-        "watermark_by_brand": dict(watermark_by_brand),
-        "check_by_brand": dict(check_by_brand),
+        "total": len(products),
+        "checked": len(results),
+        "failed": len(failed),
+        "with_watermarks": len(flagged),
+        "by_source": dict(by_source),
     }
 
 
 def mark_watermarked_products():
-    """Помечает товары с водяными знаками в БД (добавляет флаг в specifications)"""
+    """Пишет has_watermark / watermark_score / watermark_source в specifications пачками"""
     print("\n" + "=" * 70)
     print("ПОМЕТКА ТОВАРОВ С ВОДЯНЫМИ ЗНАКАМИ В БД")
     print("=" * 70 + "\n")
 
-    confirm = input("⚠️  Пометить товары с водяными знаками? (yes/no): ").strip().lower()
-    if confirm != "yes":
-        print("❌ Отменено")
+    if not os.path.exists(SCORES_PATH):
+        print(f"❌ Файл {SCORES_PATH} не найден")
+        print("   Сначала запустите поиск водяных знаков (опция 2)")
+        return
+
+    calibration = load_calibration()
+    if not calibration:
+        print("❌ Порог не откалиброван под текущие шаблоны")
+        print("   Сначала разметьте выборку и откалибруйте порог (опция 5)")
         return
 
-    # Загружаем список из файла
-    if not os.path.exists("watermarked_products.json"):
-        print("❌ Файл watermarked_products.json не найден")
-        print("   Сначала запустите поиск водяных знаков (опция 1)")
+    with open(SCORES_PATH, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    results = {int(product_id): result for product_id, result in saved["results"].items()}
+    threshold = calibration["threshold"]
+    print(
+        f"🎯 Порог {threshold} (точность {calibration['precision']:.0%}, "
+        f"полнота {calibration['recall']:.0%} на {calibration['labelled']} размеченных)"
+    )
+
+    # Текущие specifications - для отката
+    products = fetch_rows(supabase, sorted(results))
+    plan = watermark_batches(products, results, threshold)
+    if not plan:
+        print("✨ Флаги у всех товаров уже актуальны")
         return
 
-    import json
-    with open("watermarked_products.json", "r", encoding="utf-8") as f:
-        products = json.load(f)
+    count = sum(len(b["forward"]) for b in plan)
+    confirm = input(f"⚠️  Записать флаги для {count:,} товаров? (yes/no): ").strip().lower()
+    if confirm != "yes":
+        print("❌ Отменено")
+        return
 
-    print(f"📊 Товаров для пометки: {len(products):,}\n")
+    journal = OperationJournal(JOURNAL_PATH)
+    journal.start("check-watermarks", plan, {"threshold": threshold})
+    summary = journal.run(make_executor(supabase))
+
+    print(f"\n✅ Обновлено товаров: {summary['rows_applied']:,}, ошибок: {summary['rows_failed']:,}")
+    print("\n💡 Теперь вы можете фильтровать товары по флагу:")
+    print("   specifications->>'has_watermark' = 'true'")
 
-    updated = 0
-    for product in products:
-        try:
-            specs = product.get("specifications", {}) or {}
-            specs["has_watermark"] = True
-            specs["watermark_source"] = "url_pattern_detected"
 
-            supabase.table("products").update(
-                {"specifications": specs}
-            ).eq("id", product["id"]).execute()
+def calibrate_threshold():
+    """
+    Нет разметки - пишет выборку по всему диапазону оценок для ручной
+    разметки; есть - подбирает порог и сохраняет калибровку
+    """
+    print("\n" + "=" * 70)
+    print("КАЛИБРОВКА ПОРОГА ПО РУЧНОЙ РАЗМЕТКЕ")
+    print("=" * 70 + "\n")
 
-            updated += 1
+    if not os.path.exists(SCORES_PATH):
+        print(f"❌ Файл {SCORES_PATH} не найден - сначала опция 2")
+        return
 
-            if updated % 100 == 0:
-                print(f"✅ Обновлено {updated}/{len(products)}")
+    with open(SCORES_PATH, "r", encoding="utf-8") as f:
+        results = {int(i): r for i, r in json.load(f)["results"].items()}
+
+    if not os.path.exists(LABELS_PATH):
+        # Равномерно по рангу оценки: и явные, и пограничные, и чистые
+        ranked = sorted(results, key=lambda i: results[i]["score"])
+        step = max(1, len(ranked) // LABEL_SAMPLE_SIZE)
+        ids = set(ranked[::step][:LABEL_SAMPLE_SIZE])
+        products = {p["id"]: p for p in fetch_rows(supabase, sorted(ids))}
+        sample = [
+            {
+                "id": i,
+                "name": products[i]["name"],
+                "image_url": products[i]["image_url"],
+                "watermark_score": results[i]["score"],
+                "has_watermark": None,
+            }
+            for i in ids if i in products
+        ]
+        # Перемешано, чтобы оценка не подсказывала ответ при разметке
+        random.shuffle(sample)
+        with open(LABELS_PATH, "w", encoding="utf-8") as f:
+            json.dump(sample, f, ensure_ascii=False, indent=2)
+        print(f"📝 Выборка для разметки: {LABELS_PATH} ({len(sample)} шт.)")
+        print('   Откройте каждую image_url, проставьте "has_watermark": true / false')
+        print("   и запустите опцию 5 ещё раз")
+        return
 
-        except Exception as e:
-            print(f"❌ Ошибка обновления ID {product['id']}: {e}")
+    with open(LABELS_PATH, "r", encoding="utf-8") as f:
+        labels = {row["id"]: row.get("has_watermark") for row in json.load(f)}
+    calibration = calibrate({i: r["score"] for i, r in results.items()}, labels)
+    if calibration["labelled"] == 0:
+        print(f"❌ В {LABELS_PATH} нет размеченных товаров")
+        return
+    if calibration["threshold"] is None:
+        print(f"❌ Ни один порог не даёт нужной точности на {calibration['labelled']} размеченных -")
+        print("   шаблоны не отделяют знак, флаги в БД писать нельзя")
+        return
 
-    print(f"\n✅ Всего помечено товаров: {updated:,}")
-    print("\n💡 Теперь вы можете фильтровать товары по флагу:")
-    print("   specifications->>'has_watermark' = 'true'")
+    calibration["templates_mtime"] = os.path.getmtime(TEMPLATES_PATH)
+    with open(CALIBRATION_PATH, "w", encoding="utf-8") as f:
+        json.dump(calibration, f, ensure_ascii=False, indent=2)
+    print(
+        f"✅ Порог {calibration['threshold']}: точность {calibration['precision']:.0%}, "
+        f"полнота {calibration['recall']:.0%} ({calibration['labelled']} размеченных)"
+    )
+    print(f"💾 {CALIBRATION_PATH}")
 
 
 def main():
     """Главное меню"""
+    if journal_cli(OperationJournal(JOURNAL_PATH), make_executor(supabase), sys.argv[1:]):
+        return
+
     print("\n" + "=" * 70)
     print("ПОИСК И УПРАВЛЕНИЕ ВОДЯНЫМИ ЗНАКАМИ")
     print("=" * 70 + "\n")
 
-    print("1. Найти изображения с водяными знаками")
-    print("2. Пометить товары с водяными знаками в БД")
-    print("3. Выполнить оба действия")
+    print("1. Построить шаблоны водяных знаков (zip-agro, tata-agro)")
+    print("2. Найти изображения с водяными знаками")
+    print("3. Пометить товары с водяными знаками в БД")
+    print("4. Выполнить 2 и 3")
+    print("5. Откалибровать порог по ручной разметке")
     print("0. Выход")
 
     choice = input("\nВведите номер: ").strip()
 
     if choice == "1":
-        check_for_watermarks()
+        build_watermark_templates()
     elif choice == "2":
-        mark_watermarked_products()
-    elif choice == "3":
         check_for_watermarks()
-        print("\n" + "=" * 70 + "\n")
+    elif choice == "3":
         mark_watermarked_products()
+    elif choice == "4":
+        if check_for_watermarks() is not None:
+            print("\n" + "=" * 70 + "\n")
+            mark_watermarked_products()
+    elif choice == "5":
+        calibrate_threshold()
     elif choice == "0":
         print("👋 До свидания!")
     else:
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+КАТЕГОРИЗАЦИЯ UNIVERSAL ТОВАРОВ ПО ПОХОЖИМ НАЗВАНИЯМ
+
+Остаток manufacturer = "UNIVERSAL", на который не сработали ключевые
+слова (categorize-universal-products.py, redistribute-universal*.py),
+раскладывается по ближайшим соседям среди уже разложенных товаров
+(nn_categorizer.py: TF-IDF char n-gram + top-k косинусная близость).
+
+- category_id и manufacturer предсказываются независимо
+- Записывается только уверенное предсказание (--threshold, --min-similarity),
+  через changeset с rollback-файлом (categorization_plan.py)
+- Остальное → universal_to_review.json с подсказками (отдельно от
+  products_to_check_manually.json - это очередь check-watermarks.py)
+
+Использование:
+    python3 classify-universal-nn.py                    # dry run: статистика + файл ручной проверки
+    python3 classify-universal-nn.py --apply            # записать уверенные предсказания
+    python3 classify-universal-nn.py --threshold 0.8 --min-similarity 0.6
+"""
+
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from supabase import Client, create_client
+
+from categorization_plan import (
+    apply_changeset,
+    build_changeset,
+    load_catalog,
+    load_categories,
+    save_changeset,
+)
+from nn_categorizer import NearestNeighborCategorizer, is_confident
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase: Client = create_client(url, key)
+
+PLAN_PATH = "universal-nn-plan.json"
+ROLLBACK_PATH = "universal-nn-rollback.json"
+MANUAL_PATH = "universal_to_review.json"
+
+UNKNOWN_MANUFACTURERS = {None, "", "UNIVERSAL", "Неизвестно"}
+FIELDS = ("category_id", "manufacturer")
+
+
+def arg_value(args: list, name: str, default: float) -> float:
+    if name in args:
+        return float(args[args.index(name) + 1])
+    return default
+
+
+def training_labels(products: list, categories: list, exclude: set = frozenset()) -> tuple:
+    """
+    Обучающая выборка: товары с известным брендом и / или брендовой
+    категорией. universal-* и корневые категории в голосовании не участвуют.
+    exclude - id предсказываемых товаров: иначе UNIVERSAL-товар в брендовой
+    категории находит сам себя (близость 1.0) и всегда сохраняет её.
+    """
+    id_to_slug = {cat["id"]: cat["slug"] for cat in categories}
+
+    names = []
+    labels = {field: [] for field in FIELDS}
+    for product in products:
+        if product["id"] in exclude:
+            continue
+        slug = id_to_slug.get(product.get("category_id"), "")
+        category_id = product["category_id"] if "-" in slug and not slug.startswith("universal-") else None
+        manufacturer = product.get("manufacturer")
+        if manufacturer in UNKNOWN_MANUFACTURERS:
+            manufacturer = None
+
+        if category_id is None and manufacturer is None:
+            continue
+
+        names.append(product.get("name") or "")
+        labels["category_id"].append(category_id)
+        labels["manufacturer"].append(manufacturer)
+
+    return names, labels
+
+
+def save_manual(entries: list, processed_ids: set):
+    """Обновляет файл ручной проверки: записи обработанных товаров заменяются"""
+    existing = []
+    if os.path.exists(MANUAL_PATH):
+        with open(MANUAL_PATH, "r", encoding="utf-8") as f:
+            existing = json.load(f)
+
+    merged = [e for e in existing if e.get("id") not in processed_ids] + entries
+
+    with open(MANUAL_PATH, "w", encoding="utf-8") as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    args = sys.argv[1:]
+    threshold = arg_value(args, "--threshold", 0.7)
+    min_similarity = arg_value(args, "--min-similarity", 0.5)
+
+    print("=" * 80)
+    print("🧭 UNIVERSAL → КАТЕГОРИИ ПО ПОХОЖИМ НАЗВАНИЯМ")
+    print(f"🎯 Порог: confidence ≥ {threshold}, similarity ≥ {min_similarity}")
+    print("=" * 80 + "\n")
+
+    print("📦 Загрузка каталога...")
+    products = load_catalog(supabase)
+    categories = load_categories(supabase)
+    id_to_slug = {cat["id"]: cat["slug"] for cat in categories}
+
+    universal = [p for p in products if p.get("manufacturer") == "UNIVERSAL"]
+    train_names, train_labels = training_labels(
+        products, categories, exclude={p["id"] for p in universal}
+    )
+    print(f"✅ Обучающих: {len(train_names)}, UNIVERSAL: {len(universal)}\n")
+
+    if not universal or not train_names:
+        print("✅ Нечего раскладывать")
+        return
+
+    start = time.time()
+    model = NearestNeighborCategorizer().fit(train_names, train_labels)
+    predictions = model.predict([p.get("name") or "" for p in universal])
+    print(f"⚡ Предсказано за {time.time() - start:.1f}с\n")
+
+    desired = {}
+    manual = []
+    stats = Counter()
+
+    for product, prediction in zip(universal, predictions):
+        fields = {}
+        for field in FIELDS:
+            if is_confident(prediction[field], threshold, min_similarity):
+                fields[field] = prediction[field]["label"]
+                stats[field] += 1
+
+        if fields:
+            desired[product["id"]] = fields
+        if len(fields) < len(FIELDS):
+            manual.append({
+                "id": product["id"],
+                "name": product.get("name"),
+                "category": id_to_slug.get(product.get("category_id")),
+                "suggested_category": id_to_slug.get(prediction["category_id"]["label"]),
+                "category_confidence": prediction["category_id"]["confidence"],
+                "suggested_manufacturer": prediction["manufacturer"]["label"],
+                "manufacturer_confidence": prediction["manufacturer"]["confidence"],
+                "similarity": prediction["category_id"]["similarity"],
+            })
+
+    changeset = build_changeset(
+        universal,
+        desired,
+        {"threshold": threshold, "min_similarity": min_similarity},
+    )
+    save_changeset(changeset, PLAN_PATH)
+
+    print(f"📊 Уверенно: category_id {stats['category_id']}, manufacturer {stats['manufacturer']}")
+    print(f"✏️  Изменится товаров: {changeset['total']}")
+    print(f"🔍 На ручную проверку: {len(manual)}\n")
+
+    moved = Counter()
+    for group in changeset["groups"]:
+        target = id_to_slug.get(group["set"].get("category_id"), group["set"].get("manufacturer"))
+        moved[target] += len(group["ids"])
+    for target, count in moved.most_common(15):
+        print(f"   {str(target):45} {count:>6}")
+
+    save_manual(manual, {p["id"] for p in universal})
+    print(f"\n💾 План: {PLAN_PATH}, ручная проверка: {MANUAL_PATH}")
+
+    if "--apply" not in args:
+        print("\nℹ️  DRY RUN - изменения не записаны (--apply для записи)")
+        return
+
+    if changeset["total"]:
+        print(f"\n🚀 Применяем {changeset['total']} изменений (rollback → {ROLLBACK_PATH})...")
+        result = apply_changeset(supabase, changeset, rollback_path=ROLLBACK_PATH)
+        print(
+            f"✅ Обновлено: {result['updated']} за {result['requests']} запросов, "
+            f"ошибок: {result['failed']}"
+        )
+
+    print("\n" + "=" * 80)
+    print("✅ ГОТОВО!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,39 @@
 #!/usr/bin/env python3
-"""Удаление ВСЕХ дубликатов за один раз"""
+"""
+Удаление ВСЕХ дубликатов за один раз
+
+Дубликаты - товары с одинаковым name_key (регистр и лишние пробелы не
+различаются, db_batch.name_key). Это разовая подготовка к миграции
+docs/migrations/name-key.sql: после неё уникальный индекс не даёт
+импортёрам создать дубликат, и повторные чистки не нужны.
+
+Удаление - пачками по 1000 через RPC dedupe_products (dedupe.py,
+docs/migrations/dedupe-products.sql): позиции заказов переносятся на
+оставляемый товар, а не обнуляются. Пачки идут через журнал операций
+(cleanup-duplicates.journal.jsonl), полные строки копий сохраняются в нём:
+    python3 cleanup-all-duplicates.py             # прерванный запуск продолжается с места остановки
+    python3 cleanup-all-duplicates.py --rollback  # вернуть удалённые товары
+"""
 import os
+import sys
 from dotenv import load_dotenv
 from supabase import create_client
 from collections import defaultdict
 
+from db_batch import name_key
+from dedupe import apply_dedupe
+from op_journal import OperationJournal, journal_cli, make_executor
+
+JOURNAL_PATH = "cleanup-duplicates.journal.jsonl"
+
 load_dotenv("../frontend/.env.local")
 supabase = create_client(os.getenv("NEXT_PUBLIC_SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
 
+journal = OperationJournal(JOURNAL_PATH)
+executor = make_executor(supabase)
+if journal_cli(journal, executor, sys.argv[1:], confirm=False):
+    sys.exit(0)
+
 print("Загрузка всех товаров...")
 all_products = []
 offset = 0
@@ -23,32 +49,27 @@ while True:
 
 print(f"Всего: {len(all_products)}")
 
-# Группируем по имени
+# Группируем по нормализованному имени - как уникальный индекс name_key
 by_name = defaultdict(list)
 for p in all_products:
-    by_name[p['name']].append(p['id'])
+    key = name_key(p['name'])
+    if key:
+        by_name[key].append(p['id'])
 
-# Находим все дубликаты
-to_delete = []
+# Находим все дубликаты: оставляем первый (с минимальным id)
+pairs = {}
 for name, ids in by_name.items():
-    if len(ids) > 1:
-        # Оставляем первый (с минимальным id), удаляем остальные
-        to_delete.extend(sorted(ids)[1:])
-
-print(f"К удалению: {len(to_delete)}")
-
-# Удаляем
-deleted = 0
-for pid in to_delete:
-    try:
-        supabase.table("products").delete().eq("id", pid).execute()
-        deleted += 1
-        if deleted % 100 == 0:
-            print(f"  {deleted}/{len(to_delete)}")
-    except:
-        pass
-
-print(f"Удалено: {deleted}")
+    survivor, *losers = sorted(ids)
+    for loser in losers:
+        pairs[loser] = survivor
+
+print(f"К удалению: {len(pairs)}")
+
+summary = apply_dedupe(supabase, pairs, journal, "cleanup-duplicates")
+
+print(f"Удалено: {summary['rows_applied']}")
+if summary["rows_failed"]:
+    print(f"Ошибок: {summary['rows_failed']} - запустите ещё раз, упавшие пачки будут повторены")
 
 # Проверяем
 final = supabase.table("products").select("id", count="exact").execute()
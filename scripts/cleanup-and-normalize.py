@@ -10,6 +10,10 @@ from collections import defaultdict
 from dotenv import load_dotenv
 from supabase import Client, create_client
 
+from db_batch import name_key
+from dedupe import apply_dedupe
+from op_journal import OperationJournal, journal_cli, make_executor
+
 load_dotenv("frontend/.env.local")
 
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
@@ -21,6 +25,9 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Удаление дубликатов - через журнал (python3 cleanup-and-normalize.py --rollback)
+JOURNAL_PATH = "cleanup-and-normalize.journal.jsonl"
+
 
 def find_duplicates():
     """Находит дубликаты по названию"""
@@ -56,8 +63,8 @@ def find_duplicates():
     # Группируем по названию
     by_name = defaultdict(list)
     for product in all_products:
-        name_lower = product["name"].lower().strip()
-        by_name[name_lower].append(product)
+        by_name[name_key(product["name"])].append(product)
+    by_name.pop(None, None)
 
     # Находим дубликаты
     duplicates = {name: items for name, items in by_name.items() if len(items) > 1}
@@ -85,33 +92,26 @@ def remove_duplicates(duplicates, dry_run=True):
         print("УДАЛЕНИЕ ДУБЛИКАТОВ")
     print("=" * 70 + "\n")
 
-    total_to_remove = 0
-    removed_count = 0
-
+    pairs = {}
     for name, items in duplicates.items():
         # Сортируем по цене (самый дешевый первым)
         items_sorted = sorted(items, key=lambda x: x.get("price", 999999))
 
         # Оставляем первый (самый дешевый), удаляем остальные
         keep = items_sorted[0]
-        to_remove = items_sorted[1:]
-
-        total_to_remove += len(to_remove)
-
-        if not dry_run:
-            # Удаляем дубликаты
-            for item in to_remove:
-                try:
-                    supabase.table("products").delete().eq("id", item["id"]).execute()
-                    removed_count += 1
-                except Exception as e:
-                    print(f"❌ Ошибка удаления ID {item['id']}: {e}")
+        for item in items_sorted[1:]:
+            pairs[item["id"]] = keep["id"]
 
     if dry_run:
-        print(f"📊 Будет удалено товаров: {total_to_remove:,}")
+        print(f"📊 Будет удалено товаров: {len(pairs):,}")
         print(f"📊 Останется уникальных: {len(duplicates):,}")
     else:
-        print(f"✅ Удалено товаров: {removed_count:,}")
+        # Позиции заказов переносятся на оставляемый товар, копии удаляются
+        # пачками (RPC dedupe_products)
+        summary = apply_dedupe(supabase, pairs, OperationJournal(JOURNAL_PATH), "cleanup-and-normalize")
+        print(f"✅ Удалено товаров: {summary['rows_applied']:,}")
+        if summary["rows_failed"]:
+            print(f"❌ Не удалено: {summary['rows_failed']:,} - запустите ещё раз, упавшие пачки будут повторены")
 
     print("\n" + "=" * 70 + "\n")
 
@@ -320,6 +320,9 @@ def main():
     print("ОЧИСТКА И НОРМАЛИЗАЦИЯ ДАННЫХ SUPABASE")
     print("=" * 70 + "\n")
 
+    if journal_cli(OperationJournal(JOURNAL_PATH), make_executor(supabase), sys.argv[1:]):
+        return
+
     print("Выберите действие:")
     print("1. Найти дубликаты")
     print("2. Удалить дубликаты (DRY RUN)")
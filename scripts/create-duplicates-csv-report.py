@@ -7,6 +7,8 @@ import os
 import csv
 from supabase import create_client
 
+from near_duplicates import find_duplicate_clusters
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -48,22 +50,16 @@ while True:
 print(f"✅ Всего товаров: {len(all_products)}")
 print()
 
-# Находим дубликаты по name
-print("Ищем дубликаты...")
-
-names = {}
-for p in all_products:
-    name = p["name"]
-    if name not in names:
-        names[name] = []
-    names[name].append(p)
+# Кластеры дубликатов: точные и почти-дубли (near_duplicates.py)
+print("Ищем дубликаты (MinHash + LSH)...")
 
-duplicates = {name: products for name, products in names.items() if len(products) > 1}
+clusters = find_duplicate_clusters(all_products)
 
-print(f"✅ Найдено групп дубликатов: {len(duplicates)}")
+print(f"✅ Найдено групп дубликатов: {len(clusters)}")
+print(f"   из них с разным написанием: {sum(1 for c in clusters if not c['exact'])}")
 
 # Подсчитываем общее количество дублей
-total_duplicates = sum(len(products) for products in duplicates.values())
+total_duplicates = sum(len(c["duplicates"]) + 1 for c in clusters)
 print(f"✅ Всего товаров-дублей: {total_duplicates}")
 print()
 
@@ -86,25 +82,19 @@ with open(csv_file, "w", encoding="utf-8", newline="") as f:
         "Manufacturer",
         "В наличии",
         "Дата создания",
+        "Сходство",
         "ОСТАВИТЬ?",
         "Комментарий"
     ])
 
-    # Сортируем дубликаты по количеству (больше → меньше)
-    sorted_duplicates = sorted(duplicates.items(), key=lambda x: len(x[1]), reverse=True)
-
-    group_num = 0
-
-    for name, products in sorted_duplicates:
-        group_num += 1
-
-        # Сортируем по ID (минимальный первый)
-        products.sort(key=lambda x: x["id"])
+    # Кластеры уже отсортированы по размеру (больше → меньше)
+    for group_num, cluster in enumerate(clusters, 1):
+        similarity = "точный" if cluster["exact"] else cluster["similarity"]
 
-        for i, p in enumerate(products):
-            # Первый товар (минимальный ID) - оставляем
+        # Первым - предложенный к сохранению, дальше по ID
+        for i, p in enumerate([cluster["survivor"], *cluster["duplicates"]]):
             keep = "✅ ДА" if i == 0 else "❌ НЕТ"
-            comment = "Самый старый (min ID)" if i == 0 else f"Дубль #{i}"
+            comment = "Предложен к сохранению" if i == 0 else f"Дубль #{i}"
 
             writer.writerow([
                 f"Группа {group_num}",
@@ -116,6 +106,7 @@ with open(csv_file, "w", encoding="utf-8", newline="") as f:
                 p.get("manufacturer", "НЕТ"),
                 "ДА" if p.get("in_stock") else "НЕТ",
                 p.get("created_at", "НЕТ"),
+                similarity,
                 keep,
                 comment
             ])
@@ -130,17 +121,17 @@ print()
 print("📊 СТАТИСТИКА:")
 print("-" * 100)
 print(f"Всего товаров в БД: {len(all_products)}")
-print(f"Групп дубликатов: {len(duplicates)}")
+print(f"Групп дубликатов: {len(clusters)}")
 print(f"Товаров-дублей: {total_duplicates}")
-print(f"Уникальных товаров: {len(all_products) - total_duplicates + len(duplicates)}")
+print(f"Уникальных товаров: {len(all_products) - total_duplicates + len(clusters)}")
 print()
 
 # Топ-10 групп с наибольшим количеством дублей
 print("🏆 ТОП-10 ГРУПП С НАИБОЛЬШИМ КОЛИЧЕСТВОМ ДУБЛЕЙ:")
 print("-" * 100)
 
-for i, (name, products) in enumerate(sorted_duplicates[:10], 1):
-    print(f"{i}. '{name}' - {len(products)} копий")
+for i, cluster in enumerate(clusters[:10], 1):
+    print(f"{i}. '{cluster['survivor']['name']}' - {len(cluster['duplicates']) + 1} копий")
 
 print()
 print("=" * 100)
@@ -149,4 +140,5 @@ print("=" * 100)
 print()
 print(f"📁 Открой файл: {csv_file}")
 print("🔍 Проверь дубли вручную!")
-print("💡 Колонка 'ОСТАВИТЬ?' показывает какой товар будет оставлен (с минимальным ID)")
+print("💡 Колонка 'ОСТАВИТЬ?' - предложенный товар: в наличии > с фото > с ценой > с минимальным ID")
+print("💡 Колонка 'Сходство' < 1 - почти-дубли с разным написанием, проверь их внимательно")
@@ -4,7 +4,6 @@
 """
 
 import os
-import re
 import sys
 
 import requests
@@ -17,55 +16,6 @@ if not SUPABASE_KEY:
     sys.exit(1)
 
 
-def slugify(text):
-    """Создает slug из текста с транслитерацией"""
-    translit_map = {
-        "а": "a",
-        "б": "b",
-        "в": "v",
-        "г": "g",
-        "д": "d",
-        "е": "e",
-        "ё": "yo",
-        "ж": "zh",
-        "з": "z",
-        "и": "i",
-        "й": "y",
-        "к": "k",
-        "л": "l",
-        "м": "m",
-        "н": "n",
-        "о": "o",
-        "п": "p",
-        "р": "r",
-        "с": "s",
-        "т": "t",
-        "у": "u",
-        "ф": "f",
-        "х": "h",
-        "ц": "ts",
-        "ч": "ch",
-        "ш": "sh",
-        "щ": "sch",
-        "ъ": "",
-        "ы": "y",
-        "ь": "",
-        "э": "e",
-        "ю": "yu",
-        "я": "ya",
-    }
-
-    text = text.lower()
-    result = []
-    for char in text:
-        result.append(translit_map.get(char, char))
-
-    text = "".join(result)
-    text = re.sub(r"[^\w\s-]", "", text)
-    text = re.sub(r"[\s_-]+", "-", text)
-    return text.strip("-")
-
-
 # Бренды для создания
 brands = [
     {"name": "WIRAX (Виракс)", "slug": "wirax"},
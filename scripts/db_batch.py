@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+ПАКЕТНЫЕ ОБНОВЛЕНИЯ ТОВАРОВ
+
+Группирует одинаковые патчи и отправляет их одним запросом
+.update(patch).in_("id", [...]) вместо update().eq("id", ...) на каждую
+строку (как это делает migrate-parts-turbo.py вручную).
+
+Для specifications - слияние на стороне БД через RPC
+merge_specifications / merge_specifications_bulk
+(docs/migrations/merge-specifications.sql): без чтения JSONB и без
+перезаписи чужих ключей.
+
+WriteBehindQueue - то же самое в фоне: цикл классификации кладёт патчи
+и не ждёт сети, запись идёт пачками по размеру или по таймеру.
+
+controller=AIMDController() (aimd.py) - размер пачек и число запросов
+в полёте подбираются по задержке и ошибкам вместо CHUNK_SIZE.
+
+insert_new - вставка новых товаров через ON CONFLICT (name_key) DO NOTHING
+(docs/migrations/name-key.sql): дубликат по нормализованному названию
+отбрасывает БД, выгружать существующие названия не нужно.
+
+Использование:
+    from db_batch import update_grouped, merge_specifications_bulk
+
+    updates = {product_id: {"manufacturer": "DongFeng"}, ...}
+    stats = update_grouped(supabase, updates)
+
+    rows = {product_id: {"fields": {"model": "DF-244"}, "patch": {"part_type": "filter"}}}
+    stats = merge_specifications_bulk(supabase, rows)
+
+    stats = insert_new(supabase, new_products)   # {"inserted", "skipped", "failed", ...}
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aimd import AIMDController, is_overload
+
+CHUNK_SIZE = 200
+MERGE_CHUNK_SIZE = 500
+INSERT_CHUNK_SIZE = 100
+
+# Уникальный ключ нормализованного названия (docs/migrations/name-key.sql)
+NAME_CONFLICT = "name_key"
+# Генерируемые колонки: в INSERT / UPDATE их передавать нельзя
+GENERATED_COLUMNS = ("name_key",)
+
+
+def name_key(name: str | None) -> str | None:
+    """
+    То же, что product_name_key() в БД: нижний регистр, схлопнутые пробелы.
+    str.split() режет по всем пробельным символам Unicode (NBSP, табуляция) -
+    SQL перечисляет тот же набор явно
+    """
+    return " ".join((name or "").split()).lower() or None
+
+
+def _run_chunks(items: list, chunk_size: int, max_retries: int, controller, call):
+    """
+    call(chunk) по пачкам → (chunk, результат, ошибка).
+
+    Без контроллера - пачки chunk_size и до max_retries попыток с паузой 2с.
+    С контроллером - размер очередной пачки = controller.batch_size, каждый
+    запрос через его слот; пачка, упавшая по перегрузке, дробится до нового
+    (уменьшенного) batch_size, а не повторяется целиком.
+    """
+    pending = deque()
+    position = 0
+
+    while position < len(items) or pending:
+        if pending:
+            chunk, attempt = pending.popleft()
+        else:
+            size = controller.batch_size if controller else chunk_size
+            chunk, attempt = items[position : position + size], 0
+            position += size
+
+        try:
+            if controller is None:
+                result = call(chunk)
+            else:
+                with controller.slot():
+                    result = call(chunk)
+        except Exception as e:
+            if controller and is_overload(e) and len(chunk) > controller.batch_size:
+                size = controller.batch_size
+                pending.extendleft(reversed([
+                    (chunk[i : i + size], attempt) for i in range(0, len(chunk), size)
+                ]))
+            elif attempt < max_retries - 1:
+                time.sleep((controller.pause() if controller else 0) or 2)
+                pending.appendleft((chunk, attempt + 1))
+            else:
+                yield chunk, None, e
+            continue
+
+        yield chunk, result, None
+
+
+def group_updates(updates: dict) -> dict:
+    """{id: patch} → {patch_json: [ids]} (одинаковые патчи склеиваются)"""
+    groups = defaultdict(list)
+    for product_id, patch in updates.items():
+        if not patch:
+            continue
+        groups[json.dumps(patch, ensure_ascii=False, sort_keys=True)].append(product_id)
+    return groups
+
+
+def update_grouped(
+    supabase,
+    updates: dict,
+    table: str = "products",
+    chunk_size: int = CHUNK_SIZE,
+    max_retries: int = 3,
+    controller: AIMDController | None = None,
+) -> dict:
+    """
+    Применяет {id: patch} минимальным числом запросов.
+
+    Возвращает {"updated": N, "failed": N, "requests": N}.
+    """
+    stats = {"updated": 0, "failed": 0, "requests": 0}
+
+    for patch_json, ids in group_updates(updates).items():
+        patch = json.loads(patch_json)
+
+        def call(chunk):
+            return supabase.table(table).update(patch).in_("id", chunk).execute()
+
+        for chunk, _, error in _run_chunks(ids, chunk_size, max_retries, controller, call):
+            if error:
+                print(f"   ❌ Ошибка батча ({len(chunk)} шт.): {str(error)[:80]}")
+                stats["failed"] += len(chunk)
+            else:
+                stats["updated"] += len(chunk)
+                stats["requests"] += 1
+
+    return stats
+
+
+def strip_generated(row: dict) -> dict:
+    """Строка без генерируемых колонок (например, select("*") для повторной вставки)"""
+    return {k: v for k, v in row.items() if k not in GENERATED_COLUMNS}
+
+
+def insert_new(
+    supabase,
+    rows: list,
+    table: str = "products",
+    on_conflict: str = NAME_CONFLICT,
+    chunk_size: int = INSERT_CHUNK_SIZE,
+    max_retries: int = 3,
+    controller: AIMDController | None = None,
+) -> dict:
+    """
+    INSERT ... ON CONFLICT (on_conflict) DO NOTHING по пачкам.
+
+    БД возвращает только вставленные строки, остальные - дубликаты
+    (уже в таблице или повтор внутри той же выгрузки).
+    Возвращает {"inserted": N, "skipped": N, "failed": N, "requests": N}.
+    """
+    stats = {"inserted": 0, "skipped": 0, "failed": 0, "requests": 0}
+
+    def call(chunk):
+        return (
+            supabase.table(table)
+            .upsert(chunk, on_conflict=on_conflict, ignore_duplicates=True)
+            .execute()
+            .data
+        )
+
+    for chunk, inserted, error in _run_chunks(list(rows), chunk_size, max_retries, controller, call):
+        if error:
+            print(f"   ❌ Ошибка вставки ({len(chunk)} шт.): {str(error)[:80]}")
+            stats["failed"] += len(chunk)
+        else:
+            stats["inserted"] += len(inserted or [])
+            stats["skipped"] += len(chunk) - len(inserted or [])
+            stats["requests"] += 1
+
+    return stats
+
+
+def _rpc_chunks(supabase, fn: str, items: list, params, chunk_size, max_retries, controller) -> dict:
+    """RPC fn(params(chunk)) по пачкам; RPC возвращает число затронутых строк"""
+    stats = {"updated": 0, "failed": 0, "requests": 0}
+
+    def call(chunk):
+        return supabase.rpc(fn, params(chunk)).execute().data
+
+    for chunk, affected, error in _run_chunks(items, chunk_size, max_retries, controller, call):
+        if error:
+            print(f"   ❌ Ошибка {fn} ({len(chunk)} шт.): {str(error)[:80]}")
+            stats["failed"] += len(chunk)
+        else:
+            stats["updated"] += affected or 0
+            stats["requests"] += 1
+
+    return stats
+
+
+def merge_specifications(
+    supabase,
+    ids: list,
+    patch: dict,
+    remove: list | None = None,
+    chunk_size: int = MERGE_CHUNK_SIZE,
+    max_retries: int = 3,
+    controller: AIMDController | None = None,
+) -> dict:
+    """specifications || patch - remove для всех ids (один RPC на чанк)"""
+    return _rpc_chunks(
+        supabase,
+        "merge_specifications",
+        list(ids),
+        lambda chunk: {"p_ids": chunk, "p_patch": patch or {}, "p_remove": remove or []},
+        chunk_size,
+        max_retries,
+        controller,
+    )
+
+
+def merge_specifications_bulk(
+    supabase,
+    rows: dict,
+    chunk_size: int = MERGE_CHUNK_SIZE,
+    max_retries: int = 3,
+    controller: AIMDController | None = None,
+) -> dict:
+    """
+    {id: {"fields": {...}, "patch": {...}, "remove": [...]}} одним RPC на чанк.
+
+    fields - manufacturer / model / category_id / image_url, patch и remove - для specifications.
+    """
+    payload = [{"id": product_id, **row} for product_id, row in rows.items() if row]
+    return _rpc_chunks(
+        supabase,
+        "merge_specifications_bulk",
+        payload,
+        lambda chunk: {"p_rows": chunk},
+        chunk_size,
+        max_retries,
+        controller,
+    )
+
+
+class WriteBehindQueue:
+    """
+    Очередь отложенной записи: цикл классификации только кладёт патчи,
+    запись идёт в фоновых потоках.
+
+    - put(id, patch)                    → update(patch).in_("id", [...]) (одинаковые патчи склеиваются)
+    - merge(id, patch, remove, fields)  → RPC merge_specifications_bulk
+    - сброс при max_items патчей или через max_delay_ms после первого патча
+    - до max_workers сбросов выполняются параллельно с чтением
+    - повторный патч того же id до сброса сливается с предыдущим;
+      если id уже пишется, новый сброс ждёт завершения старого
+    - controller=AIMDController(): размер пачек и число запросов в
+      полёте подстраиваются под нагрузку (max_workers - потолок)
+
+    Использование:
+        with WriteBehindQueue(supabase) as queue:
+            for product in products:
+                queue.put(product["id"], {"manufacturer": "DongFeng"})
+        print(queue.stats)
+
+    Без with - обязательно вызвать queue.close() (или flush()) перед выходом.
+    """
+
+    def __init__(
+        self,
+        supabase,
+        table: str = "products",
+        max_items: int = 500,
+        max_delay_ms: int = 500,
+        max_workers: int = 4,
+        chunk_size: int = CHUNK_SIZE,
+        controller: AIMDController | None = None,
+    ):
+        self.supabase = supabase
+        self.controller = controller
+        self.table = table
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000
+        self.chunk_size = chunk_size
+
+        self.stats = {"queued": 0, "updated": 0, "failed": 0, "requests": 0, "flushes": 0}
+
+        self._lock = threading.RLock()
+        self._updates = {}
+        self._merges = {}
+        self._first_put_at = None
+        self._inflight = {}
+        self._futures = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._timer_loop, daemon=True)
+        self._timer.start()
+
+    def put(self, product_id, patch: dict):
+        """Патч простых колонок"""
+        with self._lock:
+            self._updates.setdefault(product_id, {}).update(patch)
+            self._after_put()
+
+    def merge(self, product_id, patch: dict | None = None, remove: list | None = None, fields: dict | None = None):
+        """Патч specifications (|| patch - remove) и колонок manufacturer / model / category_id"""
+        with self._lock:
+            row = self._merges.setdefault(product_id, {"fields": {}, "patch": {}, "remove": []})
+            row["fields"].update(fields or {})
+            row["patch"].update(patch or {})
+            for key_name in remove or []:
+                row["patch"].pop(key_name, None)
+                if key_name not in row["remove"]:
+                    row["remove"].append(key_name)
+            self._after_put()
+
+    def flush(self):
+        """Отправляет всё накопленное и ждёт завершения всех записей"""
+        with self._lock:
+            self._submit_locked()
+            futures = list(self._futures)
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.flush()
+        self._closed.set()
+        self._timer.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _after_put(self):
+        self.stats["queued"] += 1
+        if self._first_put_at is None:
+            self._first_put_at = time.monotonic()
+        if len(self._updates) + len(self._merges) >= self.max_items:
+            self._submit_locked()
+
+    def _timer_loop(self):
+        while not self._closed.wait(self.max_delay / 2):
+            with self._lock:
+                if (
+                    self._first_put_at is not None
+                    and time.monotonic() - self._first_put_at >= self.max_delay
+                ):
+                    self._submit_locked()
+
+    def _submit_locked(self):
+        if not self._updates and not self._merges:
+            return
+
+        updates, merges = self._updates, self._merges
+        self._updates, self._merges = {}, {}
+        self._first_put_at = None
+
+        # Если какой-то id ещё пишется предыдущим сбросом - ждём его,
+        # чтобы порядок патчей одного товара сохранялся
+        ids = set(updates) | set(merges)
+        wait_for = {self._inflight[i] for i in ids if i in self._inflight}
+
+        future = self._executor.submit(self._write, updates, merges, wait_for)
+        self._futures.add(future)
+        for product_id in ids:
+            self._inflight[product_id] = future
+        future.add_done_callback(lambda f, ids=ids: self._done(f, ids))
+        self.stats["flushes"] += 1
+
+    def _done(self, future, ids):
+        with self._lock:
+            self._futures.discard(future)
+            for product_id in ids:
+                if self._inflight.get(product_id) is future:
+                    del self._inflight[product_id]
+
+    def _write(self, updates: dict, merges: dict, wait_for: set):
+        for future in wait_for:
+            future.result()
+
+        results = []
+        if updates:
+            results.append(update_grouped(
+                self.supabase, updates, self.table, self.chunk_size, controller=self.controller
+            ))
+        if merges:
+            rows = {
+                product_id: {k: v for k, v in row.items() if v}
+                for product_id, row in merges.items()
+            }
+            results.append(merge_specifications_bulk(
+                self.supabase, rows, controller=self.controller
+            ))
+
+        with self._lock:
+            for result in results:
+                for stat in ("updated", "failed", "requests"):
+                    self.stats[stat] += result[stat]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+УДАЛЕНИЕ ДУБЛИКАТОВ ПАЧКАМИ (с переносом ссылок)
+
+Скрипты чистки удаляли копии по одной (delete().eq("id", ...)), а
+order_items.product_id - ON DELETE SET NULL: позиции заказов с удалённой
+копией теряли товар. Здесь:
+
+1. {лишняя копия: оставляемый товар} - цепочки схлопываются
+   (A → B, B → C даёт A → C, B → C)
+2. Полные строки копий читаются пачками - обратная операция в журнале
+3. Пачка = один RPC dedupe_products (docs/migrations/dedupe-products.sql):
+   order_items / product_offers переносятся на оставляемый товар, копии
+   удаляются - одной транзакцией
+4. Всё идёт через журнал операций: прерванный запуск продолжается,
+   --rollback возвращает удалённые строки (позиции заказов остаются на
+   оставляемом товаре - это та же деталь)
+
+Откат работает только без уникального индекса idx_products_name_key
+(docs/migrations/name-key.sql): у копии тот же name_key, что у оставленного
+товара, и вставка упадёт. После той миграции откат = DROP INDEX
+idx_products_name_key, --rollback, повторная чистка и CREATE UNIQUE INDEX.
+
+Использование:
+    from dedupe import apply_dedupe
+
+    journal = OperationJournal("cleanup-duplicates.journal.jsonl")
+    stats = apply_dedupe(supabase, {loser_id: survivor_id, ...}, journal, "cleanup-duplicates")
+    stats["rows_per_sec"]
+"""
+
+import time
+
+from op_journal import OperationJournal, batches, make_executor
+
+DEDUPE_BATCH_SIZE = 1000
+FETCH_BATCH_SIZE = 200
+
+
+def resolve_chains(pairs: dict) -> dict:
+    """{loser: survivor} без цепочек и циклов: каждый survivor - не loser"""
+    resolved = {}
+    for loser in pairs:
+        path = [loser]
+        survivor = pairs[loser]
+        while survivor in pairs and survivor not in path:
+            path.append(survivor)
+            survivor = pairs[survivor]
+        if survivor in path:
+            # Цикл A → B → A: остаётся наименьший id цикла
+            survivor = min(path[path.index(survivor) :])
+        if survivor != loser:
+            resolved[loser] = survivor
+    return resolved
+
+
+def fetch_rows(supabase, ids: list, table: str = "products", batch_size: int = FETCH_BATCH_SIZE) -> list:
+    """Полные строки (для отката удаления)"""
+    rows = []
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i : i + batch_size]
+        rows.extend(supabase.table(table).select("*").in_("id", chunk).order("id").execute().data)
+    return rows
+
+
+def dedupe_batches(supabase, pairs: dict, batch_size: int = DEDUPE_BATCH_SIZE) -> list:
+    """Пачки журнала вида dedupe (откат - insert сохранённых строк)"""
+    pairs = resolve_chains(pairs)
+    rows = fetch_rows(supabase, sorted(pairs))
+    forward = [{"loser": row["id"], "survivor": pairs[row["id"]]} for row in rows]
+    return batches("dedupe", forward, rows, batch_size, inverse_kind="insert")
+
+
+def apply_dedupe(
+    supabase,
+    pairs: dict,
+    journal: OperationJournal,
+    job: str,
+    meta: dict | None = None,
+    batch_size: int = DEDUPE_BATCH_SIZE,
+) -> dict:
+    """
+    Переносит ссылки и удаляет копии; summary журнала +
+    order_items / offers (перенесено), seconds, rows_per_sec.
+    rows_applied - удалено по ответу RPC (пары без оставляемого товара
+    функция пропускает), skipped - пропущенные.
+    """
+    started = time.monotonic()
+    plan = dedupe_batches(supabase, pairs, batch_size)
+    journal.start(job, plan, meta)
+
+    moved = {"deleted": 0, "order_items": 0, "offers": 0}
+    execute = make_executor(supabase)
+
+    def executor(kind, payload):
+        result = execute(kind, payload)
+        for key in moved:
+            moved[key] += (result or {}).get(key) or 0
+        return result
+
+    applied_at = time.monotonic()
+    summary = journal.run(executor)
+    finished = time.monotonic()
+
+    deleted = moved.pop("deleted")
+    summary["skipped"] = summary["rows_applied"] - deleted
+    summary["rows_applied"] = deleted
+    summary.update(moved)
+    summary["seconds"] = round(finished - started, 2)
+    summary["rows_per_sec"] = round(summary["rows_applied"] / max(finished - applied_at, 1e-6))
+    print(
+        f"⚡ Удалено {summary['rows_applied']} копий за {summary['seconds']}с "
+        f"({summary['rows_per_sec']} строк/с), перенесено позиций заказов: "
+        f"{summary['order_items']}, предложений: {summary['offers']}"
+        + (f"; пропущено (оставляемого товара нет): {summary['skipped']}" if summary["skipped"] else "")
+    )
+    return summary
@@ -2,6 +2,9 @@
 """
 УДАЛЕНИЕ ВСЕХ ДУБЛИКАТОВ ИЗ БД
 ОСТАВЛЯЕМ ТОЛЬКО 1 КОПИЮ (с минимальным ID)
+
+После docs/migrations/name-key.sql точных дубликатов в БД не появляется
+(уникальный name_key); разовая чистка перед миграцией - cleanup-all-duplicates.py
 """
 
 import os
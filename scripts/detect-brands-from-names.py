@@ -8,6 +8,9 @@ import json
 import re
 from supabase import Client, create_client
 
+from db_batch import update_grouped
+from title_index import TitleIndex
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
@@ -50,6 +53,11 @@ print("=" * 80)
 print("🔍 ОПРЕДЕЛЕНИЕ БРЕНДОВ ИЗ НАЗВАНИЙ")
 print("=" * 80 + "\n")
 
+# Один проход по таблице вместо ilike-запроса на каждый товар
+print("📥 Загрузка индекса названий...")
+index = TitleIndex.load(supabase)
+print(f"✅ Товаров в индексе: {len(index)}\n")
+
 # Файлы с универсальными запчастями где brand = "Неизвестно"
 UNIVERSAL_FILES = [
     "../parsed_data/zip-agro/zip-agro-filters.json",
@@ -58,6 +66,7 @@ UNIVERSAL_FILES = [
     "../parsed_data/zip-agro/zip-agro-kpp-parts.json",
 ]
 
+updates = {}
 total_updated = 0
 total_detected = 0
 total_not_detected = 0
@@ -90,30 +99,29 @@ for file_path in UNIVERSAL_FILES:
             not_detected += 1
             continue
 
-        # Ищем товар в БД
-        title_search = title[:40].strip()
-        result = supabase.table("products").select("id, name").ilike("name", f"{title_search}%").limit(1).execute()
+        # Ищем товар в локальном индексе
+        product = index.match(title)
 
-        if not result.data:
+        if not product:
             continue
 
-        product_id = result.data[0]["id"]
-
-        # Обновляем manufacturer
-        try:
-            supabase.table("products").update({"manufacturer": detected_brand}).eq("id", product_id).execute()
-            updated += 1
-        except Exception as e:
-            pass
+        updates[product["id"]] = {"manufacturer": detected_brand}
+        updated += 1
 
     print(f"   ✅ Обнаружен бренд: {detected}")
     print(f"   ⚠️  Бренд не обнаружен: {not_detected}")
-    print(f"   💾 Обновлено в БД: {updated}\n")
+    print(f"   💾 К обновлению: {updated}\n")
 
     total_detected += detected
     total_not_detected += not_detected
     total_updated += updated
 
+# Пишем все обновления сгруппированными по бренду запросами
+print(f"💾 Запись {len(updates)} товаров пакетами...")
+stats = update_grouped(supabase, updates)
+total_updated = stats["updated"]
+print(f"   ✅ Записано за {stats['requests']} запросов, ошибок: {stats['failed']}\n")
+
 print("=" * 80)
 print(f"📊 ИТОГО:")
 print(f"   Обнаружен бренд: {total_detected}")
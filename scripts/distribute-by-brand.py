@@ -7,6 +7,8 @@ import os
 from supabase import Client, create_client
 from multiprocessing import Pool, cpu_count
 
+from db_batch import merge_specifications
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -20,77 +22,65 @@ BRAND_TO_CATEGORY = {
     "Scout": "parts-mototractors",
 }
 
-def process_batch(batch_num: int):
-    """Обрабатывает один батч товаров"""
-    supabase = create_client(url, key)
-
-    offset = batch_num * 500
-
-    # Получаем товары из parts-minitractors
-    result = supabase.table("products") \
-        .select("id, name, manufacturer, specifications") \
-        .range(offset, offset + 499) \
-        .execute()
-
-    if not result.data:
-        return {"batch": batch_num, "updated": 0, "skipped": 0}
+def process_brand(manufacturer: str):
+    """
+    Переносит товары одного производителя из parts-minitractors.
 
-    updated = 0
-    skipped = 0
-
-    for product in result.data:
-        specs = product.get("specifications") or {}
-        current_cat = specs.get("category", "")
-        manufacturer = product.get("manufacturer", "")
+    Фильтр на стороне БД: читаются только товары, которые ещё нужно
+    перенести, - повторный запуск работает с дельтой, а не со всем каталогом.
+    """
+    supabase = create_client(url, key)
+    new_category = BRAND_TO_CATEGORY[manufacturer]
 
-        # Обрабатываем только товары из parts-minitractors
-        if current_cat != "parts-minitractors":
-            skipped += 1
-            continue
+    ids = []
+    last_id = 0
+    while True:
+        result = supabase.table("products") \
+            .select("id") \
+            .eq("manufacturer", manufacturer) \
+            .eq("specifications->>category", "parts-minitractors") \
+            .gt("id", last_id) \
+            .order("id") \
+            .limit(1000) \
+            .execute()
 
-        # Определяем новую категорию по бренду
-        new_category = BRAND_TO_CATEGORY.get(manufacturer)
+        if not result.data:
+            break
 
-        if not new_category:
-            skipped += 1
-            continue
+        ids.extend(p["id"] for p in result.data)
+        last_id = result.data[-1]["id"]
 
-        # Обновляем категорию
-        specs["category"] = new_category
+        if len(result.data) < 1000:
+            break
 
-        try:
-            supabase.table("products") \
-                .update({"specifications": specs}) \
-                .eq("id", product["id"]) \
-                .execute()
-            updated += 1
-        except Exception as e:
-            skipped += 1
+    # specifications || {"category": ...} на стороне БД
+    stats = merge_specifications(supabase, ids, {"category": new_category})
 
-    return {"batch": batch_num, "updated": updated, "skipped": skipped}
+    return {"manufacturer": manufacturer, "updated": stats["updated"], "skipped": stats["failed"]}
 
 if __name__ == "__main__":
     print("=" * 80)
     print("🔄 РАСПРЕДЕЛЕНИЕ ТОВАРОВ ПО БРЕНДОВЫМ КАТЕГОРИЯМ")
     print("=" * 80 + "\n")
 
-    # Получаем общее количество товаров
     supabase = create_client(url, key)
-    count_result = supabase.table("products").select("id", count="exact").execute()
-    total_products = count_result.count
 
-    print(f"📦 Всего товаров: {total_products}")
+    # Сколько осталось перенести (без чтения каталога)
+    pending = supabase.table("products") \
+        .select("id", count="exact") \
+        .eq("specifications->>category", "parts-minitractors") \
+        .in_("manufacturer", list(BRAND_TO_CATEGORY)) \
+        .limit(1) \
+        .execute()
 
-    # Определяем количество батчей
-    batch_size = 500
-    num_batches = (total_products // batch_size) + 1
+    print(f"📦 Ожидают переноса: {pending.count or 0}")
 
-    print(f"📊 Количество батчей: {num_batches}")
-    print(f"💻 Используем {min(12, cpu_count())} процессоров\n")
+    processes = min(len(BRAND_TO_CATEGORY), cpu_count())
+    print(f"💻 Используем {processes} процессоров (по производителю)\n")
 
     # Параллельная обработка
-    with Pool(processes=min(12, cpu_count())) as pool:
-        results = pool.map(process_batch, range(num_batches))
+    with Pool(processes=processes) as pool:
+        results = pool.map(process_brand, list(BRAND_TO_CATEGORY))
 
     # Подсчет результатов
     total_updated = sum(r["updated"] for r in results)
@@ -99,8 +89,10 @@ if __name__ == "__main__":
     print("\n" + "=" * 80)
     print("📊 РЕЗУЛЬТАТЫ:")
     print("=" * 80)
+    for r in results:
+        print(f"   {r['manufacturer']:<12} {r['updated']:>6}")
     print(f"✅ Перемещено: {total_updated:>6} товаров")
-    print(f"⏭️  Пропущено:  {total_skipped:>6} товаров")
+    print(f"⏭️  Ошибок:     {total_skipped:>6} товаров")
     print("=" * 80)
 
     # Статистика по категориям
@@ -116,30 +108,13 @@ if __name__ == "__main__":
     ]
 
     for cat_slug in brand_categories:
-        offset = 0
-        count = 0
-
-        while offset < total_products:
-            result = supabase.table("products") \
-                .select("id") \
-                .range(offset, offset + 999) \
-                .execute()
-
-            if not result.data:
-                break
-
-            for p in result.data:
-                full = supabase.table("products").select("specifications").eq("id", p["id"]).execute()
-                if full.data:
-                    specs = full.data[0].get("specifications") or {}
-                    if specs.get("category") == cat_slug:
-                        count += 1
-
-            offset += 1000
-
-            if len(result.data) < 1000:
-                break
-
-        print(f"{cat_slug:45} {count:>6}")
+        # Фильтр по ключу JSONB на стороне БД - один запрос на категорию
+        result = supabase.table("products") \
+            .select("id", count="exact") \
+            .eq("specifications->>category", cat_slug) \
+            .limit(1) \
+            .execute()
+
+        print(f"{cat_slug:45} {result.count or 0:>6}")
 
     print("\n" + "=" * 80)
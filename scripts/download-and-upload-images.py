@@ -1,127 +1,114 @@
 #!/usr/bin/env python3
 """
 Скачивает внешние картинки и загружает в Supabase Storage
+
+Через image_mirror.py: параллельное потоковое скачивание, путь в Storage -
+SHA-256 содержимого (одинаковые картинки хранятся один раз), манифест
+mirror-images.manifest.jsonl - повторный запуск продолжает с места
+остановки. image_url товаров пишутся в конце пачками через журнал
+операций (mirror-images.journal.jsonl).
+
+Перцептивный индекс (таблица image_hashes, build-image-hashes.py): URL с
+уже залитым содержимым не скачиваются, заглушки источников не заливаются,
+почти одинаковые копии получают путь уже залитой картинки. Хеши новых
+картинок дописываются в image_hashes.
+
+Требуется image_url в merge_specifications_bulk
+(docs/migrations/merge-specifications.sql) и таблица image_hashes
+(docs/migrations/image-hashes.sql).
+
+Использование:
+    python3 download-and-upload-images.py             # все внешние картинки
+    python3 download-and-upload-images.py zip-agro    # только URL с подстрокой
+    python3 download-and-upload-images.py --rollback  # вернуть старые URL
 """
 
-import hashlib
+import asyncio
 import os
-import time
-from pathlib import Path
+import sys
 
-import requests
 from supabase import create_client
 
-url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+from async_db import AsyncSupabase
+from image_hashes import ImageIndex
+from image_mirror import ImageMirror, MirrorManifest, image_url_batches
+from op_journal import OperationJournal, journal_cli, make_executor
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-supabase = create_client(url, key)
 
-# Создаем папку для временного хранения
-TEMP_DIR = Path("temp_images")
-TEMP_DIR.mkdir(exist_ok=True)
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
 
-BUCKET_NAME = "product-images"
+supabase = create_client(url, key)
 
-print("🖼️ Скачивание и загрузка картинок в Supabase Storage")
-print("=" * 60)
-
-# Получаем товары с внешними картинками
-print("\n📦 Загружаем товары с внешними картинками...")
-products = (
-    supabase.table("products")
-    .select("id,name,image_url")
-    .or_("image_url.ilike.%zip-agro%,image_url.ilike.%tata-agro%")
-    .execute()
-)
-
-print(f"✓ Найдено {len(products.data)} товаров")
-print(f"\n🚀 Начинаем обработку...\n")
-
-success_count = 0
-error_count = 0
-skip_count = 0
-
-for i, product in enumerate(products.data, 1):
-    product_id = product["id"]
-    old_url = product["image_url"]
-
-    if not old_url or old_url.startswith("http") == False:
-        skip_count += 1
-        continue
-
-    try:
-        # Скачиваем картинку
-        response = requests.get(
-            old_url,
-            timeout=10,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            },
-        )
-
-        if response.status_code != 200:
-            print(f"  ❌ ID {product_id}: HTTP {response.status_code}")
-            error_count += 1
-            continue
-
-        # Определяем расширение
-        content_type = response.headers.get("Content-Type", "")
-        if "jpeg" in content_type or "jpg" in content_type:
-            ext = "jpg"
-        elif "png" in content_type:
-            ext = "png"
-        elif "webp" in content_type:
-            ext = "webp"
-        else:
-            ext = old_url.split(".")[-1].split("?")[0].lower()
-            if ext not in ["jpg", "jpeg", "png", "webp", "gif"]:
-                ext = "jpg"
-
-        # Создаем уникальное имя файла
-        filename = f"{product_id}.{ext}"
-        file_path = TEMP_DIR / filename
-
-        # Сохраняем временно
-        with open(file_path, "wb") as f:
-            f.write(response.content)
-
-        # Загружаем в Supabase Storage
-        with open(file_path, "rb") as f:
-            storage_path = f"products/{filename}"
-            supabase.storage.from_(BUCKET_NAME).upload(
-                storage_path, f.read(), file_options={"content-type": f"image/{ext}"}
-            )
-
-        # Получаем публичный URL
-        public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(storage_path)
-
-        # Обновляем в базе
-        supabase.table("products").update({"image_url": public_url}).eq(
-            "id", product_id
-        ).execute()
-
-        # Удаляем временный файл
-        file_path.unlink()
-
-        success_count += 1
-        if i % 10 == 0:
-            print(
-                f"  ✓ Обработано {i}/{len(products.data)} (успешно: {success_count}, ошибок: {error_count})"
-            )
-
-        # Небольшая задержка чтобы не перегружать серверы
-        time.sleep(0.1)
-
-    except Exception as e:
-        print(f"  ❌ ID {product_id}: {str(e)[:50]}")
-        error_count += 1
-        continue
-
-print(f"\n{'=' * 60}")
-print(f"✅ Успешно: {success_count}")
-print(f"❌ Ошибок: {error_count}")
-print(f"⏭️  Пропущено: {skip_count}")
-print(f"\n💾 Временные файлы удалены")
-
-# Удаляем временную папку если пуста
-if not list(TEMP_DIR.iterdir()):
-    TEMP_DIR.rmdir()
+BUCKET_NAME = "product-images"
+MANIFEST_PATH = "mirror-images.manifest.jsonl"
+JOURNAL_PATH = "mirror-images.journal.jsonl"
+
+
+async def mirror_images(sources: list) -> tuple:
+    """Товары с внешними картинками и результат зеркалирования их URL"""
+    manifest = MirrorManifest(MANIFEST_PATH)
+    index = ImageIndex.load(supabase)
+    print(f"✓ Перцептивный индекс: {len(index)} картинок")
+
+    async with AsyncSupabase(url, key) as db:
+        products = await db.select_all("products", "id, image_url", {"image_url": "like.http*"})
+
+    async with ImageMirror(url, key, bucket=BUCKET_NAME, manifest=manifest, index=index) as mirror:
+        products = [
+            p for p in products
+            if not mirror.is_mirrored(p["image_url"])
+            and (not sources or any(s in p["image_url"] for s in sources))
+        ]
+        urls = {p["image_url"] for p in products}
+        print(f"✓ Найдено {len(products)} товаров, {len(urls)} разных URL")
+        print("\n🚀 Начинаем обработку...\n")
+
+        results = await mirror.mirror_all(urls)
+
+    if mirror.hashed:
+        async with AsyncSupabase(url, key) as db:
+            await db.upsert("image_hashes", mirror.hashed, on_conflict="image_url")
+    return products, results, mirror.stats
+
+
+def main():
+    print("🖼️ Скачивание и загрузка картинок в Supabase Storage")
+    print("=" * 60)
+
+    journal = OperationJournal(JOURNAL_PATH)
+    if journal_cli(journal, make_executor(supabase), sys.argv[1:]):
+        return
+
+    print("\n📦 Загружаем товары с внешними картинками...")
+    sources = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    products, results, stats = asyncio.run(mirror_images(sources))
+
+    changes = {
+        p["id"]: (p["image_url"], results[p["image_url"]].get("public_url"))
+        for p in products
+    }
+    plan = image_url_batches(changes)
+
+    print(f"\n{'=' * 60}")
+    print(f"✅ Скачано: {stats['downloaded']} ({stats['bytes'] / 1024 / 1024:.1f} МБ)")
+    print(f"📤 Залито в Storage: {stats['uploaded']}")
+    print(f"♻️  Уже в Storage (одинаковое содержимое / прошлый запуск): {stats['deduped'] + stats['resumed']}")
+    print(f"🔎 По перцептивному индексу: не скачано {stats['known']}, почти одинаковых {stats['near']}, заглушек {stats['placeholders']}")
+    print(f"❌ Ошибок: {stats['failed']} (повторятся при следующем запуске)")
+
+    if not plan:
+        print("\n✨ Нечего обновлять в БД")
+        return
+
+    print(f"\n💾 Обновляем image_url ({sum(len(b['forward']) for b in plan)} товаров, журнал: {JOURNAL_PATH})...")
+    journal.start("mirror-images", plan, {"bucket": BUCKET_NAME, "sources": sources})
+    summary = journal.run(make_executor(supabase))
+    print(f"✅ Обновлено товаров: {summary['rows_applied']}, ошибок: {summary['rows_failed']}")
+
+
+if __name__ == "__main__":
+    main()
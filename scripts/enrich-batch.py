@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 """
 Batch enrichment - обрабатываем товары батчами для ускорения
+
+Товары сопоставляются с parsed_data локально через TitleIndex (один проход
+по таблице вместо ilike-запроса на каждый товар), обновления пишутся в конце
+через RPC merge_specifications_bulk: specifications мержатся на стороне БД,
+один запрос на 500 товаров.
 """
 
 import os
 import json
-import time
 from supabase import Client, create_client
 
+from aimd import AIMDController
+from db_batch import merge_specifications_bulk
+from title_index import TitleIndex
+
 # Supabase setup
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
@@ -193,8 +201,8 @@ FILE_METADATA_MAPPING = {
 }
 
 
-def enrich_file_batch(file_path: str, metadata: dict):
-    """Обрабатывает файл батчами по 50 товаров"""
+def enrich_file_batch(file_path: str, metadata: dict, index: TitleIndex, updates: dict):
+    """Сопоставляет товары файла с БД локально и копит обновления в updates"""
 
     if not os.path.exists(file_path):
         print(f"⚠️  Файл не найден: {file_path}")
@@ -210,75 +218,52 @@ def enrich_file_batch(file_path: str, metadata: dict):
 
     updated = 0
     skipped = 0
-    batch_size = 50
-
-    for i in range(0, len(products_data), batch_size):
-        batch = products_data[i:i+batch_size]
-
-        for product_data in batch:
-            title = product_data.get("title", "")
-            brand_from_json = product_data.get("brand", "")
-
-            if not title:
-                continue
-
-            # Поиск в БД
-            try:
-                title_search = title[:40].strip()
-                result = supabase.table("products").select("id, specifications").ilike("name", f"{title_search}%").limit(1).execute()
-
-                if not result.data:
-                    skipped += 1
-                    continue
-
-                product = result.data[0]
-
-                # Формируем обновление
-                update_data = {}
-
-                # Бренд
-                if brand_from_json and brand_from_json not in ["Неизвестно", "Unknown", ""]:
-                    update_data["manufacturer"] = brand_from_json
-                elif "manufacturer" in metadata:
-                    update_data["manufacturer"] = metadata["manufacturer"]
-
-                # Model
-                if "model" in metadata:
-                    update_data["model"] = metadata["model"]
-
-                # Specifications
-                current_specs = product.get("specifications") or {}
-                new_specs = {**current_specs}
-
-                if "part_type" in metadata:
-                    new_specs["part_type"] = metadata["part_type"]
-                if "engine_model" in metadata:
-                    new_specs["engine_model"] = metadata["engine_model"]
-                if "category" in metadata:
-                    new_specs["category"] = metadata["category"]
-                if brand_from_json:
-                    new_specs["brand"] = brand_from_json
-
-                update_data["specifications"] = new_specs
-
-                # Обновляем
-                if update_data:
-                    supabase.table("products").update(update_data).eq("id", product["id"]).execute()
-                    updated += 1
-
-            except Exception as e:
-                print(f"   ⚠️  Ошибка: {str(e)[:50]}")
-                skipped += 1
-
-        # Пауза между батчами
-        if i + batch_size < len(products_data):
-            time.sleep(0.5)
-
-        # Прогресс
-        progress = min(i + batch_size, len(products_data))
-        print(f"   Прогресс: {progress}/{len(products_data)} | Обновлено: {updated} | Пропущено: {skipped}")
-
-    print(f"   ✅ Итого: {updated} обновлено, {skipped} пропущено")
+    ambiguous = 0
+
+    for product_data in products_data:
+        title = product_data.get("title", "")
+        brand_from_json = product_data.get("brand", "")
+
+        if not title:
+            continue
+
+        # Поиск в локальном индексе
+        product, status = index.resolve(title)
+
+        if not product:
+            skipped += 1
+            if status == "ambiguous":
+                ambiguous += 1
+            continue
+
+        # Формируем обновление поверх уже накопленного для этого товара:
+        # fields - простые колонки, patch - ключи для specifications || patch
+        row = updates.setdefault(product["id"], {"fields": {}, "patch": {}})
+        fields, patch = row["fields"], row["patch"]
+
+        # Бренд
+        if brand_from_json and brand_from_json not in ["Неизвестно", "Unknown", ""]:
+            fields["manufacturer"] = brand_from_json
+        elif "manufacturer" in metadata:
+            fields["manufacturer"] = metadata["manufacturer"]
+
+        # Model
+        if "model" in metadata:
+            fields["model"] = metadata["model"]
+
+        # Specifications (слияние с текущими - на стороне БД)
+        if "part_type" in metadata:
+            patch["part_type"] = metadata["part_type"]
+        if "engine_model" in metadata:
+            patch["engine_model"] = metadata["engine_model"]
+        if "category" in metadata:
+            patch["category"] = metadata["category"]
+        if brand_from_json:
+            patch["brand"] = brand_from_json
+
+        updated += 1
+
+    print(f"   ✅ Сопоставлено: {updated}, пропущено: {skipped} (неоднозначных: {ambiguous})")
     return updated, skipped
 
 
@@ -287,14 +272,25 @@ def main():
     print("🔄 BATCH ENRICHMENT")
     print("=" * 80 + "\n")
 
+    print("📥 Загрузка индекса названий...")
+    index = TitleIndex.load(supabase)
+    print(f"✅ Товаров в индексе: {len(index)}")
+
     total_updated = 0
     total_skipped = 0
+    updates = {}
 
     for file_path, metadata in FILE_METADATA_MAPPING.items():
-        updated, skipped = enrich_file_batch(file_path, metadata)
+        updated, skipped = enrich_file_batch(file_path, metadata, index, updates)
         total_updated += updated
         total_skipped += skipped
 
+    print(f"\n💾 Запись {len(updates)} товаров пакетами...")
+    controller = AIMDController(initial_batch=200, max_batch=2000, batch_step=100)
+    stats = merge_specifications_bulk(supabase, updates, controller=controller)
+    print(f"   ✅ Обновлено: {stats['updated']} за {stats['requests']} запросов, ошибок: {stats['failed']}")
+    print(f"   📈 {controller.summary()}")
+
     print("\n" + "=" * 80)
     print(f"📊 ИТОГО: {total_updated} обновлено, {total_skipped} пропущено")
     print("=" * 80)
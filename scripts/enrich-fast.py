@@ -7,6 +7,8 @@ import os
 import json
 from supabase import Client, create_client
 
+from db_batch import merge_specifications_bulk
+
 # Supabase
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
@@ -23,7 +25,7 @@ offset = 0
 batch_size = 1000
 
 while True:
-    result = supabase.table("products").select("id, name, manufacturer, model, specifications").range(offset, offset + batch_size - 1).execute()
+    result = supabase.table("products").select("id, name").range(offset, offset + batch_size - 1).execute()
 
     if not result.data:
         break
@@ -67,7 +69,7 @@ JSON_FILES = [
 ]
 
 # Будем собирать все обновления
-updates = []
+updates = {}
 
 for filename, metadata in JSON_FILES:
     # Находим файл
@@ -110,50 +112,37 @@ for filename, metadata in JSON_FILES:
         found += 1
 
         # Формируем обновление
-        update_data = {"id": product["id"]}
+        # fields - простые колонки, patch - ключи для specifications || patch
+        row = updates.setdefault(product["id"], {"fields": {}, "patch": {}})
+        fields, patch = row["fields"], row["patch"]
 
         # Бренд
         if brand and brand not in ["Неизвестно", "Unknown", ""]:
-            update_data["manufacturer"] = brand
+            fields["manufacturer"] = brand
 
         # Model
         if "model" in metadata:
-            update_data["model"] = metadata["model"]
-
-        # Specifications
-        current_specs = product.get("specifications") or {}
-        new_specs = {**current_specs}
+            fields["model"] = metadata["model"]
 
+        # Specifications (слияние с текущими - на стороне БД)
         if "part_type" in metadata:
-            new_specs["part_type"] = metadata["part_type"]
+            patch["part_type"] = metadata["part_type"]
         if "engine_model" in metadata:
-            new_specs["engine_model"] = metadata["engine_model"]
+            patch["engine_model"] = metadata["engine_model"]
         if "category" in metadata:
-            new_specs["category"] = metadata["category"]
+            patch["category"] = metadata["category"]
         if brand:
-            new_specs["brand"] = brand
-
-        update_data["specifications"] = new_specs
-
-        updates.append(update_data)
+            patch["brand"] = brand
 
     print(f"   ✅ Найдено: {found} | Не найдено: {not_found}")
 
 print(f"\n📊 Всего обновлений: {len(updates)}")
 
-# Шаг 3: Применяем обновления батчами
+# Шаг 3: Применяем обновления - один RPC merge_specifications_bulk на 500 товаров
 print("\n💾 Применение обновлений...")
 
-batch_size = 100
-for i in range(0, len(updates), batch_size):
-    batch = updates[i:i+batch_size]
-
-    for update in batch:
-        product_id = update.pop("id")
-        supabase.table("products").update(update).eq("id", product_id).execute()
-
-    progress = min(i + batch_size, len(updates))
-    print(f"   Прогресс: {progress}/{len(updates)}")
+stats = merge_specifications_bulk(supabase, updates)
+print(f"   Обновлено: {stats['updated']} за {stats['requests']} запросов, ошибок: {stats['failed']}")
 
 print("\n✅ Готово!")
 print("=" * 80)
@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 """
-FINAL ENRICHMENT - с паузами, retry и прогрессом
+FINAL ENRICHMENT - с retry и слиянием specifications на стороне БД
 """
 
 import os
 import json
-import time
 from supabase import Client, create_client
 
+from db_batch import merge_specifications_bulk
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
@@ -23,7 +24,7 @@ offset = 0
 batch_size = 1000
 
 while True:
-    result = supabase.table("products").select("id, name, manufacturer, model, specifications").range(offset, offset + batch_size - 1).execute()
+    result = supabase.table("products").select("id, name").range(offset, offset + batch_size - 1).execute()
 
     if not result.data:
         break
@@ -92,7 +93,7 @@ JSON_FILES = [
 ]
 
 # Собираем обновления
-updates = []
+updates = {}
 
 for filename, metadata in JSON_FILES:
     file_path = None
@@ -128,67 +129,39 @@ for filename, metadata in JSON_FILES:
         product = matches[0]
         found += 1
 
-        update_data = {"id": product["id"]}
+        # fields - простые колонки, patch - ключи для specifications || patch
+        row = updates.setdefault(product["id"], {"fields": {}, "patch": {}})
+        fields, patch = row["fields"], row["patch"]
 
         # Бренд
         if brand and brand not in ["Неизвестно", "Unknown", ""]:
-            update_data["manufacturer"] = brand
+            fields["manufacturer"] = brand
 
         # Model
         if "model" in metadata:
-            update_data["model"] = metadata["model"]
-
-        # Specifications
-        current_specs = product.get("specifications") or {}
-        new_specs = {**current_specs}
+            fields["model"] = metadata["model"]
 
+        # Specifications (слияние с текущими - на стороне БД)
         if "part_type" in metadata:
-            new_specs["part_type"] = metadata["part_type"]
+            patch["part_type"] = metadata["part_type"]
         if "engine_model" in metadata:
-            new_specs["engine_model"] = metadata["engine_model"]
+            patch["engine_model"] = metadata["engine_model"]
         if "category" in metadata:
-            new_specs["category"] = metadata["category"]
+            patch["category"] = metadata["category"]
         if brand:
-            new_specs["brand"] = brand
-
-        update_data["specifications"] = new_specs
-
-        updates.append(update_data)
+            patch["brand"] = brand
 
     print(f"   ✅ Найдено: {found}")
 
 print(f"\n📊 Всего обновлений: {len(updates)}\n")
 
-# Применяем обновления с ПАУЗАМИ
+# Применяем обновления - один RPC merge_specifications_bulk на 500 товаров
+# (retry внутри db_batch)
 print("💾 Применение обновлений...")
 
-batch_size = 50  # Маленькие батчи
-success_count = 0
-error_count = 0
-
-for i in range(0, len(updates), batch_size):
-    batch = updates[i:i+batch_size]
-
-    for update in batch:
-        product_id = update.pop("id")
-
-        # Retry логика
-        for attempt in range(3):
-            try:
-                supabase.table("products").update(update).eq("id", product_id).execute()
-                success_count += 1
-                break
-            except Exception as e:
-                if attempt < 2:
-                    time.sleep(2)
-                else:
-                    error_count += 1
-
-    progress = min(i + batch_size, len(updates))
-    print(f"   Прогресс: {progress}/{len(updates)} | Успешно: {success_count} | Ошибок: {error_count}")
-
-    # Пауза между батчами
-    time.sleep(1)
+stats = merge_specifications_bulk(supabase, updates)
+success_count = stats["updated"]
+error_count = stats["failed"]
 
 print(f"\n✅ Готово! Обновлено: {success_count}, Ошибок: {error_count}")
 print("=" * 80)
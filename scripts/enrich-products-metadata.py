@@ -8,9 +8,11 @@
 import os
 import json
 import re
-import time
 from supabase import Client, create_client
 
+from db_batch import merge_specifications_bulk
+from title_index import TitleIndex
+
 # Supabase setup
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
@@ -223,8 +225,8 @@ FILE_METADATA_MAPPING = {
 }
 
 
-def enrich_file(file_path: str, metadata: dict):
-    """Обогащает метаданные товаров из файла"""
+def enrich_file(file_path: str, metadata: dict, index: TitleIndex, updates: dict):
+    """Обогащает метаданные товаров из файла (обновления копятся в updates)"""
 
     if not os.path.exists(file_path):
         print(f"⚠️  Файл не найден: {file_path}")
@@ -243,76 +245,58 @@ def enrich_file(file_path: str, metadata: dict):
 
     updated = 0
     skipped = 0
+    ambiguous = 0
 
     # Обрабатываем каждый товар
     for product_data in products_data:
         title = product_data.get("title", "")
-        url = product_data.get("url", "")
         # ВАЖНО: Берем бренд из JSON файла, а не из метаданных!
         brand_from_json = product_data.get("brand", "")
 
         if not title:
             continue
 
-        # Ищем товар в БД по названию (первые 40 символов для точности)
-        title_search = title[:40].strip()
-        result = supabase.table("products").select("id, name, manufacturer, model, specifications").ilike("name", f"{title_search}%").limit(1).execute()
+        # Ищем товар в локальном индексе (exact, затем префикс 40 символов)
+        product, status = index.resolve(title)
 
-        if not result.data or len(result.data) == 0:
+        if not product:
             skipped += 1
+            if status == "ambiguous":
+                ambiguous += 1
             continue
 
-        product = result.data[0]
-
-        # Формируем обновления
-        update_data = {}
+        # Формируем обновления поверх уже накопленных для этого товара:
+        # fields - простые колонки, patch - ключи для specifications || patch
+        row = updates.setdefault(product["id"], {"fields": {}, "patch": {}})
+        fields, patch = row["fields"], row["patch"]
 
         # ПРИОРИТЕТ: Сначала берем бренд из JSON файла, потом из метаданных
         if brand_from_json and brand_from_json not in ["Неизвестно", "Unknown", ""]:
-            update_data["manufacturer"] = brand_from_json
+            fields["manufacturer"] = brand_from_json
         elif "manufacturer" in metadata and metadata["manufacturer"]:
-            update_data["manufacturer"] = metadata["manufacturer"]
+            fields["manufacturer"] = metadata["manufacturer"]
 
         # Обновляем model если указан в метаданных
         if "model" in metadata and metadata["model"]:
-            update_data["model"] = metadata["model"]
-
-        # Обновляем specifications
-        current_specs = product.get("specifications") or {}
-        new_specs = {**current_specs}
+            fields["model"] = metadata["model"]
 
+        # Обновляем specifications (слияние с текущими - на стороне БД)
         if "part_type" in metadata:
-            new_specs["part_type"] = metadata["part_type"]
+            patch["part_type"] = metadata["part_type"]
 
         if "engine_model" in metadata:
-            new_specs["engine_model"] = metadata["engine_model"]
+            patch["engine_model"] = metadata["engine_model"]
 
         if "category" in metadata:
-            new_specs["category"] = metadata["category"]
+            patch["category"] = metadata["category"]
 
         # Добавляем бренд и в specifications для удобства фильтрации
         if brand_from_json and brand_from_json not in ["Неизвестно", "Unknown", ""]:
-            new_specs["brand"] = brand_from_json
-
-        update_data["specifications"] = new_specs
-
-        # Обновляем товар с retry логикой
-        if update_data:
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    supabase.table("products").update(update_data).eq("id", product["id"]).execute()
-                    updated += 1
-                    break
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        print(f"   ⚠️  Ошибка при обновлении, попытка {attempt + 1}/{max_retries}...")
-                        time.sleep(2)
-                    else:
-                        print(f"   ❌ Не удалось обновить товар: {title[:40]}")
-                        skipped += 1
-
-    print(f"   ✅ Обновлено: {updated} | Пропущено: {skipped}")
+            patch["brand"] = brand_from_json
+
+        updated += 1
+
+    print(f"   ✅ Сопоставлено: {updated} | Пропущено: {skipped} (неоднозначных: {ambiguous})")
     return updated, skipped
 
 
@@ -323,15 +307,25 @@ def main():
     print("=" * 80 + "\n")
     print("ℹ️  Товары остаются в одной куче, обновляются только метаданные!\n")
 
+    # Один проход по таблице вместо запроса на каждый товар
+    print("📥 Загрузка индекса названий...")
+    index = TitleIndex.load(supabase)
+    print(f"✅ Товаров в индексе: {len(index)}")
+
     # Обрабатываем каждый файл
     total_updated = 0
     total_skipped = 0
+    updates = {}
 
     for file_path, metadata in FILE_METADATA_MAPPING.items():
-        updated, skipped = enrich_file(file_path, metadata)
+        updated, skipped = enrich_file(file_path, metadata, index, updates)
         total_updated += updated
         total_skipped += skipped
 
+    print(f"\n💾 Запись {len(updates)} товаров пакетами...")
+    stats = merge_specifications_bulk(supabase, updates)
+    print(f"   ✅ Записано: {stats['updated']} за {stats['requests']} запросов, ошибок: {stats['failed']}")
+
     print("\n" + "=" * 80)
     print("📊 ИТОГОВАЯ СТАТИСТИКА")
     print("=" * 80)
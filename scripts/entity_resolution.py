@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+СОПОСТАВЛЕНИЕ ТОВАРОВ МЕЖДУ ИСТОЧНИКАМИ (entity resolution)
+
+Одна и та же деталь приходит из parsed_data/tata-agro, zip-agro и
+agrodom отдельными товарами - каталог несёт по 2-3 копии популярных
+запчастей. Здесь предложения (offer = запись одного источника) сводятся
+к одному каноническому товару со списком предложений (цена, наличие,
+ссылка каждого источника).
+
+1. Блокировка - сравниваются только предложения с общим ключом блока:
+     a:<артикул>        заводской артикул (DF200.50.014A, FT250.37.183),
+                        из поля article или из названия
+     m:<модель>:<слово> токен модели (model_tokens) + первое слово названия
+     n:<слово> <слово>  два первых слова нормализованного названия
+   Блоки больше MAX_BLOCK (общие слова) пропускаются - сравнений почти
+   линейно, а не O(n²)
+2. Оценка пары (только разные источники):
+     - одинаковый заводской артикул → 0.5 + сходство названий / 2
+     - несовместимые модели (DF-240 / DF-354), числа (L-630 / L-700 мм)
+       или уточнения (левый / правый, ведущая / ведомая) → пара отбрасывается
+     - иначе - сходство названий по шинглам: среднее Jaccard и
+       вложенности (обрезанные "Амортизатор капота на трактор Do.."
+       у tata-agro не штрафуются за хвост)
+3. Кластеры - пары от лучших к худшим, склейка только если в кластере
+   не окажется двух предложений одного источника (внутри источника
+   товары различны - у них разные source_url)
+4. Канонический товар: название / описание / фото лучшего предложения,
+   цена - минимальная из предложений в наличии
+
+Использование:
+    from entity_resolution import load_offers, resolve
+
+    offers = load_offers(["parsed_data/tata-agro/tata-agro-dongfeng.json", ...])
+    for entity in resolve(offers):
+        entity["name"], entity["price"], entity["offers"]   # [{"source", "source_url", "price", ...}]
+"""
+
+import json
+import re
+from collections import defaultdict
+
+from model_tokens import extract_models
+from near_duplicates import (
+    jaccard,
+    models_conflict,
+    normalize_key,
+    numbers,
+    opposite,
+    qualifiers,
+    shingles,
+)
+from source_identity import source_fields
+
+THRESHOLD = 0.75
+MAX_BLOCK = 200
+
+# Порядок при выборе лучшего предложения (полные названия и описания - выше)
+SOURCE_PRIORITY = {"zip-agro": 0, "agrodom": 1, "tata-agro": 2}
+
+# Заводской артикул: буквенный префикс + цифры с точками / дефисами
+# (DF200.50.014A, FT250.37.183, LL380-01111, 200.43.103-1).
+# Внутренние коды магазинов (8830, 7448D, 101097) не подходят
+_ARTICLE_RE = re.compile(
+    r"(?<![\w.])(?:[A-ZА-Я]{1,4}\d{2,4}[A-ZА-Я]?[.\-][\dA-ZА-Я]{2,}(?:[.\-][\dA-ZА-Я]+)*"
+    r"|\d{2,4}\.\d{2,3}[A-ZА-Я]?\.\d{2,4}(?:[.\-][\dA-ZА-Я]+)*)(?![\w.])",
+)
+
+# Латиница для кириллических двойников в артикулах
+_ARTICLE_TRANSLIT = str.maketrans({
+    "А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H",
+    "О": "O", "Р": "P", "С": "C", "Т": "T", "Х": "X",
+})
+
+_TRUNCATED_RE = re.compile(r"\s*(?:\.{2,}|…)\s*$")
+_PRICE_RE = re.compile(r"[^\d.,]")
+
+# Наличие как в resync-by-source.py: "Нет в наличии" / "Отсутствует" - нет
+OUT_OF_STOCK_WORDS = ("нет", "отсутств")
+
+
+# ----------------------------------------------------------------------
+# Предложения из parsed_data
+# ----------------------------------------------------------------------
+def normalize_article(article: str) -> str:
+    """DF200.50.014A / df 200-50-014а → DF20050014A"""
+    text = (article or "").upper().translate(_ARTICLE_TRANSLIT)
+    return re.sub(r"[^0-9A-Z]", "", text)
+
+
+def factory_articles(*texts) -> set:
+    """Нормализованные заводские артикулы из полей и названий"""
+    found = set()
+    for text in texts:
+        for match in _ARTICLE_RE.finditer((text or "").upper()):
+            found.add(normalize_article(match.group()))
+    return found
+
+
+def parse_price(value) -> float:
+    """'152 000.00 ₽' / '618.70' / 517 → число (0 - цены нет)"""
+    cleaned = _PRICE_RE.sub("", str(value or "")).replace(",", ".")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return 0.0
+
+
+def make_offer(item: dict) -> dict | None:
+    """Запись parsed_data (tata-agro / zip-agro / agrodom) → предложение"""
+    name = (item.get("title") or item.get("name") or "").strip()
+    fields = source_fields(item)
+    if not name or not fields["source"] or not fields["source_url"]:
+        return None
+
+    article = fields["source_article"] or ""
+    price = parse_price(item.get("price"))
+    stock = (item.get("stock") or "").lower()
+    truncated = bool(_TRUNCATED_RE.search(name))
+    clean_name = _TRUNCATED_RE.sub("", name)
+
+    # Артикул в конце названия (zip-agro: "... FT250.37.183") - не часть имени
+    key_name = clean_name
+    if article and key_name.endswith(article):
+        key_name = key_name[: -len(article)]
+    key = normalize_key(key_name)
+
+    return {
+        **fields,
+        "name": clean_name,
+        "truncated": truncated,
+        "price": price,
+        "in_stock": not any(w in stock for w in OUT_OF_STOCK_WORDS) if stock else price > 0,
+        "image_url": item.get("image_url") or None,
+        "description": (item.get("description") or "").strip(),
+        "brand": item.get("brand") or "",
+        "category": item.get("category") or "",
+        "key": key,
+        "articles": factory_articles(article, clean_name),
+        "models": set(extract_models(clean_name)),
+        "numbers": numbers(key),
+        "qualifiers": qualifiers(clean_name),
+        "shingles": shingles(key),
+    }
+
+
+def load_offers(paths: list) -> list:
+    """Предложения из файлов parsed_data; повтор (source, source_url) - одно предложение"""
+    offers = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            continue
+        for item in data:
+            offer = make_offer(item)
+            if offer:
+                offers.setdefault((offer["source"], offer["source_url"]), offer)
+    return list(offers.values())
+
+
+# ----------------------------------------------------------------------
+# Блокировка и оценка пар
+# ----------------------------------------------------------------------
+def blocking_keys(offer: dict) -> set:
+    keys = {f"a:{article}" for article in offer["articles"]}
+    words = offer["key"].split()
+    if words:
+        keys.update(f"m:{model}:{words[0]}" for model in offer["models"])
+    if len(words) >= 2:
+        keys.add(f"n:{words[0]} {words[1]}")
+    return keys
+
+
+def candidate_pairs(offers: list, max_block: int = MAX_BLOCK) -> set:
+    """Пары (i, j) предложений разных источников с общим ключом блока"""
+    blocks = defaultdict(list)
+    for i, offer in enumerate(offers):
+        for key in blocking_keys(offer):
+            blocks[key].append(i)
+
+    pairs = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > max_block:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                if offers[i]["source"] != offers[j]["source"]:
+                    pairs.add((i, j))
+    return pairs
+
+
+def _numbers_compatible(a: dict, b: dict) -> bool:
+    # У обрезанного названия хвост с числами потерян - достаточно вложенности
+    if a["truncated"] or b["truncated"]:
+        return a["numbers"] <= b["numbers"] or b["numbers"] <= a["numbers"]
+    return a["numbers"] == b["numbers"]
+
+
+def score_pair(a: dict, b: dict) -> float:
+    """Сходство двух предложений 0..1 (0 - точно разные товары)"""
+    sa, sb = a["shingles"], b["shingles"]
+    if not sa or not sb or opposite(a["qualifiers"], b["qualifiers"]):
+        return 0.0
+    containment = len(sa & sb) / min(len(sa), len(sb))
+    similarity = (jaccard(sa, sb) + containment) / 2
+
+    # Общий артикул снижает планку по названию, но не заменяет её:
+    # "артикул" из названия бывает моделью двигателя (DL190-12)
+    if a["articles"] & b["articles"]:
+        return 0.5 + similarity / 2
+
+    if models_conflict(a["models"], b["models"]):
+        return 0.0
+    if not _numbers_compatible(a, b):
+        return 0.0
+    return similarity
+
+
+# ----------------------------------------------------------------------
+# Кластеры и канонический товар
+# ----------------------------------------------------------------------
+def cluster_offers(offers: list, threshold: float = THRESHOLD) -> list:
+    """
+    [[индексы предложений], ...] - в кластере не больше одного предложения
+    на источник; жёсткие запреты score_pair (противоположные уточнения,
+    непересекающиеся модели без общего артикула) проверяются для всех
+    пар членов двух кластеров, а не только для склеивающей пары
+    """
+    scored = []
+    for i, j in candidate_pairs(offers):
+        score = score_pair(offers[i], offers[j])
+        if score >= threshold:
+            scored.append((score, i, j))
+    scored.sort(reverse=True)
+
+    cluster_of = list(range(len(offers)))
+    members = {i: [i] for i in range(len(offers))}
+    sources = {i: {offers[i]["source"]} for i in range(len(offers))}
+    scores = {i: 1.0 for i in range(len(offers))}
+
+    for score, i, j in scored:
+        ci, cj = cluster_of[i], cluster_of[j]
+        if ci == cj or sources[ci] & sources[cj]:
+            continue
+        if any(_conflict(offers[a], offers[b]) for a in members[ci] for b in members[cj]):
+            continue
+        for k in members[cj]:
+            cluster_of[k] = ci
+        members[ci].extend(members.pop(cj))
+        sources[ci] |= sources.pop(cj)
+        scores[ci] = min(scores[ci], scores.pop(cj), score)
+
+    return [(sorted(m), scores[c]) for c, m in members.items()]
+
+
+def _conflict(a: dict, b: dict) -> bool:
+    """Предложения - точно разные товары (те же запреты, что в score_pair)"""
+    if opposite(a["qualifiers"], b["qualifiers"]):
+        return True
+    return models_conflict(a["models"], b["models"]) and not a["articles"] & b["articles"]
+
+
+def best_offer(offers: list) -> dict:
+    """Полное название > есть описание > заводской артикул > приоритет источника"""
+    return min(
+        offers,
+        key=lambda o: (
+            o["truncated"],
+            not o["description"],
+            not o["articles"],
+            SOURCE_PRIORITY.get(o["source"], len(SOURCE_PRIORITY)),
+            -len(o["name"]),
+        ),
+    )
+
+
+def canonical(offers: list, score: float = 1.0) -> dict:
+    """Канонический товар из предложений одного кластера"""
+    best = best_offer(offers)
+    in_stock = [o for o in offers if o["in_stock"] and o["price"] > 0]
+    priced = in_stock or [o for o in offers if o["price"] > 0]
+
+    return {
+        "name": best["name"],
+        "description": best["description"] or max((o["description"] for o in offers), key=len),
+        "image_url": best["image_url"] or next((o["image_url"] for o in offers if o["image_url"]), None),
+        "brand": best["brand"] or next((o["brand"] for o in offers if o["brand"]), ""),
+        "article": min(set().union(*(o["articles"] for o in offers)), default=None),
+        "compatible_models": sorted(set().union(*(o["models"] for o in offers))),
+        "price": min((o["price"] for o in priced), default=0.0),
+        "in_stock": bool(in_stock),
+        "primary": (best["source"], best["source_url"]),
+        "score": round(score, 3),
+        "offers": [
+            {
+                "source": o["source"],
+                "source_url": o["source_url"],
+                "source_article": o["source_article"],
+                "name": o["name"],
+                "price": o["price"],
+                "in_stock": o["in_stock"],
+                "image_url": o["image_url"],
+            }
+            for o in sorted(offers, key=lambda o: SOURCE_PRIORITY.get(o["source"], len(SOURCE_PRIORITY)))
+        ],
+    }
+
+
+def resolve(offers: list, threshold: float = THRESHOLD) -> list:
+    """Канонические товары: сначала найденные в нескольких источниках"""
+    entities = [
+        canonical([offers[i] for i in members], score)
+        for members, score in cluster_offers(offers, threshold)
+    ]
+    entities.sort(key=lambda e: (-len(e["offers"]), e["name"]))
+    return entities
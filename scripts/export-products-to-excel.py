@@ -9,6 +9,8 @@ from dotenv import load_dotenv
 from supabase import create_client
 import pandas as pd
 
+from near_duplicates import cluster_index, find_duplicate_clusters
+
 load_dotenv("../frontend/.env.local")
 
 supabase = create_client(
@@ -25,7 +27,7 @@ offset = 0
 
 while True:
     response = supabase.table("products")\
-        .select("id, name, slug, price, old_price, category_id, manufacturer, in_stock, created_at")\
+        .select("id, name, slug, price, old_price, category_id, manufacturer, in_stock, image_url, created_at")\
         .range(offset, offset + page_size - 1)\
         .execute()
     
@@ -47,8 +49,16 @@ df = pd.DataFrame(all_products)
 # Сортируем по названию для удобства поиска дубликатов
 df = df.sort_values('name')
 
-# Добавляем колонку с количеством дубликатов
-df['duplicate_count'] = df.groupby('name')['name'].transform('count')
+# Кластеры дубликатов: точные и почти-дубли (near_duplicates.py)
+clusters = find_duplicate_clusters(all_products)
+index = cluster_index(clusters)
+
+df['duplicate_group'] = df['id'].map(lambda i: index[i][0] if i in index else None)
+df['keep_id'] = df['id'].map(lambda i: index[i][1] if i in index else i)
+df['keep'] = df['keep_id'] == df['id']
+
+# Количество товаров в кластере (1 - не дубликат)
+df['duplicate_count'] = df.groupby('duplicate_group')['id'].transform('count').fillna(1).astype(int)
 
 # Добавляем колонку "is_duplicate" (True если больше 1)
 df['is_duplicate'] = df['duplicate_count'] > 1
@@ -60,13 +70,14 @@ df.to_excel(output_file, index=False, sheet_name="Товары")
 print(f"\n✅ Экспортировано в: {output_file}")
 print(f"📊 Товаров всего: {len(df)}")
 print(f"🔄 С дубликатами: {df['is_duplicate'].sum()}")
-print(f"📝 Уникальных названий с дубликатами: {len(df[df['is_duplicate']]['name'].unique())}")
+print(f"📝 Групп дубликатов: {len(clusters)}")
 
 # Создаём отдельный лист только с дубликатами
-duplicates_df = df[df['is_duplicate']].sort_values(['name', 'created_at'])
+duplicates_df = df[df['is_duplicate']].sort_values(['duplicate_group', 'keep', 'id'], ascending=[True, False, True])
 
 with pd.ExcelWriter(output_file, engine='openpyxl', mode='a') as writer:
     duplicates_df.to_excel(writer, sheet_name="Только дубликаты", index=False)
 
 print(f"\n💡 Откройте файл {output_file} для анализа")
-print("   Лист 'Только дубликаты' содержит все повторяющиеся товары")
+print("   Лист 'Только дубликаты' содержит все повторяющиеся товары (по группам)")
+print("   keep = True - товар, который предлагается оставить")
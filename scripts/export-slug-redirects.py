@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+КАРТА РЕДИРЕКТОВ СО СТАРЫХ SLUG ТОВАРОВ И КАТЕГОРИЙ
+
+Собирает frontend/app/data/slug-redirects.json и category-slug-redirects.json
+из таблицы slug_redirects (slug_redirects.py). fix-*-slugs.py пересобирают карту сами; скрипт -
+для ручной пересборки (например, после отката или удаления товаров).
+После пересборки нужен деплой фронтенда.
+
+Требуется миграция docs/migrations/slug-redirects.sql.
+
+Использование:
+    python3 export-slug-redirects.py
+"""
+
+import os
+import sys
+
+from supabase import Client, create_client
+
+from slug_redirects import export_redirect_map
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase: Client = create_client(url, key)
+
+
+if __name__ == "__main__":
+    export_redirect_map(supabase)
@@ -1,6 +1,8 @@
 package main
 
 import (
+	"crypto/sha256"
+	"encoding/hex"
 	"encoding/json"
 	"fmt"
 	"log"
@@ -23,6 +25,45 @@ type UpdateBatch struct {
 	Manufacturer string
 }
 
+// Правила - тот же файл, что и у Python скриптов (rules_engine.py)
+const rulesPath = "categorization_rules.json"
+
+type Rule struct {
+	Label    string   `json:"label"`
+	Patterns []string `json:"patterns"`
+}
+
+type RuleSet struct {
+	Mode  string `json:"mode"`
+	Rules []Rule `json:"rules"`
+}
+
+type RulesFile struct {
+	RuleSets map[string]RuleSet `json:"rule_sets"`
+}
+
+// loadRules читает набор правил и версию (первые 12 символов sha256 файла;
+// RULES_VERSION в rules_engine.py дополнительно включает код токенизатора)
+func loadRules(name string) ([]Rule, string) {
+	raw, err := os.ReadFile(rulesPath)
+	if err != nil {
+		log.Fatalf("❌ Не найден %s: %v", rulesPath, err)
+	}
+
+	var rules RulesFile
+	if err := json.Unmarshal(raw, &rules); err != nil {
+		log.Fatalf("❌ Ошибка разбора %s: %v", rulesPath, err)
+	}
+
+	ruleSet, ok := rules.RuleSets[name]
+	if !ok || ruleSet.Mode != "substring" {
+		log.Fatalf("❌ В %s нет набора подстрок %q", rulesPath, name)
+	}
+
+	sum := sha256.Sum256(raw)
+	return ruleSet.Rules, hex.EncodeToString(sum[:])[:12]
+}
+
 func main() {
 	// Загружаем .env
 	godotenv.Load()
@@ -65,33 +106,24 @@ func main() {
 	fmt.Printf("✅ Найдено UNIVERSAL товаров: %d (count: %d)\n", len(products), count)
 	fmt.Println()
 
-	// Маппинг производителей
-	manufacturerKeywords := map[string][]string{
-		"DongFeng": {"dongfeng", "донгфенг"},
-		"Foton":    {"foton", "фотон"},
-		"Xingtai":  {"xingtai", "синтай", "уралец"},
-		"Jinma":    {"jinma", "джинма"},
-		"ZUBR":     {"zubr", "зубр"},
-	}
+	// Производители - набор manufacturer, порядок правил = приоритет
+	manufacturerRules, rulesVersion := loadRules("manufacturer")
+	fmt.Printf("📐 Правила: %s\n\n", rulesVersion)
 
 	// Собираем ID для обновления
 	updates := make(map[string][]int64)
 
 	for _, product := range products {
-		nameLower := strings.ToLower(product.Name)
+		nameLower := strings.Join(strings.Fields(strings.ToLower(product.Name)), " ")
 
-		for manufacturer, keywords := range manufacturerKeywords {
-			found := false
-			for _, keyword := range keywords {
+	rules:
+		for _, rule := range manufacturerRules {
+			for _, keyword := range rule.Patterns {
 				if strings.Contains(nameLower, keyword) {
-					updates[manufacturer] = append(updates[manufacturer], product.ID)
-					found = true
-					break
+					updates[rule.Label] = append(updates[rule.Label], product.ID)
+					break rules
 				}
 			}
-			if found {
-				break
-			}
 		}
 	}
 
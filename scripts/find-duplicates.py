@@ -6,6 +6,10 @@
 import os
 from supabase import create_client
 
+from image_hashes import ImageIndex
+from model_tokens import extract_models
+from near_duplicates import find_duplicate_clusters
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -89,11 +93,12 @@ products_354_404 = []
 products_other = []
 
 for p in all_dongfeng.data:
-    name = p["name"].lower()
-    if "240" in name or "244" in name:
+    # Номера моделей по границам слов (2400 или М12х240 не считаются)
+    models = set(extract_models(p["name"]))
+    if models & {"240", "244"}:
         count_240_244 += 1
         products_240_244.append(p)
-    elif "354" in name or "404" in name:
+    elif models & {"354", "404"}:
         count_354_404 += 1
         products_354_404.append(p)
     else:
@@ -127,7 +132,7 @@ limit = 1000
 
 while True:
     batch = supabase.table("products")\
-        .select("id, name, slug")\
+        .select("id, name, slug, price, in_stock, image_url")\
         .range(offset, offset + limit - 1)\
         .execute()
 
@@ -170,6 +175,44 @@ if all_duplicates:
             print(f"   ... и ещё {len(products) - 3} копий")
         print()
 
+# Почти-дубликаты: пунктуация, "на трактор ...", единицы, кириллица/латиница
+print("=" * 100)
+print("📊 ПРОБЛЕМА 4: ПОЧТИ-ДУБЛИКАТЫ (MinHash + LSH)")
+print("-" * 100)
+
+# Второй признак - почти одинаковая фотография (таблица image_hashes,
+# build-image-hashes.py); заглушки источников не считаются
+image_index = ImageIndex.load(supabase)
+image_rows = {p["id"]: image_index.get(p["image_url"]) for p in all_products}
+image_hashes = {
+    product_id: row["phash"] for product_id, row in image_rows.items()
+    if row and not row.get("is_placeholder")
+}
+print(f"Товаров с перцептивным хешем картинки: {len(image_hashes)}")
+
+clusters = find_duplicate_clusters(all_products, image_hashes=image_hashes)
+near = [c for c in clusters if not c["exact"]]
+
+print(f"⚠️  КЛАСТЕРОВ ДУБЛИКАТОВ: {len(clusters)} (из них с разным написанием: {len(near)}, "
+      f"по фотографии: {sum(c['by_image'] for c in clusters)})")
+print(f"   Лишних товаров: {sum(len(c['duplicates']) for c in clusters)}")
+print()
+
+if near:
+    print("📋 ТОП-20 КЛАСТЕРОВ С РАЗНЫМ НАПИСАНИЕМ:")
+    print("-" * 100)
+
+    for i, cluster in enumerate(near[:20], 1):
+        survivor = cluster["survivor"]
+        photo = ", та же фотография" if cluster["by_image"] else ""
+        print(f"{i}. {len(cluster['duplicates']) + 1} товаров, сходство ≥ {cluster['similarity']}{photo}:")
+        print(f"   ✅ ID={survivor['id']}: {survivor['name']}")
+        for p in cluster["duplicates"][:3]:
+            print(f"   ❌ ID={p['id']}: {p['name']}")
+        if len(cluster["duplicates"]) > 3:
+            print(f"   ... и ещё {len(cluster['duplicates']) - 3}")
+        print()
+
 print()
 print("=" * 100)
 print("✅ ПРОВЕРКА ЗАВЕРШЕНА")
@@ -1,172 +1,122 @@
 #!/usr/bin/env python3
 """
 Исправляет ВСЕ slug с кириллицей на латиницу (транслитерация)
+
+Запись - через журнал операций (fix-cyrillic-slugs.journal.jsonl), старые
+slug сохраняются в журнале:
+    python3 fix-all-cyrillic-slugs.py             # прерванный запуск продолжается с места остановки
+    python3 fix-all-cyrillic-slugs.py --rollback  # вернуть старые slug
+
+Применённые замены записываются в slug_redirects, карта редиректов
+frontend/app/data/slug-redirects.json пересобирается (slug_redirects.py).
 """
 
 import os
 import re
+import sys
 
 from supabase import create_client
 
-# Таблица транслитерации
-TRANSLIT = {
-    "а": "a",
-    "б": "b",
-    "в": "v",
-    "г": "g",
-    "д": "d",
-    "е": "e",
-    "ё": "yo",
-    "ж": "zh",
-    "з": "z",
-    "и": "i",
-    "й": "y",
-    "к": "k",
-    "л": "l",
-    "м": "m",
-    "н": "n",
-    "о": "o",
-    "п": "p",
-    "р": "r",
-    "с": "s",
-    "т": "t",
-    "у": "u",
-    "ф": "f",
-    "х": "h",
-    "ц": "ts",
-    "ч": "ch",
-    "ш": "sh",
-    "щ": "sch",
-    "ъ": "",
-    "ы": "y",
-    "ь": "",
-    "э": "e",
-    "ю": "yu",
-    "я": "ya",
-    "А": "A",
-    "Б": "B",
-    "В": "V",
-    "Г": "G",
-    "Д": "D",
-    "Е": "E",
-    "Ё": "Yo",
-    "Ж": "Zh",
-    "З": "Z",
-    "И": "I",
-    "Й": "Y",
-    "К": "K",
-    "Л": "L",
-    "М": "M",
-    "Н": "N",
-    "О": "O",
-    "П": "P",
-    "Р": "R",
-    "С": "S",
-    "Т": "T",
-    "У": "U",
-    "Ф": "F",
-    "Х": "H",
-    "Ц": "Ts",
-    "Ч": "Ch",
-    "Ш": "Sh",
-    "Щ": "Sch",
-    "Ъ": "",
-    "Ы": "Y",
-    "Ь": "",
-    "Э": "E",
-    "Ю": "Yu",
-    "Я": "Ya",
-}
-
-
-def transliterate(text):
-    """Транслитерация кириллицы в латиницу"""
-    result = []
-    for char in text:
-        result.append(TRANSLIT.get(char, char))
-    return "".join(result)
-
-
-url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
-key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-supabase = create_client(url, key)
-
-# Получаем ВСЕ товары
-print("📦 Загружаем все товары...")
-offset = 0
-limit = 1000
-all_products = []
-
-while True:
-    response = (
-        supabase.table("products")
-        .select("id,slug,manufacturer,name")
-        .range(offset, offset + limit - 1)
-        .execute()
-    )
-    if not response.data:
-        break
-    all_products.extend(response.data)
-    offset += limit
-
-print(f"✓ Загружено {len(all_products)} товаров")
-
-# Фильтруем товары с кириллицей
-cyrillic_pattern = re.compile("[а-яА-ЯёЁ]")
-products_with_cyrillic = [p for p in all_products if cyrillic_pattern.search(p["slug"])]
-
-print(f"\n📊 Товаров с кириллицей: {len(products_with_cyrillic)}")
-print("\n🔧 Начинаем исправление...\n")
-
-fixed_count = 0
-errors = []
-batch = []
+from op_journal import APPLIED, FAILED, OperationJournal, batches, journal_cli, make_executor
+from slug_redirects import export_redirect_map, record_redirects
+from slugs import SlugRegistry, slugify
+
+JOURNAL_PATH = "fix-cyrillic-slugs.journal.jsonl"
 BATCH_SIZE = 100
 
-for i, product in enumerate(products_with_cyrillic, 1):
-    old_slug = product["slug"]
-
-    # Транслитерируем
-    new_slug = transliterate(old_slug).lower()
-
-    # Убираем множественные дефисы
-    new_slug = re.sub(r"-+", "-", new_slug)
-
-    # Убираем дефисы в начале/конце
-    new_slug = new_slug.strip("-")
-
-    if new_slug != old_slug:
-        batch.append({"id": product["id"], "old_slug": old_slug, "new_slug": new_slug})
-
-        # Обновляем по 100 товаров
-        if len(batch) >= BATCH_SIZE:
-            for item in batch:
-                try:
-                    supabase.table("products").update({"slug": item["new_slug"]}).eq(
-                        "id", item["id"]
-                    ).execute()
-                    fixed_count += 1
-                except Exception as e:
-                    errors.append(f"ID {item['id']}: {str(e)}")
-
-            print(f"  ✓ Обработано {fixed_count}/{len(products_with_cyrillic)}")
-            batch = []
-
-# Обновляем остаток
-if batch:
-    for item in batch:
-        try:
-            supabase.table("products").update({"slug": item["new_slug"]}).eq(
-                "id", item["id"]
-            ).execute()
-            fixed_count += 1
-        except Exception as e:
-            errors.append(f"ID {item['id']}: {str(e)}")
-
-print(f"\n✅ Исправлено: {fixed_count} товаров")
-print(f"❌ Ошибок: {len(errors)}")
-
-if errors:
-    print("\n⚠️ Ошибки (первые 10):")
-    for err in errors[:10]:
-        print(f"  {err}")
+CYRILLIC_PATTERN = re.compile("[а-яА-ЯёЁ]")
+
+
+def fix_slug(old_slug, registry):
+    """Транслитерация (slugs.slugify); занятый slug получает суффикс -2, -3, ..."""
+    return registry.unique(slugify(old_slug))
+
+
+def applied_redirects(journal):
+    """{старый slug: новый} из применённых пачек журнала"""
+    pairs = {}
+    for seq, batch in journal.batches.items():
+        if journal.status.get(seq) == APPLIED:
+            for new, old in zip(batch["forward"], batch["inverse"]):
+                pairs[old["set"]["slug"]] = new["set"]["slug"]
+    return pairs
+
+
+def update_redirects(supabase, journal):
+    record_redirects(supabase, applied_redirects(journal))
+    export_redirect_map(supabase)
+
+
+def load_products(supabase):
+    """Все товары (keyset-пагинация по id)"""
+    products = []
+    last_id = 0
+    limit = 1000
+
+    while True:
+        response = (
+            supabase.table("products")
+            .select("id,slug,manufacturer,name")
+            .gt("id", last_id)
+            .order("id")
+            .limit(limit)
+            .execute()
+        )
+        products.extend(response.data)
+        if len(response.data) < limit:
+            return products
+        last_id = response.data[-1]["id"]
+
+
+def main():
+    url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    supabase = create_client(url, key)
+
+    journal = OperationJournal(JOURNAL_PATH)
+    executor = make_executor(supabase)
+    if journal_cli(journal, executor, sys.argv[1:], confirm=False):
+        # После продолжения - новые редиректы, после отката - карта без них
+        update_redirects(supabase, journal)
+        return
+
+    # Получаем ВСЕ товары
+    print("📦 Загружаем все товары...")
+    all_products = load_products(supabase)
+    print(f"✓ Загружено {len(all_products)} товаров")
+
+    # Фильтруем товары с кириллицей
+    products_with_cyrillic = [
+        p for p in all_products if p["slug"] and CYRILLIC_PATTERN.search(p["slug"])
+    ]
+    print(f"\n📊 Товаров с кириллицей: {len(products_with_cyrillic)}")
+
+    # Новые slug не должны совпасть с уже существующими
+    registry = SlugRegistry(p["slug"] for p in all_products if p["slug"])
+
+    forward, inverse = [], []
+    for product in products_with_cyrillic:
+        old_slug = product["slug"]
+        new_slug = fix_slug(old_slug, registry)
+        if new_slug != old_slug:
+            forward.append({"id": product["id"], "set": {"slug": new_slug}})
+            inverse.append({"id": product["id"], "set": {"slug": old_slug}})
+
+    if not forward:
+        print("\n✅ Исправлять нечего")
+        return
+
+    # План (новые и старые slug) - в журнал до первой записи в БД
+    print(f"\n🔧 Начинаем исправление ({len(forward)} товаров, журнал: {JOURNAL_PATH})...\n")
+    journal.start("fix-cyrillic-slugs", batches("update", forward, inverse, BATCH_SIZE))
+    summary = journal.run(executor)
+    update_redirects(supabase, journal)
+
+    print(f"\n✅ Исправлено: {summary['rows_applied']} товаров")
+    print(f"❌ Ошибок: {summary['rows_failed']} (пачек: {summary[FAILED]})")
+    if summary[APPLIED] < summary["total"]:
+        print("⚠️  Запустите скрипт ещё раз - упавшие пачки будут повторены")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 """
 Быстрое исправление категорий через SQL UPDATE
+
+Читает только товары с part_type без parts-* категории, пишет одним
+RPC merge_specifications на категорию. Повторный запуск - только дельта.
 """
 
 import os
+from collections import defaultdict
 from supabase import Client, create_client
 
+from db_batch import merge_specifications
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
@@ -14,106 +20,71 @@ print("=" * 80)
 print("🔧 БЫСТРОЕ ИСПРАВЛЕНИЕ КАТЕГОРИЙ")
 print("=" * 80 + "\n")
 
-# Загружаем все товары с part_type
-print("📥 Загрузка товаров...")
-
-offset = 0
+# Маппинг part_type → категория
+PART_TYPE_TO_CATEGORY = {
+    "filters": "parts-filters",
+    "filter": "parts-filters",
+    "fuel-system": "parts-fuel-system",
+    "hydraulics": "parts-hydraulics",
+    "hydraulic": "parts-hydraulics",
+    "pump": "parts-hydraulics",
+    "pumps": "parts-hydraulics",
+    "transmission": "parts-minitractors",  # КПП относятся к минитракторам
+    "brake": "parts-minitractors",
+    "steering": "parts-minitractors",
+    "cooling": "parts-minitractors",
+}
+
+# Загружаем только товары с известным part_type (фильтр на стороне БД),
+# и только нужные ключи specifications
+print("📥 Загрузка товаров с part_type...")
+
+last_id = 0
 batch_size = 1000
-products_to_update = []
+ids_by_category = defaultdict(list)
+loaded = 0
 
-while offset < 11000:
+while True:
     result = supabase.table("products") \
-        .select("id, specifications") \
-        .range(offset, offset + batch_size - 1) \
+        .select("id, part_type:specifications->>part_type, category:specifications->>category") \
+        .in_("specifications->>part_type", list(PART_TYPE_TO_CATEGORY)) \
+        .gt("id", last_id) \
+        .order("id") \
+        .limit(batch_size) \
         .execute()
 
     if not result.data:
         break
 
     for p in result.data:
-        specs = p.get("specifications") or {}
-        part_type = specs.get("part_type", "")
-        current_cat = specs.get("category", "")
-
-        # Маппинг
-        new_cat = None
-        if part_type in ["filters", "filter"]:
-            new_cat = "parts-filters"
-        elif part_type == "fuel-system":
-            new_cat = "parts-fuel-system"
-        elif part_type in ["hydraulics", "hydraulic", "pump", "pumps"]:
-            new_cat = "parts-hydraulics"
-        elif part_type == "transmission":
-            new_cat = "parts-minitractors"  # КПП относятся к минитракторам
-        elif part_type == "brake":
-            new_cat = "parts-minitractors"
-        elif part_type == "steering":
-            new_cat = "parts-minitractors"
-        elif part_type == "cooling":
-            new_cat = "parts-minitractors"
-
-        # Обновляем если нужно
-        if new_cat and (not current_cat or not current_cat.startswith("parts-")):
-            specs["category"] = new_cat
-            products_to_update.append({
-                "id": p["id"],
-                "specifications": specs
-            })
-
-    offset += batch_size
-    print(f"   Загружено: {offset} товаров...")
+        current_cat = p.get("category") or ""
+        new_cat = PART_TYPE_TO_CATEGORY.get(p.get("part_type"))
+
+        # Обновляем только если категории ещё нет - решение уже применено раньше
+        if new_cat and not current_cat.startswith("parts-"):
+            ids_by_category[new_cat].append(p["id"])
+
+    loaded += len(result.data)
+    last_id = result.data[-1]["id"]
+    print(f"   Загружено: {loaded} товаров...")
 
     if len(result.data) < batch_size:
         break
 
-print(f"\n✅ Найдено {len(products_to_update)} товаров для обновления\n")
+total_to_update = sum(len(ids) for ids in ids_by_category.values())
+print(f"\n✅ Найдено {total_to_update} товаров для обновления\n")
 
-# Обновляем батчами
+# Один RPC на категорию (specifications || {"category": ...} на стороне БД)
 print("💾 Применение обновлений...")
 
 updated = 0
-for i, update_data in enumerate(products_to_update):
-    try:
-        supabase.table("products") \
-            .update({"specifications": update_data["specifications"]}) \
-            .eq("id", update_data["id"]) \
-            .execute()
-
-        updated += 1
-
-        if (i + 1) % 100 == 0:
-            print(f"   Прогресс: {i + 1}/{len(products_to_update)}")
-
-    except Exception as e:
-        pass
+for new_cat, ids in ids_by_category.items():
+    stats = merge_specifications(supabase, ids, {"category": new_cat})
+    updated += stats["updated"]
+    print(f"   {new_cat}: {stats['updated']}/{len(ids)}")
 
 print(f"\n✅ ОБНОВЛЕНО: {updated} товаров")
 
-# Быстрая проверка
-print("\n🔍 Проверка результатов...")
-
-check_data = {}
-offset = 0
-
-while offset < 11000:
-    result = supabase.table("products") \
-        .select("specifications") \
-        .range(offset, offset + 1000 - 1) \
-        .execute()
-
-    if not result.data:
-        break
-
-    for p in result.data:
-        specs = p.get("specifications") or {}
-        cat = specs.get("category", "NO_CATEGORY")
-        check_data[cat] = check_data.get(cat, 0) + 1
-
-    offset += 1000
-
-    if len(result.data) < 1000:
-        break
-
 print("\n" + "=" * 80)
 print("📊 ФИНАЛЬНЫЕ КАТЕГОРИИ:")
 print("=" * 80)
@@ -129,7 +100,12 @@ important_cats = [
 ]
 
 for cat in important_cats:
-    count = check_data.get(cat, 0)
-    print(f"{cat:35} {count:>6}")
+    # Счётчик на стороне БД - без выгрузки каталога
+    result = supabase.table("products") \
+        .select("id", count="exact") \
+        .eq("specifications->>category", cat) \
+        .limit(1) \
+        .execute()
+    print(f"{cat:35} {result.count or 0:>6}")
 
 print("=" * 80)
@@ -6,6 +6,8 @@
 import os
 from supabase import Client, create_client
 
+from db_batch import WriteBehindQueue
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
@@ -31,15 +33,22 @@ PART_TYPE_TO_CATEGORY = {
 }
 
 total_updated = 0
-offset = 0
+last_id = 0
+batch_num = 0
 batch_size = 500
 
-while offset < 11000:
-    print(f"📦 Обработка batch {offset // batch_size + 1}...")
+# Запись в фоне: чтение следующего batch не ждёт обновлений
+queue = WriteBehindQueue(supabase)
+
+while True:
+    batch_num += 1
+    print(f"📦 Обработка batch {batch_num}...")
 
     result = supabase.table("products") \
         .select("id, name, specifications") \
-        .range(offset, offset + batch_size - 1) \
+        .gt("id", last_id) \
+        .order("id") \
+        .limit(batch_size) \
         .execute()
 
     if not result.data:
@@ -58,25 +67,20 @@ while offset < 11000:
 
             # Обновляем только если category не установлена или не начинается с parts-
             if not current_cat or not current_cat.startswith("parts-"):
-                specs["category"] = new_category
-
-                try:
-                    supabase.table("products") \
-                        .update({"specifications": specs}) \
-                        .eq("id", product["id"]) \
-                        .execute()
+                queue.merge(product["id"], {"category": new_category})
+                batch_updated += 1
+                total_updated += 1
 
-                    batch_updated += 1
-                    total_updated += 1
-                except Exception as e:
-                    pass
-
-    print(f"   ✅ Обновлено: {batch_updated}")
-    offset += batch_size
+    print(f"   ✅ В очереди: {batch_updated}")
+    last_id = result.data[-1]["id"]
 
     if len(result.data) < batch_size:
         break
 
+# Дописываем всё, что осталось в очереди
+queue.close()
+print(f"\n💾 Записано: {queue.stats['updated']} за {queue.stats['requests']} запросов, ошибок: {queue.stats['failed']}")
+
 print("\n" + "=" * 80)
 print(f"📊 ВСЕГО ОБНОВЛЕНО: {total_updated}")
 print("=" * 80)
@@ -92,31 +96,13 @@ check_categories = [
 ]
 
 for cat in check_categories:
-    offset = 0
-    count = 0
-
-    while offset < 11000:
-        result = supabase.table("products") \
-            .select("id") \
-            .range(offset, offset + 1000 - 1) \
-            .execute()
-
-        if not result.data:
-            break
-
-        for p in result.data:
-            # Загружаем полный продукт
-            full = supabase.table("products").select("specifications").eq("id", p["id"]).execute()
-            if full.data:
-                specs = full.data[0].get("specifications") or {}
-                if specs.get("category") == cat:
-                    count += 1
-
-        offset += 1000
-
-        if len(result.data) < 1000:
-            break
+    # Фильтр по ключу JSONB на стороне БД - один запрос на категорию
+    result = supabase.table("products") \
+        .select("id", count="exact") \
+        .eq("specifications->>category", cat) \
+        .limit(1) \
+        .execute()
 
-    print(f"✅ {cat:30} {count:>6} товаров")
+    print(f"✅ {cat:30} {result.count or 0:>6} товаров")
 
 print("\n" + "=" * 80)
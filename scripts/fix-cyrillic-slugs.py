@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """
 Исправляет ВСЕ slug с кириллицей на латиницу (транслитерация)
+
+Замены записываются в slug_redirects, карта редиректов
+frontend/app/data/slug-redirects.json пересобирается (slug_redirects.py).
 """
 import os
 import re
 import sys
 from supabase import create_client
 
+from slug_redirects import export_redirect_map, record_redirects
+
 # Загрузка переменных из .env
 def load_env():
     env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
@@ -72,6 +77,7 @@ print("\n🔧 Начинаем исправление...\n")
 
 fixed_count = 0
 errors = []
+redirects = {}
 batch = []
 BATCH_SIZE = 100
 
@@ -100,6 +106,7 @@ for i, product in enumerate(products_with_cyrillic, 1):
                 try:
                     supabase.table("products").update({"slug": item['new_slug']}).eq("id", item['id']).execute()
                     fixed_count += 1
+                    redirects[item['old_slug']] = item['new_slug']
                 except Exception as e:
                     errors.append(f"ID {item['id']}: {str(e)}")
 
@@ -112,10 +119,15 @@ if batch:
         try:
             supabase.table("products").update({"slug": item['new_slug']}).eq("id", item['id']).execute()
             fixed_count += 1
+            redirects[item['old_slug']] = item['new_slug']
         except Exception as e:
             errors.append(f"ID {item['id']}: {str(e)}")
 
 print(f"\n✅ Исправлено: {fixed_count} товаров")
+
+# Старые URL → новые
+record_redirects(supabase, redirects)
+export_redirect_map(supabase)
 print(f"❌ Ошибок: {len(errors)}")
 
 if errors:
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Исправление slug категорий DongFeng для соответствия роутингу Next.js
+
+Замены записываются в slug_redirects (entity = category), карта
+редиректов фронтенда (/catalog/parts/<старый slug> → 308) пересобирается.
 """
 
 import os
@@ -8,6 +11,8 @@ from pathlib import Path
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from slug_redirects import export_redirect_map, record_redirects
+
 # Отключаем прокси
 os.environ.pop('HTTP_PROXY', None)
 os.environ.pop('HTTPS_PROXY', None)
@@ -47,6 +52,8 @@ SLUG_UPDATES = {
 
 print("📝 Обновление slug категорий...\n")
 
+redirects = {}
+
 for old_slug, new_slug in SLUG_UPDATES.items():
     try:
         # Проверяем существует ли категория со старым slug
@@ -66,12 +73,16 @@ for old_slug, new_slug in SLUG_UPDATES.items():
 
         if result.data:
             print(f"✅ {old_slug:30} → {new_slug}")
+            redirects[old_slug] = new_slug
         else:
             print(f"❌ Ошибка обновления {old_slug}")
 
     except Exception as e:
         print(f"❌ Ошибка для {old_slug}: {str(e)[:50]}")
 
+record_redirects(supabase, redirects, entity="category")
+export_redirect_map(supabase)
+
 print("\n" + "="*80)
 print("✅ ГОТОВО! Slug категорий обновлены")
 print("="*80)
@@ -2,12 +2,17 @@
 """
 Исправляет slug товаров начинающихся с 'неизвестно-'
 Заменяет на manufacturer + остальная часть slug
+
+Замены записываются в slug_redirects, карта редиректов
+frontend/app/data/slug-redirects.json пересобирается (slug_redirects.py).
 """
 
 import os
 
 from supabase import create_client
 
+from slug_redirects import export_redirect_map, record_redirects
+
 url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase = create_client(url, key)
@@ -25,6 +30,7 @@ print()
 
 fixed_count = 0
 errors = []
+redirects = {}
 
 for product in response.data:
     old_slug = product["slug"]
@@ -46,11 +52,16 @@ for product in response.data:
         ).execute()
         print(f"✓ ID {product['id']}: {old_slug[:50]} → {new_slug[:50]}")
         fixed_count += 1
+        redirects[old_slug] = new_slug
     except Exception as e:
         error_msg = f"✗ ID {product['id']}: {str(e)}"
         print(error_msg)
         errors.append(error_msg)
 
+# Старые URL → новые
+record_redirects(supabase, redirects)
+export_redirect_map(supabase)
+
 print()
 print(f"Исправлено: {fixed_count}")
 print(f"Ошибок: {len(errors)}")
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+ПРОИЗВОДНЫЕ КАРТИНКИ ТОВАРОВ (WebP / AVIF + размытая заглушка)
+
+Картинки лежат в Storage в том размере, в каком их отдал источник
+(кэш tata - 410x410, zip-agro - до 1000px+), а сетка каталога качает
+оригиналы целиком. Здесь, для уже зеркалированных картинок (image_mirror.py):
+
+1. Оригинал читается из Storage, Pillow режет его в пуле процессов
+   (ProcessPoolExecutor - кодирование WebP/AVIF упирается в CPU, не в сеть)
+2. WebP (и AVIF: formats=("webp", "avif")) ширины WIDTHS - без увеличения:
+   картинка уже ширины 410 даёт 160 / 320 / 410
+3. Заглушка 16px с размытием - data URI прямо в JSON, без запроса
+4. Файлы ложатся рядом с оригиналом: products/ab/<sha>-320w.webp
+5. specifications.images = {"base", "widths", "formats", "width", "height",
+   "placeholder"} - фронтенд (frontend/app/lib/productImages.ts) строит
+   srcset без запросов к Storage
+
+Одна картинка на многих товарах (путь - хеш содержимого) режется один раз.
+Манифест (MirrorManifest) - повторный запуск не режет готовое в тех же
+форматах; запуск с другим набором форматов (--avif после WebP) режет заново.
+
+Использование:
+    from image_derivatives import build_derivatives, images_batches
+
+    async with ImageMirror.from_env() as mirror:
+        done = await build_derivatives(mirror, urls, MirrorManifest("image-derivatives.manifest.jsonl"))
+    journal.start("image-derivatives", images_batches(products, done))
+"""
+
+import asyncio
+import base64
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageFilter, ImageOps, features
+
+from image_mirror import ImageMirror, MirrorError, MirrorManifest
+from op_journal import batches
+
+WIDTHS = (160, 320, 640, 960)
+FORMATS = ("webp",)
+QUALITY = {"webp": 78, "avif": 55}
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+PLACEHOLDER_WIDTH = 16
+# Ширина карточки в сетке каталога (для отчёта об экономии)
+GRID_WIDTH = 320
+SPEC_KEY = "images"
+SPEC_BATCH_SIZE = 500
+
+
+def avif_supported() -> bool:
+    """Pillow собран с AVIF (Pillow >= 11.3 или плагин pillow-avif-plugin)"""
+    try:
+        return bool(features.check("avif"))
+    except ValueError:
+        return False
+
+
+def render(body: bytes, widths=WIDTHS, formats=FORMATS) -> dict:
+    """
+    Выполняется в процессе пула: оригинал → {"width", "height", "files":
+    [{"width", "format", "body"}], "placeholder"}
+    """
+    with Image.open(io.BytesIO(body)) as source:
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    width, height = image.size
+    files = []
+    for target in sorted({min(w, width) for w in widths}):
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS
+        )
+        for fmt in formats:
+            out = io.BytesIO()
+            if fmt == "webp":
+                resized.save(out, "WEBP", quality=QUALITY[fmt], method=6)
+            else:
+                resized.save(out, fmt.upper(), quality=QUALITY[fmt])
+            files.append({"width": target, "format": fmt, "body": out.getvalue()})
+
+    tiny = image.resize(
+        (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))), Image.BILINEAR
+    ).filter(ImageFilter.GaussianBlur(1))
+    out = io.BytesIO()
+    tiny.save(out, "WEBP", quality=30)
+    placeholder = "data:image/webp;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
+    return {"width": width, "height": height, "files": files, "placeholder": placeholder}
+
+
+async def build_derivatives(
+    mirror: ImageMirror,
+    urls,
+    manifest: MirrorManifest | None = None,
+    widths=WIDTHS,
+    formats=FORMATS,
+    processes: int | None = None,
+    progress_every: int = 100,
+) -> dict:
+    """
+    Оригиналы из Storage → производные рядом с ними.
+    Возвращает {url оригинала: значение specifications.images}; чужие URL и
+    ошибки (в манифесте - с "error") пропускаются.
+    """
+    processes = processes or os.cpu_count() or 2
+    loop = asyncio.get_running_loop()
+    # В полёте не больше двух оригиналов на процесс - память не растёт
+    # на тысячах картинок
+    slots = asyncio.Semaphore(processes * 2)
+    stats = {"rendered": 0, "resumed": 0, "failed": 0, "bytes_in": 0, "bytes_grid": 0}
+    results = {}
+
+    async def one(url, pool):
+        done = manifest.get(url) if manifest else None
+        if done and done["images"].get("formats") == list(formats):
+            stats["resumed"] += 1
+            results[url] = done["images"]
+            return
+
+        bucket, path = mirror.storage_path(url)
+        base = path.rsplit(".", 1)[0] if path else None
+        try:
+            if not base:
+                raise MirrorError("картинка не в нашем Storage")
+            async with slots:
+                body = (await mirror.fetch(url))[0]
+                rendered = await loop.run_in_executor(pool, render, body, widths, formats)
+                await asyncio.gather(*(
+                    mirror.put(
+                        f"{base}-{f['width']}w.{f['format']}", f["body"], CONTENT_TYPES[f["format"]], bucket
+                    )
+                    for f in rendered["files"]
+                ))
+        except (MirrorError, OSError, Image.DecompressionBombError) as e:
+            stats["failed"] += 1
+            if manifest:
+                manifest.record({"source": url, "error": str(e)[:200]})
+            return
+
+        images = {
+            "base": mirror.public_url(base, bucket),
+            "widths": sorted({f["width"] for f in rendered["files"]}),
+            "formats": list(formats),
+            "width": rendered["width"],
+            "height": rendered["height"],
+            "placeholder": rendered["placeholder"],
+        }
+        stats["rendered"] += 1
+        stats["bytes_in"] += len(body)
+        grid = min(GRID_WIDTH, rendered["width"])
+        stats["bytes_grid"] += next(
+            len(f["body"]) for f in rendered["files"] if f["width"] >= grid and f["format"] == formats[0]
+        )
+        results[url] = images
+        if manifest:
+            manifest.record({"source": url, "images": images})
+
+        if progress_every and stats["rendered"] % progress_every == 0:
+            print(f"  ✓ Нарезано {stats['rendered']} (ошибок: {stats['failed']})")
+
+    urls = list(dict.fromkeys(u for u in urls if u))
+    with ProcessPoolExecutor(processes) as pool:
+        await asyncio.gather(*(one(url, pool) for url in urls))
+
+    print(
+        f"🖼️  Производные: нарезано {stats['rendered']}, уже было {stats['resumed']}, "
+        f"ошибок {stats['failed']}; картинка сетки ({GRID_WIDTH}w) - "
+        f"{stats['bytes_grid'] / max(stats['bytes_in'], 1):.0%} байт оригинала"
+    )
+    return results
+
+
+def images_batches(products: list, images: dict, batch_size: int = SPEC_BATCH_SIZE) -> list:
+    """
+    products - [{"id", "image_url", "specifications"}] → пачки журнала merge:
+    specifications.images = производные; откат - прежнее значение
+    """
+    forward, inverse = [], []
+    for product in sorted(products, key=lambda p: p["id"]):
+        new = images.get(product["image_url"])
+        old = (product.get("specifications") or {}).get(SPEC_KEY)
+        if not new or new == old:
+            continue
+        forward.append({"id": product["id"], "patch": {SPEC_KEY: new}})
+        inverse.append(
+            {"id": product["id"], "patch": {SPEC_KEY: old}} if old
+            else {"id": product["id"], "remove": [SPEC_KEY]}
+        )
+    return batches("merge", forward, inverse, batch_size)
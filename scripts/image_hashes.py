@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+ПЕРЦЕПТИВНЫЕ ХЕШИ КАРТИНОК (pHash / dHash + BK-дерево)
+
+SHA-256 (image_mirror.py) ловит только байт-в-байт одинаковые файлы. Одна
+и та же фотография, пережатая или уменьшенная другим сайтом, и заглушки
+"нет фото" источников - разные байты. Здесь:
+
+1. pHash (DCT 32x32 → 8x8 низких частот, бит = выше медианы) и dHash
+   (градиент 9x8) - по 64 бита, в БД - BIGINT (docs/migrations/image-hashes.sql)
+2. BKTree - поиск всех хешей на расстоянии Хэмминга <= r без перебора
+   всего индекса (int.bit_count, метрика - неравенство треугольника)
+3. ImageIndex - таблица image_hashes в памяти: URL → хеши, BK-дерево по
+   pHash, заглушки. Используется:
+   - image_mirror.ImageMirror(index=...) - не качать URL с известным
+     содержимым, не заливать почти одинаковые копии и заглушки
+   - near_duplicates.find_duplicate_clusters(image_hashes=...) - одна
+     фотография как второй признак дубля товара
+4. group_hashes() - кластеры почти одинаковых картинок вокруг центра
+   (близки и pHash, и dHash - similar(); без цепочек похожих фото на
+   белом фоне); кластер у многих товаров с разными названиями - заглушка
+   (find_placeholders)
+
+Использование:
+    from image_hashes import ImageIndex, image_hashes
+
+    hashes = image_hashes(body)                 # {"phash", "dhash", "width", "height"}
+    index = ImageIndex.load(supabase)
+    index.near(hashes["phash"], radius=4)       # [(расстояние, image_url), ...]
+"""
+
+import io
+from collections import defaultdict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_BITS = 64
+_MASK = (1 << HASH_BITS) - 1
+
+# Почти одинаковые: пережатие / уменьшение / лёгкая обрезка
+NEAR_RADIUS = 6
+# Та же картинка (повторная загрузка): заливать не нужно
+SAME_RADIUS = 2
+# Заглушка: кластер у стольких товаров с разными названиями
+PLACEHOLDER_MIN_PRODUCTS = 20
+PLACEHOLDER_MIN_NAMES = 10
+
+# Матрица DCT-II 32x32 (масштаб не важен - сравнивается с медианой)
+_N = 32
+_DCT = np.cos(np.pi * (2 * np.arange(_N)[None, :] + 1) * np.arange(_N)[:, None] / (2 * _N))
+
+
+def _to_int(bits: np.ndarray) -> int:
+    """64 бита → знаковое int64 (как BIGINT в Postgres)"""
+    value = int.from_bytes(np.packbits(bits.astype(np.uint8)).tobytes(), "big")
+    return value - (1 << HASH_BITS) if value >> (HASH_BITS - 1) else value
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK).bit_count()
+
+
+def similar(a: dict, b: dict, radius: int = NEAR_RADIUS) -> bool:
+    """Одна картинка: близки и pHash, и dHash (одного pHash мало - низкие
+    частоты совпадают у похожих фото разных деталей)"""
+    return hamming(a["phash"], b["phash"]) <= radius and hamming(a["dhash"], b["dhash"]) <= radius
+
+
+def phash(image: Image.Image) -> int:
+    pixels = np.asarray(image.convert("L").resize((_N, _N), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8].flatten()
+    # Постоянная составляющая (яркость) в медиану не входит
+    return _to_int(low > np.median(low[1:]))
+
+
+def dhash(image: Image.Image) -> int:
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _to_int((pixels[:, 1:] > pixels[:, :-1]).flatten())
+
+
+def image_hashes(body: bytes) -> dict:
+    """Картинка → {"phash", "dhash", "width", "height"} (можно звать в пуле процессов)"""
+    with Image.open(io.BytesIO(body)) as source:
+        width, height = source.size
+        source.draft("L", (_N * 4, _N * 4))
+        image = ImageOps.exif_transpose(source).convert("L")
+    return {"phash": phash(image), "dhash": dhash(image), "width": width, "height": height}
+
+
+class BKTree:
+    """
+    BK-дерево по расстоянию Хэмминга: узел - [хеш, значения, {расстояние:
+    потомок}]. query(h, r) обходит только потомков с |d - dist| <= r.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item=None):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value: int, radius: int) -> list:
+        """[(расстояние, значение), ...] всех хешей в радиусе, ближние первыми"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            for d, child in node[2].items():
+                if distance - radius <= d <= distance + radius:
+                    stack.append(child)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class ImageIndex:
+    """image_hashes в памяти: {url: строка}, {sha256: [url]} + BK-дерево по pHash"""
+
+    def __init__(self, rows=()):
+        self.rows = {}
+        self.by_sha = defaultdict(list)
+        self.tree = BKTree()
+        self.placeholders = BKTree()
+        for row in rows:
+            self.add(row)
+
+    @classmethod
+    def load(cls, supabase, page_size: int = 1000) -> "ImageIndex":
+        """Вся таблица image_hashes (keyset-пагинация по image_url)"""
+        index = cls()
+        last_url = ""
+
+        while True:
+            batch = (
+                supabase.table("image_hashes")
+                .select("image_url, sha256, phash, dhash, width, height, is_placeholder")
+                .gt("image_url", last_url)
+                .order("image_url")
+                .limit(page_size)
+                .execute()
+            )
+            if not batch.data:
+                break
+
+            for row in batch.data:
+                index.add(row)
+            last_url = batch.data[-1]["image_url"]
+
+            if len(batch.data) < page_size:
+                break
+
+        return index
+
+    def add(self, row: dict):
+        if row["image_url"] in self.rows:
+            return
+        self.rows[row["image_url"]] = row
+        self.by_sha[row["sha256"]].append(row["image_url"])
+        self.tree.add(row["phash"], row["image_url"])
+        if row.get("is_placeholder"):
+            self.placeholders.add(row["phash"], row["image_url"])
+
+    def get(self, url: str) -> dict | None:
+        return self.rows.get(url)
+
+    def near(self, value: int, radius: int = NEAR_RADIUS) -> list:
+        """[(расстояние, image_url), ...] по pHash"""
+        return self.tree.query(value, radius)
+
+    def is_placeholder(self, hashes: dict, radius: int = NEAR_RADIUS) -> bool:
+        """Картинка (хеши image_hashes()) - копия заглушки по pHash и dHash"""
+        return any(
+            similar(hashes, self.rows[url], radius)
+            for _, url in self.placeholders.query(hashes["phash"], radius)
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+def group_hashes(rows: list, radius: int = NEAR_RADIUS) -> list:
+    """
+    Кластеры почти одинаковых картинок: [[строка image_hashes, ...], ...],
+    только кластеры от двух URL. Центр - картинка с наибольшим числом
+    соседей (similar() в радиусе), в кластер идут только соседи центра:
+    без транзитивных цепочек A ~ B ~ C, где A и C уже разные картинки.
+    """
+    tree = BKTree()
+    for i, row in enumerate(rows):
+        tree.add(row["phash"], i)
+
+    neighbors = [
+        [j for _, j in tree.query(row["phash"], radius) if similar(row, rows[j], radius)]
+        for row in rows
+    ]
+
+    assigned = set()
+    groups = []
+    for centre in sorted(range(len(rows)), key=lambda i: (-len(neighbors[i]), i)):
+        if centre in assigned:
+            continue
+        members = [j for j in neighbors[centre] if j not in assigned]
+        assigned.update(members)
+        assigned.add(centre)
+        if len(members) > 1:
+            groups.append([rows[j] for j in sorted(members)])
+    return sorted(groups, key=len, reverse=True)
+
+
+def find_placeholders(
+    groups: list,
+    products_by_url: dict,
+    min_products: int = PLACEHOLDER_MIN_PRODUCTS,
+    min_names: int = PLACEHOLDER_MIN_NAMES,
+) -> list:
+    """
+    Кластеры-заглушки: картинку показывают >= min_products товаров
+    с >= min_names разными названиями (у дублей одного товара
+    названия одинаковые - это не заглушка)
+    """
+    placeholders = []
+    for group in groups:
+        products = [p for row in group for p in products_by_url.get(row["image_url"], [])]
+        names = {" ".join((p.get("name") or "").lower().split()) for p in products}
+        if len(products) >= min_products and len(names) >= min_names:
+            placeholders.append(group)
+    return placeholders
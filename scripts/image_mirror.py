@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+ЗЕРКАЛИРОВАНИЕ КАРТИНОК В SUPABASE STORAGE
+
+Вместо requests.get → временный файл → upload → update().eq("id", ...)
+по одному товару (download-and-upload-images.py, upload-dongfeng-images.py,
+reupload-dongfeng-images.py):
+
+1. Один httpx.AsyncClient на скачивание и один на Storage; скачиваний и
+   загрузок в полёте - не больше download_concurrency / upload_concurrency
+2. Тело читается потоком сразу в SHA-256 - без временных файлов
+3. Путь в Storage - хеш содержимого (products/ab/abcd....jpg): одинаковая
+   картинка хранится один раз, сколько бы товаров и URL на неё ни ссылалось;
+   перезаливка новой версии = новый путь, старый кэш CDN не мешает
+4. Манифест (append-only JSONL, fsync на запись): повторный запуск не
+   скачивает уже зеркалированные URL и не заливает уже лежащие хеши
+5. URL в БД пишутся в конце, пачками через журнал операций
+   (image_url_batches → merge_specifications_bulk) - с откатом --rollback
+6. С перцептивным индексом (index=ImageIndex, image_hashes.py): URL с
+   известным содержимым, которое уже лежит в Storage, не скачивается;
+   заглушки источников не заливаются (ошибка "заглушка источника");
+   почти одинаковая копия уже залитой картинки (пережатая, другой
+   размер; близки и pHash, и dHash) получает путь той картинки. Новые хеши - в mirror.hashed
+   (для таблицы image_hashes)
+
+Использование:
+    import asyncio
+    from image_mirror import ImageMirror, MirrorManifest, image_url_batches
+
+    async def main():
+        manifest = MirrorManifest("mirror-images.manifest.jsonl")
+        async with ImageMirror.from_env(manifest=manifest) as mirror:
+            return await mirror.mirror_all(urls)    # {url: {"public_url", ...}}
+
+    results = asyncio.run(main())
+    journal.start("mirror-images", image_url_batches({id: (old_url, new_url)}))
+    journal.run(make_executor(supabase))
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+from urllib.parse import urlparse
+
+import httpx
+
+from aimd import OVERLOAD_STATUSES
+from image_hashes import SAME_RADIUS, ImageIndex, hamming, image_hashes
+from op_journal import batches
+
+BUCKET_NAME = "product-images"
+STORAGE_PREFIX = "products"
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+URL_BATCH_SIZE = 500
+SLUG_BATCH_SIZE = 200
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+CONTENT_TYPES = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+    "image/avif": "avif",
+}
+EXTENSIONS = {"jpg": "image/jpeg", "jpeg": "image/jpeg", **{v: k for k, v in CONTENT_TYPES.items() if v != "jpg"}}
+
+
+class MirrorError(Exception):
+    """Картинку не удалось скачать или залить (после всех повторов)"""
+
+
+def image_type(content_type: str, name: str = "") -> tuple:
+    """(content-type, расширение) по заголовку, иначе по расширению в URL / имени файла"""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in CONTENT_TYPES:
+        ext = CONTENT_TYPES[content_type]
+        return EXTENSIONS[ext], ext
+
+    ext = Path(urlparse(name).path).suffix.lstrip(".").lower()
+    if ext in EXTENSIONS:
+        return EXTENSIONS[ext], "jpg" if ext == "jpeg" else ext
+    return None, None
+
+
+def web_client(concurrency: int = 16, timeout: float = 30.0) -> httpx.AsyncClient:
+    """Клиент для скачивания с сайтов-источников (keep-alive пул, редиректы)"""
+    return httpx.AsyncClient(
+        timeout=timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def fetch_image(client: httpx.AsyncClient, url: str, max_bytes: int = MAX_IMAGE_BYTES) -> tuple:
+    """(тело, content-type, расширение, sha256) - тело читается потоком сразу в хеш"""
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        content_type, ext = image_type(response.headers.get("content-type"), url)
+        if not content_type:
+            raise MirrorError(f"не картинка: {response.headers.get('content-type')}")
+
+        digest, body = hashlib.sha256(), bytearray()
+        async for chunk in response.aiter_bytes():
+            digest.update(chunk)
+            body += chunk
+            if len(body) > max_bytes:
+                raise MirrorError(f"больше {max_bytes // (1024 * 1024)} МБ")
+        return bytes(body), content_type, ext, digest.hexdigest()
+
+
+class MirrorManifest:
+    """
+    source (URL или путь к файлу) → результат. Последняя запись источника
+    побеждает; ошибки повторяются при следующем запуске.
+
+        {"source": "...", "sha256": "...", "path": "...", "public_url": "...", "bytes": N}
+        {"source": "...", "error": "..."}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.stored = {}
+        self._torn = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                self._torn = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная последняя строка (обрыв во время записи)
+                    continue
+                self._remember(entry)
+
+    def _remember(self, entry: dict):
+        self.entries[entry["source"]] = entry
+        if "sha256" in entry:
+            self.stored[entry["sha256"]] = entry
+
+    def get(self, source: str) -> dict | None:
+        """Успешный результат по источнику (None - ещё не зеркалирован или упал)"""
+        entry = self.entries.get(source)
+        return entry if entry and "error" not in entry else None
+
+    def record(self, entry: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._torn:
+                f.write("\n")
+                self._torn = False
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._remember(entry)
+
+
+class ImageMirror:
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        bucket: str = BUCKET_NAME,
+        prefix: str = STORAGE_PREFIX,
+        manifest: MirrorManifest | None = None,
+        download_concurrency: int = 16,
+        upload_concurrency: int = 8,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        max_bytes: int = MAX_IMAGE_BYTES,
+        index: ImageIndex | None = None,
+    ):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.manifest = manifest
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_bytes = max_bytes
+        self.index = index
+        # Хеши скачанных в этом запуске картинок (строки image_hashes)
+        self.hashed = []
+
+        self.stats = {
+            "downloaded": 0, "uploaded": 0, "deduped": 0,
+            "resumed": 0, "failed": 0, "bytes": 0,
+            "known": 0, "near": 0, "placeholders": 0,
+        }
+        self._download_slots = asyncio.Semaphore(download_concurrency)
+        self._upload_slots = asyncio.Semaphore(upload_concurrency)
+        # Скачанные, но ещё не залитые тела: скачивание ждёт, пока загрузка
+        # не освободит место - память ограничена лимитами, а не числом URL
+        self._bodies = asyncio.Semaphore(download_concurrency + upload_concurrency)
+        self._concurrency = download_concurrency + upload_concurrency
+        # sha256 → задача загрузки: одинаковые картинки внутри запуска
+        # ждут одну загрузку
+        self._uploads = {}
+        self._web: httpx.AsyncClient | None = None
+        self._storage: httpx.AsyncClient | None = None
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "ImageMirror":
+        url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+        key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        if not url or not key:
+            raise RuntimeError("Установите SUPABASE_URL и SUPABASE_SERVICE_ROLE_KEY")
+        return cls(url, key, **kwargs)
+
+    async def __aenter__(self):
+        self._web = web_client(self._concurrency, self.timeout)
+        self._storage = httpx.AsyncClient(
+            base_url=f"{self.url}/storage/v1",
+            http2=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self._concurrency, max_keepalive_connections=self._concurrency
+            ),
+            headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._web.aclose()
+        await self._storage.aclose()
+        self._web = self._storage = None
+
+    def public_url(self, path: str, bucket: str | None = None) -> str:
+        return f"{self.url}/storage/v1/object/public/{bucket or self.bucket}/{path}"
+
+    def storage_path(self, url: str) -> tuple:
+        """Публичный URL нашего Storage → (bucket, путь); (None, None) - чужой URL"""
+        if not self.is_mirrored(url):
+            return None, None
+        bucket, _, path = url[len(f"{self.url}/storage/v1/object/public/"):].partition("/")
+        return bucket, path.split("?")[0]
+
+    def is_mirrored(self, url: str) -> bool:
+        """URL уже указывает на наш Storage"""
+        return (url or "").startswith(f"{self.url}/storage/v1/object/public/")
+
+    # ------------------------------------------------------------------
+    # Скачивание / загрузка с повторами
+    # ------------------------------------------------------------------
+    async def _retry(self, call):
+        for attempt in range(self.max_retries):
+            try:
+                return await call()
+            except httpx.TransportError as e:
+                error = e
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in OVERLOAD_STATUSES:
+                    raise MirrorError(f"HTTP {e.response.status_code}") from e
+                error = e
+            except (httpx.HTTPError, httpx.InvalidURL) as e:
+                # Повтор не поможет (цикл редиректов, битый gzip, кривой URL):
+                # ошибка источника, а не всего прогона
+                raise MirrorError(f"{type(e).__name__}: {str(e)[:100]}") from e
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(2.0 ** attempt)
+        raise MirrorError(f"{type(error).__name__}: {str(error)[:100]}")
+
+    async def fetch(self, url: str) -> tuple:
+        """(тело, content-type, расширение, sha256) с повторами"""
+
+        async def call():
+            return await fetch_image(self._web, url, self.max_bytes)
+
+        async with self._download_slots:
+            result = await self._retry(call)
+        self.stats["downloaded"] += 1
+        self.stats["bytes"] += len(result[0])
+        return result
+
+    async def store(self, body: bytes, content_type: str, ext: str, sha256: str | None = None) -> dict:
+        """Заливает содержимое по пути-хешу (уже залитое не заливается) → запись манифеста"""
+        sha256 = sha256 or hashlib.sha256(body).hexdigest()
+        stored = self.manifest.stored.get(sha256) if self.manifest else None
+        if stored:
+            self.stats["deduped"] += 1
+            return {key: stored[key] for key in ("sha256", "path", "public_url", "bytes")}
+
+        if sha256 in self._uploads:
+            self.stats["deduped"] += 1
+            return await self._uploads[sha256]
+
+        path = f"{self.prefix}/{sha256[:2]}/{sha256}.{ext}"
+        entry = {"sha256": sha256, "path": path, "public_url": self.public_url(path), "bytes": len(body)}
+        task = asyncio.ensure_future(self._upload(entry, body, content_type))
+        self._uploads[sha256] = task
+        try:
+            return await task
+        except Exception:
+            # Следующий источник с тем же содержимым попробует снова
+            del self._uploads[sha256]
+            raise
+
+    async def put(self, path: str, body: bytes, content_type: str, bucket: str | None = None) -> dict:
+        """Заливка по заданному пути (производные картинки рядом с оригиналом)"""
+        entry = {"path": path, "public_url": self.public_url(path, bucket), "bytes": len(body)}
+        return await self._upload(entry, body, content_type, bucket)
+
+    async def _upload(self, entry: dict, body: bytes, content_type: str, bucket: str | None = None) -> dict:
+        async def call():
+            response = await self._storage.post(
+                f"/object/{bucket or self.bucket}/{entry['path']}",
+                content=body,
+                headers={
+                    "Content-Type": content_type,
+                    # Путь от хеша содержимого: файл по нему никогда не меняется
+                    "Cache-Control": "max-age=31536000, immutable",
+                    "x-upsert": "false",
+                },
+            )
+            if response.status_code == 409 or "Duplicate" in response.text:
+                # Уже лежит (прошлый запуск без манифеста) - то же содержимое
+                return False
+            response.raise_for_status()
+            return True
+
+        async with self._upload_slots:
+            if await self._retry(call):
+                self.stats["uploaded"] += 1
+            else:
+                self.stats["deduped"] += 1
+        return entry
+
+    # ------------------------------------------------------------------
+    # Источники
+    # ------------------------------------------------------------------
+    async def _mirror(self, source: str, load, resume: bool = True) -> dict:
+        done = self.manifest.get(source) if self.manifest and resume else None
+        if done:
+            self.stats["resumed"] += 1
+            return done
+
+        known = self.index.get(source) if self.index and resume else None
+        copy = self._stored_copy(source) if known and not known.get("is_placeholder") else None
+        if copy:
+            # Содержимое URL известно по индексу и уже лежит в Storage
+            self.stats["known"] += 1
+            entry = {"source": source, **copy}
+            if self.manifest:
+                self.manifest.record(entry)
+            return entry
+
+        try:
+            if known and known.get("is_placeholder"):
+                self.stats["placeholders"] += 1
+                raise MirrorError("заглушка источника")
+            async with self._bodies:
+                body, content_type, ext, sha256 = await load()
+                hashes, copy = await self._match(source, body, sha256) if self.index else (None, None)
+                entry = {"source": source, **(copy or await self.store(body, content_type, ext, sha256))}
+            if hashes:
+                self._remember(entry["public_url"], entry["sha256"], hashes)
+        except (MirrorError, OSError) as e:
+            self.stats["failed"] += 1
+            entry = {"source": source, "error": str(e)[:200]}
+
+        if self.manifest:
+            self.manifest.record(entry)
+        return entry
+
+    # ------------------------------------------------------------------
+    # Перцептивный индекс
+    # ------------------------------------------------------------------
+    def _stored_copy(self, url: str) -> dict | None:
+        """Залитая копия картинки из индекса: по sha256 в манифесте или URL нашего Storage с тем же sha256"""
+        row = self.index.get(url)
+        if not row:
+            return None
+        stored = self.manifest.stored.get(row["sha256"]) if self.manifest else None
+        if stored:
+            return {key: stored[key] for key in ("sha256", "path", "public_url", "bytes")}
+        for copy in self.index.by_sha.get(row["sha256"], ()):
+            if self.is_mirrored(copy):
+                return {"sha256": row["sha256"], "path": self.storage_path(copy)[1], "public_url": copy, "bytes": None}
+        return None
+
+    async def _match(self, source: str, body: bytes, sha256: str) -> tuple:
+        """
+        Скачанная картинка → (хеши, почти одинаковая залитая копия или None).
+        Заглушка источника - MirrorError; формат, который Pillow не читает, -
+        (None, None): картинка зеркалируется без хеша.
+        """
+        try:
+            hashes = await asyncio.to_thread(image_hashes, body)
+        except (OSError, ValueError):
+            return None, None
+
+        if self.index.is_placeholder(hashes):
+            self.stats["placeholders"] += 1
+            self._remember(source, sha256, hashes, is_placeholder=True)
+            raise MirrorError("заглушка источника")
+
+        self._remember(source, sha256, hashes)
+        for _, url in self.index.near(hashes["phash"], SAME_RADIUS):
+            # Одного pHash мало (низкие частоты совпадают у похожих фото
+            # разных деталей) - нужен и близкий градиент dHash
+            if hamming(hashes["dhash"], self.index.get(url)["dhash"]) > SAME_RADIUS:
+                continue
+            copy = self._stored_copy(url)
+            if not copy:
+                continue
+            if copy["sha256"] == sha256:
+                # То же содержимое - store() отсечёт по хешу
+                break
+            self.stats["near"] += 1
+            return hashes, copy
+        return hashes, None
+
+    def _remember(self, url: str, sha256: str, hashes: dict, is_placeholder: bool = False):
+        if self.index.get(url):
+            return
+        row = {"image_url": url, "sha256": sha256, **hashes, "is_placeholder": is_placeholder}
+        self.index.add(row)
+        self.hashed.append(row)
+
+    # ------------------------------------------------------------------
+    # Точки входа
+    # ------------------------------------------------------------------
+    async def mirror(self, url: str) -> dict:
+        """Внешний URL → Storage"""
+        return await self._mirror(url, lambda: self.fetch(url))
+
+    async def mirror_file(self, path) -> dict:
+        """
+        Локальный файл → Storage. Файл всегда читается заново (его могли
+        заменить), повторная загрузка отсекается по хешу в манифесте.
+        """
+        path = Path(path)
+
+        async def load():
+            content_type, ext = image_type("", path.name)
+            if not content_type:
+                raise MirrorError(f"не картинка: {path.name}")
+            body = await asyncio.to_thread(path.read_bytes)
+            return body, content_type, ext, hashlib.sha256(body).hexdigest()
+
+        return await self._mirror(str(path), load, resume=False)
+
+    async def mirror_all(self, sources, files: bool = False, progress_every: int = 100) -> dict:
+        """Все источники параллельно (в пределах лимитов) → {source: запись манифеста}"""
+        sources = list(dict.fromkeys(s for s in sources if s))
+        mirror = self.mirror_file if files else self.mirror
+        results, done = {}, 0
+
+        async def one(source):
+            nonlocal done
+            results[str(source)] = await mirror(source)
+            done += 1
+            if progress_every and done % progress_every == 0:
+                print(
+                    f"  ✓ {done}/{len(sources)} (залито: {self.stats['uploaded']}, "
+                    f"уже было: {self.stats['deduped'] + self.stats['resumed']}, "
+                    f"ошибок: {self.stats['failed']})"
+                )
+
+        await asyncio.gather(*(one(source) for source in sources))
+        return results
+
+
+def image_url_batches(changes: dict, batch_size: int = URL_BATCH_SIZE) -> list:
+    """
+    {id: (старый URL, новый URL)} → пачки журнала вида merge
+    (fields.image_url, docs/migrations/merge-specifications.sql);
+    откат возвращает старые URL
+    """
+    ids = sorted(i for i, (old, new) in changes.items() if new and old != new)
+    forward = [{"id": i, "fields": {"image_url": changes[i][1]}} for i in ids]
+    inverse = [{"id": i, "fields": {"image_url": changes[i][0]}} for i in ids]
+    return batches("merge", forward, inverse, batch_size)
+
+
+def product_image_changes(supabase, slug_urls: dict, batch_size: int = SLUG_BATCH_SIZE) -> tuple:
+    """
+    {slug: новый URL} → ({id: (старый URL, новый URL)}, [slug без товара])
+    для image_url_batches. slug=in.(...) - пачками: длина URL запроса и
+    лимит строк PostgREST (1000)
+    """
+    slugs = list(slug_urls)
+    rows = []
+    for i in range(0, len(slugs), batch_size):
+        rows.extend(
+            supabase.table("products")
+            .select("id, slug, image_url")
+            .in_("slug", slugs[i : i + batch_size])
+            .execute()
+            .data
+        )
+
+    changes = {row["id"]: (row["image_url"], slug_urls[row["slug"]]) for row in rows}
+    missing = sorted(set(slug_urls) - {row["slug"] for row in rows})
+    return changes, missing
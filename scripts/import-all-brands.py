@@ -13,6 +13,11 @@ from pathlib import Path
 from dotenv import load_dotenv
 from supabase import Client, create_client
 
+from db_batch import insert_new
+from model_tokens import extract_models
+from slugs import SlugRegistry, slugify
+from source_identity import load_known_keys, source_fields, source_key
+
 # Загружаем переменные окружения
 load_dotenv("frontend/.env.local")
 
@@ -40,36 +45,6 @@ FILES_TO_IMPORT = [
 PARTS_CATEGORY_ID = 2  # ID категории "Запчасти"
 
 
-def create_slug(name, brand="", counter=0):
-    """Создаёт slug из названия с учетом бренда и счетчика для уникальности"""
-    translit_map = {
-        "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
-        "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
-        "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
-        "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch",
-        "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
-    }
-
-    slug = name.lower()
-    for ru, en in translit_map.items():
-        slug = slug.replace(ru, en)
-
-    # Убираем спецсимволы
-    slug = re.sub(r"[^\w\s-]", "", slug)
-    slug = re.sub(r"[-\s]+", "-", slug)
-    slug = slug.strip("-")
-
-    # Добавляем бренд в начало для уникальности
-    if brand:
-        slug = f"{brand.lower()}-{slug}"
-
-    # Добавляем счетчик если нужно
-    if counter > 0:
-        slug = f"{slug}-{counter}"
-
-    return slug[:100]
-
-
 def parse_price(price_str):
     """Извлекает числовое значение цены"""
     if not price_str:
@@ -106,7 +81,7 @@ def detect_brand(product):
     return "UNIVERSAL"
 
 
-def normalize_product(product, slug_counter=0):
+def normalize_product(product, slug):
     """Нормализует структуру товара (ZIP-AGRO и TATA-AGRO имеют разные поля)"""
     # ZIP-AGRO использует: title, article, price, brand, category, stock, description, url, image_url
     # TATA-AGRO использует те же поля
@@ -121,7 +96,7 @@ def normalize_product(product, slug_counter=0):
 
     return {
         "name": name,
-        "slug": create_slug(name, brand, slug_counter),
+        "slug": slug,
         "category_id": PARTS_CATEGORY_ID,
         "price": price,
         "old_price": None,
@@ -130,6 +105,8 @@ def normalize_product(product, slug_counter=0):
         "description": description if description else f"Запчасть для минитрактора {brand}",
         "manufacturer": brand,
         "model": article if article else None,
+        "compatible_models": extract_models(name, article, description),
+        **source_fields(product),
         "specifications": {
             "article": article,
             "source_url": source_url,
@@ -147,13 +124,19 @@ def import_all_brands():
 
     # Загружаем существующие товары
     print("🔍 Получение существующих товаров из БД...")
-    existing_response = supabase.table("products").select("name").execute()
-    existing_names = {p["name"].lower().strip() for p in existing_response.data}
-    print(f"📊 Товаров уже в БД: {len(existing_names)}\n")
+    # Дубликаты по названию отбрасывает БД (уникальный name_key,
+    # docs/migrations/name-key.sql) - названия не выгружаются
+    before_count = supabase.table("products").select("id", count="exact").limit(1).execute().count
+    # Точный ключ источника (source, source_url) - загружается постранично;
+    # ключи из product_offers - деталь уже есть под товаром другого источника
+    existing_keys = load_known_keys(supabase)
+    print(f"🔑 Товаров с ключом источника: {len(existing_keys)}")
+    # Занятые slug - один постраничный проход, дальше уникальность в памяти
+    slugs = SlugRegistry.load(supabase)
+    print(f"📊 Товаров уже в БД: {before_count}\n")
 
     all_new_products = []
     total_from_files = 0
-    slug_counter_map = {}  # Для отслеживания дубликатов slug
 
     # Загружаем все файлы
     for file_path in FILES_TO_IMPORT:
@@ -170,18 +153,15 @@ def import_all_brands():
 
         for product in products:
             name = product.get("title", product.get("name", "")).strip()
-            if name and name.lower() not in existing_names:
-                # Создаем базовый slug для проверки дубликатов
-                brand = detect_brand(product)
-                base_slug = create_slug(name, brand, 0)
-
-                # Если slug уже был, увеличиваем счетчик
-                if base_slug in slug_counter_map:
-                    slug_counter_map[base_slug] += 1
-                else:
-                    slug_counter_map[base_slug] = 0
-
-                normalized = normalize_product(product, slug_counter_map[base_slug])
+            key = source_key(product)
+            if key and key in existing_keys:
+                continue
+            if name:
+                if key:
+                    existing_keys.add(key)
+                # slug "бренд-название", занятый → -2, -3, ...
+                slug = slugs.unique(slugify(f"{detect_brand(product)} {name}"))
+                normalized = normalize_product(product, slug)
                 if normalized["name"]:
                     all_new_products.append(normalized)
                     new_count += 1
@@ -195,30 +175,22 @@ def import_all_brands():
         print("✅ Все товары уже есть в базе!")
         return
 
-    # Импортируем товары пакетами
-    BATCH_SIZE = 100
-    imported_count = 0
-    error_count = 0
-
-    for i in range(0, len(all_new_products), BATCH_SIZE):
-        batch = all_new_products[i : i + BATCH_SIZE]
-
-        try:
-            response = supabase.table("products").insert(batch).execute()
-            imported_count += len(batch)
-            print(f"✅ Импортировано {imported_count}/{len(all_new_products)} товаров")
-        except Exception as e:
-            error_count += len(batch)
-            print(f"❌ Ошибка при импорте пакета {i}-{i + BATCH_SIZE}: {str(e)[:100]}")
+    # Импортируем товары пакетами: ON CONFLICT (name_key) DO NOTHING -
+    # дубликаты (в БД и внутри выгрузки) отбрасываются за тот же запрос
+    stats = insert_new(supabase, all_new_products)
+    imported_count = stats["inserted"]
+    error_count = stats["failed"]
+    print(f"✅ Импортировано {imported_count}/{len(all_new_products)} товаров за {stats['requests']} запросов")
 
     print("\n" + "=" * 70)
     print("ИМПОРТ ЗАВЕРШЁН!")
     print("=" * 70)
     print(f"✅ Успешно импортировано: {imported_count}")
+    print(f"⏭️  Пропущено дубликатов: {stats['skipped']}")
     print(f"❌ Ошибок: {error_count}")
     print(f"📊 Всего товаров в файлах: {total_from_files}")
-    print(f"📊 Было в БД: {len(existing_names)}")
-    print(f"📊 Стало в БД: {len(existing_names) + imported_count}")
+    print(f"📊 Было в БД: {before_count}")
+    print(f"📊 Стало в БД: {before_count + imported_count}")
     print("=" * 70 + "\n")
 
 
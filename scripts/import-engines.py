@@ -8,6 +8,8 @@ import json
 import re
 from supabase import create_client
 
+from model_tokens import extract_models
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -119,6 +121,7 @@ for i, engine in enumerate(engines, 1):
             "manufacturer": manufacturer,
             "image_url": image_url,
             "in_stock": True,
+            "compatible_models": extract_models(title, description),
             "specifications": {"description": description}
         }
 
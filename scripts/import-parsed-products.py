@@ -10,7 +10,10 @@ import sys
 
 from dotenv import load_dotenv
 from supabase import Client, create_client
-from transliterate import translit
+
+from db_batch import insert_new
+from model_tokens import extract_models
+from slugs import SlugRegistry, slugify
 
 # Загружаем переменные окружения
 load_dotenv("../frontend/.env.local")
@@ -29,26 +32,6 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 INPUT_FILE = "parsed_data/agrodom/parts-complete-optimized.json"
 
 
-def create_slug(name):
-    """Создаёт slug из названия товара"""
-    try:
-        # Транслитерируем русский текст
-        transliterated = translit(name, "ru", reversed=True)
-        # Приводим к нижнему регистру
-        slug = transliterated.lower()
-        # Заменяем пробелы и специальные символы на дефисы
-        slug = re.sub(r"[^\w\s-]", "", slug)
-        slug = re.sub(r"[-\s]+", "-", slug)
-        # Убираем дефисы в начале и конце
-        slug = slug.strip("-")
-        return slug
-    except:
-        # Если транслитерация не сработала, просто удаляем спецсимволы
-        slug = re.sub(r"[^\w\s-]", "", name.lower())
-        slug = re.sub(r"[-\s]+", "-", slug)
-        return slug.strip("-")
-
-
 def parse_price(price_str):
     """Извлекает числовое значение цены из строки"""
     if not price_str:
@@ -143,28 +126,22 @@ def import_products():
 
     print(f"📦 Загружено товаров из файла: {len(products)}")
 
-    # Получаем существующие товары из БД
-    print("🔍 Проверка существующих товаров в БД...")
-    existing_response = supabase.table("products").select("name").execute()
-    existing_names = {p["name"].lower().strip() for p in existing_response.data}
-    print(f"📊 Товаров уже в БД: {len(existing_names)}")
-
-    # Фильтруем новые товары
-    new_products = []
-    for product in products:
-        name = product.get("name", "").strip()
-        if name.lower() not in existing_names:
-            new_products.append(product)
-
-    print(f"✨ Новых товаров для импорта: {len(new_products)}")
+    # Дубликаты по названию отбрасывает БД: ON CONFLICT (name_key) DO NOTHING
+    # (docs/migrations/name-key.sql) - существующие названия не выгружаются
+    new_products = [p for p in products if p.get("name", "").strip()]
+    print(f"✨ Товаров для импорта: {len(new_products)}")
 
     if not new_products:
         print("✅ Все товары уже есть в базе!")
         return
 
+    # Занятые slug - один постраничный проход по БД
+    slugs = SlugRegistry.load(supabase)
+
     # Импортируем товары пакетами
     BATCH_SIZE = 100
     imported_count = 0
+    skipped_count = 0
     error_count = 0
 
     for i in range(0, len(new_products), BATCH_SIZE):
@@ -181,12 +158,8 @@ def import_products():
             category = detect_category_from_data(product)
             part_type = detect_type_from_name(name)
 
-            # Формируем slug
-            base_slug = create_slug(name)
-            if brand:
-                slug = f"{brand}-{part_type}-{base_slug}"[:100]
-            else:
-                slug = f"universal-{part_type}-{base_slug}"[:100]
+            # Формируем slug: бренд-тип-название, занятый → -2, -3, ...
+            slug = slugs.unique(slugify(f"{brand or 'universal'} {part_type} {name}"))
 
             product_data = {
                 "name": name,
@@ -199,6 +172,7 @@ def import_products():
                 "image_url": product.get("image_url", ""),
                 "description": f"Запчасть для минитракторов. Источник: {product.get('link', '')}",
                 "manufacturer": brand if brand else "universal",
+                "compatible_models": extract_models(name),
                 "specifications": {
                     "type": part_type,
                     "category": product.get("category", ""),
@@ -209,18 +183,17 @@ def import_products():
             batch_data.append(product_data)
 
         # Вставляем пакет в БД
-        try:
-            response = supabase.table("products").insert(batch_data).execute()
-            imported_count += len(batch_data)
-            print(f"✅ Импортировано {imported_count}/{len(new_products)} товаров")
-        except Exception as e:
-            error_count += len(batch_data)
-            print(f"❌ Ошибка при импорте пакета {i}-{i + BATCH_SIZE}: {e}")
+        stats = insert_new(supabase, batch_data, chunk_size=BATCH_SIZE)
+        imported_count += stats["inserted"]
+        skipped_count += stats["skipped"]
+        error_count += stats["failed"]
+        print(f"✅ Импортировано {imported_count}/{len(new_products)} товаров")
 
     print("\n" + "=" * 70)
     print("ИМПОРТ ЗАВЕРШЁН!")
     print("=" * 70)
     print(f"✅ Успешно импортировано: {imported_count}")
+    print(f"⏭️  Пропущено дубликатов: {skipped_count}")
     print(f"❌ Ошибок: {error_count}")
     print(f"📊 Всего товаров в файле: {len(products)}")
     print("=" * 70 + "\n")
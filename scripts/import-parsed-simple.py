@@ -12,6 +12,10 @@ import sys
 from dotenv import load_dotenv
 from supabase import Client, create_client
 
+from db_batch import insert_new
+from model_tokens import extract_models
+from slugs import SlugRegistry, slugify
+
 load_dotenv("../frontend/.env.local")
 
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
@@ -27,54 +31,6 @@ INPUT_FILE = "parsed_data/agrodom/parts-complete-optimized.json"
 PARTS_CATEGORY_ID = 2  # ID категории "Запчасти"
 
 
-def create_slug(name):
-    """Создаёт slug из названия"""
-    # Простая транслитерация основных букв
-        "а": "a",
-        "б": "b",
-        "в": "v",
-        "г": "g",
-        "д": "d",
-        "е": "e",
-        "ё": "yo",
-        "ж": "zh",
-        "з": "z",
-        "и": "i",
-        "й": "y",
-        "к": "k",
-        "л": "l",
-        "м": "m",
-        "н": "n",
-        "о": "o",
-        "п": "p",
-        "р": "r",
-        "с": "s",
-        "т": "t",
-        "у": "u",
-        "ф": "f",
-        "х": "h",
-        "ц": "ts",
-        "ч": "ch",
-        "ш": "sh",
-        "щ": "sch",
-        "ъ": "",
-        "ы": "y",
-        "ь": "",
-        "э": "e",
-        "ю": "yu",
-        "я": "ya",
-    }
-
-    slug = name.lower()
-    for ru, en in translit_map.items():
-        slug = slug.replace(ru, en)
-
-    # Убираем спецсимволы
-    slug = re.sub(r"[^\w\s-]", "", slug)
-    slug = re.sub(r"[-\s]+", "-", slug)
-    return slug.strip("-")[:100]
-
-
 def parse_price(price_str):
     """Извлекает числовое значение цены"""
     if not price_str:
@@ -100,28 +56,22 @@ def import_products():
 
     print(f"📦 Загружено товаров из файла: {len(products)}")
 
-    # Получаем существующие товары
-    print("🔍 Проверка существующих товаров...")
-    existing_response = supabase.table("products").select("name").execute()
-    existing_names = {p["name"].lower().strip() for p in existing_response.data}
-    print(f"📊 Товаров уже в БД: {len(existing_names)}")
-
-    # Фильтруем новые товары
-    new_products = []
-    for product in products:
-        name = product.get("name", "").strip()
-        if name and name.lower() not in existing_names:
-            new_products.append(product)
-
-    print(f"✨ Новых товаров для импорта: {len(new_products)}\n")
+    # Дубликаты по названию отбрасывает БД: ON CONFLICT (name_key) DO NOTHING
+    # (docs/migrations/name-key.sql) - существующие названия не выгружаются
+    new_products = [p for p in products if p.get("name", "").strip()]
+    print(f"✨ Товаров для импорта: {len(new_products)}\n")
 
     if not new_products:
         print("✅ Все товары уже есть в базе!")
         return
 
+    # Занятые slug - один постраничный проход по БД
+    slugs = SlugRegistry.load(supabase)
+
     # Импортируем товары пакетами
     BATCH_SIZE = 50
     imported_count = 0
+    skipped_count = 0
     error_count = 0
 
     for i in range(0, len(new_products), BATCH_SIZE):
@@ -134,7 +84,7 @@ def import_products():
                 continue
 
             price = parse_price(product.get("price", ""))
-            slug = create_slug(name)
+            slug = slugs.unique(slugify(name))
 
             # Формируем данные для вставки
             product_data = {
@@ -147,6 +97,7 @@ def import_products():
                 "image_url": product.get("image_url", ""),
                 "description": f"Запчасть для минитракторов. Категория: {product.get('category', '')}",
                 "manufacturer": "universal",
+                "compatible_models": extract_models(name),
                 "specifications": {
                     "category": product.get("category", ""),
                     "source_url": product.get("link", ""),
@@ -156,19 +107,17 @@ def import_products():
             batch_data.append(product_data)
 
         # Вставляем пакет
-        try:
-            response = supabase.table("products").insert(batch_data).execute()
-            imported_count += len(batch_data)
-            print(f"✅ Импортировано {imported_count}/{len(new_products)} товаров")
-        except Exception as e:
-            error_count += len(batch_data)
-            print(f"❌ Ошибка при импорте пакета {i}-{i + BATCH_SIZE}: {e}")
-            print(f"❌ Ошибка при импорте пакета {i}-{i+BATCH_SIZE}: {e}")
+        stats = insert_new(supabase, batch_data, chunk_size=BATCH_SIZE)
+        imported_count += stats["inserted"]
+        skipped_count += stats["skipped"]
+        error_count += stats["failed"]
+        print(f"✅ Импортировано {imported_count}/{len(new_products)} товаров")
 
     print("\n" + "=" * 70)
     print("ИМПОРТ ЗАВЕРШЁН!")
     print("=" * 70)
     print(f"✅ Успешно импортировано: {imported_count}")
+    print(f"⏭️  Пропущено дубликатов: {skipped_count}")
     print(f"❌ Ошибок: {error_count}")
     print(f"📊 Всего товаров в файле: {len(products)}")
     print("=" * 70 + "\n")
@@ -4,99 +4,16 @@
 С автоматической привязкой к категориям по брендам и типам
 """
 
+import asyncio
 import json
 import os
 import re
 import sys
 from pathlib import Path
 
-import requests
-
-
-def slugify(text):
-    """Создает slug из текста с транслитерацией"""
-    translit_map = {
-        "а": "a",
-        "б": "b",
-        "в": "v",
-        "г": "g",
-        "д": "d",
-        "е": "e",
-        "ё": "yo",
-        "ж": "zh",
-        "з": "z",
-        "и": "i",
-        "й": "y",
-        "к": "k",
-        "л": "l",
-        "м": "m",
-        "н": "n",
-        "о": "o",
-        "п": "p",
-        "р": "r",
-        "с": "s",
-        "т": "t",
-        "у": "u",
-        "ф": "f",
-        "х": "h",
-        "ц": "ts",
-        "ч": "ch",
-        "ш": "sh",
-        "щ": "sch",
-        "ъ": "",
-        "ы": "y",
-        "ь": "",
-        "э": "e",
-        "ю": "yu",
-        "я": "ya",
-        "А": "A",
-        "Б": "B",
-        "В": "V",
-        "Г": "G",
-        "Д": "D",
-        "Е": "E",
-        "Ё": "Yo",
-        "Ж": "Zh",
-        "З": "Z",
-        "И": "I",
-        "Й": "Y",
-        "К": "K",
-        "Л": "L",
-        "М": "M",
-        "Н": "N",
-        "О": "O",
-        "П": "P",
-        "Р": "R",
-        "С": "S",
-        "Т": "T",
-        "У": "U",
-        "Ф": "F",
-        "Х": "H",
-        "Ц": "Ts",
-        "Ч": "Ch",
-        "Ш": "Sh",
-        "Щ": "Sch",
-        "Ъ": "",
-        "Ы": "Y",
-        "Ь": "",
-        "Э": "E",
-        "Ю": "Yu",
-        "Я": "Ya",
-    }
-
-    text = text.lower()
-    result = []
-
-    for char in text:
-        if char in translit_map:
-            result.append(translit_map[char])
-        else:
-            result.append(char)
-
-    text = "".join(result)
-    text = re.sub(r"[^\w\s-]", "", text)
-    text = re.sub(r"[\s_-]+", "-", text)
-    return text.strip("-")
+from async_db import AsyncSupabase, AsyncSupabaseError
+from model_tokens import extract_models
+from slugs import SlugRegistry, slugify
 
 
 # Supabase credentials
@@ -159,43 +76,19 @@ def detect_brand(product_name):
     return None
 
 
-def get_category_by_slug(slug):
+async def get_category_by_slug(db, slug):
     """Получает категорию по slug"""
-    url = f"{SUPABASE_URL}/rest/v1/categories"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-    }
-    params = {"slug": f"eq.{slug}"}
-
-    response = requests.get(url, headers=headers, params=params)
-
-    if response.status_code == 200:
-        categories = response.json()
-        if categories:
-            return categories[0]
-    return None
+    categories = await db.select("categories", "*", {"slug": f"eq.{slug}"})
+    return categories[0] if categories else None
 
 
-def create_product(product_data):
+async def create_product(db, product_data):
     """Создает товар в Supabase"""
-    url = f"{SUPABASE_URL}/rest/v1/products"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=representation",
-    }
-
-    response = requests.post(url, headers=headers, json=product_data)
-
-    if response.status_code in [200, 201]:
-        product = response.json()
-        if isinstance(product, list):
-            return product[0]
-        return product
-    else:
+    try:
+        created = await db.insert("products", [product_data], returning=True)
+    except AsyncSupabaseError:
         return None
+    return created[0] if created else None
 
 
 def parse_price(price_str):
@@ -212,7 +105,7 @@ def parse_price(price_str):
         return None
 
 
-def main():
+async def main():
     """Основная функция"""
     print("=" * 70)
     print("📦 ИМПОРТ ЗАПЧАСТЕЙ В SUPABASE")
@@ -228,19 +121,17 @@ def main():
     print(f"\n📊 Найдено товаров в файле: {len(parts)}")
     print("-" * 70)
 
+    async with AsyncSupabase(SUPABASE_URL, SUPABASE_KEY, concurrency=32) as db:
+        await import_parts(db, parts)
+
+
+async def import_parts(db, parts):
     # Кэш категорий для ускорения
     print("📦 Загружаю категории для кэширования...")
-    categories_cache = {}
-    url = f"{SUPABASE_URL}/rest/v1/categories"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-    }
-    response = requests.get(url, headers=headers, params={"limit": "1000"})
-    if response.status_code == 200:
-        for cat in response.json():
-            categories_cache[cat["slug"]] = cat
+    categories_cache = {cat["slug"]: cat for cat in await db.select_all("categories")}
     print(f"✅ Загружено {len(categories_cache)} категорий в кэш")
+    # Занятые slug товаров: новые slug уникальны без запросов на каждый товар
+    slugs = SlugRegistry(row["slug"] for row in await db.select_all("products", "id, slug"))
     print("-" * 70)
 
     results = {
@@ -249,6 +140,7 @@ def main():
         "no_brand": 0,
         "no_category": 0,
     }
+    to_create = []
 
     for i, part in enumerate(parts, 1):
         name = part.get("name", "")
@@ -287,7 +179,7 @@ def main():
         price = parse_price(part.get("price"))
 
         # Создаем slug товара
-        product_slug = slugify(name[:100])
+        product_slug = slugs.unique(slugify(name))
 
         # Формируем данные товара
         product_data = {
@@ -299,18 +191,24 @@ def main():
             "image_url": part.get("image_url"),
             "in_stock": True,
             "is_featured": False,
+            "compatible_models": extract_models(name, part.get("category")),
         }
 
-        # Создаем товар
-        result = create_product(product_data)
+        to_create.append(product_data)
+
+    # Создаем товары параллельно (не больше concurrency запросов в полёте)
+    print(f"🚀 Создаю {len(to_create)} товаров...")
+    created = await asyncio.gather(*(create_product(db, data) for data in to_create))
+
+    for product_data, result in zip(to_create, created):
         if result:
             results["success"] += 1
-            if results["success"] % 10 == 0:
+            if results["success"] % 100 == 0:
                 print(f"✅ Импортировано: {results['success']} товаров")
         else:
             results["error"] += 1
             if results["error"] <= 5:
-                print(f"❌ Ошибка создания товара: {name[:50]}")
+                print(f"❌ Ошибка создания товара: {product_data['name'][:50]}")
 
     # Итоги
     print("\n" + "=" * 70)
@@ -328,4 +226,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
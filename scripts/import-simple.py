@@ -10,6 +10,10 @@ import sys
 from dotenv import load_dotenv
 from supabase import create_client
 
+from db_batch import insert_new
+from model_tokens import extract_models
+from slugs import SlugRegistry, slugify
+
 load_dotenv("../frontend/.env.local")
 
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
@@ -22,20 +26,6 @@ INPUT_FILE = "parsed_data/agrodom/parts-bs4-unique.json"
 PARTS_CATEGORY_ID = 2
 
 
-def create_slug(name):
-    import hashlib
-    import time
-
-    slug = name.lower()
-    slug = slug.replace(" ", "-")
-    slug = re.sub(r"[^a-z0-9-]", "", slug)
-    # Добавляем hash + timestamp для уникальности
-    unique_str = f"{name}{time.time()}"
-    hash_suffix = hashlib.md5(unique_str.encode()).hexdigest()[:8]
-    slug = f"{slug[:85]}-{hash_suffix}" if slug else f"product-{hash_suffix}"
-    return slug[:100]
-
-
 def parse_price(price_str):
     if not price_str:
         return 0
@@ -56,23 +46,19 @@ def main():
 
     print(f"📦 Загружено: {len(products)}")
 
-    existing = supabase.table("products").select("name").execute()
-    existing_names = {p["name"].lower().strip() for p in existing.data}
-    print(f"📊 В БД: {len(existing_names)}")
-
-    new_products = []
-    for p in products:
-        name = p.get("name", "").strip()
-        if name and name.lower() not in existing_names:
-            new_products.append(p)
-
-    print(f"✨ Новых: {len(new_products)}\n")
+    # Дубликаты по названию отбрасывает БД (ON CONFLICT (name_key) DO NOTHING)
+    new_products = [p for p in products if p.get("name", "").strip()]
+    print(f"✨ К импорту: {len(new_products)}\n")
 
     if not new_products:
         print("✅ Все уже в базе!")
         return
 
+    # Занятые slug - один постраничный проход по БД
+    slugs = SlugRegistry.load(supabase)
+
     imported = 0
+    skipped = 0
     errors = 0
     BATCH = 50
 
@@ -86,7 +72,7 @@ def main():
                 continue
 
             price = parse_price(p.get("price", ""))
-            slug = create_slug(name)
+            slug = slugs.unique(slugify(name))
 
             batch_data.append(
                 {
@@ -98,20 +84,20 @@ def main():
                     "image_url": p.get("image_url", ""),
                     "description": f"Запчасть. Категория: {p.get('category', '')}",
                     "manufacturer": "universal",
+                    "compatible_models": extract_models(name),
                     "specifications": {"source": p.get("link", "")},
                 }
             )
 
-        try:
-            supabase.table("products").insert(batch_data).execute()
-            imported += len(batch_data)
-            print(f"✅ {imported}/{len(new_products)}")
-        except Exception as e:
-            errors += len(batch_data)
-            print(f"❌ Ошибка: {e}")
+        stats = insert_new(supabase, batch_data, chunk_size=BATCH)
+        imported += stats["inserted"]
+        skipped += stats["skipped"]
+        errors += stats["failed"]
+        print(f"✅ {imported}/{len(new_products)}")
 
     print("\n" + "=" * 70)
     print(f"✅ Импортировано: {imported}")
+    print(f"⏭️  Дубликатов: {skipped}")
     print(f"❌ Ошибок: {errors}")
     print("=" * 70 + "\n")
 
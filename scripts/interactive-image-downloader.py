@@ -2,33 +2,31 @@
 """
 Интерактивный скрипт для скачивания изображений с dongfeng-traktor.com
 Открывает браузер в НЕ headless режиме и показывает изображения
+
+Скачивание - через image_mirror.py: один клиент на все картинки,
+потоковое чтение, автоматический режим качает параллельно.
 """
 
 import asyncio
-import json
 from pathlib import Path
-from urllib.parse import urljoin
 
-import aiohttp
 from playwright.async_api import async_playwright
 
+from image_mirror import fetch_image, web_client
+
 # Настройки
 BASE_URL = "https://dongfeng-traktor.com/"
 OUTPUT_DIR = Path(__file__).parent.parent / "parsed_data" / "dongfeng_images"
 OUTPUT_DIR.mkdir(exist_ok=True)
 
 
-async def download_image(url, filename):
+async def download_image(client, url, filename):
     """Скачивает изображение"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=30) as response:
-                if response.status == 200:
-                    filepath = OUTPUT_DIR / filename
-                    with open(filepath, "wb") as f:
-                        f.write(await response.read())
-                    print(f"  ✅ Сохранено: {filename}")
-                    return True
+        body, *_ = await fetch_image(client, url)
+        (OUTPUT_DIR / filename).write_bytes(body)
+        print(f"  ✅ Сохранено: {filename}")
+        return True
     except Exception as e:
         print(f"  ❌ Ошибка: {e}")
     return False
@@ -48,7 +46,7 @@ async def main():
 
     input("\n👉 Нажмите Enter чтобы открыть браузер...")
 
-    async with async_playwright() as p:
+    async with async_playwright() as p, web_client() as client:
         print("\n🚀 Запуск браузера (с графическим интерфейсом)...")
         browser = await p.chromium.launch(
             headless=False,  # Показываем браузер
@@ -65,9 +63,12 @@ async def main():
             print(f"⚠️  Ошибка загрузки: {e}")
             print("Попробуйте открыть сайт вручную в браузере")
 
-        # Ждем загрузки контента
-        print("\n⏳ Ждем загрузки изображений (15 секунд)...")
-        await asyncio.sleep(15)
+        # Ждем загрузки контента: до тишины в сети, но не дольше 15 секунд
+        print("\n⏳ Ждем загрузки изображений...")
+        try:
+            await page.wait_for_load_state("networkidle", timeout=15000)
+        except Exception:
+            print("⚠️  Страница ещё грузится - ищем среди того, что есть")
 
         print("\n🔍 Поиск изображений на странице...")
 
@@ -118,11 +119,11 @@ async def main():
         if mode == "1":
             # Автоматическое скачивание
             print("\n📥 Автоматическое скачивание всех изображений...")
-            for i, img in enumerate(images[:16], 1):  # Первые 16
-                filename = f"dongfeng-auto-{i}.jpg"
-                print(f"\n{i}/16: {img['src'][:60]}...")
-                if await download_image(img["src"], filename):
-                    downloaded.append(filename)
+            names = [f"dongfeng-auto-{i}.jpg" for i in range(1, 17)]  # Первые 16
+            ok = await asyncio.gather(
+                *(download_image(client, img["src"], name) for img, name in zip(images, names))
+            )
+            downloaded += [name for name, saved in zip(names, ok) if saved]
 
         elif mode == "2":
             # Выбор вручную
@@ -149,7 +150,7 @@ async def main():
                     model = input("   Введите модель (например: 244, 504-g3): ").strip()
                     if model:
                         filename = f"dongfeng-{model.lower().replace(' ', '-')}.jpg"
-                        if await download_image(img["src"], filename):
+                        if await download_image(client, img["src"], filename):
                             downloaded.append(filename)
 
         elif mode == "3":
@@ -171,7 +172,7 @@ async def main():
 
                 filename = f"dongfeng-{model.lower().replace(' ', '-')}.jpg"
                 print(f"💾 Скачивание {filename}...")
-                if await download_image(url, filename):
+                if await download_image(client, url, filename):
                     downloaded.append(filename)
 
         print("\n" + "=" * 70)
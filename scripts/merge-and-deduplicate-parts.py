@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Объединяет данные из parts.json и parts-all.json
-Удаляет подкатегории и дубликаты товаров
+Удаляет подкатегории и дубликаты товаров (только внутри agrodom;
+одна деталь из разных источников сводится в resolve-entities.py)
 """
 
 import json
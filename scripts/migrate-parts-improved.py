@@ -2,14 +2,23 @@
 """
 УЛУЧШЕННАЯ МИГРАЦИЯ ЗАПЧАСТЕЙ ПО БРЕНДАМ И ТИПАМ
 Исправлены конфликты паттернов и добавлена детальная диагностика
+
+Запись - через журнал операций (migrate-parts.journal.jsonl):
+    python3 migrate-parts-improved.py             # прерванная миграция продолжается с места остановки
+    python3 migrate-parts-improved.py --rollback  # откат применённых пачек
 """
 
 import os
 import re
+import sys
 from collections import defaultdict
 
 from supabase import Client, create_client
 
+from categorization_plan import apply_changeset, build_changeset
+from op_journal import OperationJournal, journal_cli, make_executor
+from rules_engine import get_engine
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -22,190 +31,23 @@ if not url or not key:
 supabase: Client = create_client(url, key)
 
 # ============================================================================
-# ИСПРАВЛЕННЫЕ ПАТТЕРНЫ БРЕНДОВ (без конфликтов)
+# ПРАВИЛА: categorization_rules.json (наборы brand_category и part_category,
+# порядок в файле = приоритет, от специфичных к общим)
 # ============================================================================
-BRAND_PATTERNS = {
-    # Приоритет 1: Самые специфичные паттерны
-    "perkins": ["perkins", "перкинс"],  # Сначала проверяем специфичные
-    "dongfeng-parts": [
-        "dongfeng",
-        "донгфенг",
-        "дунфенг",
-        "dong feng",
-        "df-244",
-        "df-404",
-        "df 244",
-        "df 404",
-        "df244",
-        "df404",
-    ],
-    "km-engines": ["км385", "км496", "ll380", "ll385", "km385", "km496", "yd385"],
-    # Приоритет 2: Бренды с уникальными названиями
-    "uralets": ["уралец", "uralets"],
-    "jinma": ["джинма", "jinma", "jin ma"],
-    "xingtai": ["синтай", "xingtai", "xing tai", "синтай-504"],
-    "foton": ["фотон", "foton", "lovol"],
-    "rusich": ["русич", "rusich"],
-    "shifeng": ["шифенг", "shifeng", "shi feng"],
-    "catmann": ["кэтманн", "catmann", "кетманн"],
-    "chuvashpiller": ["чувашпиллер", "chuvashpiller"],
-    "bulat": ["булат", "bulat"],
-    "yto": ["yto"],
-    "wirax": ["wirax", "виракс"],
-    "dlh": ["dlh"],
-    "rustrak": ["рустрак", "rustrak"],
-    # Приоритет 3: МТЗ и Беларус (вместе)
-    "mtz": ["мтз", "mtz", "беларус", "belarus"],
-    # Приоритет 4: Бренды с моделями (проверяем СТРОГО)
-    "scout": ["скаут т-", "scout t-", "скаут-т", "scout-t"],  # Только с моделью
-    "kentavr": ["кентавр т-", "kentavr t-", "т-224", "t-224"],  # Только с моделью
-    "fayter": ["файтер т-", "fayter t-"],  # Только с моделью
-    "neva": ["нева", "neva", "мб-", "мб "],
-    # Приоритет 5: T-series (общее для всех Т-40, Т-25, Т-16)
-    "t-series": ["т-40", "т-25", "т-16", "t-40", "t-25", "t-16"],
-}
+ENGINE = get_engine()
 
-# ============================================================================
-# ПАТТЕРНЫ ТИПОВ ЗАПЧАСТЕЙ (от специфичных к общим)
-# ============================================================================
-TYPE_PATTERNS = {
-    # Сначала самые специфичные
-    "diesel-engines": [
-        "двигатель",
-        "двигателя",
-        "мотор",
-        "поршень",
-        "поршневые",
-        "поршня",
-        "цилиндр",
-        "гильза",
-        "гбц",
-        "головка блока",
-        "коленвал",
-        "коленчатый вал",
-        "распредвал",
-        "блок цилиндров",
-        "картер",
-        "маховик",
-        "шатун",
-    ],
-    "starters-generators": ["стартер", "генератор"],
-    "filters": ["фильтр"],
-    "driveshafts": ["кардан", "карданный вал", "карданный"],
-    "hydraulics": [
-        "гидравлик",
-        "гидроцилиндр",
-        "гидронасос",
-        "нш-",
-        "нш ",
-        "гур",
-        "рулевой цилиндр",
-    ],
-    "seats": ["сиденье", "сидение", "кресло"],
-    "spare-parts-kit": ["зип", "ремкомплект", "ремонтный комплект", "рем.комплект"],
-    "equipment-parts": [
-        "картофелекопалка",
-        "косилка",
-        "окучник",
-        "плуг",
-        "борона",
-        "фреза",
-        "снегоуборщик",
-        "прицеп",
-        "погрузчик",
-        "пресс-подборщик",
-        "культиватор",
-    ],
-    "wheels-tires": [
-        "колесо",
-        "колёс",
-        "диск колесн",
-        "шина",
-        "резина",
-        "покрышка",
-        "груз колесн",
-        "грунтозацеп",
-    ],
-    "standard-parts": [
-        "болт",
-        "гайка",
-        "шпилька",
-        "винт",
-        "прокладка",
-        "сальник",
-        "кольцо уплотн",
-        "кольцо стопорн",
-        "манжета",
-        "шайба",
-        "шплинт",
-        "палец стопорн",
-        "штифт",
-        "пружина",
-    ],
-    "tractor-parts": [
-        "редуктор",
-        "коробка передач",
-        "кпп",
-        "сцепление",
-        "корзина",
-        "диск сцепления",
-        "вал",
-        "вом",
-        "привод",
-        "дифференциал",
-        "тормоз",
-        "тормозн",
-    ],
-    # Более общие категории
-    "universal-parts": ["универсальн", "комплект прокладок", "набор"],
-    "other-parts": [
-        "прочие",
-        "прочее",
-        "навесное",
-        "оборудование",
-        "крепление",
-        "кронштейн",
-        "адаптер",
-        "кабина",
-        "крыло",
-        "зеркало",
-        "колпак",
-        "ковш",
-        "борт",
-        "фаркоп",
-        "бампер",
-        "фара",
-        "стекло",
-        "рулевое",
-        "педаль",
-    ],
-}
+ROLLBACK_PATH = "migrate-parts-rollback.json"
+JOURNAL_PATH = "migrate-parts.journal.jsonl"
 
 
 def detect_brand(product_name: str) -> str:
-    """Определяет бренд из названия товара (улучшенная версия)"""
-    name_lower = product_name.lower()
-
-    # Проверяем бренды в порядке приоритета
-    for brand_key, patterns in BRAND_PATTERNS.items():
-        for pattern in patterns:
-            if pattern.lower() in name_lower:
-                return brand_key
-
-    return "universal"
+    """Определяет бренд из названия товара"""
+    return ENGINE.label("brand_category", product_name)
 
 
 def detect_type(product_name: str) -> str:
     """Определяет тип запчасти из названия товара"""
-    name_lower = product_name.lower()
-
-    # Проверяем типы в порядке от специфичных к общим
-    for type_key, patterns in TYPE_PATTERNS.items():
-        for pattern in patterns:
-            if pattern.lower() in name_lower:
-                return type_key
-
-    return "other-parts"
+    return ENGINE.label("part_category", product_name)
 
 
 def main():
@@ -213,6 +55,11 @@ def main():
     print("🚀 МИГРАЦИЯ ЗАПЧАСТЕЙ ПО БРЕНДАМ И ТИПАМ")
     print("=" * 80 + "\n")
 
+    # Прерванная миграция / --rollback - по журналу, без повторной классификации
+    journal = OperationJournal(JOURNAL_PATH)
+    if journal_cli(journal, make_executor(supabase), sys.argv[1:]):
+        return
+
     # ========================================================================
     # ШАГ 1: Загружаем категории из БД
     # ========================================================================
@@ -372,45 +219,26 @@ def main():
     print("\n🚀 Начинаем миграцию...")
     print("=" * 80 + "\n")
 
-    success_count = 0
-    error_count = 0
-    errors = []
-
-    for i, item in enumerate(migration_plan, 1):
-        try:
-            supabase.table("products").update({"category_id": item["new_category"]}).eq(
-                "id", item["product_id"]
-            ).execute()
-
-            success_count += 1
-
-            if success_count % 50 == 0:
-                progress = (i / len(migration_plan)) * 100
-                print(f"  ⏳ Прогресс: {i}/{len(migration_plan)} ({progress:.1f}%)")
-
-        except Exception as e:
-            error_count += 1
-            errors.append(
-                {
-                    "product_id": item["product_id"],
-                    "name": item["product_name"][:50],
-                    "error": str(e),
-                }
-            )
+    # Changeset: только отличающиеся строки, запись пачками по 500 одним RPC,
+    # старые значения - в rollback-файл (откат: plan-categorization.py --rollback)
+    desired = {
+        item["product_id"]: {"category_id": item["new_category"]} for item in migration_plan
+    }
+    changeset = build_changeset(
+        all_parts, desired, {"job": "migrate-parts", "rules_version": ENGINE.version}
+    )
+    result = apply_changeset(supabase, changeset, rollback_path=ROLLBACK_PATH, journal=journal)
 
     # ========================================================================
     # ШАГ 8: Проверяем результаты
     # ========================================================================
     print("\n" + "=" * 80)
     print("\n✅ МИГРАЦИЯ ЗАВЕРШЕНА!\n")
-    print(f"  Успешно мигрировано: {success_count}")
-    print(f"  Ошибок: {error_count}")
-    print(f"  Всего обработано: {len(migration_plan)}")
-
-    if errors:
-        print("\n❌ ОШИБКИ:")
-        for err in errors[:10]:
-            print(f"  ID {err['product_id']}: {err['name']} - {err['error']}")
+    print(f"  Успешно мигрировано: {result['updated']}")
+    print(f"  Ошибок: {result['failed']}")
+    print(f"  Запросов: {result['requests']}")
+    print(f"  Всего обработано: {changeset['total']}")
+    print(f"  Откат: {ROLLBACK_PATH} / python3 migrate-parts-improved.py --rollback")
 
     print("\n📊 Проверка остатка...")
     remaining = (
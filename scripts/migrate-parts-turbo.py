@@ -10,6 +10,9 @@ from collections import defaultdict
 
 from supabase import Client, create_client
 
+from aimd import AIMDController
+from db_batch import update_grouped
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -151,30 +154,18 @@ print(f"\nВсего к миграции: {total_to_migrate} товаров")
 print("\n" + "=" * 80)
 print("🚀 ЗАПУСК TURBO МИГРАЦИИ...\n")
 
-# BATCH обновление - по 50 товаров за раз в одну категорию
-success = 0
-errors = 0
-BATCH_SIZE = 50
-
-for target_cat_id, product_ids in category_batches.items():
-    # Разбиваем на батчи по 50
-    for i in range(0, len(product_ids), BATCH_SIZE):
-        batch_ids = product_ids[i : i + BATCH_SIZE]
-
-        try:
-            # Обновляем сразу все товары в батче
-            supabase.table("products").update({"category_id": target_cat_id}).in_(
-                "id", batch_ids
-            ).execute()
-
-            success += len(batch_ids)
-            if success % 200 == 0:
-                print(
-                    f"  ⚡ {success}/{total_to_migrate} ({100 * success / total_to_migrate:.1f}%)"
-                )
-        except Exception as e:
-            errors += len(batch_ids)
-            print(f"  ❌ Ошибка для категории {target_cat_id}: {e}")
+# BATCH обновление: размер пачки и число запросов подбирает AIMD-контроллер
+# (растёт, пока БД отвечает быстро, вдвое меньше на 429 / 5xx / таймаут)
+controller = AIMDController(initial_batch=50, max_batch=1000)
+updates = {
+    product_id: {"category_id": target_cat_id}
+    for target_cat_id, product_ids in category_batches.items()
+    for product_id in product_ids
+}
+stats = update_grouped(supabase, updates, controller=controller)
+success = stats["updated"]
+errors = stats["failed"]
+print(f"  ⚡ {success}/{total_to_migrate} за {stats['requests']} запросов ({controller.summary()})")
 
 print("\n" + "=" * 80)
 print("✅ TURBO МИГРАЦИЯ ЗАВЕРШЕНА!\n")
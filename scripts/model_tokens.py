@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+ТОКЕНИЗАТОР МОДЕЛЕЙ ТРАКТОРОВ И ДВИГАТЕЛЕЙ
+
+Вместо проверок вида "240" in name (срабатывают на 2400, 12404 и т.п.)
+извлекает из текста нормализованные идентификаторы моделей по границам
+слов (\\b):
+
+    DF-244, ДФ 244, df244, Dongfeng 244   → "244", "df-244"
+    Foton 244 / Lovol 244 / ФТ-244        → "244", "ft-244"
+    240/244                               → "240", "244"
+    KM385, КМ385, km-385, KM385BT         → "km385", "km385bt"
+    ZN490BT, ЗН490                        → "zn490", "zn490bt"
+    R195NE, Р195, R180ANE                 → "r195", "r195ne", "r180", "r180ane"
+
+Кириллические двойники латинских префиксов (км, дф, зн, р, ...)
+приводятся к латинице. Результат кладётся в products.compatible_models
+(TEXT[] + GIN индекс, docs/migrations/compatible-models.sql), страницы
+моделей и счётчики используют поиск по массиву вместо LIKE.
+
+Использование:
+    from model_tokens import extract_models, engine_models
+
+    extract_models("Фильтр масляный ДФ-244 (КМ385ВТ)")
+    # → ["244", "df-244", "km385", "km385bt"]
+"""
+
+import re
+
+# Латиница для кириллических букв в суффиксах (КМ385ВТ = KM385BT:
+# "В" набирают вместо похожей латинской "B")
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "b", "д": "d", "е": "e", "ж": "j", "з": "z",
+    "и": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "р": "r",
+    "с": "s", "т": "t", "у": "y", "ф": "f", "х": "x",
+})
+
+# Префиксы двигателей → каноническая латиница
+ENGINE_PREFIXES = {
+    "km": "km", "км": "km",
+    "ll": "ll", "лл": "ll",
+    "zn": "zn", "зн": "zn",
+    "zs": "zs", "зс": "zs",
+    "ty": "ty", "ти": "ty",
+    "jd": "jd", "жд": "jd",
+    "hs": "hs",
+    "yd": "yd",
+    "s": "s",
+    "r": "r", "р": "r",
+}
+
+# Префиксы / названия брендов тракторов → короткий префикс модели
+TRACTOR_PREFIXES = {
+    "df": "df", "дф": "df", "dongfeng": "df", "донгфенг": "df", "dong feng": "df",
+    "ft": "ft", "фт": "ft", "foton": "ft", "фотон": "ft", "lovol": "ft", "ловол": "ft",
+    "jm": "jm", "жм": "jm", "jinma": "jm", "джинма": "jm",
+    "xt": "xt", "хт": "xt", "xingtai": "xt", "синтай": "xt",
+}
+
+# Номера моделей тракторов, которые узнаём и без префикса
+TRACTOR_NUMBERS = {
+    "120", "180", "220", "224", "240", "244", "254", "304", "354",
+    "404", "504", "554", "804", "854", "904", "1304",
+}
+
+
+def _alternation(words) -> str:
+    # Длинные варианты первыми, чтобы "dongfeng" не съел "df"
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+# Однобуквенные префиксы (R195, S1100) - только слитно с номером:
+# "А-1250 Р 180" и "Болт S 120" - размеры, а не модели
+_ENGINE_RE = re.compile(
+    rf"\b(?:(?P<prefix>{_alternation(p for p in ENGINE_PREFIXES if len(p) > 1)})[-\s]?"
+    rf"|(?P<letter>{_alternation(p for p in ENGINE_PREFIXES if len(p) == 1)}))"
+    r"(?P<number>\d{3,4})(?:-?(?P<suffix>[a-zа-яё]{1,4}))?\b",
+    re.IGNORECASE,
+)
+
+_FOUR_L_RE = re.compile(r"\b4[lл]22(?P<suffix>bt|бт)?\b", re.IGNORECASE)
+
+_TRACTOR_PREFIXED_RE = re.compile(
+    rf"\b(?P<prefix>{_alternation(TRACTOR_PREFIXES)})[-\s]?(?P<number>\d{{2,4}})\b",
+    re.IGNORECASE,
+)
+
+# 240/244, 354-404: голые номера тракторов по границам слов
+_TRACTOR_NUMBER_RE = re.compile(
+    rf"(?<![\w.,])(?P<number>{_alternation(TRACTOR_NUMBERS)})(?![\w]|[.,]\d)"
+)
+
+
+def engine_models(text: str) -> list:
+    """Модели двигателей: семейство (km385) и вариант с суффиксом (km385bt)"""
+    if not text:
+        return []
+
+    tokens = []
+    for match in _ENGINE_RE.finditer(text):
+        prefix = match.group("prefix") or match.group("letter")
+        family = ENGINE_PREFIXES[prefix.lower()] + match.group("number")
+        tokens.append(family)
+        if match.group("suffix"):
+            tokens.append(family + match.group("suffix").lower().translate(_TRANSLIT))
+
+    for match in _FOUR_L_RE.finditer(text):
+        tokens.append("4l22")
+        if match.group("suffix"):
+            tokens.append("4l22bt")
+
+    return list(dict.fromkeys(tokens))
+
+
+def tractor_models(text: str) -> list:
+    """Модели тракторов: номер (244) и номер с префиксом бренда (df-244)"""
+    if not text:
+        return []
+
+    tokens = []
+    for match in _TRACTOR_PREFIXED_RE.finditer(text):
+        prefix = TRACTOR_PREFIXES[" ".join(match.group("prefix").lower().split())]
+        number = match.group("number")
+        tokens.extend([number, f"{prefix}-{number}"])
+
+    for match in _TRACTOR_NUMBER_RE.finditer(text):
+        tokens.append(match.group("number"))
+
+    return list(dict.fromkeys(tokens))
+
+
+def extract_models(*texts) -> list:
+    """Все идентификаторы моделей из названия / описания / колонки model (отсортированы)"""
+    tokens = set()
+    for text in texts:
+        if not text:
+            continue
+        tokens.update(tractor_models(text))
+        tokens.update(engine_models(text))
+    return sorted(tokens)
@@ -3,65 +3,57 @@
 Перемещает товары Perkins в правильные категории
 """
 
-import os
+import asyncio
 import sys
 
-import requests
+from async_db import AsyncSupabase, PartialWriteError
 
-SUPABASE_URL = "https://dpsykseeqloturowdyzf.supabase.co"
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-if not SUPABASE_KEY:
-    print("❌ ОШИБКА: Не найден SUPABASE_SERVICE_ROLE_KEY")
-    sys.exit(1)
+async def main():
+    print("=" * 70)
+    print("🔄 ПЕРЕМЕЩЕНИЕ ТОВАРОВ PERKINS")
+    print("=" * 70)
 
-headers = {
-    "apikey": SUPABASE_KEY,
-    "Authorization": f"Bearer {SUPABASE_KEY}",
-    "Content-Type": "application/json",
-}
+    async with AsyncSupabase.from_env() as db:
+        # Получаем категорию "Perkins - Фильтра"
+        perkins_filters_cat = await db.select(
+            "categories", "id", {"slug": "eq.perkins-filters"}
+        )
 
-print("=" * 70)
-print("🔄 ПЕРЕМЕЩЕНИЕ ТОВАРОВ PERKINS")
-print("=" * 70)
+        if not perkins_filters_cat:
+            print("❌ Категория perkins-filters не найдена!")
+            sys.exit(1)
 
-# Получаем категорию "Perkins - Фильтра"
-url = f"{SUPABASE_URL}/rest/v1/categories?select=id&slug=eq.perkins-filters"
-response = requests.get(url, headers=headers)
-perkins_filters_cat = response.json()
+        perkins_category_id = perkins_filters_cat[0]["id"]
+        print(f"\n✅ Найдена категория Perkins - Фильтра (ID: {perkins_category_id})")
 
-if not perkins_filters_cat:
-    print("❌ Категория perkins-filters не найдена!")
-    sys.exit(1)
+        # Товары с Perkins в названии - фильтр на стороне БД
+        perkins_products = await db.select_all(
+            "products",
+            "id, name, category_id",
+            {"name": "ilike.*perkins*", "category_id": f"neq.{perkins_category_id}"},
+        )
 
-perkins_category_id = perkins_filters_cat[0]["id"]
-print(f"\n✅ Найдена категория Perkins - Фильтра (ID: {perkins_category_id})")
+        print(f"\n📦 Найдено товаров с 'Perkins' в названии: {len(perkins_products)}")
 
-# Получаем все товары с Perkins в названии
-url = f"{SUPABASE_URL}/rest/v1/products?select=*"
-response = requests.get(url, headers=headers, params={"limit": "10000"})
-all_products = response.json()
+        for product in perkins_products:
+            print(f"🔄 ID {product['id']}: {product['name'][:60]}")
 
-perkins_products = [p for p in all_products if "perkins" in p["name"].lower()]
+        # Перемещаем товары - чанки id=in.(...) параллельно
+        try:
+            moved = await db.update_ids(
+                "products",
+                {"category_id": perkins_category_id},
+                [p["id"] for p in perkins_products],
+            )
+        except PartialWriteError as e:
+            moved = sum(e.results)
+            print(f"\n❌ Не перемещено {len(e.failed)} товаров ({e.errors[0]}): id {e.failed}")
 
-print(f"\n📦 Найдено товаров с 'Perkins' в названии: {len(perkins_products)}")
+    print(f"\n{'=' * 70}")
+    print(f"✅ Перемещено товаров: {moved} из {len(perkins_products)}")
+    print(f"{'=' * 70}")
 
-# Перемещаем товары
-moved = 0
-for product in perkins_products:
-    print(f"\n🔄 Перемещаю товар ID {product['id']}: {product['name'][:60]}...")
 
-    # Обновляем category_id
-    url = f"{SUPABASE_URL}/rest/v1/products?id=eq.{product['id']}"
-    data = {"category_id": perkins_category_id}
-    response = requests.patch(url, headers=headers, json=data)
-
-    if response.status_code in [200, 204]:
-        print(f"  ✅ Перемещен в категорию Perkins - Фильтра")
-        moved += 1
-    else:
-        print(f"  ❌ Ошибка: {response.status_code} - {response.text}")
-
-print(f"\n{'=' * 70}")
-print(f"✅ Перемещено товаров: {moved} из {len(perkins_products)}")
-print(f"{'=' * 70}")
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+ПОИСК ПОЧТИ-ДУБЛИКАТОВ (MinHash + LSH)
+
+Точное сравнение name пропускает дубли, которые и раздувают счётчики
+категорий:
+
+    "Фильтр масляный на трактор Dongfeng 244" / "Фильтр масляный DongFeng-244"
+    "Шланг L-700 мм" / "Шланг L 700мм"
+    "Ремень КМ385ВТ" / "Ремень KM385BT" (кириллица вместо латиницы)
+
+1. normalize_key(): нижний регистр, ё → е, пунктуация → пробел, цифры
+   отделяются от букв, служебные слова ("на", "для", "трактор", ...)
+   выбрасываются, кириллические двойники латинских букв склеиваются
+2. Шинглы - символьные 3-граммы ключа; MinHash-подпись из num_perm
+   хэшей (numpy, без попарных сравнений)
+3. LSH: подпись режется на bands полос, товары с совпавшей полосой -
+   кандидаты (почти линейно вместо O(n²))
+4. Кандидаты - только с одинаковым набором чисел в названии (DF-240 и
+   DF-244 - не дубли), проверка точным Jaccard по шинглам (>= threshold).
+   Числа совпадают и у разных деталей - пара отбрасывается, если
+   уточнения противоположны (левый / правый, впускной / выпускной) или
+   модели не пересекаются (LL385BT / KM385BT / YD385BT); те же проверки -
+   в entity_resolution.score_pair
+5. Пары склеиваются в кластеры (union-find, от самых похожих), в каждом -
+   предлагаемый оставляемый товар (choose_survivor). Проверки п. 4 идут
+   и для кластеров целиком (clusters_conflict): общее название без
+   уточнения не связывает "левый" с "правым" и KM385BT с LL385BT
+6. Второй признак - картинка (image_hashes={id: pHash}, image_hashes.py):
+   товары с почти одинаковой фотографией (Хэмминг <= image_radius, пары
+   из BK-дерева) - дубли уже при Jaccard >= image_threshold. Заглушки
+   источников в image_hashes передавать нельзя
+
+Использование:
+    from near_duplicates import find_duplicate_clusters
+
+    for cluster in find_duplicate_clusters(products, threshold=0.8):
+        cluster["survivor"]     # товар, который оставить
+        cluster["duplicates"]   # остальные товары кластера
+        cluster["similarity"]   # минимальное сходство внутри кластера
+"""
+
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+from image_hashes import SAME_RADIUS, BKTree
+from model_tokens import extract_models
+
+SHINGLE_SIZE = 3
+NUM_PERM = 128
+BANDS = 16
+THRESHOLD = 0.8
+# Порог названий, когда совпала и фотография
+IMAGE_THRESHOLD = 0.6
+
+# Наибольшее простое < 2^32: a * x + b (a, b, x < 2^32) помещается в uint64
+_PRIME = np.uint64(4294967291)
+
+# Слова, которые не отличают один товар от другого
+STOPWORDS = {
+    "на", "для", "к", "с", "в", "и", "от",
+    "трактор", "трактора", "тракторов", "тракторы",
+    "минитрактор", "минитрактора", "минитракторов", "минитракторы",
+    "мини", "мототрактор", "мототрактора",
+}
+
+# Кириллические двойники латинских букв (после lower(): "ВТ" → "вт" → "bt")
+_HOMOGLYPHS = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h",
+    "о": "o", "р": "p", "с": "c", "т": "t", "у": "y", "х": "x",
+})
+
+_DIGIT_BOUNDARY_RE = re.compile(r"(?<=\d)(?=[^\W\d_])|(?<=[^\W\d_])(?=\d)")
+_SEPARATOR_RE = re.compile(r"[\W_]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+# Противоположные уточнения: "левый" и "правый" рычаг - разные детали
+OPPOSITES = (
+    ("лев", "прав"), ("перед", "зад"), ("верх", "ниж"),
+    ("внутр", "наруж"), ("ведущ", "ведом"), ("впуск", "выпуск"),
+)
+_WORD_RE = re.compile(r"[а-яё]+")
+
+
+def normalize_key(name: str) -> str:
+    """Ключ сравнения: "Шланг L-700мм на трактор" и "шланг l 700 мм" дают один ключ"""
+    text = (name or "").lower().replace("ё", "е")
+    text = _DIGIT_BOUNDARY_RE.sub(" ", text)
+    tokens = [t for t in _SEPARATOR_RE.sub(" ", text).split() if t not in STOPWORDS]
+    return " ".join(tokens).translate(_HOMOGLYPHS)
+
+
+def numbers(key: str) -> frozenset:
+    """Числа названия: у дублей должны совпадать (размеры, модели, артикулы)"""
+    return frozenset(_NUMBER_RE.findall(key))
+
+
+def qualifiers(name: str) -> frozenset:
+    """Основы противоположных уточнений в названии ("правого" → "прав")"""
+    found = set()
+    for word in _WORD_RE.findall((name or "").lower()):
+        for pair in OPPOSITES:
+            for stem in pair:
+                if word.startswith(stem):
+                    found.add(stem)
+    return frozenset(found)
+
+
+def opposite(a: frozenset, b: frozenset) -> bool:
+    """Уточнения qualifiers(): у одного "левый", у другого только "правый" (и т.п.)"""
+    for first, second in OPPOSITES:
+        qa = a & {first, second}
+        qb = b & {first, second}
+        if qa and qb and qa != qb:
+            return True
+    return False
+
+
+def models_conflict(a: set, b: set) -> bool:
+    """У обоих есть модели extract_models(), и ни одна не общая (KM385BT / LL385BT)"""
+    return bool(a and b and not a & b)
+
+
+def clusters_conflict(qualifiers_a: frozenset, models_a: set, qualifiers_b: frozenset, models_b: set) -> bool:
+    """
+    Два кластера нельзя склеить: qualifiers_* - объединение уточнений
+    членов, models_* - множество наборов моделей членов (frozenset).
+    Конфликт любой пары членов из разных кластеров - конфликт кластеров.
+    """
+    if opposite(qualifiers_a, qualifiers_b):
+        return True
+    return any(models_conflict(a, b) for a in models_a for b in models_b)
+
+
+def shingles(key: str, size: int = SHINGLE_SIZE) -> set:
+    if len(key) <= size:
+        return {key} if key else set()
+    return {key[i : i + size] for i in range(len(key) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """num_perm хэш-функций вида (a * x + b) mod p над crc32 шинглов"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set),
+        )
+        values = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _PRIME
+        return values.min(axis=1).astype(np.uint32)
+
+    def signatures(self, shingle_sets: list) -> np.ndarray:
+        """(n, num_perm) uint32; пустой набор шинглов - строка максимумов"""
+        result = np.full((len(shingle_sets), self.num_perm), np.iinfo(np.uint32).max, np.uint32)
+        for i, shingle_set in enumerate(shingle_sets):
+            if shingle_set:
+                result[i] = self.signature(shingle_set)
+        return result
+
+
+def lsh_candidates(signatures: np.ndarray, bands: int = BANDS, partitions: list | None = None) -> set:
+    """
+    Пары (i, j), i < j, у которых совпала хотя бы одна полоса подписи.
+    partitions - ключ раздела на строку: пары только внутри раздела
+    """
+    n, num_perm = signatures.shape
+    if num_perm % bands:
+        raise ValueError(f"num_perm={num_perm} не делится на bands={bands}")
+    rows = num_perm // bands
+
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        for i in range(n):
+            part = partitions[i] if partitions is not None else None
+            buckets[(part, chunk[i].tobytes())].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+def choose_survivor(products: list) -> dict:
+    """
+    Кого оставить: в наличии > есть фото > есть цена > есть описание >
+    самый старый (минимальный id)
+    """
+    return max(
+        products,
+        key=lambda p: (
+            bool(p.get("in_stock")),
+            bool(p.get("image_url")),
+            bool(p.get("price")),
+            bool(p.get("description")),
+            -p["id"],
+        ),
+    )
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x: int, y: int):
+        self.parent[self.find(x)] = self.find(y)
+
+
+def find_duplicate_clusters(
+    products: list,
+    threshold: float = THRESHOLD,
+    num_perm: int = NUM_PERM,
+    bands: int = BANDS,
+    field: str = "name",
+    image_hashes: dict | None = None,
+    image_threshold: float = IMAGE_THRESHOLD,
+    image_radius: int = SAME_RADIUS,
+) -> list:
+    """
+    Кластеры почти-дубликатов, от больших к меньшим:
+    [{"survivor", "duplicates", "similarity", "exact", "by_image"}, ...]
+
+    exact - все названия кластера совпадают буквально (старый критерий);
+    by_image - в кластере есть пара, принятая по фотографии.
+    """
+    # Одинаковые ключи - один представитель: LSH и проверка идут по
+    # уникальным ключам, корзины не раздуваются шаблонными названиями
+    by_key = defaultdict(list)
+    for index, product in enumerate(products):
+        by_key[normalize_key(product.get(field))].append(index)
+    keys = list(by_key)
+    # Уточнения и модели - по исходному названию (в ключе кириллица
+    # уже склеена с латиницей)
+    names = [products[by_key[k][0]].get(field) or "" for k in keys]
+    key_qualifiers = [qualifiers(name) for name in names]
+    key_models = [frozenset(extract_models(name)) for name in names]
+
+    shingle_sets = [shingles(k) for k in keys]
+    signatures = MinHasher(num_perm).signatures(shingle_sets)
+
+    # Числа должны совпадать - раздел LSH по набору чисел
+    partitions = [numbers(k) for k in keys]
+    candidates = {
+        (i, j): threshold for i, j in lsh_candidates(signatures, bands, partitions)
+    }
+    if image_hashes:
+        for pair in _image_candidates(keys, by_key, products, partitions, image_hashes, image_radius):
+            candidates[pair] = min(candidates.get(pair, threshold), image_threshold)
+
+    accepted = []
+    for (i, j), required in candidates.items():
+        score = jaccard(shingle_sets[i], shingle_sets[j])
+        if score >= required:
+            accepted.append((score, i, j))
+    # Самые похожие пары склеиваются первыми
+    accepted.sort(key=lambda item: (-item[0], item[1], item[2]))
+
+    uf = _UnionFind(len(keys))
+    similarity = defaultdict(lambda: 1.0)
+    by_image = set()
+    # Уточнения и наборы моделей членов каждого кластера (по корню)
+    cluster_qualifiers = dict(enumerate(key_qualifiers))
+    cluster_models = {i: {models} for i, models in enumerate(key_models)}
+    for score, i, j in accepted:
+        root_i, root_j = uf.find(i), uf.find(j)
+        if root_i == root_j or clusters_conflict(
+            cluster_qualifiers[root_i], cluster_models[root_i],
+            cluster_qualifiers[root_j], cluster_models[root_j],
+        ):
+            continue
+        uf.union(i, j)
+        root = uf.find(i)
+        cluster_qualifiers[root] = cluster_qualifiers.pop(root_i) | cluster_qualifiers.pop(root_j)
+        cluster_models[root] = cluster_models.pop(root_i) | cluster_models.pop(root_j)
+        similarity[root] = min(similarity[root_i], similarity[root_j], score)
+        if score < threshold or root_i in by_image or root_j in by_image:
+            by_image.add(root)
+
+    groups = defaultdict(list)
+    for key_index, key in enumerate(keys):
+        groups[uf.find(key_index)].extend(by_key[key])
+
+    clusters = []
+    for root, indices in groups.items():
+        if len(indices) < 2:
+            continue
+        members = sorted((products[i] for i in indices), key=lambda p: p["id"])
+        survivor = choose_survivor(members)
+        clusters.append({
+            "survivor": survivor,
+            "duplicates": [p for p in members if p is not survivor],
+            "similarity": round(similarity[root], 3),
+            "exact": len({p.get(field) for p in members}) == 1,
+            "by_image": root in by_image,
+        })
+
+    clusters.sort(key=lambda c: (-len(c["duplicates"]), c["survivor"]["id"]))
+    return clusters
+
+
+def _image_candidates(
+    keys: list, by_key: dict, products: list, partitions: list, image_hashes: dict, radius: int
+) -> set:
+    """Пары ключей (i, j), i < j, с почти одинаковой фотографией в одном разделе чисел"""
+    tree = BKTree()
+    key_hashes = []
+    for key_index, key in enumerate(keys):
+        hashes = {image_hashes[products[i]["id"]] for i in by_key[key] if products[i]["id"] in image_hashes}
+        key_hashes.append(hashes)
+        for value in hashes:
+            tree.add(value, key_index)
+
+    pairs = set()
+    for i, hashes in enumerate(key_hashes):
+        for value in hashes:
+            for _, j in tree.query(value, radius):
+                if i < j and partitions[i] == partitions[j]:
+                    pairs.add((i, j))
+    return pairs
+
+
+def cluster_index(clusters: list) -> dict:
+    """{id товара: (номер кластера с 1, id оставляемого)}"""
+    index = {}
+    for number, cluster in enumerate(clusters, 1):
+        survivor_id = cluster["survivor"]["id"]
+        for p in (cluster["survivor"], *cluster["duplicates"]):
+            index[p["id"]] = (number, survivor_id)
+    return index
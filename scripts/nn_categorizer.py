@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+КАТЕГОРИЗАЦИЯ ПО БЛИЖАЙШИМ СОСЕДЯМ (TF-IDF char n-gram)
+
+Для товаров, на которые не срабатывают ключевые слова (UNIVERSAL):
+обучаемся на уже разложенных товарах и для каждого нового ищем
+top-k самых похожих названий по косинусной близости.
+
+- Векторы: TF-IDF по символьным n-граммам (3-5) внутри слов -
+  устойчиво к опечаткам, окончаниям и смеси кириллицы / латиницы
+- Поиск: разреженное произведение матриц кусками по CHUNK_SIZE строк,
+  top-k через argpartition (без построения полной матрицы N x M)
+- Метка: взвешенное голосование соседей по каждому полю
+  (category_id, manufacturer, ...), confidence = доля веса победителя
+
+Только CPU, тысячи названий за секунды.
+
+Использование:
+    from nn_categorizer import NearestNeighborCategorizer
+
+    model = NearestNeighborCategorizer(k=7)
+    model.fit(train_names, {"category_id": [...], "manufacturer": [...]})
+    for p in model.predict(names):
+        p["category_id"]   # {"label": 42, "confidence": 0.86, "similarity": 0.71}
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from rules_engine import normalize_name
+
+CHUNK_SIZE = 512
+
+
+class NearestNeighborCategorizer:
+    def __init__(self, k: int = 7, ngram_range: tuple = (3, 5), min_df: int = 2):
+        self.k = k
+        self.vectorizer = TfidfVectorizer(
+            analyzer="char_wb",
+            ngram_range=ngram_range,
+            min_df=min_df,
+            sublinear_tf=True,
+            dtype=np.float32,
+            preprocessor=normalize_name,
+        )
+        self.train_matrix = None
+        self.labels = {}
+
+    def fit(self, names: list, labels: dict):
+        """
+        names - названия обучающих товаров, labels - {поле: [метка по
+        каждому названию]}. Метка None = поле у товара неизвестно, в
+        голосовании по этому полю товар не участвует.
+        """
+        for field, values in labels.items():
+            if len(values) != len(names):
+                raise ValueError(f"{field}: {len(values)} меток на {len(names)} названий")
+
+        self.train_matrix = self.vectorizer.fit_transform(names).tocsr()
+        self.labels = {field: list(values) for field, values in labels.items()}
+        return self
+
+    def neighbors(self, names: list):
+        """Индексы top-k обучающих товаров и их близость (генератор по кускам)"""
+        if self.train_matrix is None:
+            raise RuntimeError("Сначала fit()")
+
+        query = self.vectorizer.transform(names).tocsr()
+        train_t = self.train_matrix.T.tocsc()
+        k = min(self.k, self.train_matrix.shape[0])
+
+        for start in range(0, query.shape[0], CHUNK_SIZE):
+            sims = (query[start:start + CHUNK_SIZE] @ train_t).toarray()
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1)
+            yield np.take_along_axis(top, order, axis=1), np.take_along_axis(top_sims, order, axis=1)
+
+    def _vote(self, values: list, indices, sims) -> dict:
+        weights = defaultdict(float)
+        best_sim = defaultdict(float)
+        for idx, sim in zip(indices, sims):
+            label = values[idx]
+            if label is None or sim <= 0:
+                continue
+            weights[label] += sim
+            best_sim[label] = max(best_sim[label], sim)
+
+        if not weights:
+            return {"label": None, "confidence": 0.0, "similarity": 0.0}
+
+        label = max(weights, key=weights.get)
+        return {
+            "label": label,
+            "confidence": round(float(weights[label] / sum(weights.values())), 3),
+            "similarity": round(float(best_sim[label]), 3),
+        }
+
+    def predict(self, names: list, fields=None) -> list:
+        """[{поле: {"label", "confidence", "similarity"}}] в порядке names"""
+        fields = fields or list(self.labels)
+        predictions = []
+        for top, top_sims in self.neighbors(names):
+            for indices, sims in zip(top, top_sims):
+                predictions.append({
+                    field: self._vote(self.labels[field], indices, sims) for field in fields
+                })
+        return predictions
+
+
+def is_confident(prediction: dict, threshold: float, min_similarity: float) -> bool:
+    """Голосование уверенное и ближайший сосед победителя достаточно похож"""
+    return (
+        prediction["label"] is not None
+        and prediction["confidence"] >= threshold
+        and prediction["similarity"] >= min_similarity
+    )
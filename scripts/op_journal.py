@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+ЖУРНАЛ ОПЕРАЦИЙ ДЛЯ ДОЛГИХ МИГРАЦИЙ
+
+Append-only JSONL рядом со скриптом: сначала весь план (пачки с прямым
+и обратным патчем), потом по строке на результат каждой пачки. Каждая
+запись сразу fsync-ается - после Ctrl+C / обрыва сети / падения журнал
+знает, какие пачки уже применены.
+
+    {"type": "plan",   "plan": "...", "job": "...", "batches": 42, "meta": {...}}
+    {"type": "batch",  "plan": "...", "seq": 0, "kind": "merge", "forward": [...], "inverse": [...]}
+    {"type": "status", "plan": "...", "seq": 0, "status": "applied" | "failed" | "rolled_back" | "rollback_failed", ...}
+
+- run()        - применяет пачки без статуса applied (новые и упавшие);
+                 повторный запуск = продолжение с последней применённой
+- rollback()   - обратные патчи применённых пачек в обратном порядке;
+                 упавшие merge / update тоже откатываются - они пишутся
+                 чанками, и до ошибки часть строк уже записана
+- unfinished() - есть ли неприменённые пачки (скрипт может сразу
+                 продолжить, не скачивая каталог заново)
+- plans() / select(plan) - все планы файла: новый план не закрывает
+                 доступ к откату прежних (в том числе брошенных
+                 недоделанными), --rollback <план> откатывает любой
+
+Виды пачек (executor):
+    merge  - [{"id", "fields", "patch", "remove"}] → merge_specifications_bulk
+    update - [{"id", "set": {...}}]                → update_grouped
+    delete - [id, ...]                             → delete().in_("id", ...)
+    insert - [{полная строка}]                     → upsert (обратное к delete)
+    dedupe - [{"loser", "survivor"}]               → RPC dedupe_products (ссылки на
+                                                     оставляемый товар + удаление)
+    offers - [{строка product_offers}]             → upsert по (source, source_url);
+             строка с "delete": true                 удаляется (обратное к новой)
+
+Использование:
+    journal = OperationJournal("migrate-parts.journal.jsonl")
+    executor = make_executor(supabase)
+
+    if not journal.unfinished():
+        journal.start("migrate-parts", batches)   # [{"kind", "forward", "inverse"}]
+    journal.run(executor)
+    ...
+    journal.rollback(executor)
+
+    python3 script.py --plans               # планы журнала и их статусы
+    python3 script.py --rollback            # откат последнего плана
+    python3 script.py --rollback <план>     # откат выбранного плана
+"""
+
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from aimd import AIMDController
+from db_batch import merge_specifications_bulk, strip_generated, update_grouped
+from source_identity import SOURCE_CONFLICT
+
+APPLIED = "applied"
+FAILED = "failed"
+ROLLED_BACK = "rolled_back"
+ROLLBACK_FAILED = "rollback_failed"
+
+# Виды, которые пишутся чанками (не одной транзакцией): упавшая пачка
+# могла записаться частично, её обратный патч (идемпотентный) нужен при откате
+PARTIAL_KINDS = {"merge", "update"}
+
+
+class OperationJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self.plan = None
+        self.batches = {}
+        self.status = {}
+        # {id плана: (запись плана, пачки, статусы)} - все планы файла по порядку
+        self._plans = {}
+        self._torn = False
+        self._load()
+
+    def _load(self):
+        """Все планы в файле и итоговые статусы их пачек; текущий - последний"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                self._torn = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная последняя строка (обрыв во время записи)
+                    continue
+
+                if record["type"] == "plan":
+                    self._plans[record["plan"]] = (record, {}, {})
+                elif record.get("plan") in self._plans:
+                    _, plan_batches, plan_status = self._plans[record["plan"]]
+                    if record["type"] == "batch":
+                        plan_batches[record["seq"]] = record
+                    elif record["type"] == "status":
+                        plan_status[record["seq"]] = record["status"]
+
+        if self._plans:
+            self.select(list(self._plans)[-1])
+
+    def plans(self) -> list:
+        """Записи всех планов файла, от старых к новым"""
+        return [record for record, _, _ in self._plans.values()]
+
+    def select(self, plan_id: str):
+        """Делает текущим (для run / rollback / summary) план plan_id"""
+        if plan_id not in self._plans:
+            raise KeyError(f"в журнале {self.path} нет плана {plan_id}")
+        self.plan, self.batches, self.status = self._plans[plan_id]
+
+    def _append(self, record: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._torn:
+                # Новая запись - с новой строки, не в хвост оборванной
+                f.write("\n")
+                self._torn = False
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ------------------------------------------------------------------
+    # План
+    # ------------------------------------------------------------------
+    def start(self, job: str, batches: list, meta: dict | None = None):
+        """Новый план: batches - [{"kind", "forward", "inverse"}]"""
+        plan_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.plan = {
+            "type": "plan",
+            "plan": plan_id,
+            "job": job,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "batches": len(batches),
+            "meta": meta or {},
+        }
+        self.batches = {}
+        self.status = {}
+        self._plans[plan_id] = (self.plan, self.batches, self.status)
+        self._append(self.plan)
+
+        for seq, batch in enumerate(batches):
+            record = {"type": "batch", "plan": plan_id, "seq": seq, **batch}
+            self.batches[seq] = record
+            self._append(record)
+
+    def unfinished(self) -> bool:
+        """Есть пачки текущего плана, которые ещё не применены"""
+        return any(self.status.get(seq) in (None, FAILED) for seq in self.batches)
+
+    def applied(self) -> bool:
+        """В текущем плане есть записанные и не откаченные пачки"""
+        return any(
+            self.status.get(seq) in (APPLIED, ROLLBACK_FAILED)
+            or (self.status.get(seq) == FAILED and batch["kind"] in PARTIAL_KINDS)
+            for seq, batch in self.batches.items()
+        )
+
+    def summary(self) -> dict:
+        """Пачки по статусам + строки в применённых / упавших пачках"""
+        counts = {
+            "total": len(self.batches), "pending": 0,
+            APPLIED: 0, FAILED: 0, ROLLED_BACK: 0, ROLLBACK_FAILED: 0,
+            "rows_applied": 0, "rows_failed": 0,
+        }
+        for seq, batch in self.batches.items():
+            state = self.status.get(seq, "pending")
+            counts[state] += 1
+            if state in (APPLIED, FAILED):
+                counts[f"rows_{state}"] += len(batch["forward"])
+        return counts
+
+    # ------------------------------------------------------------------
+    # Применение / откат
+    # ------------------------------------------------------------------
+    def _execute(self, executor, seq: int, kind: str, payload, status: str, failed: str) -> bool:
+        try:
+            result = executor(kind, payload)
+        except Exception as e:
+            self._append({
+                "type": "status", "plan": self.plan["plan"], "seq": seq,
+                "status": failed, "error": str(e)[:300],
+            })
+            self.status[seq] = failed
+            return False
+
+        self._append({
+            "type": "status", "plan": self.plan["plan"], "seq": seq,
+            "status": status, "result": result,
+        })
+        self.status[seq] = status
+        return True
+
+    def run(self, executor, retry_failed: bool = True, progress: bool = True) -> dict:
+        """Применяет все неприменённые пачки (упавшие - если retry_failed)"""
+        for seq in sorted(self.batches):
+            state = self.status.get(seq)
+            if state not in (None, FAILED) or (state == FAILED and not retry_failed):
+                continue
+
+            batch = self.batches[seq]
+            ok = self._execute(executor, seq, batch["kind"], batch["forward"], APPLIED, FAILED)
+            if progress:
+                mark = "✅" if ok else "❌"
+                print(f"   {mark} Пачка {seq + 1}/{len(self.batches)} ({len(batch['forward'])} шт.)")
+
+        return self.summary()
+
+    def rollback(self, executor, progress: bool = True) -> dict:
+        """
+        Обратные патчи применённых пачек, от последней к первой (и повтор
+        неоткаченных); упавшие пачки PARTIAL_KINDS - тоже
+        """
+        for seq in sorted(self.batches, reverse=True):
+            batch = self.batches[seq]
+            state = self.status.get(seq)
+            if state not in (APPLIED, ROLLBACK_FAILED) and not (
+                state == FAILED and batch["kind"] in PARTIAL_KINDS
+            ):
+                continue
+
+            kind = batch.get("inverse_kind", batch["kind"])
+            ok = self._execute(executor, seq, kind, batch["inverse"], ROLLED_BACK, ROLLBACK_FAILED)
+            if progress:
+                mark = "↩️ " if ok else "❌"
+                print(f"   {mark} Пачка {seq + 1}/{len(self.batches)} откачена")
+
+        return self.summary()
+
+
+def journal_cli(journal: OperationJournal, executor, args: list, confirm: bool = True) -> bool:
+    """
+    Общие флаги скриптов с журналом. True - скрипт дальше не идёт:
+    --plans            - список планов журнала
+    --rollback [план]  - откат применённых пачек плана (по умолчанию последнего)
+    без флагов         - если план не доделан, предлагает продолжить его
+                         (без повторного чтения каталога и классификации)
+    """
+    if "--plans" in args:
+        current = journal.plan
+        for record in journal.plans():
+            journal.select(record["plan"])
+            summary = journal.summary()
+            print(
+                f"   {record['plan']}  {record['job']:30} применено {summary[APPLIED]}/{summary['total']}, "
+                f"ошибок {summary[FAILED]}, откачено {summary[ROLLED_BACK]}"
+            )
+        if current:
+            journal.select(current["plan"])
+        return True
+
+    if "--rollback" in args:
+        position = args.index("--rollback") + 1
+        if position < len(args) and not args[position].startswith("--"):
+            journal.select(args[position])
+        if not journal.plan:
+            print(f"📒 Журнал {journal.path} пуст - откатывать нечего")
+            return True
+        print(f"↩️  Откат плана {journal.plan['plan']} ({journal.plan['job']}) по журналу {journal.path}...")
+        summary = journal.rollback(executor)
+        print(f"✅ Откачено пачек: {summary[ROLLED_BACK]}, ошибок: {summary[ROLLBACK_FAILED]}")
+        return True
+
+    if not journal.unfinished():
+        return False
+
+    summary = journal.summary()
+    print(
+        f"📒 Журнал {journal.path}: план {journal.plan['job']} от {journal.plan['created_at']} "
+        f"не доделан - применено {summary[APPLIED]}/{summary['total']} пачек, "
+        f"ошибок {summary[FAILED]}"
+    )
+    if confirm and input("▶️  Продолжить с места остановки? (yes/no): ").lower() != "yes":
+        if journal.applied():
+            print(
+                f"⚠️  Уже записанные пачки плана остаются в журнале: "
+                f"откат - --rollback {journal.plan['plan']}"
+            )
+        return False
+
+    summary = journal.run(executor)
+    print(
+        f"✅ Применено пачек: {summary[APPLIED]}/{summary['total']} "
+        f"({summary['rows_applied']} строк), ошибок: {summary[FAILED]}"
+    )
+    return True
+
+
+def batches(kind: str, forward: list, inverse: list, batch_size: int, inverse_kind: str | None = None) -> list:
+    """Нарезает параллельные списки forward / inverse на пачки журнала"""
+    result = []
+    for i in range(0, len(forward), batch_size):
+        batch = {
+            "kind": kind,
+            "forward": forward[i : i + batch_size],
+            "inverse": inverse[i : i + batch_size],
+        }
+        if inverse_kind:
+            batch["inverse_kind"] = inverse_kind
+        result.append(batch)
+    return result
+
+
+def make_executor(supabase, table: str = "products", controller: AIMDController | None = None):
+    """executor(kind, payload) для OperationJournal; ошибка пачки = исключение"""
+
+    def check(stats: dict) -> dict:
+        if stats["failed"]:
+            raise RuntimeError(f"не записано {stats['failed']} строк")
+        return stats
+
+    def execute(kind: str, payload):
+        if kind == "merge":
+            rows = {row["id"]: {k: v for k, v in row.items() if k != "id" and v} for row in payload}
+            return check(merge_specifications_bulk(supabase, rows, controller=controller))
+
+        if kind == "update":
+            updates = {row["id"]: row["set"] for row in payload}
+            return check(update_grouped(supabase, updates, table, controller=controller))
+
+        if kind == "delete":
+            supabase.table(table).delete().in_("id", payload).execute()
+            return {"deleted": len(payload)}
+
+        if kind == "dedupe":
+            return supabase.rpc("dedupe_products", {"p_map": payload}).execute().data
+
+        if kind == "insert":
+            rows = [strip_generated(row) for row in payload]
+            try:
+                supabase.table(table).upsert(rows, on_conflict="id").execute()
+            except Exception as e:
+                if "idx_products_name_key" in str(e):
+                    raise RuntimeError(
+                        "строка совпадает по name_key с существующей: откат удаления "
+                        "дубликатов возможен только без индекса idx_products_name_key "
+                        "(см. scripts/dedupe.py)"
+                    ) from e
+                raise
+            return {"inserted": len(payload)}
+
+        if kind == "offers":
+            upserts = [row for row in payload if not row.get("delete")]
+            deletes = defaultdict(list)
+            for row in payload:
+                if row.get("delete"):
+                    deletes[row["source"]].append(row["source_url"])
+            if upserts:
+                supabase.table("product_offers").upsert(upserts, on_conflict=SOURCE_CONFLICT).execute()
+            for source, urls in deletes.items():
+                supabase.table("product_offers").delete().eq("source", source).in_("source_url", urls).execute()
+            return {"upserted": len(upserts), "deleted": len(payload) - len(upserts)}
+
+        raise ValueError(f"Неизвестный вид пачки: {kind}")
+
+    return execute
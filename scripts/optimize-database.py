@@ -14,6 +14,10 @@ from collections import defaultdict
 from dotenv import load_dotenv
 from supabase import Client, create_client
 
+from db_batch import name_key
+from dedupe import apply_dedupe
+from op_journal import OperationJournal, journal_cli, make_executor
+
 load_dotenv("frontend/.env.local")
 
 SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
@@ -25,6 +29,9 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Удаление дубликатов - через журнал (python3 optimize-database.py --rollback)
+JOURNAL_PATH = "optimize-database.journal.jsonl"
+
 
 def main():
     """Главная функция - выполняет все оптимизации"""
@@ -32,6 +39,9 @@ def main():
     print("ПОЛНАЯ ОПТИМИЗАЦИЯ БАЗЫ ДАННЫХ SUPABASE")
     print("=" * 70 + "\n")
 
+    if journal_cli(OperationJournal(JOURNAL_PATH), make_executor(supabase), sys.argv[1:]):
+        return
+
     # Шаг 1: Удаление дубликатов
     print("📋 ШАГ 1: УДАЛЕНИЕ ДУБЛИКАТОВ")
     print("-" * 70)
@@ -91,8 +101,8 @@ def remove_duplicates():
     # Группируем по названию
     by_name = defaultdict(list)
     for product in all_products:
-        name_lower = product["name"].lower().strip()
-        by_name[name_lower].append(product)
+        by_name[name_key(product["name"])].append(product)
+    by_name.pop(None, None)
 
     # Находим дубликаты
     duplicates = {name: items for name, items in by_name.items() if len(items) > 1}
@@ -103,31 +113,20 @@ def remove_duplicates():
         print("✅ Дубликатов не найдено!")
         return
 
-    # Удаляем дубликаты
-    removed_count = 0
-    total_to_remove = sum(len(items) - 1 for items in duplicates.values())
-
-    print(f"🗑️  Будет удалено записей: {total_to_remove}")
-
+    pairs = {}
     for name, items in duplicates.items():
-        # Сортируем по цене (самый дешевый первым)
+        # Сортируем по цене (самый дешевый первым), остальные - копии
         items_sorted = sorted(items, key=lambda x: x.get("price", 999999))
+        for item in items_sorted[1:]:
+            pairs[item["id"]] = items_sorted[0]["id"]
 
-        # Удаляем все кроме первого
-        to_remove = items_sorted[1:]
-
-        for item in to_remove:
-            try:
-                supabase.table("products").delete().eq("id", item["id"]).execute()
-                removed_count += 1
-
-                if removed_count % 100 == 0:
-                    print(f"  ✅ Удалено {removed_count}/{total_to_remove}")
+    print(f"🗑️  Будет удалено записей: {len(pairs)}")
 
-            except Exception as e:
-                print(f"  ❌ Ошибка удаления ID {item['id']}: {e}")
+    # Позиции заказов переносятся на оставляемый товар, копии удаляются
+    # пачками (RPC dedupe_products)
+    summary = apply_dedupe(supabase, pairs, OperationJournal(JOURNAL_PATH), "optimize-database")
 
-    print(f"\n✅ Удалено дубликатов: {removed_count}")
+    print(f"\n✅ Удалено дубликатов: {summary['rows_applied']}")
 
 
 def normalize_brands():
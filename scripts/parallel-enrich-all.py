@@ -1,72 +1,34 @@
 #!/usr/bin/env python3
 """
-ПАРАЛЛЕЛЬНАЯ ОБРАБОТКА ВСЕХ ФАЙЛОВ - 8 ПРОЦЕССОВ
+ОБРАБОТКА ВСЕХ ФАЙЛОВ - ЛОКАЛЬНОЕ СОПОСТАВЛЕНИЕ + ПАКЕТНАЯ ЗАПИСЬ
+
+Раньше: 8 процессов и ilike-запрос на каждый товар.
+Теперь: индекс названий загружается один раз (TitleIndex), все файлы
+сопоставляются локально за секунды, обновления уходят группами по бренду.
 """
 
 import os
 import json
-import re
-from multiprocessing import Pool, cpu_count
 from supabase import Client, create_client
 
+from db_batch import update_grouped
+from rules_engine import get_engine
+from title_index import TitleIndex
+
 # Supabase
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
-# Паттерны брендов
-BRAND_PATTERNS = {
-    "DongFeng": [
-        r"\bdongfeng\b", r"\bдонгфенг\b", r"\bдф\b",
-        r"\bdf[-\s]?\d{3}", r"\bдф[-\s]?\d{3}",
-        r"\b240\b", r"\b244\b", r"\b254\b", r"\b304\b", r"\b354\b", r"\b404\b",
-        r"\b504\b", r"\b554\b", r"\b804\b", r"\b854\b", r"\b904\b",
-    ],
-    "Foton": [
-        r"\bfoton\b", r"\bфотон\b", r"\blovol\b", r"\bловол\b",
-        r"\bft[-\s]?\d{3}", r"\bфт[-\s]?\d{3}",
-    ],
-    "Jinma": [
-        r"\bjinma\b", r"\bджинма\b", r"\bjm[-\s]?\d{3}", r"\bжм[-\s]?\d{3}",
-    ],
-    "Xingtai": [
-        r"\bxingtai\b", r"\bсинтай\b", r"\bсингтай\b", r"\bуралец\b",
-        r"\bxt[-\s]?\d{3}", r"\bхт[-\s]?\d{3}",
-        r"\b120\b", r"\b180\b", r"\b220\b", r"\b224\b",
-    ],
-    "ZUBR": [r"\bзубр\b", r"\bzubr\b"],
-    "Scout": [r"\bscout\b", r"\bскаут\b"],
-}
-
-# Маппинг двигателей
-ENGINE_BRAND_MAP = {
-    "KM385": "DongFeng", "LL380": "DongFeng", "LL385": "DongFeng",
-    "ZN490": "DongFeng", "TY290": "DongFeng", "TY295": "DongFeng",
-    "JD295": "DongFeng", "S195": "DongFeng", "HS380": "DongFeng",
-    "ZS1110": "Xingtai", "ZS1115": "Xingtai",
-    "R180": "Xingtai", "R190": "Xingtai", "R195": "Xingtai",
-}
+# Правила - общий файл categorization_rules.json:
+# набор brand + engine_brand_map (бренд по модели двигателя)
+ENGINE = get_engine()
 
 def detect_brand(name: str) -> str | None:
     """Определяет бренд из названия"""
-    name_lower = name.lower()
-
-    # Прямые паттерны
-    for brand, patterns in BRAND_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, name_lower, re.IGNORECASE):
-                return brand
-
-    # Двигатели
-    for engine, brand in ENGINE_BRAND_MAP.items():
-        if engine.lower() in name_lower:
-            return brand
-
-    return None
-
-def process_file(file_path: str) -> dict:
-    """Обрабатывает один JSON файл"""
-    supabase = create_client(url, key)
+    return ENGINE.label("brand", name)
 
+def process_file(file_path: str, index: TitleIndex, updates: dict) -> dict:
+    """Обрабатывает один JSON файл: сопоставление локально, обновления в updates"""
     if not os.path.exists(file_path):
         return {"file": file_path, "updated": 0, "skipped": 0, "error": "File not found"}
 
@@ -96,24 +58,15 @@ def process_file(file_path: str) -> dict:
                 skipped += 1
                 continue
 
-            # Ищем в БД
-            title_search = title[:40].strip()
-
-            try:
-                result = supabase.table("products").select("id").ilike("name", f"{title_search}%").limit(1).execute()
-
-                if not result.data:
-                    skipped += 1
-                    continue
+            # Ищем в локальном индексе
+            product = index.match(title)
 
-                product_id = result.data[0]["id"]
-
-                # Обновляем
-                supabase.table("products").update({"manufacturer": brand}).eq("id", product_id).execute()
-                updated += 1
-
-            except Exception:
+            if not product:
                 skipped += 1
+                continue
+
+            updates[product["id"]] = {"manufacturer": brand}
+            updated += 1
 
         return {"file": os.path.basename(file_path), "updated": updated, "skipped": skipped}
 
@@ -144,14 +97,24 @@ FILES = [
 
 if __name__ == '__main__':
     print("=" * 80)
-    print(f"🚀 ПАРАЛЛЕЛЬНАЯ ОБРАБОТКА - {cpu_count()} ЯДЕР")
+    print("🚀 ОБРАБОТКА ВСЕХ ФАЙЛОВ")
     print("=" * 80 + "\n")
 
+    supabase = create_client(url, key)
+
+    print("📥 Загрузка индекса названий...")
+    index = TitleIndex.load(supabase)
+    print(f"✅ Товаров в индексе: {len(index)}\n")
+
     print(f"📦 Файлов к обработке: {len(FILES)}\n")
 
-    # Параллельная обработка
-    with Pool(processes=min(8, cpu_count())) as pool:
-        results = pool.map(process_file, FILES)
+    # Сопоставление - чистый CPU, процессы больше не нужны
+    updates = {}
+    results = [process_file(file_path, index, updates) for file_path in FILES]
+
+    print(f"💾 Запись {len(updates)} товаров пакетами...")
+    stats = update_grouped(supabase, updates)
+    print(f"   ✅ Записано: {stats['updated']} за {stats['requests']} запросов, ошибок: {stats['failed']}")
 
     # Статистика
     total_updated = sum(r.get("updated", 0) for r in results)
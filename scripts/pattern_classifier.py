@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+КОМПИЛИРОВАННЫЙ КЛАССИФИКАТОР ПО КЛЮЧЕВЫМ СЛОВАМ
+
+Заменяет вложенные циклы вида
+
+    for brand, patterns in BRAND_PATTERNS.items():
+        for pattern in patterns:
+            if pattern in name_lower:
+                return brand
+
+одним проходом по названию:
+- подстроки → автомат Ахо-Корасик по всем ключевым словам сразу
+- регулярные выражения → обязательные литералы паттернов ищутся тем же
+  автоматом, регулярками проверяются только кандидаты; scan() отдаёт
+  совпадения всех паттернов (и разных паттернов на одной позиции)
+
+Приоритет = порядок меток в словаре правил, затем порядок паттернов,
+поэтому classify() возвращает ровно то же, что и старые циклы.
+
+Использование:
+    from pattern_classifier import PatternClassifier
+
+    brands = PatternClassifier(BRAND_PATTERNS, default="universal")
+    brands.classify("Фильтр масляный DongFeng 244")   # → "dongfeng-parts"
+    brands.scan("...")                                 # → все Hit с позициями
+
+    regex_brands = PatternClassifier(REGEX_PATTERNS, regex=True)
+"""
+
+import re
+from collections import deque, namedtuple
+
+Hit = namedtuple("Hit", "label keyword start end priority")
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _required_literal(pattern: str) -> str:
+    """
+    Литерал, без которого регулярка не может совпасть (начало паттерна
+    до первого метасимвола), или "" если такого нет.
+    """
+    if _has_top_level_alternation(pattern):
+        return ""
+
+    rest = pattern[2:] if pattern.startswith(r"\b") else pattern
+    literal = []
+    for ch in rest:
+        if ch in _REGEX_META:
+            # Символ перед квантификатором может отсутствовать
+            if ch in "?*{+" and literal:
+                literal.pop()
+            break
+        literal.append(ch)
+
+    return "".join(literal).lower() if len(literal) >= 2 else ""
+
+
+class PatternClassifier:
+    """Классификатор: {метка: [паттерны]} → одно сканирование текста"""
+
+    def __init__(
+        self,
+        rules: dict,
+        regex: bool = False,
+        word_boundary: bool = False,
+        default=None,
+    ):
+        self.regex = regex
+        self.word_boundary = word_boundary
+        self.default = default
+        self.labels = list(rules)
+
+        # (метка, паттерн) в порядке приоритета
+        self._entries = [
+            (label, pattern)
+            for label, patterns in rules.items()
+            for pattern in patterns
+        ]
+
+        if regex:
+            self._compile_regex()
+        else:
+            self._compile_automaton([pattern for _, pattern in self._entries])
+
+    # ------------------------------------------------------------------
+    # Сборка
+    # ------------------------------------------------------------------
+    def _compile_regex(self):
+        parts = []
+        for i, (_, pattern) in enumerate(self._entries):
+            if self.word_boundary:
+                pattern = rf"\b(?:{pattern})\b"
+            parts.append(pattern)
+
+        # Отдельные регулярки + префильтр по обязательным литералам
+        self._compiled = [re.compile(part, re.IGNORECASE) for part in parts]
+        literals = [_required_literal(pattern) for _, pattern in self._entries]
+        self._always = [i for i, literal in enumerate(literals) if not literal]
+        self._compile_automaton(literals)
+
+    def _compile_automaton(self, keywords: list):
+        # goto: список dict (узел → {символ: узел}), out: номера паттернов в узле
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for i, keyword in enumerate(keywords):
+            node = 0
+            for ch in keyword.lower():
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            if keyword:
+                self._out[node].append(i)
+
+        # Fail-ссылки (BFS)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+    def scan(self, text: str) -> list:
+        """Все совпадения (Hit) в порядке позиции в тексте"""
+        if not text:
+            return []
+        if self.regex:
+            return self._scan_regex(text)
+        return self._scan_automaton(text)
+
+    def _candidates(self, text: str) -> list:
+        """Номера регулярок, обязательный литерал которых есть в тексте"""
+        candidates = set(self._always)
+        for _, matched in self._walk(text.lower()):
+            candidates.update(matched)
+        return sorted(candidates)
+
+    def _scan_regex(self, text: str) -> list:
+        hits = []
+        for i in self._candidates(text):
+            label, pattern = self._entries[i]
+            for match in self._compiled[i].finditer(text):
+                hits.append(Hit(label, pattern, match.start(), match.end(), i))
+        hits.sort(key=lambda h: (h.start, h.priority))
+        return hits
+
+    def _walk(self, text_lower: str):
+        """(позиция, номера паттернов) для каждого символа с совпадениями"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+
+        for pos, ch in enumerate(text_lower):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                yield pos, out[node]
+
+    def _scan_automaton(self, text: str) -> list:
+        text_lower = text.lower()
+        hits = []
+
+        for pos, matched in self._walk(text_lower):
+            for i in matched:
+                label, keyword = self._entries[i]
+                end = pos + 1
+                start = end - len(keyword)
+                if self.word_boundary and (
+                    (start > 0 and _is_word_char(text_lower[start - 1]))
+                    or (end < len(text_lower) and _is_word_char(text_lower[end]))
+                ):
+                    continue
+                hits.append(Hit(label, keyword, start, end, i))
+
+        hits.sort(key=lambda h: (h.start, h.priority))
+        return hits
+
+    def classify(self, text: str):
+        """Метка с наивысшим приоритетом среди совпадений (или default)"""
+        if self.regex:
+            return self._classify_regex(text)
+
+        hits = self.scan(text)
+        if not hits:
+            return self.default
+        return min(hits, key=lambda h: h.priority).label
+
+    def _classify_regex(self, text: str):
+        if not text:
+            return self.default
+
+        for i in self._candidates(text):
+            if self._compiled[i].search(text):
+                return self._entries[i][0]
+        return self.default
+
+    def matched_labels(self, text: str) -> list:
+        """Все совпавшие метки в порядке приоритета"""
+        seen = {}
+        for hit in self.scan(text):
+            if hit.label not in seen or hit.priority < seen[hit.label]:
+                seen[hit.label] = hit.priority
+        return sorted(seen, key=seen.get)
+
+    def classify_many(self, texts) -> list:
+        """classify() для списка названий"""
+        return [self.classify(text) for text in texts]
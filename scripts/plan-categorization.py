@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+ПЛАН КАТЕГОРИЗАЦИИ ВСЕГО КАТАЛОГА
+
+Считает желаемое состояние каталога локально (правила из
+categorization_rules.json), сравнивает с текущим и пишет компактный
+changeset. Запись - отдельным шагом, только отличающиеся строки.
+
+Желаемое состояние:
+- category_id: товары из "Запчасти" → <бренд>-<тип>, товары из
+  universal-* → <бренд>-<тип>, если бренд определился (как
+  migrate-parts-improved.py и redistribute-universal-parts.py)
+- manufacturer: каноническое написание (DONGFENG → DongFeng),
+  для пустого / UNIVERSAL - бренд из названия
+- specifications.part_type: тип из названия, если определился
+
+Использование:
+    python3 plan-categorization.py                      # dry run: план в categorization-plan.json
+    python3 plan-categorization.py --apply              # план + запись (rollback в categorization-rollback.json)
+    python3 plan-categorization.py --apply-file plan.json
+    python3 plan-categorization.py --rollback categorization-rollback.json
+"""
+
+import os
+import sys
+
+from supabase import Client, create_client
+
+from categorization_plan import (
+    apply_changeset,
+    build_changeset,
+    load_catalog,
+    load_categories,
+    load_changeset,
+    save_changeset,
+    summarize,
+)
+from rules_engine import get_engine
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase: Client = create_client(url, key)
+
+ENGINE = get_engine()
+
+PLAN_PATH = "categorization-plan.json"
+ROLLBACK_PATH = "categorization-rollback.json"
+
+UNKNOWN_MANUFACTURERS = {None, "", "UNIVERSAL"}
+
+
+def find_parts_category(categories: list):
+    """Корневая категория "Запчасти" (как в migrate-parts-improved.py)"""
+    for cat in categories:
+        if cat["slug"] == "parts" or "запчасти" in cat["name"].lower():
+            if "для" not in cat["name"].lower():
+                return cat
+    return None
+
+
+def desired_state(products: list, categories: list) -> dict:
+    """{id: {поле: желаемое значение}} для всего каталога"""
+    slug_to_id = {cat["slug"]: cat["id"] for cat in categories}
+    id_to_slug = {cat["id"]: cat["slug"] for cat in categories}
+
+    parts_category = find_parts_category(categories)
+    parts_cat_id = parts_category["id"] if parts_category else None
+
+    labels = ENGINE.classify_many(
+        [p.get("name") or "" for p in products],
+        ["brand", "brand_category", "part_category", "part_type"],
+    )
+
+    desired = {}
+    for product, label in zip(products, labels):
+        fields = {}
+
+        # category_id
+        current_slug = id_to_slug.get(product.get("category_id"), "")
+        target_slug = f"{label['brand_category']}-{label['part_category']}"
+        if product.get("category_id") == parts_cat_id and parts_cat_id is not None:
+            if target_slug in slug_to_id:
+                fields["category_id"] = slug_to_id[target_slug]
+        elif current_slug.startswith("universal-") and label["brand_category"] != "universal":
+            part_slug = current_slug[len("universal-"):]
+            brand_slug = f"{label['brand_category']}-{part_slug}"
+            if brand_slug in slug_to_id:
+                fields["category_id"] = slug_to_id[brand_slug]
+
+        # manufacturer
+        manufacturer = ENGINE.normalize_brand(product.get("manufacturer"))
+        if manufacturer in UNKNOWN_MANUFACTURERS and label["brand"]:
+            manufacturer = label["brand"]
+        if manufacturer:
+            fields["manufacturer"] = manufacturer
+
+        # specifications.part_type
+        if label["part_type"]:
+            fields["part_type"] = label["part_type"]
+
+        desired[product["id"]] = fields
+
+    return desired
+
+
+def print_summary(changeset: dict, categories: list):
+    id_to_slug = {cat["id"]: cat["slug"] for cat in categories}
+
+    print(f"✏️  Изменится товаров: {changeset['total']} ({len(changeset['groups'])} групп)\n")
+    for field, values in summarize(changeset).items():
+        print(f"📊 {field}:")
+        for value, count in sorted(values.items(), key=lambda x: -x[1])[:15]:
+            shown = id_to_slug.get(value, value) if field == "category_id" else value
+            print(f"   {str(shown):45} {count:>6}")
+        print()
+
+
+def main():
+    args = sys.argv[1:]
+
+    print("=" * 80)
+    print("🗺️  ПЛАН КАТЕГОРИЗАЦИИ КАТАЛОГА")
+    print(f"📐 Правила: {ENGINE.version}")
+    print("=" * 80 + "\n")
+
+    if "--rollback" in args:
+        path = args[args.index("--rollback") + 1]
+        changeset = load_changeset(path)
+        print(f"↩️  Откат {path}: {changeset['total']} товаров")
+        stats = apply_changeset(supabase, changeset)
+        print(f"✅ Откачено: {stats['updated']}, ошибок: {stats['failed']}")
+        return
+
+    if "--apply-file" in args:
+        path = args[args.index("--apply-file") + 1]
+        changeset = load_changeset(path)
+        print(f"📄 План из {path} (правила {changeset.get('rules_version')})")
+    else:
+        print("📦 Загрузка каталога...")
+        products = load_catalog(supabase)
+        categories = load_categories(supabase)
+        print(f"✅ Товаров: {len(products)}, категорий: {len(categories)}\n")
+
+        desired = desired_state(products, categories)
+        changeset = build_changeset(products, desired, {"rules_version": ENGINE.version})
+        save_changeset(changeset, PLAN_PATH)
+
+        print_summary(changeset, categories)
+        print(f"💾 План сохранён: {PLAN_PATH}")
+
+    if "--apply" not in args and "--apply-file" not in args:
+        print("\nℹ️  DRY RUN - изменения не записаны (--apply для записи)")
+        return
+
+    if changeset["total"] == 0:
+        print("\n✅ Каталог уже соответствует правилам")
+        return
+
+    print(f"\n🚀 Применяем {changeset['total']} изменений (rollback → {ROLLBACK_PATH})...")
+    stats = apply_changeset(supabase, changeset, rollback_path=ROLLBACK_PATH)
+    print(
+        f"✅ Обновлено: {stats['updated']} за {stats['requests']} запросов, "
+        f"ошибок: {stats['failed']}"
+    )
+
+    print("\n" + "=" * 80)
+    print("✅ ГОТОВО!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
 #!/usr/bin/env python3
 """
 Анализирует и перераспределяет товары из категории "Универсальные" по правильным брендам
+
+Запись - через журнал операций (redistribute-universal.journal.jsonl):
+    python3 redistribute-universal-parts.py             # прерванный запуск продолжается с места остановки
+    python3 redistribute-universal-parts.py --rollback  # откат применённых пачек
 """
 
 import os
 import re
+import sys
 from collections import defaultdict
 
 from supabase import create_client
 
+from categorization_plan import apply_changeset, build_changeset
+from op_journal import OperationJournal, journal_cli, make_executor
+from rules_engine import get_engine
+
 
 # Загружаем переменные окружения
 def load_env():
@@ -28,106 +37,18 @@ supabase = create_client(
     os.getenv("NEXT_PUBLIC_SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 )
 
-# Расширенные ключевые слова для определения брендов
-BRAND_KEYWORDS = {
-    "uralets": [
-        "уралец",
-        "uralets",
-    ],
-    "dongfeng-parts": [
-        "dongfeng",
-        "донгфенг",
-        "донфенг",
-        "dong feng",
-        "df",
-        "дф-",
-    ],
-    "jinma": [
-        "jinma",
-        "джинма",
-        "цзинма",
-        "jm",
-    ],
-    "xingtai": [
-        "xingtai",
-        "синтай",
-        "синьтай",
-        "xt",
-    ],
-    "foton": [
-        "foton",
-        "фотон",
-        "lovol",
-        "ловол",
-        "ft",
-    ],
-    "shifeng": [
-        "shifeng",
-        "шифенг",
-        "sf",
-    ],
-    "bulat": [
-        "булат",
-        "bulat",
-    ],
-    "scout": [
-        "скаут",
-        "scout",
-    ],
-    "mtz": [
-        "беларус",
-        "belarus",
-        "мтз",
-        "mtz",
-    ],
-    "kentavr": [
-        "кентавр",
-        "kentavr",
-    ],
-    "rusich": [
-        "русич",
-        "rusich",
-    ],
-    "fayter": [
-        "файтер",
-        "fayter",
-        "fighter",
-    ],
-    "wirax": [
-        "wirax",
-        "виракс",
-        "вайракс",
-    ],
-    "yto": [
-        "yto",
-        "ито",
-    ],
-    "neva": [
-        "нева",
-        "neva",
-    ],
-    "catmann": [
-        "catmann",
-        "катманн",
-    ],
-    "chuvashpiller": [
-        "чувашпиллер",
-        "chuvashpiller",
-    ],
-    "km-engines": [
-        "км385",
-        "км490",
-        "км495",
-        "км-",
-    ],
-    "dlh": [
-        "dlh",
-    ],
-    "perkins": [
-        "perkins",
-        "перкинс",
-    ],
-}
+# Бренды - общий набор brand_category из categorization_rules.json
+ENGINE = get_engine()
+
+ROLLBACK_PATH = "redistribute-universal-rollback.json"
+JOURNAL_PATH = "redistribute-universal.journal.jsonl"
+
+
+def detect_brand_from_name(name):
+    """Определяет бренд из названия товара (None - бренд не найден)"""
+    brand = ENGINE.label("brand_category", name)
+    return None if brand == "universal" else brand
+
 
 # Маппинг типов запчастей по ключевым словам в slug категории
 PART_TYPE_FROM_SLUG = {
@@ -147,19 +68,6 @@ PART_TYPE_FROM_SLUG = {
 }
 
 
-def detect_brand_from_name(name):
-    """Определяет бренд из названия товара"""
-    name_lower = name.lower()
-
-    # Проверяем каждый бренд
-    for brand_slug, keywords in BRAND_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword.lower() in name_lower:
-                return brand_slug
-
-    return None
-
-
 def get_part_type_from_category_slug(category_slug):
     """Извлекает тип запчасти из slug категории (например: universal-filters -> filters)"""
     for part_type_slug in PART_TYPE_FROM_SLUG.keys():
@@ -290,6 +198,8 @@ def redistribute_products(dry_run=True):
         "no_category": 0,
         "errors": 0,
     }
+    all_products = []
+    desired = {}
 
     for univ_category in universal_categories:
         category_id = univ_category["id"]
@@ -333,25 +243,23 @@ def redistribute_products(dry_run=True):
                 print(f"   ⚠️  Категория не найдена: {new_category_slug}")
                 continue
 
-            new_category_id = category_map[new_category_slug]
-
-            # Перемещаем товар
-            if not dry_run:
-                try:
-                    supabase.table("products").update(
-                        {"category_id": new_category_id}
-                    ).eq("id", product["id"]).execute()
-
-                    stats["redistributed"] += 1
+            # В план: запись одним шагом после сканирования
+            all_products.append(product)
+            desired[product["id"]] = {"category_id": category_map[new_category_slug]}
 
-                    if stats["redistributed"] % 100 == 0:
-                        print(f"   ✅ Перемещено: {stats['redistributed']}")
+    # Changeset - только товары, у которых категория реально меняется
+    changeset = build_changeset(
+        all_products, desired, {"job": "redistribute-universal", "rules_version": ENGINE.version}
+    )
+    stats["redistributed"] = changeset["total"]
 
-                except Exception as e:
-                    print(f"   ❌ Ошибка при перемещении {product['name'][:50]}: {e}")
-                    stats["errors"] += 1
-            else:
-                stats["redistributed"] += 1
+    if not dry_run and changeset["total"]:
+        print(f"\n🚀 Перемещаем {changeset['total']} товаров (откат: {ROLLBACK_PATH})...")
+        result = apply_changeset(
+            supabase, changeset, rollback_path=ROLLBACK_PATH, journal=OperationJournal(JOURNAL_PATH)
+        )
+        stats["redistributed"] = result["updated"]
+        stats["errors"] = result["failed"]
 
     # Итоговая статистика
     print(f"\n{'=' * 80}")
@@ -373,6 +281,11 @@ def main():
 ╚════════════════════════════════════════════════════════════════════════════╝
     """)
 
+    # Прерванный запуск / --rollback - по журналу, без повторного анализа
+    journal = OperationJournal(JOURNAL_PATH)
+    if journal_cli(journal, make_executor(supabase), sys.argv[1:]):
+        return
+
     # Шаг 1: Анализ
     brand_dist, undetected = analyze_universal_products()
 
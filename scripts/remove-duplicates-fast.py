@@ -2,6 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 БЫСТРОЕ удаление дубликатов через SQL
+
+После docs/migrations/name-key.sql точных дубликатов в БД не появляется
+(уникальный name_key); разовая чистка перед миграцией - cleanup-all-duplicates.py
 """
 import os
 from dotenv import load_dotenv
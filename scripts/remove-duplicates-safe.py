@@ -10,6 +10,8 @@ import os
 import sys
 from supabase import create_client
 
+from near_duplicates import find_duplicate_clusters
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -33,7 +35,7 @@ limit = 1000
 
 while True:
     batch = supabase.table("products")\
-        .select("id, name, slug, price, category_id, manufacturer, in_stock, created_at")\
+        .select("id, name, slug, price, category_id, manufacturer, in_stock, image_url, created_at")\
         .range(offset, offset + limit - 1)\
         .execute()
 
@@ -51,23 +53,16 @@ while True:
 print(f"✅ Всего товаров: {len(all_products)}")
 print()
 
-# Находим дубликаты по name
-names = {}
-for p in all_products:
-    name = p["name"]
-    if name not in names:
-        names[name] = []
-    names[name].append(p)
-
-duplicates = {name: products for name, products in names.items() if len(products) > 1}
+# Кластеры дубликатов: точные и почти-дубли (пунктуация, единицы,
+# "на трактор ...", кириллица вместо латиницы) - near_duplicates.py
+clusters = find_duplicate_clusters(all_products)
 
-print(f"📊 НАЙДЕНО ДУБЛИКАТОВ: {len(duplicates)}")
+print(f"📊 НАЙДЕНО КЛАСТЕРОВ ДУБЛИКАТОВ: {len(clusters)}")
+print(f"   из них с разным написанием: {sum(1 for c in clusters if not c['exact'])}")
 print()
 
 # Подсчитываем сколько товаров будет удалено
-total_to_delete = 0
-for name, products in duplicates.items():
-    total_to_delete += len(products) - 1  # Оставляем 1, удаляем остальные
+total_to_delete = sum(len(c["duplicates"]) for c in clusters)
 
 print(f"⚠️  БУДЕТ УДАЛЕНО: {total_to_delete} товаров")
 print(f"✅ ОСТАНЕТСЯ: {len(all_products) - total_to_delete} товаров")
@@ -76,33 +71,32 @@ print()
 # Определяем стратегию - какой товар оставить
 print("📋 СТРАТЕГИЯ УДАЛЕНИЯ:")
 print("-" * 100)
-print("Для каждого дубликата:")
-print("  ✅ ОСТАВИМ: товар с минимальным ID (самый старый)")
+print("Для каждого кластера:")
+print("  ✅ ОСТАВИМ: в наличии > с фото > с ценой > с описанием > с минимальным ID")
 print("  ❌ УДАЛИМ: все остальные копии")
 print()
 
 # Показываем примеры
-print("📋 ПРИМЕРЫ (первые 10 дубликатов):")
+print("📋 ПРИМЕРЫ (первые 10 кластеров):")
 print("-" * 100)
 
-for i, (name, products) in enumerate(list(duplicates.items())[:10], 1):
-    # Сортируем по ID
-    products.sort(key=lambda x: x["id"])
+for i, cluster in enumerate(clusters[:10], 1):
+    survivor = cluster["survivor"]
 
-    print(f"\n{i}. '{name}' - {len(products)} копий:")
-    print(f"   ✅ ОСТАВИМ: ID={products[0]['id']}, created_at={products[0].get('created_at', 'НЕТ')}")
+    print(f"\n{i}. '{survivor['name']}' - {len(cluster['duplicates']) + 1} копий (сходство ≥ {cluster['similarity']}):")
+    print(f"   ✅ ОСТАВИМ: ID={survivor['id']}, created_at={survivor.get('created_at', 'НЕТ')}")
     print(f"   ❌ УДАЛИМ:")
-    for p in products[1:]:
-        print(f"      ID={p['id']}, created_at={p.get('created_at', 'НЕТ')}")
+    for p in cluster["duplicates"]:
+        print(f"      ID={p['id']}, '{p['name']}', created_at={p.get('created_at', 'НЕТ')}")
 
 print()
 print("=" * 100)
 print("⚠️  ВНИМАНИЕ!")
 print("=" * 100)
 print(f"Будет БЕЗВОЗВРАТНО удалено {total_to_delete} товаров!")
-print("Останется по 1 копии каждого товара (с минимальным ID)")
+print("Останется по 1 копии каждого товара (предложенный в кластере)")
 print()
-print("Это БЕЗОПАСНО - мы оставляем самые старые товары!")
+print("Проверь почти-дубли в отчёте - у них разное написание!")
 print()
 
 # Сохраняем отчёт в файл
@@ -113,20 +107,21 @@ with open("duplicates-report.txt", "w", encoding="utf-8") as f:
     f.write("ОТЧЁТ О ДУБЛИКАТАХ\n")
     f.write("=" * 100 + "\n\n")
     f.write(f"Всего товаров: {len(all_products)}\n")
-    f.write(f"Найдено дубликатов: {len(duplicates)}\n")
+    f.write(f"Найдено кластеров дубликатов: {len(clusters)}\n")
     f.write(f"Будет удалено: {total_to_delete} товаров\n")
     f.write(f"Останется: {len(all_products) - total_to_delete} товаров\n\n")
     f.write("=" * 100 + "\n")
-    f.write("СПИСОК ВСЕХ ДУБЛИКАТОВ:\n")
+    f.write("СПИСОК ВСЕХ КЛАСТЕРОВ:\n")
     f.write("=" * 100 + "\n\n")
 
-    for name, products in sorted(duplicates.items(), key=lambda x: len(x[1]), reverse=True):
-        products.sort(key=lambda x: x["id"])
-        f.write(f"\n'{name}' - {len(products)} копий:\n")
-        f.write(f"  ОСТАВИМ: ID={products[0]['id']}\n")
+    for cluster in clusters:
+        survivor = cluster["survivor"]
+        kind = "точные" if cluster["exact"] else f"почти-дубли, сходство ≥ {cluster['similarity']}"
+        f.write(f"\n'{survivor['name']}' - {len(cluster['duplicates']) + 1} копий ({kind}):\n")
+        f.write(f"  ОСТАВИМ: ID={survivor['id']}\n")
         f.write(f"  УДАЛИМ:\n")
-        for p in products[1:]:
-            f.write(f"    ID={p['id']}\n")
+        for p in cluster["duplicates"]:
+            f.write(f"    ID={p['id']} '{p['name']}'\n")
 
 print("✅ Отчёт сохранён!")
 print()
@@ -3,6 +3,9 @@
 """
 Удаление дубликатов товаров
 Оставляет самый старый товар по каждому названию, удаляет остальные
+
+После docs/migrations/name-key.sql точных дубликатов в БД не появляется
+(уникальный name_key); разовая чистка перед миграцией - cleanup-all-duplicates.py
 """
 import os
 import sys
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+ОДИН ТОВАР НА ДЕТАЛЬ ИЗ НЕСКОЛЬКИХ ИСТОЧНИКОВ
+
+tata-agro, zip-agro и agrodom импортируются отдельными товарами, и
+популярные запчасти лежат в каталоге в 2-3 копиях. Скрипт сводит
+предложения источников в канонические товары (entity_resolution.py) и:
+
+1. Пишет все предложения в product_offers (цена / наличие / ссылка
+   каждого источника) с product_id оставляемого товара
+2. Оставляемому товару ставит минимальную цену из предложений в наличии
+3. Лишние копии удаляет (RPC dedupe_products: позиции заказов
+   переносятся на оставляемый товар)
+
+Все три шага - пачками через журнал операций: прежние строки
+предложений, цены и полные строки копий сохраняются в журнале, откат
+возвращает копии и их предложения (новые предложения удаляются).
+
+Оставляемый товар - тот, что импортирован из лучшего предложения
+(полное название, описание, заводской артикул), иначе самый старый.
+Импортёры (import-all-*.py) больше не создают товар, если ключ его
+источника уже есть в product_offers.
+
+Требуются миграции docs/migrations/source-identity.sql, product-offers.sql
+и dedupe-products.sql.
+
+Использование:
+    python3 resolve-entities.py                # отчёт entity-resolution.json, без записи
+    python3 resolve-entities.py --apply        # запись (прерванный запуск продолжается)
+    python3 resolve-entities.py --rollback     # вернуть цены, удалённые копии и их предложения
+    python3 resolve-entities.py --threshold 0.8
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from supabase import Client, create_client
+
+from dedupe import dedupe_batches
+from entity_resolution import THRESHOLD, load_offers, resolve
+from op_journal import OperationJournal, batches, journal_cli, make_executor
+from source_identity import load_offer_rows, load_source_map
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase: Client = create_client(url, key)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Те же каталоги, что в resync-by-source.py (+ parts-final.json agrodom)
+PARSED_DIRS = [
+    ROOT / "parsed_data" / "tata-agro",
+    ROOT / "parsed_data" / "zip-agro",
+    ROOT / "parsed_data" / "agrodom",
+    ROOT / "scripts" / "parsed_data" / "agrodom",
+]
+
+REPORT_PATH = "entity-resolution.json"
+JOURNAL_PATH = "resolve-entities.journal.jsonl"
+BATCH_SIZE = 100
+OFFER_BATCH_SIZE = 500
+
+
+def find_parsed_files():
+    files = []
+    for directory in PARSED_DIRS:
+        if directory.exists():
+            files.extend(p for p in sorted(directory.rglob("*.json")) if "archive" not in p.parts)
+    return files
+
+
+def plan_merges(entities, products, offer_products):
+    """
+    Для каждой сущности: оставляемый товар и лишние копии.
+    products / offer_products - {(source, source_url): id} из products и product_offers.
+    """
+    merges = []
+    for entity in entities:
+        ids = set()
+        for offer in entity["offers"]:
+            offer_key = (offer["source"], offer["source_url"])
+            product_id = products.get(offer_key) or offer_products.get(offer_key)
+            if product_id:
+                ids.add(product_id)
+        if not ids:
+            continue
+
+        survivor = products.get(entity["primary"]) or offer_products.get(entity["primary"])
+        if survivor not in ids:
+            survivor = min(ids)
+        merges.append({"entity": entity, "survivor": survivor, "losers": sorted(ids - {survivor})})
+    return merges
+
+
+def offer_rows(merges):
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {**offer, "product_id": merge["survivor"], "updated_at": now}
+        for merge in merges
+        for offer in merge["entity"]["offers"]
+    ]
+
+
+def offer_inverse(rows, existing):
+    """Обратное к upsert предложений: прежняя строка (без id) или удаление новой"""
+    inverse = []
+    for row in rows:
+        previous = existing.get((row["source"], row["source_url"]))
+        if previous:
+            inverse.append({k: v for k, v in previous.items() if k != "id"})
+        else:
+            inverse.append({"source": row["source"], "source_url": row["source_url"], "delete": True})
+    return inverse
+
+
+def main():
+    apply = "--apply" in sys.argv
+    threshold = THRESHOLD
+    if "--threshold" in sys.argv:
+        threshold = float(sys.argv[sys.argv.index("--threshold") + 1])
+
+    print("=" * 80)
+    print("🔗 ОДИН ТОВАР НА ДЕТАЛЬ ИЗ НЕСКОЛЬКИХ ИСТОЧНИКОВ" + ("" if apply else " (DRY RUN)"))
+    print("=" * 80 + "\n")
+
+    journal = OperationJournal(JOURNAL_PATH)
+    executor = make_executor(supabase)
+    if journal_cli(journal, executor, sys.argv[1:], confirm=False):
+        return
+
+    files = find_parsed_files()
+    offers = load_offers(files)
+    entities = resolve(offers, threshold)
+    multi = [e for e in entities if len(e["offers"]) > 1]
+
+    print(f"📁 Файлов: {len(files)}, предложений: {len(offers)}")
+    print(f"🧩 Деталей: {len(entities)}, из них в нескольких источниках: {len(multi)}")
+    print(f"   лишних копий в парсинге: {len(offers) - len(entities)}\n")
+
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(multi, f, ensure_ascii=False, indent=2)
+    print(f"💾 Отчёт: {REPORT_PATH}\n")
+
+    for entity in multi[:10]:
+        print(f"  {entity['name'][:70]} (сходство {entity['score']}, цена {entity['price']})")
+        for offer in entity["offers"]:
+            print(f"     {offer['source']:10} {offer['price']:>10} {offer['source_url']}")
+
+    products = load_source_map(supabase, columns="id, price, in_stock")
+    existing_offers = load_offer_rows(supabase)
+    offer_products = {offer_key: row["product_id"] for offer_key, row in existing_offers.items()}
+    merges = plan_merges(entities, {k: row["id"] for k, row in products.items()}, offer_products)
+    losers = {loser: merge["survivor"] for merge in merges for loser in merge["losers"]}
+
+    # Цена и наличие оставляемого товара - по всем предложениям
+    rows_by_id = {row["id"]: row for row in products.values()}
+    forward, inverse = [], []
+    for merge in merges:
+        entity, row = merge["entity"], rows_by_id.get(merge["survivor"])
+        if len(entity["offers"]) < 2 or row is None or not entity["price"]:
+            continue
+        patch = {"price": entity["price"], "in_stock": entity["in_stock"]}
+        if float(row.get("price") or 0) != patch["price"] or row.get("in_stock") != patch["in_stock"]:
+            forward.append({"id": row["id"], "set": patch})
+            inverse.append({"id": row["id"], "set": {"price": row.get("price"), "in_stock": row.get("in_stock")}})
+
+    print(f"\n📦 Товаров в БД с деталями из парсинга: {len(merges)}")
+    print(f"🗑️  Лишних копий в БД: {len(losers)}")
+    print(f"💰 Цена / наличие изменится: {len(forward)}")
+
+    if not apply:
+        print("\nℹ️  DRY RUN - запуск с --apply запишет изменения")
+        return
+
+    # Журнал (план пишется до первой записи). 1. Предложения → оставляемый
+    # товар - до удаления копий: у копий предложения удаляются каскадом, а
+    # при откате копии вернутся раньше, чем их предложения
+    rows = offer_rows(merges)
+    plan = batches("offers", rows, offer_inverse(rows, existing_offers), OFFER_BATCH_SIZE)
+    # 2-3. Цены и удаление копий
+    plan += batches("update", forward, inverse, BATCH_SIZE)
+    plan += dedupe_batches(supabase, losers)
+    journal.start("resolve-entities", plan, {"threshold": threshold})
+    summary = journal.run(executor)
+
+    print(f"\n✅ Применено пачек: {summary['applied']}/{summary['total']}, ошибок: {summary['failed']}")
+    print(f"   Журнал: {JOURNAL_PATH} (откат: --rollback)")
+
+
+if __name__ == "__main__":
+    main()
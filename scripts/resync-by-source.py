@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+RESYNC ПО КЛЮЧУ ИСТОЧНИКА
+
+Сопоставляет свежий парсинг с товарами в БД по точному ключу
+(source, source_url) - hash join за O(n), без угадывания по названию:
+1. Строим словарь ключ → запись из parsed_data
+2. Один раз загружаем товары с ключом источника из БД
+3. Для каждого товара БД ищем свежую запись и считаем только изменённые поля
+4. Пишем изменения пакетами (одинаковые патчи - одним запросом)
+
+Требуется миграция docs/migrations/source-identity.sql.
+
+Использование:
+    python3 resync-by-source.py                 # все файлы parsed_data
+    python3 resync-by-source.py --dry-run       # только показать изменения
+    python3 resync-by-source.py path/to/file.json ...
+"""
+
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from supabase import Client, create_client
+
+from db_batch import update_grouped
+from source_identity import load_source_map, source_fields, source_key
+
+url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+if not url or not key:
+    print("❌ ОШИБКА: Установите переменные окружения")
+    sys.exit(1)
+
+supabase: Client = create_client(url, key)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PARSED_DIRS = [
+    ROOT / "parsed_data" / "tata-agro",
+    ROOT / "parsed_data" / "zip-agro",
+    ROOT / "scripts" / "parsed_data" / "agrodom",
+]
+
+
+def parse_price(price_str):
+    """Извлекает числовое значение цены"""
+    if not price_str:
+        return 0
+
+    cleaned = re.sub(r"[^\d.,]", "", str(price_str))
+    cleaned = cleaned.replace(",", ".")
+
+    try:
+        return float(cleaned)
+    except ValueError:
+        return 0
+
+
+def parse_in_stock(item, price):
+    """Наличие: поле stock ("В наличии"/"Нет в наличии"), иначе по цене"""
+    stock = str(item.get("stock") or "").lower()
+    if stock:
+        return "нет" not in stock and "отсутств" not in stock
+    return price > 0
+
+
+def find_parsed_files(paths):
+    """JSON файлы из аргументов или из всех PARSED_DIRS (без archive)"""
+    if paths:
+        return [Path(p) for p in paths]
+
+    files = []
+    for directory in PARSED_DIRS:
+        if not directory.exists():
+            continue
+        for path in sorted(directory.rglob("*.json")):
+            if "archive" not in path.parts:
+                files.append(path)
+    return files
+
+
+def build_fresh_map(files):
+    """Build-сторона hash join: {(source, source_url): item}"""
+    fresh = {}
+    for path in files:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"⚠️  Ошибка чтения {path}")
+            continue
+
+        if not isinstance(data, list):
+            continue
+
+        for item in data:
+            item_key = source_key(item)
+            if item_key:
+                # Более поздний файл перекрывает ранний (как при повторном парсинге)
+                fresh[item_key] = item
+    return fresh
+
+
+def diff_product(row, item):
+    """Патч только для реально изменившихся полей"""
+    patch = {}
+
+    price = parse_price(item.get("price"))
+    if price > 0 and float(row.get("price") or 0) != price:
+        patch["price"] = price
+
+    in_stock = parse_in_stock(item, price)
+    if row.get("in_stock") != in_stock:
+        patch["in_stock"] = in_stock
+
+    article = source_fields(item)["source_article"]
+    if article and row.get("source_article") != article:
+        patch["source_article"] = article
+
+    image_url = item.get("image_url")
+    if image_url and not row.get("image_url"):
+        patch["image_url"] = image_url
+
+    return patch
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    paths = [a for a in sys.argv[1:] if not a.startswith("--")]
+
+    print("=" * 80)
+    print("🔄 RESYNC ПО КЛЮЧУ ИСТОЧНИКА" + (" (DRY RUN)" if dry_run else ""))
+    print("=" * 80 + "\n")
+
+    files = find_parsed_files(paths)
+    fresh = build_fresh_map(files)
+    print(f"📁 Файлов: {len(files)}, записей с ключом: {len(fresh)}")
+
+    existing = load_source_map(
+        supabase, columns="id, price, in_stock, image_url, source_article"
+    )
+    print(f"📦 Товаров в БД с ключом: {len(existing)}\n")
+
+    # Probe-сторона: проходим по БД, ищем свежую запись по ключу
+    updates = {}
+    missing_in_crawl = 0
+    for row_key, row in existing.items():
+        item = fresh.get(row_key)
+        if item is None:
+            missing_in_crawl += 1
+            continue
+        patch = diff_product(row, item)
+        if patch:
+            updates[row["id"]] = patch
+
+    new_in_crawl = sum(1 for k in fresh if k not in existing)
+
+    print(f"✏️  Изменилось: {len(updates)}")
+    print(f"🆕 Нет в БД (кандидаты на импорт): {new_in_crawl}")
+    print(f"👻 Нет в свежем парсинге: {missing_in_crawl}\n")
+
+    if dry_run:
+        for product_id, patch in list(updates.items())[:20]:
+            print(f"  {product_id}: {patch}")
+        print("\nℹ️  DRY RUN - изменения не записаны")
+        return
+
+    if updates:
+        stats = update_grouped(supabase, updates)
+        print(
+            f"✅ Обновлено: {stats['updated']} за {stats['requests']} запросов, "
+            f"ошибок: {stats['failed']}"
+        )
+
+    print("\n" + "=" * 80)
+    print("✅ ГОТОВО!")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
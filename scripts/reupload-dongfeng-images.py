@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 """
 Перезагрузка изображений тракторов DongFeng в Supabase Storage
-Удаляет старые файлы и загружает новые
+
+Через image_mirror.py: путь в Storage - SHA-256 содержимого
+(dongfeng/ab/abcd....jpg), файлы заливаются параллельно, уже залитые
+(манифест dongfeng-images.manifest.jsonl) пропускаются. image_url
+товаров пишутся одной пачкой через журнал операций
+(dongfeng-images.journal.jsonl), откат - --rollback.
+
+Удалять старые файлы больше не нужно: новое содержимое ложится по новому
+пути, и старая версия не отдаётся из кэша CDN.
 """
 
-import json
+import asyncio
 import os
 import sys
 from pathlib import Path
 
-import requests
+from supabase import create_client
+
+from image_mirror import ImageMirror, MirrorManifest, image_url_batches, product_image_changes
+from op_journal import OperationJournal, journal_cli, make_executor
 
 # Supabase credentials
 SUPABASE_URL = os.getenv(
@@ -21,9 +32,13 @@ if not SUPABASE_KEY:
     print("❌ ОШИБКА: Не найден SUPABASE_SERVICE_ROLE_KEY")
     sys.exit(1)
 
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
 # Пути
 IMAGES_DIR = Path(__file__).parent.parent / "parsed_data" / "dongfeng_images"
 STORAGE_BUCKET = "products"  # Название bucket в Supabase Storage
+MANIFEST_PATH = "dongfeng-images.manifest.jsonl"
+JOURNAL_PATH = "dongfeng-images.journal.jsonl"
 
 # Только файлы, которые нужно перезагрузить
 IMAGE_MAPPING = {
@@ -34,64 +49,13 @@ IMAGE_MAPPING = {
 }
 
 
-def delete_from_storage(storage_path):
-    """Удаляет файл из Supabase Storage"""
-    url = f"{SUPABASE_URL}/storage/v1/object/{STORAGE_BUCKET}/{storage_path}"
-    headers = {
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-    }
-
-    response = requests.delete(url, headers=headers)
-
-    if response.status_code in [200, 204]:
-        return True
-    else:
-        print(f"  ⚠️  Ошибка удаления (возможно файл не существует): {response.text}")
-        return False
-
-
-def upload_to_storage(file_path, storage_path):
-    """Загружает файл в Supabase Storage"""
-    url = f"{SUPABASE_URL}/storage/v1/object/{STORAGE_BUCKET}/{storage_path}"
-    headers = {
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "image/jpeg",
-    }
-
-    with open(file_path, "rb") as f:
-        response = requests.post(url, headers=headers, data=f)
-
-    if response.status_code in [200, 201]:
-        public_url = (
-            f"{SUPABASE_URL}/storage/v1/object/public/{STORAGE_BUCKET}/{storage_path}"
-        )
-        return public_url
-    else:
-        print(f"  ❌ Ошибка загрузки: {response.text}")
-        return None
-
-
-def update_product_image(slug, image_url):
-    """Обновляет изображение товара в БД"""
-    url = f"{SUPABASE_URL}/rest/v1/products"
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=representation",
-    }
-
-    # Обновляем запись
-    params = {"slug": f"eq.{slug}"}
-    data = {"image_url": image_url}
-
-    response = requests.patch(url, headers=headers, params=params, json=data)
-
-    if response.status_code == 200:
-        return True
-    else:
-        print(f"  ❌ Ошибка обновления БД: {response.text}")
-        return False
+async def mirror_files(files: list) -> tuple:
+    """Файлы → Storage (путь - хеш содержимого) → {путь к файлу: запись манифеста}"""
+    manifest = MirrorManifest(MANIFEST_PATH)
+    async with ImageMirror(
+        SUPABASE_URL, SUPABASE_KEY, bucket=STORAGE_BUCKET, prefix="dongfeng", manifest=manifest
+    ) as mirror:
+        return await mirror.mirror_all(files, files=True), mirror.stats
 
 
 def main():
@@ -100,44 +64,53 @@ def main():
     print("🔄 ПЕРЕЗАГРУЗКА ИЗОБРАЖЕНИЙ DONGFENG В SUPABASE")
     print("=" * 70)
 
+    journal = OperationJournal(JOURNAL_PATH)
+    if journal_cli(journal, make_executor(supabase), sys.argv[1:]):
+        return
+
     if not IMAGES_DIR.exists():
         print(f"\n❌ Папка не найдена: {IMAGES_DIR}")
         sys.exit(1)
 
     results = {"success": 0, "error": 0}
 
-    for filename, slug in IMAGE_MAPPING.items():
+    mapped = []
+    for filename in IMAGE_MAPPING:
         image_file = IMAGES_DIR / filename
-
         if not image_file.exists():
             print(f"\n⚠️  {filename} - файл не найден")
             results["error"] += 1
-            continue
-
-        print(f"\n📷 {filename}")
-        storage_path = f"dongfeng/{filename}"
-
-        # Удаляем старый файл
-        print(f"  🗑️  Удаление старого файла...")
-        delete_from_storage(storage_path)
-
-        # Загружаем новый
-        print(f"  ↗️  Загрузка нового файла...")
-        public_url = upload_to_storage(image_file, storage_path)
-
-        if not public_url:
-            results["error"] += 1
-            continue
-
-        print(f"  ✓ URL: {public_url}")
-
-        # Обновляем БД
-        print(f"  ↗️  Обновление товара {slug}...")
-        if update_product_image(slug, public_url):
-            print(f"  ✅ Товар обновлен успешно")
-            results["success"] += 1
         else:
+            mapped.append(image_file)
+
+    # Загружаем в Storage
+    print(f"\n↗️  Загрузка {len(mapped)} файлов в Storage...")
+    mirrored, stats = asyncio.run(mirror_files(mapped))
+    print(f"  ✓ Залито: {stats['uploaded']}, уже было: {stats['deduped'] + stats['resumed']}")
+
+    slug_urls = {}
+    for image_file in mapped:
+        entry = mirrored[str(image_file)]
+        if "error" in entry:
+            print(f"  ❌ {image_file.name}: {entry['error']}")
             results["error"] += 1
+        else:
+            slug_urls[IMAGE_MAPPING[image_file.name]] = entry["public_url"]
+
+    # Обновляем БД
+    changes, missing = product_image_changes(supabase, slug_urls)
+    for slug in missing:
+        print(f"  ❌ Товар {slug} не найден")
+    results["error"] += len(missing)
+
+    failed = 0
+    plan = image_url_batches(changes)
+    if plan:
+        print(f"\n↗️  Обновление {sum(len(b['forward']) for b in plan)} товаров...")
+        journal.start("reupload-dongfeng-images", plan)
+        failed = journal.run(make_executor(supabase))["rows_failed"]
+    results["error"] += failed
+    results["success"] += len(changes) - failed
 
     # Итоги
     print("\n" + "=" * 70)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+ЕДИНЫЙ ДВИЖОК ПРАВИЛ КАТЕГОРИЗАЦИИ
+
+Все словари брендов / типов / моделей, которые раньше копировались
+из скрипта в скрипт (и успели разойтись), лежат в одном файле
+categorization_rules.json. Движок компилирует каждый набор правил
+один раз в PatternClassifier и отдаёт решения пачкой:
+
+    from rules_engine import get_engine
+
+    engine = get_engine()
+    results = engine.classify_many(names)          # [{"brand": ..., "part_type": ...}, ...]
+    engine.label("part_category", name)            # одно поле
+    engine.version                                 # хэш правил + кода движка
+
+classify_many() классифицирует каждое уникальное (нормализованное)
+название один раз - повторы в выгрузке не сканируются заново.
+
+RULES_VERSION - первые 12 символов sha256 файла правил вместе с кодом,
+от которого зависят решения (ENGINE_SOURCES: токенизатор моделей для
+бренда по двигателю, классификатор, движок). Правка токенизатора меняет
+бренды - и версию, поэтому старые штампы не считаются актуальными.
+fast-universal-categorizer.go читает тот же файл правил, но печатает хэш
+одного файла (токенизатор ему не нужен).
+
+Кэш решений: engine.stamp(name) = "<версия правил>:<хэш названия>".
+Скрипт хранит штамп в локальном кэше по id (например
+auto-categorize.stamps.json, а не в products - иначе смена правил
+переписала бы весь каталог) и при следующем запуске классифицирует
+только строки, где штамп не совпал - изменилось название или правила.
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from model_tokens import engine_models
+from pattern_classifier import PatternClassifier
+
+RULES_PATH = Path(__file__).resolve().parent / "categorization_rules.json"
+# Код, от которого зависят решения, - входит в версию правил
+ENGINE_SOURCES = [
+    Path(__file__).resolve().parent / name
+    for name in ("model_tokens.py", "pattern_classifier.py", "rules_engine.py")
+]
+
+
+def normalize_name(name: str) -> str:
+    """Нижний регистр + схлопнутые пробелы (ключ дедупликации названий)"""
+    return " ".join((name or "").lower().split())
+
+
+def name_hash(name: str) -> str:
+    """Хэш нормализованного названия (16 hex)"""
+    return hashlib.sha1(normalize_name(name).encode("utf-8")).hexdigest()[:16]
+
+
+class RulesEngine:
+    """Скомпилированные наборы правил из categorization_rules.json"""
+
+    def __init__(self, rules: dict, version: str):
+        self.rules = rules
+        self.version = version
+        self.fields = list(rules["rule_sets"])
+
+        self.classifiers = {}
+        for field, rule_set in rules["rule_sets"].items():
+            self.classifiers[field] = PatternClassifier(
+                {rule["label"]: rule["patterns"] for rule in rule_set["rules"]},
+                regex=rule_set.get("mode") == "regex",
+                word_boundary=rule_set.get("word_boundary", False),
+                default=rule_set.get("default"),
+            )
+
+        # Бренд по модели двигателя, если в названии нет бренда
+        # (модели - токены model_tokens, по границам слов: km385, zs1115, ...)
+        self.engine_brand_map = {
+            engine.lower(): brand
+            for engine, brand in rules.get("engine_brand_map", {}).items()
+        }
+
+        self.brand_aliases = {
+            alias.lower(): brand for alias, brand in rules.get("brand_aliases", {}).items()
+        }
+
+    @classmethod
+    def load(cls, path=RULES_PATH) -> "RulesEngine":
+        raw = Path(path).read_bytes()
+        digest = hashlib.sha256(raw)
+        for source in ENGINE_SOURCES:
+            digest.update(source.read_bytes())
+        return cls(json.loads(raw), digest.hexdigest()[:12])
+
+    # ------------------------------------------------------------------
+    # Одно название
+    # ------------------------------------------------------------------
+    def label(self, field: str, name: str):
+        """Решение одного набора правил для одного названия"""
+        if field == "brand":
+            return self._brand(normalize_name(name))
+        return self.classifiers[field].classify(normalize_name(name))
+
+    def classify(self, name: str, fields=None) -> dict:
+        """{поле: метка} по всем (или выбранным) наборам правил"""
+        return self.classify_many([name], fields)[0]
+
+    def stamp(self, name: str) -> str:
+        """Штамп решения: версия правил + хэш нормализованного названия"""
+        return f"{self.version}:{name_hash(name)}"
+
+    def is_fresh(self, name: str, stamp) -> bool:
+        """Решение со штампом stamp ещё актуально для name"""
+        return stamp == self.stamp(name)
+
+    def normalize_brand(self, brand: str) -> str:
+        """Каноническое написание бренда (DONGFENG → DongFeng, Неизвестно → UNIVERSAL)"""
+        if not brand:
+            return brand
+        return self.brand_aliases.get(brand.strip().lower(), brand.strip())
+
+    def _brand(self, name_norm: str):
+        brand = self.classifiers["brand"].classify(name_norm)
+        if brand:
+            return brand
+        engines = set(engine_models(name_norm))
+        for engine, brand in self.engine_brand_map.items():
+            if engine in engines:
+                return brand
+        return None
+
+    # ------------------------------------------------------------------
+    # Пачка названий
+    # ------------------------------------------------------------------
+    def classify_many(self, names, fields=None) -> list:
+        """
+        Классифицирует список названий.
+
+        Каждое уникальное нормализованное название сканируется один раз
+        каждым набором правил; результат - список dict в порядке names.
+        """
+        fields = list(fields or self.fields)
+        keys = [normalize_name(name) for name in names]
+        unique = list(dict.fromkeys(keys))
+
+        columns = {}
+        for field in fields:
+            if field == "brand":
+                columns[field] = [self._brand(key_name) for key_name in unique]
+            else:
+                columns[field] = self.classifiers[field].classify_many(unique)
+
+        decided = {
+            key_name: {field: columns[field][i] for field in fields}
+            for i, key_name in enumerate(unique)
+        }
+        return [dict(decided[key_name]) for key_name in keys]
+
+
+@lru_cache(maxsize=None)
+def get_engine(path=RULES_PATH) -> RulesEngine:
+    """Движок, загруженный один раз на процесс"""
+    return RulesEngine.load(path)
+
+
+RULES_VERSION = get_engine().version
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+КАТАЛОГ В РАЗДЕЛЯЕМОЙ ПАМЯТИ ДЛЯ Pool-ВОРКЕРОВ
+
+Раньше каждый воркер Pool(12) создавал свой Supabase клиент, сам читал
+свою страницу offset-ом и заново импортировал правила. Теперь:
+
+1. Драйвер читает каталог один раз (keyset) и кладёт его в один блок
+   multiprocessing.shared_memory: ids - массив int64, строковые колонки -
+   смещения int64 + UTF-8 байты подряд
+2. В воркеры через initializer передаются только описание блока (имя,
+   размеры) и скомпилированные правила - один раз на процесс
+3. Задачи воркеров - диапазоны индексов (start, stop), результат -
+   список патчей; запись делает драйвер
+
+Ничего не копируется и не пиклится по строкам. None в строковых
+колонках хранится как "".
+
+Использование:
+    from shared_catalog import SharedCatalog, attach_worker, worker_catalog, index_ranges
+
+    with SharedCatalog.create(products, ["name", "stamp"]) as catalog:
+        with Pool(12, initializer=attach_worker, initargs=(catalog.spec, ENGINE)) as pool:
+            results = pool.map(process_range, index_ranges(len(catalog), 2000))
+
+    def process_range(bounds):
+        catalog, engine = worker_catalog()
+        for product_id, row in catalog.rows(*bounds): ...
+"""
+
+from multiprocessing import shared_memory
+
+INT_SIZE = 8
+
+
+class SharedCatalog:
+    """Только для чтения: ids + строковые колонки в одном блоке разделяемой памяти"""
+
+    def __init__(self, shm, spec: dict, owner: bool):
+        self._shm = shm
+        self.spec = spec
+        self.owner = owner
+        self.columns = spec["columns"]
+
+        buf = shm.buf
+        n = spec["length"]
+        self._ids = buf[: n * INT_SIZE].cast("q")
+        self._offsets = {}
+        self._data = {}
+        for column, (offsets_at, data_at, data_len) in spec["layout"].items():
+            self._offsets[column] = buf[offsets_at : offsets_at + (n + 1) * INT_SIZE].cast("q")
+            self._data[column] = buf[data_at : data_at + data_len]
+
+    @classmethod
+    def create(cls, rows: list, columns: list, id_field: str = "id"):
+        """Кладёт rows (список dict) в новый блок; вызывающий - владелец блока"""
+        n = len(rows)
+        encoded = {
+            column: [(row.get(column) or "").encode("utf-8") for row in rows]
+            for column in columns
+        }
+
+        layout = {}
+        size = n * INT_SIZE
+        for column in columns:
+            data_len = sum(len(value) for value in encoded[column])
+            layout[column] = (size, size + (n + 1) * INT_SIZE, data_len)
+            size += (n + 1) * INT_SIZE + data_len
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        buf = shm.buf
+
+        ids = buf[: n * INT_SIZE].cast("q")
+        for i, row in enumerate(rows):
+            ids[i] = row[id_field]
+        ids.release()
+
+        for column in columns:
+            offsets_at, data_at, _ = layout[column]
+            offsets = buf[offsets_at : offsets_at + (n + 1) * INT_SIZE].cast("q")
+            position = 0
+            for i, value in enumerate(encoded[column]):
+                offsets[i] = position
+                buf[data_at + position : data_at + position + len(value)] = value
+                position += len(value)
+            offsets[n] = position
+            offsets.release()
+
+        spec = {"name": shm.name, "length": n, "columns": list(columns), "layout": layout}
+        return cls(shm, spec, owner=True)
+
+    @classmethod
+    def attach(cls, spec: dict):
+        """Подключение к блоку драйвера (в воркере)"""
+        # Воркеры Pool делят resource_tracker с драйвером: блок удаляет
+        # только владелец (close() в драйвере)
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        return cls(shm, spec, owner=False)
+
+    def __len__(self):
+        return self.spec["length"]
+
+    def id(self, i: int) -> int:
+        return self._ids[i]
+
+    def value(self, column: str, i: int) -> str:
+        offsets = self._offsets[column]
+        return bytes(self._data[column][offsets[i] : offsets[i + 1]]).decode("utf-8")
+
+    def rows(self, start: int = 0, stop: int | None = None):
+        """(id, {колонка: значение}) для индексов [start, stop)"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            yield self._ids[i], {column: self.value(column, i) for column in self.columns}
+
+    def close(self):
+        self._ids.release()
+        for view in (*self._offsets.values(), *self._data.values()):
+            view.release()
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def index_ranges(length: int, size: int) -> list:
+    """[(start, stop), ...] - задачи для pool.map"""
+    return [(start, min(start + size, length)) for start in range(0, length, size)]
+
+
+# ----------------------------------------------------------------------
+# Состояние воркера: заполняется один раз через Pool(initializer=...)
+# ----------------------------------------------------------------------
+_worker = {}
+
+
+def attach_worker(spec: dict, payload=None):
+    """initializer для Pool: подключает каталог и сохраняет payload (правила)"""
+    _worker["catalog"] = SharedCatalog.attach(spec)
+    _worker["payload"] = payload
+
+
+def worker_catalog() -> tuple:
+    """(каталог, payload) текущего воркера"""
+    return _worker["catalog"], _worker["payload"]
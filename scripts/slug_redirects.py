@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+РЕДИРЕКТЫ СО СТАРЫХ SLUG
+
+fix-*-slugs.py меняют slug товаров на месте - старые URL уже в индексе
+поисковиков и без редиректа отдают 404 после лишнего запроса к БД.
+
+1. record_redirects() - замены old → new в таблицу slug_redirects
+   (docs/migrations/slug-redirects.sql)
+2. export_redirect_map() - карты {old: new} для товаров
+   (frontend/app/data/slug-redirects.json) и категорий
+   (category-slug-redirects.json): цепочки (A → B → C) схлопываются,
+   старые slug, которые снова живые, и редиректы на несуществующие
+   товары / категории выбрасываются
+3. frontend/middleware.ts отвечает 308 по картам (/catalog/product/:slug
+   и /catalog/parts/:slug) - один поиск в объекте, без обращения к БД
+
+Использование:
+    from slug_redirects import export_redirect_map, record_redirects
+
+    record_redirects(supabase, {"старый-slug": "staryy-slug"})
+    export_redirect_map(supabase)
+"""
+
+import json
+from pathlib import Path
+
+from slugs import SlugRegistry
+
+ROOT = Path(__file__).resolve().parent.parent
+REDIRECTS_PATH = ROOT / "frontend" / "app" / "data" / "slug-redirects.json"
+CATEGORY_REDIRECTS_PATH = ROOT / "frontend" / "app" / "data" / "category-slug-redirects.json"
+
+REDIRECT_CONFLICT = "entity,old_slug"
+BATCH_SIZE = 500
+
+
+def record_redirects(supabase, pairs: dict, entity: str = "product") -> int:
+    """{old_slug: new_slug} → slug_redirects (повтор old_slug перезаписывает цель)"""
+    rows = [
+        {"entity": entity, "old_slug": old, "new_slug": new}
+        for old, new in pairs.items()
+        if old and new and old != new
+    ]
+    for i in range(0, len(rows), BATCH_SIZE):
+        supabase.table("slug_redirects").upsert(
+            rows[i : i + BATCH_SIZE], on_conflict=REDIRECT_CONFLICT
+        ).execute()
+    return len(rows)
+
+
+def load_redirects(supabase, entity: str = "product", page_size: int = 1000) -> dict:
+    """{old_slug: new_slug} из slug_redirects (keyset-пагинация по id, по порядку записи)"""
+    redirects = {}
+    last_id = 0
+
+    while True:
+        batch = (
+            supabase.table("slug_redirects")
+            .select("id, old_slug, new_slug")
+            .eq("entity", entity)
+            .gt("id", last_id)
+            .order("id")
+            .limit(page_size)
+            .execute()
+        )
+        if not batch.data:
+            break
+
+        for row in batch.data:
+            redirects[row["old_slug"]] = row["new_slug"]
+        last_id = batch.data[-1]["id"]
+
+        if len(batch.data) < page_size:
+            break
+
+    return redirects
+
+
+def build_redirect_map(redirects: dict, live: set | None = None) -> dict:
+    """
+    Итоговая карта: каждый старый slug ведёт сразу на конечный.
+    live - текущие slug: живой старый slug не перенаправляется,
+    редирект в никуда выбрасывается.
+    """
+    result = {}
+    for old in redirects:
+        target, seen = redirects[old], {old}
+        while target in redirects and target not in seen:
+            seen.add(target)
+            target = redirects[target]
+
+        if target in seen:
+            # Цикл (slug вернули обратно) - редиректа нет
+            continue
+        if live is not None and (old in live or target not in live):
+            continue
+        result[old] = target
+
+    return dict(sorted(result.items()))
+
+
+def load_category_slugs(supabase) -> set:
+    """Текущие slug категорий (таблица маленькая - один запрос)"""
+    return {row["slug"] for row in supabase.table("categories").select("slug").execute().data}
+
+
+def _write_map(redirect_map: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(redirect_map, f, ensure_ascii=False, separators=(",", ":"))
+        f.write("\n")
+
+
+def export_redirect_map(
+    supabase, path: Path = REDIRECTS_PATH, category_path: Path = CATEGORY_REDIRECTS_PATH
+) -> int:
+    """Пишет карты товаров и категорий для frontend/middleware.ts, возвращает число редиректов"""
+    live = SlugRegistry.load(supabase).taken
+    redirect_map = build_redirect_map(load_redirects(supabase), live)
+    _write_map(redirect_map, path)
+    print(f"🔀 Карта редиректов товаров: {len(redirect_map)} → {path}")
+
+    category_map = build_redirect_map(
+        load_redirects(supabase, entity="category"), load_category_slugs(supabase)
+    )
+    _write_map(category_map, category_path)
+    print(f"🔀 Карта редиректов категорий: {len(category_map)} → {category_path}")
+    return len(redirect_map) + len(category_map)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+SLUG ТОВАРОВ И КАТЕГОРИЙ
+
+Одна транслитерация вместо копий create_slug / slugify / transliterate
+в каждом скрипте:
+
+1. Таблица str.maketrans - один проход translate() по названию вместо
+   33 вызовов str.replace на каждую букву
+2. Одна регулярка: всё, кроме [a-z0-9], схлопывается в один дефис
+3. SlugRegistry - занятые slug в памяти (загружаются из БД одним
+   постраничным проходом); совпадение → суффикс -2, -3, ... без
+   запросов к БД и без коллизий с уже существующими товарами
+
+Использование:
+    from slugs import SlugRegistry, slugify, slugify_many
+
+    slugify("Фильтр масляный DF-244")                # "filtr-maslyanyy-df-244"
+
+    registry = SlugRegistry.load(supabase)           # slug всех товаров
+    slugs = slugify_many(names, registry, prefix="foton")
+"""
+
+import re
+
+MAX_LENGTH = 100
+
+# Строчные буквы: slugify() переводит текст в нижний регистр до translate()
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+
+_TRANSLIT_TABLE = str.maketrans(TRANSLIT)
+# Для transliterate(): заглавные → с заглавной буквы ("Ш" → "Sh")
+_TRANSLIT_TABLE_MIXED = str.maketrans({
+    **TRANSLIT,
+    **{ru.upper(): en.capitalize() for ru, en in TRANSLIT.items()},
+})
+_SEPARATOR_RE = re.compile(r"[^a-z0-9]+")
+
+
+def transliterate(text: str) -> str:
+    """Кириллица → латиница (регистр сохраняется: "Ёж" → "Yozh")"""
+    return (text or "").translate(_TRANSLIT_TABLE_MIXED)
+
+
+def slugify(text: str, max_length: int = MAX_LENGTH) -> str:
+    """Нижний регистр, транслитерация, [a-z0-9] через дефис"""
+    slug = _SEPARATOR_RE.sub("-", (text or "").lower().translate(_TRANSLIT_TABLE))
+    return slug.strip("-")[:max_length].rstrip("-")
+
+
+class SlugRegistry:
+    """
+    Занятые slug. unique(slug) возвращает slug или slug-2, slug-3, ...
+    и сразу помечает результат занятым.
+    """
+
+    def __init__(self, taken=(), max_length: int = MAX_LENGTH):
+        self.max_length = max_length
+        self.taken = set(taken)
+        # Следующий суффикс для базы - повторы одного названия не
+        # перебирают -2, -3, ... заново
+        self._next = {}
+
+    @classmethod
+    def load(cls, supabase, table: str = "products", page_size: int = 1000, max_length: int = MAX_LENGTH):
+        """Все slug таблицы (keyset-пагинация по id)"""
+        registry = cls(max_length=max_length)
+        last_id = 0
+
+        while True:
+            batch = (
+                supabase.table(table)
+                .select("id, slug")
+                .gt("id", last_id)
+                .order("id")
+                .limit(page_size)
+                .execute()
+            )
+            if not batch.data:
+                break
+
+            registry.taken.update(row["slug"] for row in batch.data if row.get("slug"))
+            last_id = batch.data[-1]["id"]
+
+            if len(batch.data) < page_size:
+                break
+
+        return registry
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.taken
+
+    def __len__(self) -> int:
+        return len(self.taken)
+
+    def add(self, slug: str):
+        self.taken.add(slug)
+
+    def unique(self, slug: str) -> str:
+        slug = slug or "product"
+        if slug not in self.taken:
+            self.taken.add(slug)
+            return slug
+
+        counter = self._next.get(slug, 2)
+        while True:
+            suffix = f"-{counter}"
+            candidate = slug[: self.max_length - len(suffix)].rstrip("-") + suffix
+            counter += 1
+            if candidate not in self.taken:
+                break
+
+        self._next[slug] = counter
+        self.taken.add(candidate)
+        return candidate
+
+
+def slugify_many(
+    texts,
+    registry: SlugRegistry | None = None,
+    prefix: str = "",
+    max_length: int = MAX_LENGTH,
+) -> list:
+    """
+    slug для списка названий за один проход; registry - уникальность
+    внутри списка и относительно уже занятых slug (без запросов к БД)
+    """
+    registry = registry if registry is not None else SlugRegistry(max_length=max_length)
+    head = slugify(prefix, max_length)
+
+    result = []
+    for text in texts:
+        slug = slugify(text, max_length)
+        if head:
+            slug = f"{head}-{slug}"[:max_length].rstrip("-") if slug else head
+        result.append(registry.unique(slug))
+    return result
@@ -8,91 +8,32 @@
 
 import os
 import json
-import re
 from supabase import Client, create_client
 
+from rules_engine import get_engine
+
 # Supabase setup
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 supabase: Client = create_client(url, key)
 
-# Паттерны для определения типа запчасти по названию
-PART_TYPE_PATTERNS = {
-    "filter": ["фильтр", "filter"],
-    "fuel-system": ["бак топливн", "кран топливн", "насос топливн", "карбюратор", "форсунк"],
-    "pump": ["насос", "pump", "гидронасос"],
-    "engine-part": ["поршень", "поршневые кольца", "цилиндр", "головка блока", "гбц", "клапан", "коленвал", "распредвал", "прокладк"],
-    "transmission": ["шестерня", "вал кпп", "муфта", "сцепление", "корзина сцепления", "диск сцепления"],
-    "steering": ["рулев", "гидроусилитель", "насос гур"],
-    "hydraulics": ["гидравлик", "гидроцилиндр", "распределитель гидравлическ"],
-    "electrical": ["генератор", "стартер", "аккумулятор", "проводка", "реле", "датчик"],
-    "cooling": ["радиатор", "термостат", "помпа"],
-    "brake": ["тормоз", "колодк тормозн"],
-    "bearing": ["подшипник", "bearing"],
-    "seal": ["сальник", "манжет", "уплотнитель"],
-    "bolt": ["болт", "гайка", "шпилька"],
-}
-
-# Паттерны для определения модели двигателя
-ENGINE_MODEL_PATTERNS = {
-    "R180": ["r180", "р180", "r-180"],
-    "R190": ["r190", "р190", "r-190"],
-    "R195": ["r195", "р195", "r-195"],
-    "ZS1115": ["zs1115", "зс1115", "zs-1115", "1115"],
-    "ZS1100": ["zs1100", "зс1100", "zs-1100", "1100"],
-    "KM385BT": ["km385", "км385", "km-385"],
-    "LL380": ["ll380", "лл380", "ll-380"],
-    "ZN490": ["zn490", "зн490", "zn-490"],
-    "ZN390": ["zn390", "зн390", "zn-390"],
-    "TY290": ["ty290", "ти290"],
-    "TY295": ["ty295", "ти295"],
-    "JD295": ["jd295", "жд295"],
-    "4L22BT": ["4l22", "4л22"],
-}
-
-# Паттерны для определения модели трактора
-TRACTOR_MODEL_PATTERNS = {
-    "DF-240": ["240", "df-240", "dongfeng 240"],
-    "DF-244": ["244", "df-244", "dongfeng 244"],
-    "DF-354": ["354", "df-354", "dongfeng 354"],
-    "DF-404": ["404", "df-404", "dongfeng 404"],
-    "FT-244": ["foton 244", "ft-244", "lovol 244"],
-    "FT-254": ["foton 254", "ft-254", "lovol 254"],
-    "JM-244": ["jinma 244", "jm-244"],
-    "JM-254": ["jinma 254", "jm-254"],
-    "XT-120": ["xingtai 120", "xt-120", "синтай 120"],
-    "XT-180": ["xingtai 180", "xt-180", "синтай 180"],
-}
+# Правила - общий файл categorization_rules.json (part_type, engine_model, tractor_model)
+ENGINE = get_engine()
 
 
 def detect_part_type(title: str) -> str | None:
     """Определяет тип запчасти из названия"""
-    title_lower = title.lower()
-    for part_type, patterns in PART_TYPE_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in title_lower:
-                return part_type
-    return None
+    return ENGINE.label("part_type", title)
 
 
 def detect_engine_model(title: str) -> str | None:
     """Определяет модель двигателя из названия"""
-    title_lower = title.lower()
-    for model, patterns in ENGINE_MODEL_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in title_lower:
-                return model
-    return None
+    return ENGINE.label("engine_model", title)
 
 
 def detect_tractor_model(title: str) -> str | None:
     """Определяет модель трактора из названия"""
-    title_lower = title.lower()
-    for model, patterns in TRACTOR_MODEL_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in title_lower:
-                return model
-    return None
+    return ENGINE.label("tractor_model", title)
 
 
 def process_json_file(file_path: str):
@@ -154,6 +95,7 @@ def process_json_file(file_path: str):
             specs["brand"] = brand_from_json
 
         if specs:
+            specs["rules_version"] = ENGINE.version
             update_data["specifications"] = specs
 
         # Обновляем
@@ -173,6 +115,7 @@ def process_json_file(file_path: str):
 def main():
     print("="*80)
     print("🧠 УМНАЯ КАТЕГОРИЗАЦИЯ ТОВАРОВ")
+    print(f"📐 Правила: {ENGINE.version}")
     print("="*80)
 
     # Список всех JSON файлов
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+ИДЕНТИФИКАЦИЯ ТОВАРА ПО ИСТОЧНИКУ
+
+Каждый товар из parsed_data однозначно определяется парой
+(source, source_url): сайт-источник + нормализованный URL карточки.
+Эти поля хранятся в отдельных индексированных колонках products
+(docs/migrations/source-identity.sql) с UNIQUE (source, source_url),
+поэтому повторный импорт и обновление цен идут по точному ключу,
+а не угадыванием по префиксу названия.
+
+Если одна деталь пришла из нескольких источников, товар один, а ключи
+остальных источников лежат в product_offers (resolve-entities.py,
+docs/migrations/product-offers.sql) - load_known_keys() учитывает и их.
+
+Использование:
+    from source_identity import source_fields, load_source_map
+
+    row = {**normalized, **source_fields(item)}
+    existing = load_source_map(supabase, columns="id, price")
+"""
+
+from urllib.parse import urlsplit, urlunsplit
+
+# Хост → короткое имя источника
+SOURCE_HOSTS = {
+    "tata-agro-moto.com": "tata-agro",
+    "zip-agro.ru": "zip-agro",
+    "xn----7sbabpgpk4bsbesjp1f.xn--p1ai": "agrodom",
+    "запчасти-агродом.рф": "agrodom",
+}
+
+# Колонки для upsert(..., on_conflict=SOURCE_CONFLICT)
+SOURCE_CONFLICT = "source,source_url"
+
+
+def normalize_source_url(url: str) -> str | None:
+    """Схема и хост в нижнем регистре, без #fragment и завершающего /"""
+    url = (url or "").strip()
+    if not url:
+        return None
+
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def detect_source(url: str) -> str | None:
+    """Определяет источник по хосту URL"""
+    url = (url or "").strip()
+    if not url:
+        return None
+
+    host = urlsplit(url).netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return SOURCE_HOSTS.get(host, host or None)
+
+
+def source_fields(item: dict) -> dict:
+    """Колонки source / source_url / source_article для записи товара"""
+    url = item.get("url") or item.get("link") or ""
+    article = str(item.get("article") or item.get("sku") or "").strip()
+
+    return {
+        "source": detect_source(url),
+        "source_url": normalize_source_url(url),
+        "source_article": article or None,
+    }
+
+
+def source_key(item: dict) -> tuple | None:
+    """Ключ (source, source_url) для записи из parsed_data или строки БД"""
+    if "source_url" in item and "source" in item:
+        source, url = item.get("source"), item.get("source_url")
+    else:
+        fields = source_fields(item)
+        source, url = fields["source"], fields["source_url"]
+
+    if not source or not url:
+        return None
+    return source, url
+
+
+def load_source_map(
+    supabase,
+    columns: str = "id",
+    source: str | None = None,
+    page_size: int = 1000,
+) -> dict:
+    """{(source, source_url): row} для всех товаров с заполненным ключом"""
+    select = f"source, source_url, {columns}"
+    rows = {}
+    offset = 0
+
+    while True:
+        query = supabase.table("products").select(select).not_.is_("source_url", "null")
+        if source:
+            query = query.eq("source", source)
+
+        batch = query.order("id").range(offset, offset + page_size - 1).execute()
+        if not batch.data:
+            break
+
+        for row in batch.data:
+            rows[(row["source"], row["source_url"])] = row
+
+        if len(batch.data) < page_size:
+            break
+        offset += page_size
+
+    return rows
+
+
+OFFER_COLUMNS = "source, source_url, source_article, name, price, in_stock, image_url, updated_at, product_id"
+
+
+def load_offer_rows(supabase, columns: str = OFFER_COLUMNS, page_size: int = 1000) -> dict:
+    """{(source, source_url): строка} предложений из product_offers"""
+    offers = {}
+    last_id = 0
+
+    while True:
+        batch = (
+            supabase.table("product_offers")
+            .select(f"id, {columns}")
+            .gt("id", last_id)
+            .order("id")
+            .limit(page_size)
+            .execute()
+        )
+        for row in batch.data:
+            offers[(row["source"], row["source_url"])] = row
+        if len(batch.data) < page_size:
+            return offers
+        last_id = batch.data[-1]["id"]
+
+
+def load_offer_map(supabase, page_size: int = 1000) -> dict:
+    """{(source, source_url): product_id} предложений из product_offers"""
+    rows = load_offer_rows(supabase, "source, source_url, product_id", page_size)
+    return {offer_key: row["product_id"] for offer_key, row in rows.items()}
+
+
+def load_known_keys(supabase) -> set:
+    """Ключи источников, для которых товар уже есть: свои и чужие предложения"""
+    return set(load_source_map(supabase)) | set(load_offer_map(supabase))
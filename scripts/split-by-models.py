@@ -7,35 +7,20 @@
 
 import csv
 import json
-import re
 from collections import defaultdict
 
+from model_tokens import extract_models
+
 def determine_model(title, description):
     """Определяет модель трактора по названию и описанию"""
-    text = f"{title} {description}".lower()
-
-    # Паттерны для моделей
-    patterns_240_244 = [
-        r'\b240\b', r'\b244\b',
-        r'240/244', r'244/240',
-        r'df-?240', r'df-?244'
-    ]
-
-    patterns_354_404 = [
-        r'\b354\b', r'\b404\b',
-        r'354/404', r'404/354',
-        r'df-?354', r'df-?404'
-    ]
-
-    # Проверяем 240/244
-    for pattern in patterns_240_244:
-        if re.search(pattern, text, re.I):
-            return '240_244'
-
-    # Проверяем 354/404
-    for pattern in patterns_354_404:
-        if re.search(pattern, text, re.I):
-            return '354_404'
+    models = set(extract_models(title, description))
+
+    # 240/244, DF-240, ДФ-244, 240/244 ... - см. model_tokens.py
+    if models & {"240", "244"}:
+        return '240_244'
+
+    if models & {"354", "404"}:
+        return '354_404'
 
     # Универсальные запчасти (если не указана конкретная модель)
     return 'universal'
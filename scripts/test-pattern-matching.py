@@ -4,183 +4,22 @@
 Проверяет правильность определения брендов и типов на примерах
 """
 
-import os
-import sys
+from rules_engine import get_engine
 
-# Импортируем функции из улучшенного скрипта
-sys.path.insert(0, os.path.dirname(__file__))
-
-# Копируем паттерны из migrate-parts-improved.py
-BRAND_PATTERNS = {
-    "perkins": ["perkins", "перкинс"],
-    "dongfeng-parts": [
-        "dongfeng",
-        "донгфенг",
-        "дунфенг",
-        "dong feng",
-        "df-244",
-        "df-404",
-        "df 244",
-        "df 404",
-        "df244",
-        "df404",
-    ],
-    "km-engines": ["км385", "км496", "ll380", "ll385", "km385", "km496", "yd385"],
-    "uralets": ["уралец", "uralets"],
-    "jinma": ["джинма", "jinma", "jin ma"],
-    "xingtai": ["синтай", "xingtai", "xing tai", "синтай-504"],
-    "foton": ["фотон", "foton", "lovol"],
-    "rusich": ["русич", "rusich"],
-    "shifeng": ["шифенг", "shifeng", "shi feng"],
-    "catmann": ["кэтманн", "catmann", "кетманн"],
-    "chuvashpiller": ["чувашпиллер", "chuvashpiller"],
-    "bulat": ["булат", "bulat"],
-    "yto": ["yto"],
-    "wirax": ["wirax", "виракс"],
-    "dlh": ["dlh"],
-    "rustrak": ["рустрак", "rustrak"],
-    "mtz": ["мтз", "mtz", "беларус", "belarus"],
-    "scout": ["скаут т-", "scout t-", "скаут-т", "scout-t"],
-    "kentavr": ["кентавр т-", "kentavr t-", "т-224", "t-224"],
-    "fayter": ["файтер т-", "fayter t-"],
-    "neva": ["нева", "neva", "мб-", "мб "],
-    "t-series": ["т-40", "т-25", "т-16", "t-40", "t-25", "t-16"],
-}
-
-TYPE_PATTERNS = {
-    "diesel-engines": [
-        "двигатель",
-        "двигателя",
-        "мотор",
-        "поршень",
-        "поршневые",
-        "поршня",
-        "цилиндр",
-        "гильза",
-        "гбц",
-        "головка блока",
-        "коленвал",
-        "коленчатый вал",
-        "распредвал",
-        "блок цилиндров",
-        "картер",
-        "маховик",
-        "шатун",
-    ],
-    "starters-generators": ["стартер", "генератор"],
-    "filters": ["фильтр"],
-    "driveshafts": ["кардан", "карданный вал", "карданный"],
-    "hydraulics": [
-        "гидравлик",
-        "гидроцилиндр",
-        "гидронасос",
-        "нш-",
-        "нш ",
-        "гур",
-        "рулевой цилиндр",
-    ],
-    "seats": ["сиденье", "сидение", "кресло"],
-    "spare-parts-kit": ["зип", "ремкомплект", "ремонтный комплект", "рем.комплект"],
-    "equipment-parts": [
-        "картофелекопалка",
-        "косилка",
-        "окучник",
-        "плуг",
-        "борона",
-        "фреза",
-        "снегоуборщик",
-        "прицеп",
-        "погрузчик",
-        "пресс-подборщик",
-        "культиватор",
-    ],
-    "wheels-tires": [
-        "колесо",
-        "колёс",
-        "диск колесн",
-        "шина",
-        "резина",
-        "покрышка",
-        "груз колесн",
-        "грунтозацеп",
-    ],
-    "standard-parts": [
-        "болт",
-        "гайка",
-        "шпилька",
-        "винт",
-        "прокладка",
-        "сальник",
-        "кольцо уплотн",
-        "кольцо стопорн",
-        "манжета",
-        "шайба",
-        "шплинт",
-        "палец стопорн",
-        "штифт",
-        "пружина",
-    ],
-    "tractor-parts": [
-        "редуктор",
-        "коробка передач",
-        "кпп",
-        "сцепление",
-        "корзина",
-        "диск сцепления",
-        "вал",
-        "вом",
-        "привод",
-        "дифференциал",
-        "тормоз",
-        "тормозн",
-    ],
-    "universal-parts": ["универсальн", "комплект прокладок", "набор"],
-    "other-parts": [
-        "прочие",
-        "прочее",
-        "навесное",
-        "оборудование",
-        "крепление",
-        "кронштейн",
-        "адаптер",
-        "кабина",
-        "крыло",
-        "зеркало",
-        "колпак",
-        "ковш",
-        "борт",
-        "фаркоп",
-        "бампер",
-        "фара",
-        "стекло",
-        "рулевое",
-        "педаль",
-    ],
-}
+# Те же правила, что и у migrate-parts-improved.py (categorization_rules.json)
+ENGINE = get_engine()
+BRAND_CLASSIFIER = ENGINE.classifiers["brand_category"]
+TYPE_CLASSIFIER = ENGINE.classifiers["part_category"]
 
 
 def detect_brand(product_name: str) -> str:
     """Определяет бренд из названия товара"""
-    name_lower = product_name.lower()
-
-    for brand_key, patterns in BRAND_PATTERNS.items():
-        for pattern in patterns:
-            if pattern.lower() in name_lower:
-                return brand_key
-
-    return "universal"
+    return ENGINE.label("brand_category", product_name)
 
 
 def detect_type(product_name: str) -> str:
     """Определяет тип запчасти из названия товара"""
-    name_lower = product_name.lower()
-
-    for type_key, patterns in TYPE_PATTERNS.items():
-        for pattern in patterns:
-            if pattern.lower() in name_lower:
-                return type_key
-
-    return "other-parts"
+    return ENGINE.label("part_category", product_name)
 
 
 # ============================================================================
@@ -220,6 +59,7 @@ test_products = [
 
 print("\n" + "=" * 100)
 print("🧪 ТЕСТИРОВАНИЕ PATTERN MATCHING")
+print(f"📐 Правила: {ENGINE.version}")
 print("=" * 100 + "\n")
 
 conflicts = []
@@ -230,8 +70,17 @@ for product_name in test_products:
     ptype = detect_type(product_name)
     category_slug = f"{brand}-{ptype}"
 
+    # Все совпадения с позициями - видно, какой паттерн сработал
+    hits = BRAND_CLASSIFIER.scan(product_name) + TYPE_CLASSIFIER.scan(product_name)
+
     results.append(
-        {"name": product_name, "brand": brand, "type": ptype, "slug": category_slug}
+        {
+            "name": product_name,
+            "brand": brand,
+            "type": ptype,
+            "slug": category_slug,
+            "hits": hits,
+        }
     )
 
     # Проверка на конфликты (если бренд определился неправильно)
@@ -245,6 +94,9 @@ for i, result in enumerate(results, 1):
     print(f"{i:2}. {result['name'][:60]:<60}")
     print(f"    → Бренд: {result['brand']:<20} Тип: {result['type']:<20}")
     print(f"    → Категория: {result['slug']}")
+    if result["hits"]:
+        matched = ", ".join(f"{h.keyword}@{h.start}" for h in result["hits"])
+        print(f"    → Совпадения: {matched}")
     print()
 
 # Проверка конфликтов
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+ИНДЕКС НАЗВАНИЙ ТОВАРОВ ДЛЯ СОПОСТАВЛЕНИЯ С PARSED_DATA
+
+Вместо запроса .ilike("name", f"{title[:40]}%").limit(1) на каждый товар
+из JSON загружаем id + name один раз и ищем локально:
+- точный хэш-индекс по нормализованному названию
+- отсортированный массив названий + bisect для поиска по префиксу
+  (тот же поиск, что и префиксное дерево, но без миллиона dict-узлов)
+
+Выбор лучшего совпадения детерминированный: побеждает кандидат с самым
+длинным общим префиксом с полным названием из JSON. Если лидеров несколько,
+результат помечается как неоднозначный и не применяется.
+
+Использование:
+    from title_index import TitleIndex
+
+    index = TitleIndex.load(supabase, columns="id, name, specifications")
+    product, status = index.resolve(title)
+    if status in ("exact", "prefix"):
+        ...
+"""
+
+import re
+from bisect import bisect_left
+
+PREFIX_LENGTH = 40
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_title(text: str) -> str:
+    """Нормализует название: регистр, ё→е, пробелы"""
+    text = (text or "").lower().replace("ё", "е")
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class TitleIndex:
+    """Индекс товаров по названию: exact-хэш + префиксный поиск"""
+
+    def __init__(self, products: list[dict]):
+        self.products = {p["id"]: p for p in products}
+        self.exact: dict[str, list] = {}
+
+        for p in products:
+            self.exact.setdefault(normalize_title(p.get("name")), []).append(p["id"])
+
+        # Отсортированные (нормализованное название, id) для bisect
+        self._sorted = sorted((key, pid) for key, ids in self.exact.items() for pid in ids)
+        self._keys = [key for key, _ in self._sorted]
+
+    @classmethod
+    def load(cls, supabase, columns: str = "id, name", page_size: int = 1000):
+        """Загружает все товары постранично (один проход по таблице)"""
+        products = []
+        offset = 0
+
+        while True:
+            batch = (
+                supabase.table("products")
+                .select(columns)
+                .order("id")
+                .range(offset, offset + page_size - 1)
+                .execute()
+            )
+            if not batch.data:
+                break
+            products.extend(batch.data)
+            if len(batch.data) < page_size:
+                break
+            offset += page_size
+
+        return cls(products)
+
+    def __len__(self):
+        return len(self.products)
+
+    def candidates(self, prefix: str) -> list:
+        """Все id товаров, нормализованное название которых начинается с prefix"""
+        prefix = normalize_title(prefix)
+        if not prefix:
+            return []
+
+        # Ключи с префиксом лежат подряд: [prefix, prefix + максимальный символ)
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + "\U0010ffff", start)
+        return [pid for _, pid in self._sorted[start:end]]
+
+    def resolve(self, title: str, prefix_length: int = PREFIX_LENGTH):
+        """
+        Находит товар по названию из JSON.
+
+        Возвращает (product | None, status), где status:
+        - "exact"     - нормализованные названия совпали полностью
+        - "prefix"    - единственный лучший кандидат по префиксу
+        - "ambiguous" - несколько равноценных кандидатов
+        - "missing"   - ничего не найдено
+        """
+        key = normalize_title(title)
+        if not key:
+            return None, "missing"
+
+        exact_ids = self.exact.get(key)
+        if exact_ids:
+            if len(exact_ids) == 1:
+                return self.products[exact_ids[0]], "exact"
+            return None, "ambiguous"
+
+        candidate_ids = self.candidates(key[:prefix_length].strip())
+        if not candidate_ids:
+            return None, "missing"
+        if len(candidate_ids) == 1:
+            return self.products[candidate_ids[0]], "prefix"
+
+        scored = sorted(
+            (
+                -_common_prefix_length(key, normalize_title(self.products[pid]["name"])),
+                pid,
+            )
+            for pid in candidate_ids
+        )
+        if len(scored) > 1 and scored[0][0] == scored[1][0]:
+            return None, "ambiguous"
+        return self.products[scored[0][1]], "prefix"
+
+    def match(self, title: str, prefix_length: int = PREFIX_LENGTH):
+        """Как resolve(), но возвращает только товар (или None)"""
+        product, _ = self.resolve(title, prefix_length)
+        return product
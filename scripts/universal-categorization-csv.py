@@ -7,6 +7,8 @@ import os
 import csv
 from supabase import create_client
 
+from rules_engine import get_engine
+
 url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -39,34 +41,11 @@ print(f"✅ Найдено: {len(universal_products)}")
 categories_result = supabase.table("categories").select("id, name").execute()
 categories = {cat["id"]: cat["name"] for cat in categories_result.data}
 
-# Определяем типы
-part_types_map = {
-    "Вал": ["вал"],
-    "Подшипник": ["подшипник"],
-    "Сальник": ["сальник"],
-    "Насос": ["насос"],
-    "Прокладка": ["прокладка"],
-    "Диск": ["диск"],
-    "Ремень": ["ремень"],
-    "Фильтр": ["фильтр"],
-    "Шестерня": ["шестерня", "шестерн"],
-    "Двигатель/ДВС": ["двигатель", "двс", "мотор"],
-    "Форсунка": ["форсунка"],
-    "Стартер": ["стартер"],
-    "Генератор": ["генератор"],
-    "Свеча": ["свеча"],
-    "Гидрораспределитель": ["гидрораспределитель"],
-    "Карданный вал": ["карданный", "кардан"],
-    "Колесо/Шина": ["колес", "шина"],
-    "Пресс-подборщик": ["пресс-подборщик"],
-}
-
-def detect_part_type(name):
-    name_lower = name.lower()
-    for part_type, keywords in part_types_map.items():
-        if any(kw in name_lower for kw in keywords):
-            return part_type
-    return "Другое"
+# Определяем типы - набор part_type_ru из categorization_rules.json,
+# все названия одним вызовом classify_many
+ENGINE = get_engine()
+part_types = ENGINE.classify_many([p["name"] for p in universal_products], ["part_type_ru"])
+print(f"📐 Правила: {ENGINE.version}")
 
 # Создаём CSV
 csv_file = "universal-products-categorized.csv"
@@ -87,9 +66,8 @@ with open(csv_file, "w", encoding="utf-8", newline="") as f:
 
     # Сортируем по типу запчасти
     products_with_type = []
-    for p in universal_products:
-        part_type = detect_part_type(p["name"])
-        products_with_type.append({**p, "part_type": part_type})
+    for p, labels in zip(universal_products, part_types):
+        products_with_type.append({**p, "part_type": labels["part_type_ru"]})
 
     products_with_type.sort(key=lambda x: x["part_type"])
 
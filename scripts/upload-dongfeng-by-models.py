@@ -8,7 +8,10 @@ import csv
 from pathlib import Path
 from supabase import create_client, Client
 from dotenv import load_dotenv
-import re
+
+from db_batch import insert_new
+from model_tokens import extract_models
+from slugs import SlugRegistry, slugify
 
 # Отключаем прокси
 os.environ.pop('HTTP_PROXY', None)
@@ -41,14 +44,8 @@ print(f"✅ Ключ: {len(SUPABASE_KEY)} символов\n")
 # Подключение
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-
-def create_slug(title):
-    """Создаёт slug из названия товара"""
-    slug = title.lower()
-    slug = re.sub(r'[^a-zа-яё0-9\s-]', '', slug)
-    slug = re.sub(r'\s+', '-', slug)
-    slug = slug[:100]
-    return slug
+# Занятые slug - один постраничный проход вместо запроса на каждый товар
+slugs = SlugRegistry.load(supabase)
 
 
 def upload_products(file_path, category_slug, category_name):
@@ -87,22 +84,20 @@ def upload_products(file_path, category_slug, category_name):
 
     # Загружаем товары
     print(f"\n   📤 Загрузка в Supabase...")
-    uploaded = 0
+    rows = []
     skipped = 0
 
     for product in products:
         try:
-            slug = create_slug(product['title'])
-
-            # Проверяем существует ли
-            existing = supabase.table('products').select('id').eq('slug', slug).execute()
+            slug = slugify(product['title'])
 
-            if existing.data and len(existing.data) > 0:
+            # Уже загружен (тот же slug)
+            if slug in slugs:
                 skipped += 1
                 continue
+            slugs.add(slug)
 
-            # Создаём товар
-            new_product = {
+            rows.append({
                 'name': product['title'],
                 'slug': slug,
                 'description': product.get('description', ''),
@@ -113,21 +108,24 @@ def upload_products(file_path, category_slug, category_name):
                 'model': product.get('article', ''),
                 'in_stock': product.get('stock', 'В наличии') == 'В наличии',
                 'featured': False,
+                'compatible_models': extract_models(
+                    product['title'], product.get('article'), product.get('description')
+                ),
                 'specifications': {
                     'article': product.get('article', ''),
                     'source_url': product.get('url', ''),
                 }
-            }
-
-            result = supabase.table('products').insert(new_product).execute()
-
-            if result.data:
-                uploaded += 1
+            })
 
         except Exception as e:
             print(f"      ⚠️  Ошибка: {str(e)[:50]}")
             continue
 
+    # Пачками; товар с тем же названием (name_key) БД пропускает
+    stats = insert_new(supabase, rows)
+    uploaded = stats['inserted']
+    skipped += stats['skipped']
+
     print(f"\n   ✅ Загружено новых: {uploaded}")
     print(f"   ⏭️  Пропущено (уже в БД): {skipped}")
 
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+ПОИСК ВОДЯНЫХ ЗНАКОВ ПО ПИКСЕЛЯМ
+
+check-watermarks.py искал "wm" / "logo" в URL, а все картинки zip-agro и
+tata-agro отправлял на ручную проверку (4000+ штук). Здесь:
+
+1. Картинки качаются параллельно (image_mirror.fetch_image, один клиент)
+2. Pillow в пуле процессов сводит каждую к серому кадру SIZE x SIZE и
+   оставляет только мелкие детали (кадр минус его размытие): текст и
+   контур логотипа остаются, плавный фон и освещение - нет
+3. Шаблон знака источника - по выборке его картинок (build_templates):
+   в шаблоне остаются только пиксели, стабильные от кадра к кадру
+   (|среднее| / разброс >= MIN_CONSISTENCY). Знак стоит на одном месте и
+   проходит; контур товара в центре кадра в среднем тоже ненулевой, но
+   у разных товаров разный - разброс большой, и он отсекается. Регионы
+   (углы и центр), где стабильных пикселей мало, не участвуют
+4. Оценка - нормированная корреляция регионов кадра с регионами шаблона
+   одним умножением матриц на пачку кадров (NumPy), score = максимум
+   по регионам и шаблонам
+5. Порог - только по ручной разметке (calibrate): выборка картинок по
+   всему диапазону оценок размечается руками, порог выбирается по
+   точности. Без калибровки флаги в БД не пишутся
+6. Флаги пишутся пачками через журнал операций (watermark_batches →
+   merge_specifications_bulk); на ручную проверку - только найденные
+
+Использование:
+    from watermarks import build_templates, calibrate, classify, load_templates, save_templates
+
+    templates = build_templates(await sample_frames(products))   # {"zip-agro": ..., ...}
+    save_templates(templates)
+    scores = await classify(products, load_templates())          # {id: {"score", "template"}}
+    calibrate({i: r["score"] for i, r in scores.items()}, labels) # {"threshold", "precision", ...}
+"""
+
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+from image_mirror import fetch_image, web_client
+from op_journal import batches
+from source_identity import detect_source
+
+SIZE = 96
+CORNER = SIZE // 3
+CENTER = CORNER * 2
+BLUR_RADIUS = 3
+
+# (верх, лево, высота, ширина) на кадре SIZE x SIZE
+REGIONS = {
+    "top_left": (0, 0, CORNER, CORNER),
+    "top_right": (0, SIZE - CORNER, CORNER, CORNER),
+    "bottom_left": (SIZE - CORNER, 0, CORNER, CORNER),
+    "bottom_right": (SIZE - CORNER, SIZE - CORNER, CORNER, CORNER),
+    "center": ((SIZE - CENTER) // 2, (SIZE - CENTER) // 2, CENTER, CENTER),
+}
+
+# Пиксель шаблона стабилен, если |среднее| не меньше этой доли разброса
+# по кадрам (знак - одинаковый, контуры разных товаров - нет)
+MIN_CONSISTENCY = 0.5
+# Регион шаблона значим, если в нём не меньше этой доли энергии
+# самого "яркого" региона
+REGION_ENERGY = 0.35
+# Порог по умолчанию - только до калибровки (для отчёта); в БД пишет
+# порог из CALIBRATION_PATH. Корреляция идёт со стабильными пикселями,
+# остальная часть региона её разбавляет - оценки ниже, чем у сырого среднего
+THRESHOLD = 0.15
+# Калибровка: точность флага не ниже (ложный флаг хуже пропуска)
+TARGET_PRECISION = 0.95
+BATCH_SIZE = 512
+FLAG_BATCH_SIZE = 500
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "watermark-templates.npz")
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "watermark-calibration.json")
+SPEC_KEYS = ("has_watermark", "watermark_score", "watermark_source")
+
+
+def decode(body: bytes) -> np.ndarray:
+    """Выполняется в процессе пула: картинка → мелкие детали серого кадра SIZE x SIZE (float32)"""
+    with Image.open(io.BytesIO(body)) as source:
+        source.draft("L", (SIZE * 2, SIZE * 2))
+        image = ImageOps.exif_transpose(source).convert("L").resize((SIZE, SIZE), Image.BILINEAR)
+
+    frame = np.asarray(image, dtype=np.float32)
+    blurred = np.asarray(image.filter(ImageFilter.GaussianBlur(BLUR_RADIUS)), dtype=np.float32)
+    return frame - blurred
+
+
+def _regions(stack: np.ndarray, names) -> np.ndarray:
+    """(N, SIZE, SIZE) → (N, регионов, CORNER * CORNER)"""
+    out = []
+    for name in names:
+        top, left, height, width = REGIONS[name]
+        crop = stack[:, top : top + height, left : left + width]
+        if height != CORNER:
+            # Центр вдвое больше углов: среднее блоков 2x2, чтобы все
+            # регионы были одной длины
+            step = height // CORNER
+            crop = crop.reshape(len(stack), CORNER, step, CORNER, step).mean(axis=(2, 4))
+        out.append(crop.reshape(len(stack), -1))
+    return np.stack(out, axis=1)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Нулевое среднее и единичная норма по последней оси (для корреляции)"""
+    vectors = vectors - vectors.mean(axis=-1, keepdims=True)
+    norm = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norm, 1e-6)
+
+
+def build_templates(frames_by_source: dict) -> dict:
+    """
+    {источник: (N, SIZE, SIZE) кадров decode()} → {источник: {"frame",
+    "regions"}}: среднее кадров только в стабильных пикселях и регионы,
+    где у такого шаблона есть энергия
+    """
+    templates = {}
+    for source, stack in frames_by_source.items():
+        if len(stack) < 2:
+            continue
+        mean = np.mean(stack, axis=0, dtype=np.float32)
+        spread = np.std(stack, axis=0, dtype=np.float32)
+        consistent = np.abs(mean) >= MIN_CONSISTENCY * np.maximum(spread, 1e-3)
+        frame = np.where(consistent, mean, 0.0).astype(np.float32)
+
+        energy = {
+            name: float(np.std(frame[top : top + h, left : left + w]))
+            for name, (top, left, h, w) in REGIONS.items()
+        }
+        strongest = max(energy.values())
+        regions = [name for name, e in energy.items() if strongest and e >= strongest * REGION_ENERGY]
+        templates[source] = {"frame": frame, "regions": regions}
+    return templates
+
+
+def save_templates(templates: dict, path: str = TEMPLATES_PATH):
+    arrays = {}
+    for source, template in templates.items():
+        arrays[f"{source}:frame"] = template["frame"]
+        arrays[f"{source}:regions"] = np.array(template["regions"])
+    np.savez_compressed(path, **arrays)
+
+
+def load_templates(path: str = TEMPLATES_PATH) -> dict:
+    templates = {}
+    with np.load(path) as data:
+        for key in data.files:
+            source, kind = key.rsplit(":", 1)
+            templates.setdefault(source, {})[kind] = data[key] if kind == "frame" else list(data[key])
+    return templates
+
+
+def score_frames(stack: np.ndarray, templates: dict) -> tuple:
+    """
+    (N, SIZE, SIZE) → (scores (N,), имя шаблона с максимумом на каждый кадр).
+    Корреляция всех кадров со всеми регионами шаблона - одно einsum.
+    """
+    names = list(templates)
+    best = np.full(len(stack), -1.0, dtype=np.float32)
+    best_template = np.zeros(len(stack), dtype=np.int32)
+
+    for i, source in enumerate(names):
+        regions = templates[source]["regions"]
+        if not regions:
+            continue
+        template = _normalize(_regions(templates[source]["frame"][None], regions))[0]   # (R, P)
+        # (N, R, P) · (R, P) → (N, R): корреляция каждого региона кадра с шаблоном
+        correlation = np.einsum("nrp,rp->nr", _normalize(_regions(stack, regions)), template)
+        score = correlation.max(axis=1)
+        better = score > best
+        best[better] = score[better]
+        best_template[better] = i
+
+    return best, [names[i] for i in best_template]
+
+
+def calibrate(scores: dict, labels: dict, target_precision: float = TARGET_PRECISION) -> dict:
+    """
+    Порог по ручной разметке: scores {id: score}, labels {id: True/False}
+    → {"threshold", "precision", "recall", "labelled"}. Среди порогов с
+    точностью >= target_precision - наибольшая полнота, при равной -
+    наибольшая точность и порог; threshold None - такого порога нет.
+    """
+    pairs = sorted(
+        ((scores[i], bool(label)) for i, label in labels.items() if i in scores and label is not None),
+        reverse=True,
+    )
+    positives = sum(label for _, label in pairs)
+    candidates = []
+    hits = 0
+    for flagged, (score, label) in enumerate(pairs, 1):
+        hits += label
+        # Порог ставится только между разными оценками
+        if flagged < len(pairs) and pairs[flagged][0] == score:
+            continue
+        precision = hits / flagged
+        if positives and precision >= target_precision:
+            candidates.append((hits / positives, precision, score))
+
+    result = {"threshold": None, "precision": None, "recall": None, "labelled": len(pairs)}
+    if candidates:
+        recall, precision, score = max(candidates)
+        result.update(threshold=round(score, 3), precision=round(precision, 3), recall=round(recall, 3))
+    return result
+
+
+def product_source(product: dict) -> str | None:
+    return product.get("source") or detect_source(product.get("source_url") or product.get("image_url"))
+
+
+async def frames(
+    urls,
+    failed: dict | None = None,
+    concurrency: int = 32,
+    processes: int | None = None,
+    batch_size: int = BATCH_SIZE,
+):
+    """
+    Асинхронный генератор пачек (urls, (N, SIZE, SIZE)): скачивание -
+    параллельно, декодирование - в пуле процессов, в памяти не больше
+    двух пачек кадров. Недоступные и битые картинки → failed {url: ошибка}.
+    """
+    urls = list(dict.fromkeys(u for u in urls if u))
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=batch_size)
+
+    async def one(client, pool, url):
+        async with slots:
+            try:
+                body = (await fetch_image(client, url))[0]
+                frame = await loop.run_in_executor(pool, decode, body)
+            except Exception as e:
+                frame, error = None, e
+            else:
+                error = None
+        await queue.put((url, frame, error))
+
+    with ProcessPoolExecutor(processes or os.cpu_count() or 2) as pool:
+        async with web_client(concurrency) as client:
+            tasks = [asyncio.ensure_future(one(client, pool, url)) for url in urls]
+            batch_urls, batch_frames = [], []
+            for _ in urls:
+                url, frame, error = await queue.get()
+                if error is not None:
+                    if failed is not None:
+                        failed[url] = f"{type(error).__name__}: {str(error)[:200]}"
+                    continue
+                batch_urls.append(url)
+                batch_frames.append(frame)
+                if len(batch_urls) >= batch_size:
+                    yield batch_urls, np.stack(batch_frames)
+                    batch_urls, batch_frames = [], []
+            if batch_urls:
+                yield batch_urls, np.stack(batch_frames)
+            await asyncio.gather(*tasks)
+
+
+async def sample_frames(products: list, per_source: int = 300, **kwargs) -> dict:
+    """{источник: (N, SIZE, SIZE)} по первым per_source картинкам каждого источника"""
+    by_source = {}
+    for product in products:
+        source = product_source(product)
+        if source and product.get("image_url"):
+            urls = by_source.setdefault(source, [])
+            if len(urls) < per_source:
+                urls.append(product["image_url"])
+
+    result = {}
+    for source, urls in by_source.items():
+        parts = [stack async for _, stack in frames(urls, **kwargs)]
+        if parts:
+            result[source] = np.concatenate(parts)
+    return result
+
+
+async def classify(products: list, templates: dict, failed: dict | None = None, **kwargs) -> dict:
+    """
+    products - [{"id", "image_url", ...}] → {id: {"score", "template"}};
+    одна картинка на многих товарах качается и оценивается один раз
+    """
+    ids_by_url = {}
+    for product in products:
+        if product.get("image_url"):
+            ids_by_url.setdefault(product["image_url"], []).append(product["id"])
+
+    results, checked = {}, 0
+    async for urls, stack in frames(ids_by_url, failed, **kwargs):
+        scores, names = score_frames(stack, templates)
+        for url, score, name in zip(urls, scores, names):
+            for product_id in ids_by_url[url]:
+                results[product_id] = {"score": round(float(score), 3), "template": name}
+        checked += len(urls)
+        print(f"  ✓ Проверено картинок: {checked}/{len(ids_by_url)}")
+    return results
+
+
+def watermark_batches(
+    products: list,
+    results: dict,
+    threshold: float = THRESHOLD,
+    batch_size: int = FLAG_BATCH_SIZE,
+) -> list:
+    """
+    Пачки журнала merge: specifications.has_watermark / watermark_score /
+    watermark_source для каждого проверенного товара; откат - прежние значения
+    """
+    forward, inverse = [], []
+    for product in sorted(products, key=lambda p: p["id"]):
+        result = results.get(product["id"])
+        if not result:
+            continue
+
+        flagged = result["score"] >= threshold
+        patch = {
+            "has_watermark": flagged,
+            "watermark_score": result["score"],
+            "watermark_source": result["template"] if flagged else None,
+        }
+        specs = product.get("specifications") or {}
+        old = {key: specs[key] for key in SPEC_KEYS if key in specs}
+        if all(specs.get(key) == value for key, value in patch.items()):
+            continue
+
+        forward.append({"id": product["id"], "patch": patch})
+        missing = [key for key in SPEC_KEYS if key not in old]
+        inverse.append({"id": product["id"], "patch": old, "remove": missing})
+    return batches("merge", forward, inverse, batch_size)